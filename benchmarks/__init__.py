@@ -0,0 +1,5 @@
+"""
+Legalgram 2.0 Performance Benchmarks
+====================================
+Standalone scripts - run with `python -m benchmarks.<name>`.
+"""
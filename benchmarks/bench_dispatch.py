@@ -0,0 +1,68 @@
+"""
+=========================================================
+LEGALGRAM 2.0 - STAGE DISPATCH MICROBENCHMARK
+=========================================================
+Per-stage cost of LegalAI.process_flow and of the bare
+STAGE_HANDLERS lookup.
+
+Run:  python -m benchmarks.bench_dispatch [--number N]
+SALES_MODE uses a catalog-matched message so no LLM is called.
+=========================================================
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.ai_engine import LegalAI, STAGE_HANDLERS, Stage
+
+# One representative message per stage (deterministic paths only)
+STAGE_MESSAGES = {
+    Stage.INIT: "",
+    Stage.CAPTURE_NAME: "my name is Alice",
+    Stage.TRIAGE: "I want to talk to a lawyer",
+    Stage.HUMAN_ROUTE: "actually show me a document",
+    Stage.SALES_MODE: "I need an NDA for my startup",
+    Stage.DONE: "thanks",
+}
+
+
+def bench_stage(stage: Stage, number: int) -> float:
+    """Nanoseconds per process_flow call for one stage"""
+    message = STAGE_MESSAGES[stage]
+    seconds = min(timeit.repeat(
+        lambda: LegalAI.process_flow(message, "Alice", stage.value, "bench"),
+        number=number, repeat=5
+    ))
+    return seconds / number * 1e9
+
+
+def bench_lookup(number: int) -> float:
+    """Nanoseconds per handler lookup"""
+    get = STAGE_HANDLERS.get
+    seconds = min(timeit.repeat(lambda: get("TRIAGE"), number=number, repeat=5))
+    return seconds / number * 1e9
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[3])
+    parser.add_argument("--number", type=int, default=20000, help="calls per timing run")
+    args = parser.parse_args()
+
+    # Warm caches and CPU frequency before the first measured stage
+    for stage in Stage:
+        bench_stage(stage, args.number // 10 or 1)
+
+    print(f"{'stage':<14} {'ns/call':>10}")
+    print("-" * 25)
+    for stage in Stage:
+        print(f"{stage.value:<14} {bench_stage(stage, args.number):>10.0f}")
+    print("-" * 25)
+    print(f"{'lookup only':<14} {bench_lookup(args.number * 10):>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+=========================================================
+LEGALGRAM 2.0 - SALES PROMPT BENCHMARK
+=========================================================
+Per-request system prompt built with an f-string (user name
+and query interpolated) vs the static cached prompt with the
+user context in its own message.
+
+Reports build time, estimated prompt tokens per request and
+how many leading tokens two different requests share (the
+part a provider-side prefix cache can reuse).
+
+Run:  python -m benchmarks.bench_prompt [--number N]
+=========================================================
+"""
+
+import argparse
+import os
+import sys
+import timeit
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.ai_engine import SALESPERSON_PROMPT, USER_CONTEXT_TEMPLATE, LegalAI
+from services.prompts import build_chat_messages
+from services.tokens import estimate_tokens
+
+REQUESTS = [
+    ("Alice", "I am hiring a freelance designer, what do I need?"),
+    ("Bob", "My landlord wants me to sign something before I move in"),
+]
+
+
+def legacy_messages(user_name: str, message: str) -> List[Dict[str, str]]:
+    """How SALES_MODE built its prompt before the static system prompt"""
+    system_prompt = f"""
+{SALESPERSON_PROMPT}
+
+USER CONTEXT:
+- User Name: {user_name}
+- They are looking for legal document help
+- Current Query: {message}
+
+AVAILABLE DOCUMENTS (mention these by name):
+- NDA (Non-Disclosure Agreement) - Business confidentiality
+- Lease Agreement - Rental property
+- LLC Operating Agreement - Business formation
+- Power of Attorney - Financial/legal authority
+- Employment Agreement - Hiring employees
+- And 165+ more templates
+
+YOUR RESPONSE SHOULD:
+1. Acknowledge their need
+2. Recommend 1-2 specific documents that fit
+3. Briefly explain why our version is best
+4. End with a call to action
+"""
+    return [{"role": "system", "content": system_prompt}, {"role": "user", "content": message}]
+
+
+def current_messages(user_name: str, message: str) -> List[Dict[str, str]]:
+    system_prompt, _ = LegalAI.sales_system_prompt()
+    context = USER_CONTEXT_TEMPLATE.format(name=user_name)
+    messages, _ = build_chat_messages(system_prompt, message, context=context)
+    return messages
+
+
+def flatten(messages: List[Dict[str, str]]) -> str:
+    return "".join(f"<{m['role']}>{m['content']}" for m in messages)
+
+
+def shared_prefix_tokens(build) -> int:
+    """Estimated tokens at the start of two different requests that are identical"""
+    first, second = (flatten(build(*request)) for request in REQUESTS)
+    return estimate_tokens(os.path.commonprefix([first, second]))
+
+
+def build_us(build, number: int) -> float:
+    user_name, message = REQUESTS[0]
+    seconds = min(timeit.repeat(lambda: build(user_name, message), number=number, repeat=5))
+    return seconds / number * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[3])
+    parser.add_argument("--number", type=int, default=20000, help="builds per timing run")
+    args = parser.parse_args()
+
+    print(f"{'variant':<10} {'build (us)':>11} {'prompt tok':>11} {'shared tok':>11} {'cacheable':>10}")
+    print("-" * 57)
+    for name, build in (("f-string", legacy_messages), ("static", current_messages)):
+        build(*REQUESTS[0])
+        tokens = sum(estimate_tokens(m["content"]) for m in build(*REQUESTS[0]))
+        shared = shared_prefix_tokens(build)
+        print(
+            f"{name:<10} {build_us(build, args.number):>11.2f} {tokens:>11} "
+            f"{shared:>11} {shared / tokens:>10.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+=========================================================
+LEGALGRAM 2.0 - SESSION MEMORY BENCHMARK
+=========================================================
+Bytes per session for the legacy dict layout vs the slotted
+SessionRecord/MessageRecord layout, at several history sizes.
+
+Run:  python -m benchmarks.bench_session_memory [--sessions N]
+Measured with tracemalloc; message text is generated fresh for
+every message so both layouts pay the same for content.
+=========================================================
+"""
+
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Any, Callable, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.records import ROLE_ASSISTANT, ROLE_USER, MessageRecord, SessionRecord
+
+MESSAGE_COUNTS = (10, 100, 1000)
+
+USER_TEXT = "I need an NDA for my startup, message {i}"
+ASSISTANT_TEXT = (
+    "Great choice! Our **Non-Disclosure Agreement** protects your confidential "
+    "business information when sharing with partners or employees. Reply {i}."
+)
+
+
+def legacy_session(n_messages: int) -> dict:
+    """Layout used before records: dicts with ISO timestamp strings"""
+    messages = []
+    for i in range(n_messages // 2):
+        messages.append({
+            "role": "user",
+            "content": USER_TEXT.format(i=i),
+            "timestamp": datetime.now().isoformat()
+        })
+        messages.append({
+            "role": "assistant",
+            "content": ASSISTANT_TEXT.format(i=i),
+            "timestamp": datetime.now().isoformat()
+        })
+    return {
+        "user_name": "Alice",
+        "stage": "SALES_MODE",
+        "messages": messages,
+        "created_at": datetime.now().isoformat()
+    }
+
+
+def record_session(n_messages: int) -> SessionRecord:
+    """Current layout: slotted records, interned roles, float timestamps"""
+    messages = []
+    for i in range(n_messages // 2):
+        messages.append(MessageRecord(ROLE_USER, USER_TEXT.format(i=i), time.time()))
+        messages.append(MessageRecord(ROLE_ASSISTANT, ASSISTANT_TEXT.format(i=i), time.time()))
+    return SessionRecord("Alice", "SALES_MODE", messages)
+
+
+def bytes_per_session(build: Callable[[int], Any], n_messages: int, sessions: int) -> float:
+    """Average traced allocation for one session with `n_messages` messages"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept: List[Any] = [build(n_messages) for _ in range(sessions)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return (after - before) / sessions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[3])
+    parser.add_argument("--sessions", type=int, default=200, help="sessions built per measurement")
+    args = parser.parse_args()
+
+    print(f"{'messages':>8} {'dict (B)':>12} {'records (B)':>12} {'saved':>7}")
+    print("-" * 42)
+    for n_messages in MESSAGE_COUNTS:
+        sessions = max(1, args.sessions * 10 // n_messages)
+        legacy = bytes_per_session(legacy_session, n_messages, sessions)
+        records = bytes_per_session(record_session, n_messages, sessions)
+        print(f"{n_messages:>8} {legacy:>12,.0f} {records:>12,.0f} {1 - records / legacy:>6.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+"""
+=========================================================
+LEGALGRAM 2.0 - ENGINE BENCHMARK SUITE (WITH BASELINES)
+=========================================================
+Times the engine hot paths against catalogs of 5 (the
+built-in DOCUMENT_DATABASE), 170 (production) and 5000
+templates:
+- process_flow for every deterministic stage, SALES_MODE with
+  a catalog hit on the first and on the last template
+- match_document / needs_llm: first hit, last hit, miss (the
+  full scan every LLM-bound turn pays)
+- _generate_document_pitch
+- get_document_details: exact key, fuzzy, miss
+
+Baselines are JSON ({case: ns per call}). Save one on the
+reference commit, then compare: any case slower than
+baseline * (1 + tolerance) is a regression and the run exits 1.
+A missing baseline file exits 2 rather than passing.
+
+--save keeps the median of --runs full runs (default 5) and
+refuses to write a baseline whose catalog-independent cases
+(deterministic stages, first hit, exact lookup) disagree across
+catalog sizes by more than 50%: that is machine noise, not a
+reference. A stored baseline failing the same check exits 2.
+
+Run:  python -m benchmarks.bench_suite --save            (write baseline)
+      python -m benchmarks.bench_suite                   (compare)
+      python -m benchmarks.bench_suite --sizes 170 --tolerance 0.2
+benchmarks/baseline.json is the committed reference. Baselines
+are machine-specific: on another host, record one from the
+reference commit there (benchmarks/README.md).
+=========================================================
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import timeit
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import ai_engine
+from services.ai_engine import LegalAI
+
+CATALOG_SIZES = (5, 170, 5000)
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+DEFAULT_TOLERANCE = 0.25
+SAVE_RUNS = 5
+
+# Cases that do not scan the catalog: their timings should agree across sizes
+CATALOG_INDEPENDENT = (
+    "process_flow:INIT", "process_flow:CAPTURE_NAME", "process_flow:TRIAGE", "process_flow:HUMAN_ROUTE",
+    "process_flow:DONE", "process_flow:SALES_MODE:first", "match_document:first", "document_pitch",
+    "document_details:exact",
+)
+CONSISTENCY_TOLERANCE = 0.5
+
+# Not named in any template, so matching scans the whole catalog
+MISS_MESSAGE = "my neighbour's tree fell on my car, what now?"
+
+_SUBJECTS = (
+    "Commercial", "Residential", "Vendor", "Consulting", "Freelance", "Partnership",
+    "Equipment", "Software", "Franchise", "Marketing", "Construction", "Healthcare",
+)
+_KINDS = (
+    "Services Agreement", "Sublease", "Release Form", "Bill of Sale", "Promissory Note",
+    "License Agreement", "Purchase Agreement", "Consent Form", "Addendum", "Waiver",
+)
+_CATEGORIES = ("Business Security", "Property Matters", "Family Protection")
+
+
+def synthetic_catalog(size: int) -> Dict[str, Dict[str, Any]]:
+    """The real templates first, padded with generated ones to `size` entries"""
+    catalog: Dict[str, Dict[str, Any]] = {}
+    for doc_key, doc_info in ai_engine.DOCUMENT_DATABASE.items():
+        if len(catalog) == size:
+            return catalog
+        catalog[doc_key] = doc_info
+    template = next(iter(ai_engine.DOCUMENT_DATABASE.values()))
+    serial = 0
+    while len(catalog) < size:
+        subject = _SUBJECTS[serial % len(_SUBJECTS)]
+        kind = _KINDS[(serial // len(_SUBJECTS)) % len(_KINDS)]
+        full_name = f"{subject} {kind} {serial // (len(_SUBJECTS) * len(_KINDS)) + 1:03d}"
+        catalog[full_name.lower()] = {
+            **template,
+            "full_name": full_name,
+            "category": _CATEGORIES[serial % len(_CATEGORIES)],
+        }
+        serial += 1
+    return catalog
+
+
+@contextmanager
+def installed_catalog(catalog: Dict[str, Dict[str, Any]]) -> Iterator[None]:
+    """Swap DOCUMENT_DATABASE (and the derived index) for the duration of the block"""
+    original = ai_engine.DOCUMENT_DATABASE
+    ai_engine.DOCUMENT_DATABASE = catalog
+    LegalAI.build_catalog_index()
+    try:
+        yield
+    finally:
+        ai_engine.DOCUMENT_DATABASE = original
+        LegalAI.build_catalog_index()
+
+
+class BenchCase(NamedTuple):
+    name: str
+    call: Callable[[], Any]
+
+
+def engine_cases(catalog: Dict[str, Dict[str, Any]]) -> List[BenchCase]:
+    """Cases for the currently installed catalog"""
+    docs = list(catalog.values())
+    keys = list(catalog)
+    first, last = docs[0], docs[-1]
+    first_msg = f"I need a {first['full_name']}"
+    last_msg = f"I need a {last['full_name']}"
+    flow = LegalAI.process_flow
+    return [
+        BenchCase("process_flow:INIT", lambda: flow("", "Alice", "INIT", "bench")),
+        BenchCase("process_flow:CAPTURE_NAME", lambda: flow("my name is Alice", None, "CAPTURE_NAME", "bench")),
+        BenchCase("process_flow:TRIAGE", lambda: flow("I want to talk to a lawyer", "Alice", "TRIAGE", "bench")),
+        BenchCase("process_flow:HUMAN_ROUTE", lambda: flow("show me a document", "Alice", "HUMAN_ROUTE", "bench")),
+        BenchCase("process_flow:SALES_MODE:first", lambda: flow(first_msg, "Alice", "SALES_MODE", "bench")),
+        BenchCase("process_flow:SALES_MODE:last", lambda: flow(last_msg, "Alice", "SALES_MODE", "bench")),
+        BenchCase("process_flow:DONE", lambda: flow("thanks", "Alice", "DONE", "bench")),
+        BenchCase("match_document:first", lambda: LegalAI.match_document(first_msg)),
+        BenchCase("match_document:last", lambda: LegalAI.match_document(last_msg)),
+        BenchCase("match_document:miss", lambda: LegalAI.match_document(MISS_MESSAGE)),
+        BenchCase("needs_llm:miss", lambda: LegalAI.needs_llm(MISS_MESSAGE, "SALES_MODE")),
+        BenchCase("document_pitch", lambda: LegalAI._generate_document_pitch(last, "Alice")),
+        BenchCase("document_details:exact", lambda: LegalAI.get_document_details(keys[-1].replace(" ", "-"))),
+        BenchCase("document_details:fuzzy", lambda: LegalAI.get_document_details(f"{keys[-1]} template")),
+        BenchCase("document_details:miss", lambda: LegalAI.get_document_details("time machine lease")),
+    ]
+
+
+def calibrate(call: Callable[[], Any], sample_seconds: float = 0.05) -> int:
+    """Calls per timing sample so one sample takes about `sample_seconds`"""
+    number, seconds = timeit.Timer(call).autorange()
+    return max(1, int(number * sample_seconds / seconds))
+
+
+def run_suite(sizes: Sequence[int] = CATALOG_SIZES, number: Optional[int] = None, repeat: int = 7) -> Dict[str, float]:
+    """{"catalog=<size>/<case>": ns per call}.
+
+    Samples are taken in rounds over all cases (not back to back per
+    case) and the best round is kept, so a burst of machine noise
+    inflates one sample of many cases instead of every sample of one.
+    """
+    results: Dict[str, float] = {}
+    for size in sizes:
+        with installed_catalog(synthetic_catalog(size)):
+            cases = engine_cases(ai_engine.DOCUMENT_DATABASE)
+            timers = [(case.name, timeit.Timer(case.call), number or calibrate(case.call)) for case in cases]
+            best: Dict[str, float] = {}
+            for _ in range(repeat):
+                for name, timer, calls in timers:
+                    ns = timer.timeit(calls) / calls * 1e9
+                    best[name] = min(ns, best.get(name, ns))
+            for name, _, _ in timers:
+                results[f"catalog={size}/{name}"] = best[name]
+    return results
+
+
+def record_baseline(
+    sizes: Sequence[int] = CATALOG_SIZES, number: Optional[int] = None, repeat: int = 7, runs: int = SAVE_RUNS
+) -> Dict[str, float]:
+    """Median per case over `runs` full runs of run_suite()"""
+    samples: Dict[str, List[float]] = {}
+    for _ in range(max(1, runs)):
+        for name, ns in run_suite(sizes, number, repeat).items():
+            samples.setdefault(name, []).append(ns)
+    return {name: statistics.median(values) for name, values in samples.items()}
+
+
+def inconsistent_cases(results: Dict[str, float], tolerance: float = CONSISTENCY_TOLERANCE) -> List[str]:
+    """Catalog-independent cases whose timings differ across catalog sizes by more than `tolerance`"""
+    spread: Dict[str, List[float]] = {}
+    for key, ns in results.items():
+        _, _, name = key.partition("/")
+        if name in CATALOG_INDEPENDENT:
+            spread.setdefault(name, []).append(ns)
+    return [
+        f"{name} ({min(values):,.0f}-{max(values):,.0f} ns)"
+        for name, values in spread.items()
+        if len(values) > 1 and max(values) > min(values) * (1 + tolerance)
+    ]
+
+
+class Comparison(NamedTuple):
+    name: str
+    baseline: Optional[float]
+    current: float
+    ratio: Optional[float]
+    regressed: bool
+
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], tolerance: float) -> List[Comparison]:
+    """Per-case ratio against the baseline; cases missing from it never regress"""
+    rows = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if not base:
+            rows.append(Comparison(name, None, current, None, False))
+            continue
+        ratio = current / base
+        rows.append(Comparison(name, base, current, ratio, ratio > 1 + tolerance))
+    return rows
+
+
+def environment() -> Dict[str, str]:
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "processor": platform.processor() or "unknown",
+    }
+
+
+def save_baseline(path: str, results: Dict[str, float]) -> None:
+    with open(path, "w") as f:
+        json.dump(
+            {"environment": environment(), "results": {k: round(v, 1) for k, v in results.items()}},
+            f, indent=2, sort_keys=True
+        )
+        f.write("\n")
+
+
+def load_baseline(path: str) -> Optional[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[3])
+    parser.add_argument("--sizes", default=",".join(map(str, CATALOG_SIZES)), help="comma-separated catalog sizes")
+    parser.add_argument("--number", type=int, default=None, help="calls per timing run (default: auto)")
+    parser.add_argument("--repeat", type=int, default=7, help="timing rounds (best per case is kept)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON path")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="allowed slowdown (0.25 = +25%%)")
+    parser.add_argument("--save", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--runs", type=int, default=None, help=f"full runs, median kept (default: {SAVE_RUNS} with --save, else 1)")
+    args = parser.parse_args()
+
+    stored = None if args.save else load_baseline(args.baseline)
+    if not args.save:
+        if stored is None:
+            print(f"No baseline at {args.baseline}; run with --save on the reference commit to record one")
+            sys.exit(2)
+        noisy = inconsistent_cases(stored["results"])
+        if noisy:
+            print(f"Baseline {args.baseline} was recorded on a noisy run; re-record it with --save:")
+            for case in noisy:
+                print(f"    {case}")
+            sys.exit(2)
+
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    runs = args.runs or (SAVE_RUNS if args.save else 1)
+    results = record_baseline(sizes, args.number, args.repeat, runs)
+
+    if args.save:
+        noisy = inconsistent_cases(results)
+        if noisy:
+            print("Catalog-independent cases disagree across catalog sizes; not saving (machine busy?):")
+            for case in noisy:
+                print(f"    {case}")
+            sys.exit(1)
+        save_baseline(args.baseline, results)
+        for name, ns in results.items():
+            print(f"{name:<50} {ns:>12,.0f} ns")
+        print(f"\nBaseline written to {args.baseline}")
+        return
+
+    baseline = stored["results"]
+    if stored.get("environment") != environment():
+        print(f"warning: baseline was recorded on {stored.get('environment')}, this is {environment()}\n")
+
+    rows = compare(results, baseline, args.tolerance)
+    print(f"{'case':<50} {'baseline ns':>12} {'current ns':>12} {'ratio':>7}")
+    print("-" * 84)
+    for row in rows:
+        base = f"{row.baseline:,.0f}" if row.baseline is not None else "-"
+        ratio = f"{row.ratio:.2f}x" if row.ratio is not None else "-"
+        flag = "  REGRESSED" if row.regressed else ""
+        print(f"{row.name:<50} {base:>12} {row.current:>12,.0f} {ratio:>7}{flag}")
+
+    regressed = [row for row in rows if row.regressed]
+    if regressed:
+        print(f"\n{len(regressed)} case(s) slower than baseline by more than {args.tolerance:.0%}")
+        sys.exit(1)
+    else:
+        print(f"\nAll cases within {args.tolerance:.0%} of baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""
+=========================================================
+LEGALGRAM 2.0 - IN-PROCESS REDIS STAND-IN
+=========================================================
+Implements the small slice of the redis-py client API that
+RedisSessionStore uses (hashes, lists, sorted sets, EXPIRE,
+DBSIZE, pipelines), with decode_responses=True semantics, so tests
+and benchmarks can exercise the Redis backend with no server
+and no `redis` package installed. Lives with the benchmarks
+(soak_sessions.py) so they run without the tests package; the
+tests import it from here. The app never imports it.
+
+Not a general-purpose fake: unsupported commands simply do
+not exist.
+=========================================================
+"""
+
+import threading
+import time
+from typing import Any, Dict, List
+
+
+class FakeRedis:
+    """Thread-safe dict-backed subset of redis.Redis"""
+
+    # Commands between sweeps for expired keys
+    ACTIVE_EXPIRE_EVERY = 1000
+
+    def __init__(self) -> None:
+        self._data: Dict[str, Any] = {}
+        self._expires: Dict[str, float] = {}
+        self._lock = threading.RLock()
+        self.commands = 0
+        self.round_trips = 0
+
+    # ---- housekeeping ----
+    def _alive(self, key: str) -> bool:
+        deadline = self._expires.get(key)
+        if deadline is not None and deadline <= time.monotonic():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        return key in self._data
+
+    def _run(self, name: str, *args: Any, **kwargs: Any) -> Any:
+        with self._lock:
+            self.commands += 1
+            if self.commands % self.ACTIVE_EXPIRE_EVERY == 0:
+                self._active_expire()
+            return getattr(self, f"_cmd_{name}")(*args, **kwargs)
+
+    def _active_expire(self) -> None:
+        # Redis also deletes expired keys nobody reads again (its active
+        # expire cycle); without this, abandoned sessions would pile up here
+        now = time.monotonic()
+        for key in [key for key, deadline in self._expires.items() if deadline <= now]:
+            self._data.pop(key, None)
+            del self._expires[key]
+
+    # ---- commands ----
+    def _cmd_hset(self, name: str, mapping: Dict[str, Any]) -> int:
+        if not self._alive(name):
+            self._data[name] = {}
+        current = self._data[name]
+        added = sum(1 for field in mapping if field not in current)
+        current.update({field: str(value) for field, value in mapping.items()})
+        return added
+
+    def _cmd_hgetall(self, name: str) -> Dict[str, str]:
+        return dict(self._data[name]) if self._alive(name) else {}
+
+    def _cmd_rpush(self, name: str, *values: Any) -> int:
+        if not self._alive(name):
+            self._data[name] = []
+        self._data[name].extend(str(v) for v in values)
+        return len(self._data[name])
+
+    def _cmd_lrange(self, name: str, start: int, end: int) -> List[str]:
+        if not self._alive(name):
+            return []
+        items = self._data[name]
+        stop = len(items) if end == -1 else (end + 1 if end >= 0 else len(items) + end + 1)
+        return list(items[start if start >= 0 else max(len(items) + start, 0):stop])
+
+    def _cmd_ltrim(self, name: str, start: int, end: int) -> bool:
+        if self._alive(name):
+            self._data[name] = self._cmd_lrange(name, start, end)
+            if not self._data[name]:
+                self._cmd_delete(name)
+        return True
+
+    def _cmd_expire(self, name: str, seconds: int) -> bool:
+        if not self._alive(name):
+            return False
+        self._expires[name] = time.monotonic() + seconds
+        return True
+
+    def _cmd_ttl(self, name: str) -> int:
+        if not self._alive(name):
+            return -2
+        deadline = self._expires.get(name)
+        return -1 if deadline is None else int(round(deadline - time.monotonic()))
+
+    def _cmd_delete(self, *names: str) -> int:
+        removed = 0
+        for name in names:
+            if self._alive(name):
+                del self._data[name]
+                removed += 1
+            self._expires.pop(name, None)
+        return removed
+
+    def _cmd_zadd(self, name: str, mapping: Dict[str, float]) -> int:
+        if not self._alive(name):
+            self._data[name] = {}
+        current = self._data[name]
+        added = sum(1 for member in mapping if member not in current)
+        current.update({member: float(score) for member, score in mapping.items()})
+        return added
+
+    def _cmd_zrem(self, name: str, *members: str) -> int:
+        if not self._alive(name):
+            return 0
+        removed = sum(1 for member in members if self._data[name].pop(member, None) is not None)
+        if not self._data[name]:
+            self._cmd_delete(name)
+        return removed
+
+    def _cmd_zremrangebyscore(self, name: str, low: Any, high: Any) -> int:
+        if not self._alive(name):
+            return 0
+        low, high = float(low), float(high)
+        return self._cmd_zrem(name, *[m for m, score in self._data[name].items() if low <= score <= high])
+
+    def _cmd_zcard(self, name: str) -> int:
+        return len(self._data[name]) if self._alive(name) else 0
+
+    def _cmd_ping(self) -> bool:
+        return True
+
+    def _cmd_dbsize(self) -> int:
+        return len(self._data)
+
+    # ---- client API ----
+    def hset(self, name: str, mapping: Dict[str, Any]) -> int:
+        self.round_trips += 1
+        return self._run("hset", name, mapping)
+
+    def hgetall(self, name: str) -> Dict[str, str]:
+        self.round_trips += 1
+        return self._run("hgetall", name)
+
+    def rpush(self, name: str, *values: Any) -> int:
+        self.round_trips += 1
+        return self._run("rpush", name, *values)
+
+    def lrange(self, name: str, start: int, end: int) -> List[str]:
+        self.round_trips += 1
+        return self._run("lrange", name, start, end)
+
+    def ltrim(self, name: str, start: int, end: int) -> bool:
+        self.round_trips += 1
+        return self._run("ltrim", name, start, end)
+
+    def expire(self, name: str, seconds: int) -> bool:
+        self.round_trips += 1
+        return self._run("expire", name, seconds)
+
+    def ttl(self, name: str) -> int:
+        self.round_trips += 1
+        return self._run("ttl", name)
+
+    def delete(self, *names: str) -> int:
+        self.round_trips += 1
+        return self._run("delete", *names)
+
+    def zadd(self, name: str, mapping: Dict[str, float]) -> int:
+        self.round_trips += 1
+        return self._run("zadd", name, mapping)
+
+    def zrem(self, name: str, *members: str) -> int:
+        self.round_trips += 1
+        return self._run("zrem", name, *members)
+
+    def zremrangebyscore(self, name: str, low: Any, high: Any) -> int:
+        self.round_trips += 1
+        return self._run("zremrangebyscore", name, low, high)
+
+    def zcard(self, name: str) -> int:
+        self.round_trips += 1
+        return self._run("zcard", name)
+
+    def ping(self) -> bool:
+        self.round_trips += 1
+        return self._run("ping")
+
+    def dbsize(self) -> int:
+        self.round_trips += 1
+        return self._run("dbsize")
+
+    def pipeline(self, transaction: bool = True) -> "FakePipeline":
+        return FakePipeline(self)
+
+    def close(self) -> None:
+        pass
+
+
+class FakePipeline:
+    """Buffers commands and runs them in one go on execute()"""
+
+    def __init__(self, client: FakeRedis) -> None:
+        self._client = client
+        self._queued: List[tuple] = []
+
+    def __enter__(self) -> "FakePipeline":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._queued = []
+
+    def __getattr__(self, name: str) -> Any:
+        if not hasattr(FakeRedis, f"_cmd_{name}"):
+            raise AttributeError(name)
+
+        def queue(*args: Any, **kwargs: Any) -> "FakePipeline":
+            self._queued.append((name, args, kwargs))
+            return self
+        return queue
+
+    def execute(self) -> List[Any]:
+        queued, self._queued = self._queued, []
+        self._client.round_trips += 1
+        # One lock for the batch mirrors MULTI/EXEC atomicity
+        with self._client._lock:
+            return [self._client._run(name, *args, **kwargs) for name, args, kwargs in queued]
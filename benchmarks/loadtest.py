@@ -0,0 +1,347 @@
+"""
+=========================================================
+LEGALGRAM 2.0 - /api/chat LOAD TEST (CONVERSATION JOURNEYS)
+=========================================================
+Drives multi-turn journeys through /api/chat with an asyncio
+HTTP client:
+    INIT -> CAPTURE_NAME -> TRIAGE -> SALES_MODE x N
+(a share of journeys pick the human route at TRIAGE instead).
+SALES_MODE turns mix catalog questions (answered from the
+document database) with free-form ones (LLM calls).
+
+Open model: journeys *start* at Poisson arrivals of --rate per
+second whether or not earlier ones have finished, so a slow
+server shows up as rising latency instead of a politely slower
+generator.
+
+Targets:
+  in-process   the ASGI app via httpx.ASGITransport (default)
+  --url URL    a running server (python server.py)
+
+LLM:
+  --stub       start benchmarks/stub_llm.py in a background
+               thread and point GROQ_BASE_URL at it (in-process)
+  otherwise    whatever GROQ_API_KEY / GROQ_BASE_URL say; with
+               no key SALES_MODE answers the high-demand fallback
+
+Reports throughput, p50/p95/p99/max per stage, errors by status
+and LLM calls started (from /api/status, so one worker's view
+when the server runs several).
+
+Run:  python -m benchmarks.loadtest --rate 20 --duration 30 --stub
+      python -m benchmarks.loadtest --url http://127.0.0.1:8000 --rate 5
+=========================================================
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import socket
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+import uvicorn
+
+CATALOG_QUERIES = (
+    "I need an NDA for a new partner",
+    "Do you have a lease agreement?",
+    "I want a power of attorney for my mother",
+    "Show me the employment agreement",
+)
+
+LLM_QUERIES = (
+    "which form do I need to hire a freelancer?",
+    "what is the difference between a will and a living trust?",
+    "why do I need an operating agreement for a single-member company?",
+    "my landlord wants me to sign something before I move in",
+    "I'm selling my car to a friend, what should we sign?",
+)
+
+NAMES = ("Alice", "Bob", "Carmen", "Dev", "Eun", "Farah", "Gus", "Hana")
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class Journey:
+    """Scripted turns for one visitor: (stage label, message) pairs"""
+
+    def __init__(self, rng: random.Random, sales_turns: int, human_ratio: float, llm_ratio: float) -> None:
+        name = rng.choice(NAMES)
+        self.turns: List[Tuple[str, str]] = [("INIT", "hi"), ("CAPTURE_NAME", f"My name is {name}")]
+        if rng.random() < human_ratio:
+            self.turns += [("TRIAGE", "1"), ("HUMAN_ROUTE", "thanks, that's all")]
+            return
+        self.turns.append(("TRIAGE", "2"))
+        for _ in range(sales_turns):
+            if rng.random() < llm_ratio:
+                self.turns.append(("SALES_MODE:llm", rng.choice(LLM_QUERIES)))
+            else:
+                self.turns.append(("SALES_MODE:catalog", rng.choice(CATALOG_QUERIES)))
+
+
+class LoadReport:
+    """Latencies and outcomes collected during a run"""
+
+    def __init__(self) -> None:
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.journeys_started = 0
+        self.journeys_completed = 0
+        self.max_start_lag = 0.0
+        self.elapsed = 0.0
+        self.llm_calls = 0
+
+    def record(self, stage: str, seconds: float, error: Optional[str]) -> None:
+        self.latencies[stage].append(seconds)
+        if error is not None:
+            self.errors[stage][error] += 1
+
+    @property
+    def turns(self) -> int:
+        return sum(len(values) for values in self.latencies.values())
+
+    @property
+    def error_count(self) -> int:
+        return sum(sum(codes.values()) for codes in self.errors.values())
+
+    def stage_summary(self) -> Dict[str, Dict[str, Any]]:
+        summary = {}
+        for stage in sorted(self.latencies):
+            values = sorted(self.latencies[stage])
+            summary[stage] = {
+                "count": len(values),
+                "errors": dict(self.errors.get(stage, {})),
+                "p50_ms": round(percentile(values, 50) * 1000, 2),
+                "p95_ms": round(percentile(values, 95) * 1000, 2),
+                "p99_ms": round(percentile(values, 99) * 1000, 2),
+                "max_ms": round(values[-1] * 1000, 2),
+            }
+        return summary
+
+    def to_dict(self) -> Dict[str, Any]:
+        elapsed = self.elapsed or 1e-9
+        return {
+            "elapsed_s": round(self.elapsed, 3),
+            "journeys_started": self.journeys_started,
+            "journeys_completed": self.journeys_completed,
+            "turns": self.turns,
+            "turns_per_s": round(self.turns / elapsed, 2),
+            "errors": self.error_count,
+            "error_rate": round(self.error_count / self.turns, 4) if self.turns else 0.0,
+            "llm_calls": self.llm_calls,
+            "max_start_lag_ms": round(self.max_start_lag * 1000, 2),
+            "stages": self.stage_summary(),
+        }
+
+    def format(self) -> str:
+        data = self.to_dict()
+        lines = [
+            f"{data['journeys_completed']}/{data['journeys_started']} journeys, {data['turns']} turns "
+            f"in {data['elapsed_s']:.1f}s = {data['turns_per_s']:.1f} turns/s",
+            f"errors: {data['errors']} ({data['error_rate']:.2%})   LLM calls: {data['llm_calls']}   "
+            f"max start lag: {data['max_start_lag_ms']:.1f} ms",
+            "",
+            f"{'stage':<20} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}  errors",
+            "-" * 78,
+        ]
+        for stage, row in data["stages"].items():
+            errors = ", ".join(f"{code}x{n}" for code, n in row["errors"].items()) or "-"
+            lines.append(
+                f"{stage:<20} {row['count']:>6} {row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} "
+                f"{row['p99_ms']:>9.1f} {row['max_ms']:>9.1f}  {errors}"
+            )
+        return "\n".join(lines)
+
+
+async def _llm_calls_started(client: httpx.AsyncClient) -> Optional[int]:
+    try:
+        response = await client.get("/api/status")
+        return response.json()["in_flight"]["llm_calls"]["started"]
+    except (httpx.HTTPError, KeyError, ValueError):
+        return None
+
+
+async def run_journey(
+    client: httpx.AsyncClient,
+    journey: Journey,
+    report: LoadReport,
+    think_time: float = 0.0
+) -> bool:
+    """Play one journey; stops at the first failed turn. True when every turn succeeded"""
+    session_id: Optional[str] = None
+    context_stage = "INIT"
+    for label, message in journey.turns:
+        body = {"message": message, "session_id": session_id, "context_stage": context_stage}
+        started = time.perf_counter()
+        error = None
+        try:
+            response = await client.post("/api/chat", json=body)
+            if response.status_code != 200:
+                error = str(response.status_code)
+        except httpx.TimeoutException:
+            error = "timeout"
+        except httpx.HTTPError as e:
+            error = type(e).__name__
+        report.record(label, time.perf_counter() - started, error)
+        if error is not None:
+            return False
+        data = response.json()
+        session_id = data["session_id"]
+        context_stage = data["new_stage"]
+        if think_time:
+            await asyncio.sleep(think_time)
+    return True
+
+
+async def run_load(
+    client: httpx.AsyncClient,
+    rate: float,
+    duration: Optional[float] = None,
+    journeys: Optional[int] = None,
+    sales_turns: int = 2,
+    human_ratio: float = 0.2,
+    llm_ratio: float = 0.5,
+    think_time: float = 0.0,
+    seed: Optional[int] = None
+) -> LoadReport:
+    """Start journeys at Poisson arrivals until `duration` seconds or `journeys` starts, then wait for all"""
+    if duration is None and journeys is None:
+        raise ValueError("give a duration or a journey count")
+    rng = random.Random(seed)
+    report = LoadReport()
+    llm_before = await _llm_calls_started(client)
+
+    async def play(journey: Journey) -> None:
+        if await run_journey(client, journey, report, think_time):
+            report.journeys_completed += 1
+
+    tasks = []
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    next_arrival = started
+    while True:
+        if journeys is not None and report.journeys_started >= journeys:
+            break
+        if duration is not None and next_arrival - started >= duration:
+            break
+        delay = next_arrival - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        report.max_start_lag = max(report.max_start_lag, loop.time() - next_arrival)
+        journey = Journey(rng, sales_turns, human_ratio, llm_ratio)
+        tasks.append(asyncio.ensure_future(play(journey)))
+        report.journeys_started += 1
+        next_arrival += rng.expovariate(rate)
+    await asyncio.gather(*tasks)
+    report.elapsed = loop.time() - started
+
+    llm_after = await _llm_calls_started(client)
+    if llm_before is not None and llm_after is not None:
+        report.llm_calls = llm_after - llm_before
+    return report
+
+
+RATE_LIMIT_SETTINGS = ("RATE_LIMIT_PER_MINUTE", "RATE_LIMIT_LLM_PER_MINUTE", "RATE_LIMIT_PER_HOUR")
+
+
+def in_process_client(timeout: float = 30.0) -> httpx.AsyncClient:
+    """AsyncClient bound to main.app without a network hop.
+
+    Every simulated visitor shares the transport's client address,
+    so the per-IP rate limits are off unless set in the environment.
+    """
+    for name in RATE_LIMIT_SETTINGS:
+        os.environ.setdefault(name, "0")
+    from main import app
+
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    return httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=timeout)
+
+
+def start_stub(ttft: str, rate_429: float) -> str:
+    """Serve the stub LLM on a free local port in a daemon thread; returns its base URL"""
+    from benchmarks.stub_llm import StubConfig, create_stub_app
+
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    config = uvicorn.Config(
+        create_stub_app(StubConfig(ttft=ttft, rate_429=rate_429)),
+        host="127.0.0.1", port=port, log_level="warning"
+    )
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}"
+
+
+async def _main(args: argparse.Namespace) -> LoadReport:
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout)
+    else:
+        client = in_process_client(args.timeout)
+    async with client:
+        return await run_load(
+            client,
+            rate=args.rate,
+            duration=args.duration,
+            journeys=args.journeys,
+            sales_turns=args.sales_turns,
+            human_ratio=args.human_ratio,
+            llm_ratio=args.llm_ratio,
+            think_time=args.think_time,
+            seed=args.seed
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[3])
+    parser.add_argument("--url", help="base URL of a running server (default: in-process app)")
+    parser.add_argument("--rate", type=float, default=10.0, help="journey arrivals per second")
+    parser.add_argument("--duration", type=float, default=None, help="seconds to keep starting journeys")
+    parser.add_argument("--journeys", type=int, default=None, help="number of journeys to start")
+    parser.add_argument("--sales-turns", type=int, default=2, help="SALES_MODE turns per AI journey")
+    parser.add_argument("--human-ratio", type=float, default=0.2, help="share of journeys taking the human route")
+    parser.add_argument("--llm-ratio", type=float, default=0.5, help="share of SALES_MODE turns needing the LLM")
+    parser.add_argument("--think-time", type=float, default=0.0, help="pause between a visitor's turns (s)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="per-request client timeout (s)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--stub", action="store_true", help="run the stub LLM in-process (in-process target only)")
+    parser.add_argument("--stub-ttft", default="lognormal:0.35,0.5", help="stub time-to-first-token distribution")
+    parser.add_argument("--stub-rate-429", type=float, default=0.0, help="stub 429 rate")
+    parser.add_argument("--json", dest="json_path", help="also write the report as JSON to this path")
+    args = parser.parse_args()
+    if args.duration is None and args.journeys is None:
+        args.duration = 10.0
+
+    if args.stub:
+        if args.url:
+            parser.error("--stub only applies to the in-process target")
+        os.environ["GROQ_BASE_URL"] = start_stub(args.stub_ttft, args.stub_rate_429)
+        os.environ.setdefault("GROQ_API_KEY", "stub")
+
+    report = asyncio.run(_main(args))
+    print(report.format())
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report.to_dict(), f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
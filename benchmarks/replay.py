@@ -0,0 +1,261 @@
+"""
+=========================================================
+LEGALGRAM 2.0 - TURN TRACE REPLAY
+=========================================================
+Feeds a trace recorded with TURN_RECORD_PATH (see
+services/turn_recorder.py) back through /api/chat, so a change
+can be compared on real traffic shapes: session arrivals,
+journey lengths, stage mix, catalog vs LLM turns.
+
+Timing:
+  --speed 1    original timing (default)
+  --speed 10   ten times compressed
+  --speed 0    as fast as possible
+Each recorded session replays on its own session id with its
+turns in order; a turn never starts before the previous one of
+its session has been answered.
+
+Traces hold no message text, so each turn gets a synthetic one
+that takes the recorded path: the recorded TRIAGE / HUMAN_ROUTE
+choice, the suggested catalog document, or an LLM question of
+the recorded route padded to the recorded length. A document no
+longer in the catalog replays as an LLM turn.
+
+Targets and LLM options (--url, --stub) as in loadtest.py.
+Prints the recorded server-side latency per stage next to the
+replayed client-side latency.
+
+Run:  python -m benchmarks.replay turns.jsonl --speed 10 --stub
+      python -m benchmarks.replay turns.jsonl --url http://127.0.0.1:8000 --speed 0
+=========================================================
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from benchmarks.loadtest import LLM_QUERIES, LoadReport, _llm_calls_started, in_process_client, start_stub
+from services.ai_engine import LegalAI
+from services.routing import COMPARISON, EXPLANATION, SHORT_ANSWER, classify_query
+
+ROUTE_QUERIES = {
+    SHORT_ANSWER: LLM_QUERIES[0],
+    COMPARISON: LLM_QUERIES[1],
+    EXPLANATION: LLM_QUERIES[2],
+}
+
+# Neutral padding for LLM questions: no catalog names, no routing keywords
+_PADDING = " we are a small team and want to get the paperwork right"
+
+
+def load_trace(path: str) -> List[Dict[str, Any]]:
+    """Records in start order; unreadable lines are skipped"""
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(record, dict) and "t" in record and "s" in record:
+                records.append(record)
+    records.sort(key=lambda record: record["t"])
+    return records
+
+
+def group_sessions(records: List[Dict[str, Any]]) -> "OrderedDict[str, List[Dict[str, Any]]]":
+    """Session token -> its records, sessions ordered by first turn"""
+    sessions: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+    for record in records:
+        sessions.setdefault(record["s"], []).append(record)
+    return sessions
+
+
+def effective_stages(turns: List[Dict[str, Any]]) -> List[str]:
+    """Stage each turn of one session ran in.
+
+    Like run_chat_turn: a client sending INIT continues from the
+    session's stored stage, i.e. the previous turn's outcome.
+    """
+    stages = []
+    session_stage = "INIT"
+    for record in turns:
+        stage = record.get("st", "INIT")
+        stages.append(stage if stage != "INIT" else session_stage)
+        session_stage = record.get("ns", session_stage)
+    return stages
+
+
+def stage_label(record: Dict[str, Any], stage: str) -> str:
+    """Report label; SALES_MODE is split into catalog and LLM turns like loadtest.py"""
+    if stage == "SALES_MODE":
+        return "SALES_MODE:catalog" if record.get("doc") else "SALES_MODE:llm"
+    return stage
+
+
+def _llm_message(route: Optional[str], length: int) -> str:
+    base = ROUTE_QUERIES.get(route or SHORT_ANSWER, ROUTE_QUERIES[SHORT_ANSWER])
+    message = base
+    while len(message) + len(_PADDING) <= length:
+        candidate = message + _PADDING
+        if classify_query(candidate) != classify_query(base):
+            break
+        message = candidate
+    return message
+
+
+def synthesize_message(record: Dict[str, Any], stage: str) -> str:
+    """A message that takes the same path through `stage` as the recorded one"""
+    next_stage = record.get("ns")
+    if stage == "CAPTURE_NAME":
+        return "My name is Visitor"
+    if stage == "TRIAGE":
+        return {"HUMAN_ROUTE": "1", "SALES_MODE": "2"}.get(next_stage, "hmm, not sure")
+    if stage == "HUMAN_ROUTE":
+        return "show me a document" if next_stage == "SALES_MODE" else "thanks, that's all"
+    if stage == "SALES_MODE":
+        doc = record.get("doc")
+        if doc and LegalAI.match_document(doc) is not None:
+            return f"I need a {doc}"
+        return _llm_message(record.get("route"), record.get("len", 0))
+    return "hi"
+
+
+def recorded_report(records: List[Dict[str, Any]]) -> LoadReport:
+    """The trace's own server-side latencies in LoadReport form"""
+    report = LoadReport()
+    for turns in group_sessions(records).values():
+        for record, stage in zip(turns, effective_stages(turns)):
+            code = record.get("code", 200)
+            report.record(stage_label(record, stage), record.get("ms", 0.0) / 1000, None if code == 200 else str(code))
+    if records:
+        report.elapsed = records[-1]["t"] - records[0]["t"]
+    report.journeys_started = report.journeys_completed = len(group_sessions(records))
+    report.llm_calls = sum(1 for record in records if "llm_ms" in record)
+    return report
+
+
+async def replay_session(
+    client: httpx.AsyncClient,
+    session: str,
+    turns: List[Dict[str, Any]],
+    origin: float,
+    speed: float,
+    started: float,
+    report: LoadReport
+) -> bool:
+    """Replay one recorded session; True when every turn got a 200"""
+    loop = asyncio.get_running_loop()
+    session_id = f"replay-{session}"
+    ok = True
+    for record, stage in zip(turns, effective_stages(turns)):
+        if speed > 0:
+            due = started + (record["t"] - origin) / speed
+            delay = due - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                report.max_start_lag = max(report.max_start_lag, -delay)
+        body = {
+            "message": synthesize_message(record, stage),
+            "session_id": session_id,
+            "context_stage": record.get("st", "INIT"),
+        }
+        turn_started = time.perf_counter()
+        error = None
+        try:
+            response = await client.post("/api/chat", json=body)
+            if response.status_code != 200:
+                error = str(response.status_code)
+        except httpx.TimeoutException:
+            error = "timeout"
+        except httpx.HTTPError as e:
+            error = type(e).__name__
+        report.record(stage_label(record, stage), time.perf_counter() - turn_started, error)
+        ok = ok and error is None
+    return ok
+
+
+async def run_replay(client: httpx.AsyncClient, records: List[Dict[str, Any]], speed: float = 1.0) -> LoadReport:
+    """Replay every session of a trace concurrently, each on its recorded schedule"""
+    report = LoadReport()
+    if not records:
+        return report
+    sessions = group_sessions(records)
+    llm_before = await _llm_calls_started(client)
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    origin = records[0]["t"]
+
+    async def play(session: str, turns: List[Dict[str, Any]]) -> None:
+        report.journeys_started += 1
+        if await replay_session(client, session, turns, origin, speed, started, report):
+            report.journeys_completed += 1
+
+    await asyncio.gather(*(play(session, turns) for session, turns in sessions.items()))
+    report.elapsed = loop.time() - started
+    llm_after = await _llm_calls_started(client)
+    if llm_before is not None and llm_after is not None:
+        report.llm_calls = llm_after - llm_before
+    return report
+
+
+async def _main(args: argparse.Namespace, records: List[Dict[str, Any]]) -> LoadReport:
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout)
+    else:
+        client = in_process_client(args.timeout)
+    async with client:
+        return await run_replay(client, records, args.speed)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[3])
+    parser.add_argument("trace", help="JSONL trace written with TURN_RECORD_PATH")
+    parser.add_argument("--speed", type=float, default=1.0, help="time compression (1 = original, 0 = no waits)")
+    parser.add_argument("--limit", type=int, default=None, help="replay only the first N sessions")
+    parser.add_argument("--url", help="base URL of a running server (default: in-process app)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="per-request client timeout (s)")
+    parser.add_argument("--stub", action="store_true", help="run the stub LLM in-process (in-process target only)")
+    parser.add_argument("--stub-ttft", default="lognormal:0.35,0.5", help="stub time-to-first-token distribution")
+    parser.add_argument("--stub-rate-429", type=float, default=0.0, help="stub 429 rate")
+    parser.add_argument("--json", dest="json_path", help="also write both reports as JSON to this path")
+    args = parser.parse_args()
+    if args.speed < 0:
+        parser.error("--speed must be >= 0")
+
+    records = load_trace(args.trace)
+    if args.limit is not None:
+        keep = set(list(group_sessions(records))[:args.limit])
+        records = [record for record in records if record["s"] in keep]
+    if not records:
+        parser.error(f"no turns in {args.trace}")
+
+    if args.stub:
+        if args.url:
+            parser.error("--stub only applies to the in-process target")
+        os.environ["GROQ_BASE_URL"] = start_stub(args.stub_ttft, args.stub_rate_429)
+        os.environ.setdefault("GROQ_API_KEY", "stub")
+
+    recorded = recorded_report(records)
+    replayed = asyncio.run(_main(args, records))
+    print("Recorded (server-side)")
+    print(recorded.format())
+    print(f"\nReplayed at speed {args.speed:g} (client-side)")
+    print(replayed.format())
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"recorded": recorded.to_dict(), "replayed": replayed.to_dict()}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+"""
+=========================================================
+LEGALGRAM 2.0 - SESSION MEMORY SOAK
+=========================================================
+Sustained unique-session traffic through chat_endpoint with
+a mocked LLM, checking that worker memory levels off instead
+of growing with every visitor.
+
+Each simulated visitor plays INIT -> CAPTURE_NAME -> TRIAGE ->
+SALES_MODE x2 (LLM turns) on a brand-new session id and never
+comes back, which is the worst case for per-process state.
+Every --sample-every turns the soak records the store's
+session count, the rows/keys it actually holds (expired or
+not), RSS and tracemalloc's traced total.
+
+Steady state: the traced total and the stored rows at the end
+of the run may be at most --max-growth above their value (for
+rows: their peak) up to the warm-up point (--warmup, fraction
+of the run). By then the store has to be at capacity:
+  memory  InMemorySessionStore(max_sessions=--max-sessions)
+  sqlite  SqliteSessionStore(cache_size=--max-sessions,
+          ttl=--session-ttl s), temp file
+  redis   RedisSessionStore(FakeRedis(), ttl=--session-ttl s)
+
+Run:  python -m benchmarks.soak_sessions --turns 1000000
+      python -m benchmarks.soak_sessions --backends memory --turns 200000 --max-sessions 5000
+Exits 1 if any backend keeps growing.
+=========================================================
+"""
+
+import argparse
+import asyncio
+import gc
+import itertools
+import os
+import resource
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import closing
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+import main
+from services.ai_engine import LegalAI
+from services.rate_limit import RateLimiter
+from services.session_store import InMemorySessionStore, RedisSessionStore, SessionStore, SqliteSessionStore
+from services.structured_logging import log_pipeline
+from benchmarks.fake_redis import FakeRedis
+
+BACKENDS = ("memory", "sqlite", "redis")
+
+JOURNEY = (
+    ("INIT", "hi"),
+    ("CAPTURE_NAME", "my name is {name}"),
+    ("TRIAGE", "2"),
+    ("SALES_MODE", "which form do I need to hire a freelancer?"),
+    ("SALES_MODE", "what about keeping our designs confidential?"),
+)
+
+
+class FakeLLMClient:
+    """Minimal stand-in for the Groq client.
+
+    Deliberately not a MagicMock: a mock records every call and would
+    itself be the leak.
+    """
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **kwargs: Any) -> Any:
+        self.calls += 1
+        # A fresh string per reply, like a real response body
+        content = f"For that you want our Independent Contractor Agreement (ref {self.calls})."
+        message = SimpleNamespace(content=content)
+        usage = SimpleNamespace(prompt_tokens=400, completion_tokens=20)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+
+class Sample(NamedTuple):
+    turns: int
+    sessions: Optional[int]  # None: the backend does not count
+    rows: int
+    rss_bytes: int
+    traced_bytes: int
+    elapsed: float
+
+
+class SoakResult(NamedTuple):
+    backend: str
+    samples: List[Sample]
+    warm_sample: Sample
+    growth: float
+    row_growth: float
+    bounded: bool
+    llm_calls: int
+    top_growth: List[str]
+
+
+def rss_bytes() -> int:
+    """Current resident set size (Linux /proc), else the peak from getrusage"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def make_store(backend: str, max_sessions: int, session_ttl: float, workdir: str) -> SessionStore:
+    if backend == "memory":
+        return InMemorySessionStore(max_sessions=max_sessions)
+    if backend == "sqlite":
+        return SqliteSessionStore(os.path.join(workdir, "soak.db"), cache_size=max_sessions, ttl_seconds=session_ttl)
+    if backend == "redis":
+        return RedisSessionStore(FakeRedis(), ttl_seconds=max(1, int(session_ttl)))
+    raise ValueError(f"Unknown backend: {backend}")
+
+
+def stored_rows(store: SessionStore) -> int:
+    """What the backend holds, including expired sessions it has not deleted yet"""
+    if isinstance(store, SqliteSessionStore):
+        # Own connection: reads the file, not the store's cache
+        with closing(sqlite3.connect(store.path)) as conn:
+            return conn.execute(
+                "SELECT (SELECT COUNT(*) FROM sessions) + (SELECT COUNT(*) FROM messages)"
+            ).fetchone()[0]
+    if isinstance(store, RedisSessionStore):
+        return store.client.dbsize()
+    return store.count()
+
+
+def _request() -> Request:
+    return Request({
+        "type": "http",
+        "method": "POST",
+        "path": "/api/chat",
+        "headers": [],
+        "query_string": b"",
+        "client": ("10.0.0.1", 40000),
+        "app": main.app,
+    })
+
+
+async def drive(
+    turns: int,
+    concurrency: int,
+    sample_every: int,
+    sample: Callable[[int], None]
+) -> None:
+    """Play journeys on fresh sessions from `concurrency` workers until `turns` turns"""
+    counter = itertools.count()
+    played = 0
+    request = _request()
+
+    async def worker() -> None:
+        nonlocal played
+        while played < turns:
+            visitor = next(counter)
+            session_id = f"soak-{visitor}"
+            for stage, text in JOURNEY:
+                req = main.ChatRequest(
+                    message=text.format(name=f"Visitor{visitor}"),
+                    session_id=session_id,
+                    context_stage=stage
+                )
+                await main.chat_endpoint(req, request, Response())
+                played += 1
+                if played % sample_every == 0:
+                    sample(played)
+                if played >= turns:
+                    return
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+def soak(
+    backend: str,
+    turns: int,
+    max_sessions: int = 20_000,
+    session_ttl: float = 5.0,
+    sample_every: int = 10_000,
+    warmup: float = 0.5,
+    max_growth: float = 0.10,
+    concurrency: int = 8,
+    top: int = 5,
+    log: Optional[Callable[[Sample], None]] = None
+) -> SoakResult:
+    """Run one backend; see the module docstring for what is asserted"""
+    llm = FakeLLMClient()
+    samples: List[Sample] = []
+    snapshots: Dict[str, Any] = {}
+    warm_turn = max(sample_every, int(turns * warmup) // sample_every * sample_every)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        store = make_store(backend, max_sessions, session_ttl, workdir)
+        started = time.perf_counter()
+
+        def sample(played: int) -> None:
+            gc.collect()
+            point = Sample(
+                played, store.count(), stored_rows(store), rss_bytes(), tracemalloc.get_traced_memory()[0],
+                time.perf_counter() - started
+            )
+            samples.append(point)
+            if played == warm_turn:
+                snapshots["warm"] = tracemalloc.take_snapshot()
+            if log is not None:
+                log(point)
+
+        gc.collect()
+        tracemalloc.start()
+        try:
+            # Sampled per-turn log lines are not session state (and would flood stdout);
+            # every visitor shares one client address, so rate limits stay off
+            with patch.object(main, "session_store", store), \
+                    patch.object(main, "rate_limiter", RateLimiter(0, 0, 0)), \
+                    patch.object(LegalAI, "get_groq_client", staticmethod(lambda retries=True: llm)), \
+                    patch.object(log_pipeline, "sample_rate", 0.0):
+                asyncio.run(drive(turns, concurrency, sample_every, sample))
+            final = tracemalloc.take_snapshot()
+        finally:
+            tracemalloc.stop()
+            store.close()
+
+    warm_sample = next((s for s in samples if s.turns >= warm_turn), samples[-1])
+    growth = (samples[-1].traced_bytes - warm_sample.traced_bytes) / max(1, warm_sample.traced_bytes)
+    # Rows swing with throughput x TTL, so compare against the peak before warm-up
+    warm_rows = max(s.rows for s in samples if s.turns <= warm_sample.turns)
+    row_growth = (samples[-1].rows - warm_rows) / max(1, warm_rows)
+    top_growth: List[str] = []
+    if "warm" in snapshots:
+        stats = final.compare_to(snapshots["warm"], "lineno")
+        top_growth = [str(stat) for stat in stats[:top] if stat.size_diff > 0]
+    bounded = growth <= max_growth and row_growth <= max_growth
+    return SoakResult(backend, samples, warm_sample, growth, row_growth, bounded, llm.calls, top_growth)
+
+
+def _format_sample(backend: str, point: Sample) -> str:
+    sessions = "-" if point.sessions is None else f"{point.sessions:,}"
+    return (
+        f"{backend:<7} {point.turns:>10,} {sessions:>9} {point.rows:>9,} {point.rss_bytes / 2**20:>9.1f} "
+        f"{point.traced_bytes / 2**20:>10.2f} {point.turns / max(point.elapsed, 1e-9):>9,.0f}"
+    )
+
+
+def main_cli(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[3])
+    parser.add_argument("--backends", default=",".join(BACKENDS), help="comma-separated: memory,sqlite,redis")
+    parser.add_argument("--turns", type=int, default=1_000_000, help="turns per backend")
+    parser.add_argument("--max-sessions", type=int, default=20_000, help="memory store cap / sqlite cache size")
+    parser.add_argument("--session-ttl", type=float, default=5.0, help="session TTL for the sqlite and redis backends (s)")
+    parser.add_argument("--sample-every", type=int, default=None, help="turns between samples (default: turns/20)")
+    parser.add_argument("--warmup", type=float, default=0.5, help="fraction of the run before steady state")
+    parser.add_argument("--max-growth", type=float, default=0.10, help="allowed memory and row growth after warm-up")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent visitors")
+    args = parser.parse_args(argv)
+    sample_every = args.sample_every or max(1, args.turns // 20)
+
+    print(f"{'backend':<7} {'turns':>10} {'sessions':>9} {'rows':>9} {'RSS MiB':>9} {'traced MiB':>10} {'turns/s':>9}")
+    print("-" * 70)
+    failed = []
+    for backend in [b.strip() for b in args.backends.split(",") if b.strip()]:
+        result = soak(
+            backend, args.turns, args.max_sessions, args.session_ttl, sample_every,
+            args.warmup, args.max_growth, args.concurrency,
+            log=lambda point, backend=backend: print(_format_sample(backend, point), flush=True)
+        )
+        verdict = "bounded" if result.bounded else "GROWING"
+        print(
+            f"{backend}: traced {result.warm_sample.traced_bytes / 2**20:.2f} -> "
+            f"{result.samples[-1].traced_bytes / 2**20:.2f} MiB after warm-up "
+            f"({result.growth:+.1%}), rows {result.row_growth:+.1%}, {result.llm_calls:,} LLM calls: {verdict}"
+        )
+        if not result.bounded:
+            failed.append(backend)
+            for line in result.top_growth:
+                print(f"    {line}")
+        print()
+    if failed:
+        print(f"Unbounded growth: {', '.join(failed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
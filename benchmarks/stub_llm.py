@@ -0,0 +1,359 @@
+"""
+=========================================================
+LEGALGRAM 2.0 - STUB LLM SERVER (GROQ WIRE FORMAT)
+=========================================================
+Local stand-in for the Groq chat-completions API so SALES_MODE
+can be load-tested without spending quota.
+
+Speaks POST /openai/v1/chat/completions (what groq.Groq calls)
+with plain JSON or, for `"stream": true`, server-sent events
+ending in `data: [DONE]`. Timing is modelled as
+    time to first token  (--ttft distribution)
+  + completion tokens / --tokens-per-second
+and each request can be turned into a 429 (with retry-after),
+a 500, or a hang of --hang-seconds (client timeout) at the
+configured rates.
+
+Run:
+  python -m benchmarks.stub_llm --port 8100 --ttft lognormal:0.35,0.5 --rate-429 0.05
+  GROQ_BASE_URL=http://127.0.0.1:8100 GROQ_API_KEY=stub python server.py
+
+Distributions: fixed:S  uniform:LO,HI  normal:MEAN,SD
+               lognormal:MEDIAN,SIGMA  exponential:MEAN
+Runtime control: GET /stub/stats, POST /stub/config (JSON,
+same field names as StubConfig), POST /stub/reset.
+=========================================================
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import time
+import uuid
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from services.tokens import estimate_tokens
+
+REPLY_WORDS = (
+    "Based on what you described, our attorney-reviewed Non-Disclosure Agreement is "
+    "the right fit. It is state-compliant, covers mutual protection and spells out "
+    "remedies for breach. Ready to create your NDA? Click here to start."
+).split()
+
+
+class LatencyDistribution:
+    """Seconds drawn from a named distribution (never negative)"""
+
+    KINDS = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2, "exponential": 1}
+
+    def __init__(self, kind: str, params: Tuple[float, ...]) -> None:
+        if kind not in self.KINDS:
+            raise ValueError(f"unknown distribution {kind!r}")
+        if len(params) != self.KINDS[kind]:
+            raise ValueError(f"{kind} takes {self.KINDS[kind]} parameter(s)")
+        self.kind = kind
+        self.params = params
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyDistribution":
+        """'lognormal:0.35,0.5' -> LatencyDistribution; a bare number means fixed"""
+        kind, _, raw = spec.partition(":")
+        if not raw:
+            return cls("fixed", (float(kind),))
+        return cls(kind, tuple(float(p) for p in raw.split(",")))
+
+    def sample(self, rng: random.Random) -> float:
+        p = self.params
+        if self.kind == "fixed":
+            value = p[0]
+        elif self.kind == "uniform":
+            value = rng.uniform(p[0], p[1])
+        elif self.kind == "normal":
+            value = rng.gauss(p[0], p[1])
+        elif self.kind == "lognormal":
+            value = rng.lognormvariate(math.log(p[0]), p[1]) if p[0] > 0 else 0.0
+        else:
+            value = rng.expovariate(1 / p[0]) if p[0] > 0 else 0.0
+        return max(0.0, value)
+
+    def __str__(self) -> str:
+        return f"{self.kind}:{','.join(f'{p:g}' for p in self.params)}"
+
+
+class StubConfig:
+    """Timing and fault-injection knobs (mutable at runtime via /stub/config)"""
+
+    def __init__(
+        self,
+        ttft: str = "fixed:0.2",
+        tokens_per_second: float = 250.0,
+        reply_tokens: int = 120,
+        rate_429: float = 0.0,
+        rate_500: float = 0.0,
+        rate_timeout: float = 0.0,
+        hang_seconds: float = 120.0,
+        retry_after: float = 1.0,
+        seed: Optional[int] = None
+    ) -> None:
+        self.ttft = LatencyDistribution.parse(ttft)
+        self.tokens_per_second = tokens_per_second
+        self.reply_tokens = reply_tokens
+        self.rate_429 = rate_429
+        self.rate_500 = rate_500
+        self.rate_timeout = rate_timeout
+        self.hang_seconds = hang_seconds
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+
+    def update(self, changes: Dict[str, Any]) -> None:
+        """Apply a partial update; unknown fields raise ValueError"""
+        for field, value in changes.items():
+            if field == "ttft":
+                self.ttft = LatencyDistribution.parse(str(value))
+            elif field == "seed":
+                self.rng = random.Random(value)
+            elif field in ("tokens_per_second", "rate_429", "rate_500", "rate_timeout", "hang_seconds", "retry_after"):
+                setattr(self, field, float(value))
+            elif field == "reply_tokens":
+                self.reply_tokens = int(value)
+            else:
+                raise ValueError(f"unknown field {field!r}")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "ttft": str(self.ttft),
+            "tokens_per_second": self.tokens_per_second,
+            "reply_tokens": self.reply_tokens,
+            "rate_429": self.rate_429,
+            "rate_500": self.rate_500,
+            "rate_timeout": self.rate_timeout,
+            "hang_seconds": self.hang_seconds,
+            "retry_after": self.retry_after,
+        }
+
+    def token_interval(self) -> float:
+        return 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    def fault(self) -> Optional[str]:
+        """'429', '500', 'timeout' or None for this request"""
+        draw = self.rng.random()
+        for fault, rate in (("429", self.rate_429), ("500", self.rate_500), ("timeout", self.rate_timeout)):
+            if draw < rate:
+                return fault
+            draw -= rate
+        return None
+
+
+class StubStats:
+    """Request counters for /stub/stats"""
+
+    FIELDS = (
+        "requests", "streamed", "completed", "rate_limited", "server_errors",
+        "timeouts", "prompt_tokens", "completion_tokens"
+    )
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        for field in self.FIELDS:
+            setattr(self, field, 0)
+
+    def to_dict(self) -> Dict[str, int]:
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+
+def _error(status: int, message: str, kind: str, code: str, headers: Optional[Dict[str, str]] = None) -> JSONResponse:
+    """Error body in the provider's format"""
+    return JSONResponse(
+        {"error": {"message": message, "type": kind, "code": code}},
+        status_code=status,
+        headers=headers
+    )
+
+
+def _reply_tokens(count: int) -> List[str]:
+    return [REPLY_WORDS[i % len(REPLY_WORDS)] + " " for i in range(count)]
+
+
+def create_stub_app(config: Optional[StubConfig] = None) -> FastAPI:
+    """Stub app; `app.state.config` / `app.state.stats` are the live objects"""
+    app = FastAPI(title="Legalgram stub LLM")
+    app.state.config = config or StubConfig()
+    app.state.stats = StubStats()
+
+    @app.post("/openai/v1/chat/completions")
+    async def chat_completions(request: Request):
+        config: StubConfig = app.state.config
+        stats: StubStats = app.state.stats
+        body = await request.json()
+        messages = body.get("messages")
+        model = body.get("model")
+        if not isinstance(messages, list) or not messages or not model:
+            return _error(400, "'messages' and 'model' are required", "invalid_request_error", "invalid_request")
+        stats.requests += 1
+
+        fault = config.fault()
+        if fault == "429":
+            stats.rate_limited += 1
+            return _error(
+                429,
+                f"Rate limit reached for model `{model}`. Please try again in {config.retry_after:g}s.",
+                "tokens",
+                "rate_limit_exceeded",
+                headers={"retry-after": f"{config.retry_after:g}", "x-ratelimit-remaining-requests": "0"}
+            )
+        if fault == "500":
+            stats.server_errors += 1
+            return _error(500, "Internal Server Error", "internal_server_error", "internal_server_error")
+        if fault == "timeout":
+            stats.timeouts += 1
+            await asyncio.sleep(config.hang_seconds)
+            return _error(504, "Gateway Timeout", "internal_server_error", "timeout")
+
+        prompt_tokens = sum(estimate_tokens(str(m.get("content", ""))) for m in messages)
+        limit = body.get("max_tokens") or config.reply_tokens
+        count = max(1, min(config.reply_tokens, int(limit)))
+        finish_reason = "length" if count < config.reply_tokens else "stop"
+        ttft = config.ttft.sample(config.rng)
+        stats.prompt_tokens += prompt_tokens
+        stats.completion_tokens += count
+
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        interval = config.token_interval()
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": count,
+            "total_tokens": prompt_tokens + count,
+            "prompt_time": 0.0,
+            "completion_time": round(count * interval, 6),
+            "total_time": round(ttft + count * interval, 6),
+        }
+
+        if body.get("stream"):
+            stats.streamed += 1
+            return StreamingResponse(
+                _stream(stats, completion_id, created, model, ttft, interval, count, finish_reason, usage),
+                media_type="text/event-stream"
+            )
+
+        await asyncio.sleep(ttft + count * interval)
+        stats.completed += 1
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "system_fingerprint": "fp_stub",
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": "".join(_reply_tokens(count)).rstrip()},
+                "logprobs": None,
+                "finish_reason": finish_reason
+            }],
+            "usage": usage
+        }
+
+    @app.get("/stub/stats")
+    async def stub_stats():
+        return {"config": app.state.config.to_dict(), "stats": app.state.stats.to_dict()}
+
+    @app.post("/stub/config")
+    async def stub_config(request: Request):
+        changes = await request.json()
+        if not isinstance(changes, dict):
+            raise HTTPException(status_code=400, detail="expected a JSON object")
+        try:
+            app.state.config.update(changes)
+        except (TypeError, ValueError) as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return app.state.config.to_dict()
+
+    @app.post("/stub/reset")
+    async def stub_reset():
+        app.state.stats.reset()
+        return app.state.stats.to_dict()
+
+    return app
+
+
+async def _stream(
+    stats: StubStats,
+    completion_id: str,
+    created: int,
+    model: str,
+    ttft: float,
+    interval: float,
+    count: int,
+    finish_reason: str,
+    usage: Dict[str, Any]
+) -> AsyncIterator[str]:
+    """SSE chunks: role, one chunk per token, then finish_reason + usage (x_groq) and [DONE]"""
+
+    def chunk(delta: Dict[str, str], finish: Optional[str] = None, x_groq: Optional[Dict] = None) -> str:
+        payload = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "system_fingerprint": "fp_stub",
+            "choices": [{"index": 0, "delta": delta, "logprobs": None, "finish_reason": finish}],
+        }
+        if x_groq is not None:
+            payload["x_groq"] = x_groq
+        return f"data: {json.dumps(payload)}\n\n"
+
+    await asyncio.sleep(ttft)
+    yield chunk({"role": "assistant", "content": ""})
+    for token in _reply_tokens(count):
+        if interval:
+            await asyncio.sleep(interval)
+        yield chunk({"content": token})
+    yield chunk({}, finish_reason, {"id": f"req_{completion_id[9:]}", "usage": usage})
+    yield "data: [DONE]\n\n"
+    stats.completed += 1
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[3])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--ttft", default="fixed:0.2", help="time-to-first-token distribution (seconds)")
+    parser.add_argument("--tokens-per-second", type=float, default=250.0, help="generation speed (0 = instant)")
+    parser.add_argument("--reply-tokens", type=int, default=120, help="completion length before max_tokens")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="fraction of requests answered 429")
+    parser.add_argument("--rate-500", type=float, default=0.0, help="fraction of requests answered 500")
+    parser.add_argument("--rate-timeout", type=float, default=0.0, help="fraction of requests that hang")
+    parser.add_argument("--hang-seconds", type=float, default=120.0, help="how long a hanging request stalls")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="retry-after sent with 429s")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    config = StubConfig(
+        ttft=args.ttft,
+        tokens_per_second=args.tokens_per_second,
+        reply_tokens=args.reply_tokens,
+        rate_429=args.rate_429,
+        rate_500=args.rate_500,
+        rate_timeout=args.rate_timeout,
+        hang_seconds=args.hang_seconds,
+        retry_after=args.retry_after,
+        seed=args.seed
+    )
+    print(f"[STUB LLM] http://{args.host}:{args.port}/openai/v1/chat/completions {config.to_dict()}")
+    uvicorn.run(create_stub_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,21 +9,75 @@ Enterprise Legal AI Platform Backend
 =========================================================
 """
 
-from fastapi import FastAPI, HTTPException, Request
+# Startup profiler first - its import is the zero point of the boot report
+from services.startup import startup_profile
+
+# Each heavy import gets its own phase (fastapi would otherwise pull pydantic in)
+from pydantic import BaseModel, Field
+startup_profile.mark("import:pydantic")
+
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+startup_profile.mark("import:fastapi")
+
+from contextlib import asynccontextmanager
+from typing import Optional
 from dotenv import load_dotenv
-import uvicorn
+import hmac
+import logging
 import os
 import uuid
 from datetime import datetime
 
 # Load environment variables FIRST
 load_dotenv()
+startup_profile.mark("import:dotenv")
+
+# Import the AI Engine and services (groq itself is imported lazily on first SALES_MODE call).
+# The engine (catalog, prompts, routing, logging, tracing) and the session store
+# (sqlite3) are timed on their own; the remaining services share import:services
+from services.ai_engine import LegalAI, stage_label
+startup_profile.mark("import:services.ai_engine")
+from services.session_store import create_session_store, new_session
+startup_profile.mark("import:services.session_store")
+from services.admission import AdmissionMiddleware, admission
+from services.config import env_int, env_str
+from services.idempotency import IdempotencyKeyReused, idempotency_cache, request_fingerprint, scoped_key
+from services.inflight import chat_requests, llm_calls
+from services.lifecycle import readiness, shutdown, shut_down, track_chat_request, warm_up
+from services.metrics import MEDIA_TYPE, MetricsMiddleware, render_metrics
+from services.prompts import ConversationHistory
+from services.rate_limit import rate_limiter, request_identities
+from services.routing import route_metrics
+from services.records import ROLE_ASSISTANT, ROLE_USER, MessageRecord, iso_timestamp
+from services.request_limits import RequestSizeLimitMiddleware
+from services.session_locks import session_locks
+from services.request_context import session_scope
+from services.structured_logging import get_logger, log_pipeline, sample_event
+from services.tracing import TracingMiddleware, tracer
+from services.turn_recorder import turn_recorder
+startup_profile.mark("import:services")
 
-# Import the AI Engine
-from services.ai_engine import LegalAI
+# JSON logs on stdout from a background thread
+log_pipeline.start()
+logger = get_logger("chat")
+
+# =========================================================
+# Application Lifespan
+# =========================================================
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm up before reporting ready; drain and flush sessions on the way down"""
+    log_pipeline.start()
+    await warm_up()
+    report = startup_profile.report()
+    level = logging.WARNING if report["within_budget"] is False else logging.INFO
+    get_logger("startup").log(level, "Startup complete", extra={"event": "startup", **report})
+    yield
+    await shut_down(session_store)
+    log_pipeline.stop()
 
 # =========================================================
 # FastAPI Application Setup
@@ -33,9 +87,15 @@ app = FastAPI(
     description="Enterprise Legal Document AI Platform - Secure Backend",
     version="2.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
+# =========================================================
+# Request Size Limits (413 before any JSON parsing)
+# =========================================================
+app.add_middleware(RequestSizeLimitMiddleware)
+
 # =========================================================
 # CORS Configuration - Allow React Frontend
 # =========================================================
@@ -53,19 +113,30 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Counts in-flight requests for load shedding
+app.add_middleware(AdmissionMiddleware)
+
+# Times every request, including ones refused by the middlewares above
+app.add_middleware(MetricsMiddleware)
+
+# Outermost: root span per request, trace id returned in X-Trace-Id
+app.add_middleware(TracingMiddleware)
+
 # =========================================================
-# Session Storage (In-Memory for dev, use Redis in prod)
+# Session Storage (backend selected by SESSION_STORE)
 # =========================================================
-sessions: Dict[str, Dict[str, Any]] = {}
+session_store = create_session_store()
 
 # =========================================================
 # Request/Response Models
 # =========================================================
+MAX_MESSAGE_CHARS = env_int("MAX_MESSAGE_CHARS", 4000)
+
 class ChatRequest(BaseModel):
-    message: str
-    session_id: Optional[str] = None
-    user_name: Optional[str] = None
-    context_stage: str = "INIT"  # INIT, CAPTURE_NAME, TRIAGE, ADVISING, SALES_MODE, DONE
+    message: str = Field(max_length=MAX_MESSAGE_CHARS)
+    session_id: Optional[str] = Field(default=None, max_length=128)
+    user_name: Optional[str] = Field(default=None, max_length=100)
+    context_stage: str = Field(default="INIT", max_length=32)  # a Stage value; metrics, logs and traces record anything else as "other"
 
 class ChatResponse(BaseModel):
     response: str
@@ -97,85 +168,226 @@ def health_check():
         "timestamp": datetime.now().isoformat()
     }
 
+@app.get("/healthz")
+def liveness():
+    """Liveness probe - the process is up and serving"""
+    return {"status": "alive"}
+
+@app.get("/readyz")
+def readiness_probe():
+    """Readiness probe - 503 until warm-up has finished"""
+    status_code = 200 if readiness.ready else 503
+    return JSONResponse(status_code=status_code, content=readiness.snapshot())
+
+@app.get("/api/startup")
+def startup_report():
+    """Cold-start timing report (imports, app construction, index build)"""
+    return startup_profile.report()
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus metrics for this worker"""
+    return Response(content=render_metrics(session_store), media_type=MEDIA_TYPE)
+
 @app.get("/api/status")
 def api_status():
     """Detailed API status"""
-    return {
+    status = {
         "service": "Legalgram AI Backend",
         "groq_configured": bool(os.getenv("GROQ_API_KEY")),
-        "active_sessions": len(sessions),
+        "in_flight": {
+            "chat_requests": chat_requests.snapshot(),
+            "llm_calls": llm_calls.snapshot()
+        },
+        "shutdown": shutdown.snapshot(),
+        "admission": admission.snapshot(),
+        "rate_limited": rate_limiter.limited_total,
+        "session_locks": session_locks.snapshot(),
+        "prompt": LegalAI.prompt_info(),
+        "llm_routes": route_metrics.snapshot(),
+        "turn_recorder": turn_recorder.snapshot(),
+        "tracing": tracer.snapshot(),
+        "logging": log_pipeline.snapshot(),
         "endpoints": ["/api/chat", "/api/session", "/api/documents"]
     }
+    # Left out, not null, for a store that cannot count its sessions
+    active_sessions = session_store.count()
+    if active_sessions is not None:
+        status["active_sessions"] = active_sessions
+    return status
 
 # =========================================================
 # Main Chat Endpoint - THE BRAIN
 # =========================================================
 @app.post("/api/chat", response_model=ChatResponse)
-async def chat_endpoint(req: ChatRequest):
+async def chat_endpoint(req: ChatRequest, request: Request, response: Response):
     """
     Main chat endpoint implementing AJA's requirements:
     1. Captures user name/details first
     2. Routes to Human vs AI (Triage)
     3. Acts as Salesperson for document recommendations
-    """
     
-    # Generate or use existing session ID
-    session_id = req.session_id or str(uuid.uuid4())
-    
-    # Get or create session
-    if session_id not in sessions:
-        sessions[session_id] = {
-            "user_name": None,
-            "stage": "INIT",
-            "messages": [],
-            "created_at": datetime.now().isoformat()
-        }
+    Send an `Idempotency-Key` header to make client retries safe: a repeated
+    key from the same client and session returns the stored response instead
+    of re-running the turn.
+    """
+    idempotency_key = request.headers.get("idempotency-key")
+    if not idempotency_key:
+        return await run_chat_turn(req, request)
     
-    session = sessions[session_id]
+    if len(idempotency_key) > 255:
+        raise HTTPException(status_code=400, detail="Idempotency-Key too long")
+    try:
+        result, replayed = await idempotency_cache.run(
+            # Without a session_id the client is all that separates two visitors
+            scoped_key(
+                idempotency_key,
+                request.client.host if request.client else None,
+                request.headers.get("x-api-key"),
+                req.session_id
+            ),
+            request_fingerprint(req.model_dump()),
+            lambda: run_chat_turn(req, request)
+        )
+    except IdempotencyKeyReused:
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency-Key was already used with a different request"
+        )
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
+
+
+async def run_store(method, *args, **kwargs):
+    """Call a session store method; SQLite and Redis I/O runs off the event loop"""
+    if session_store.blocking:
+        return await run_in_threadpool(method, *args, **kwargs)
+    return method(*args, **kwargs)
+
+
+def enforce_turn_limits(req: ChatRequest, request: Request, needs_llm: bool) -> None:
+    """Raise 429 past the per-client limits, or 503 when new LLM work is shed"""
+    # Per-client limits (IP, session, optional API key); LLM turns have their own budget
+    with tracer.span("rate_limit.check"):
+        limited = rate_limiter.check(
+            request_identities(
+                request.client.host if request.client else None,
+                req.session_id,
+                request.headers.get("x-api-key")
+            ),
+            needs_llm=needs_llm
+        )
+    if limited is not None:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests, please slow down",
+            headers=limited.headers()
+        )
     
-    # Update session with any provided data
-    if req.user_name:
-        session["user_name"] = req.user_name
+    # Shed new LLM work when saturated; deterministic stages are always served
+    if admission.should_shed(needs_llm):
+        admission.reject()
+        raise HTTPException(
+            status_code=503,
+            detail="AI assistant is at capacity, please retry shortly",
+            headers={"Retry-After": str(admission.retry_after)}
+        )
+
+
+async def run_chat_turn(req: ChatRequest, request: Request) -> ChatResponse:
+    """Process one conversation turn"""
     
-    # Use the stage from request or session
-    current_stage = req.context_stage if req.context_stage != "INIT" else session["stage"]
+    # Generate or use existing session ID
+    session_id = req.session_id or str(uuid.uuid4())
     
-    # Process through the AI Engine
-    try:
-        result = LegalAI.process_flow(
-            message=req.message,
-            user_name=session.get("user_name"),
-            stage=current_stage,
-            session_id=session_id
-        )
+    # Opt-in anonymized trace of the turn for record-and-replay (TURN_RECORD_PATH)
+    with turn_recorder.turn(session_id, stage_label(req.context_stage), len(req.message)) as turn, \
+            session_scope(session_id):
+        # Refuse over-limit and shed turns before queueing behind an in-flight
+        # turn on this session. The requested stage decides; INIT defers to the
+        # stored stage, which is re-checked once the session is loaded
+        request.state.chat_stage = stage_label(req.context_stage)
+        with tracer.span("engine.needs_llm", stage=stage_label(req.context_stage)) as span:
+            needs_llm = LegalAI.needs_llm(req.message, req.context_stage)
+            span.set("needs_llm", needs_llm)
+        enforce_turn_limits(req, request, needs_llm)
         
-        # Update session
-        session["stage"] = result["new_stage"]
-        if result.get("user_name"):
-            session["user_name"] = result["user_name"]
-        session["messages"].append({
-            "role": "user",
-            "content": req.message,
-            "timestamp": datetime.now().isoformat()
-        })
-        session["messages"].append({
-            "role": "assistant", 
-            "content": result["response"],
-            "timestamp": datetime.now().isoformat()
-        })
+        # Turns on one session run one at a time; other sessions are unaffected
+        async with session_locks.hold(session_id):
+            # Get or create session
+            with tracer.span("session.load"):
+                session = await run_store(session_store.get, session_id)
+            if session is None:
+                if shutdown.draining:
+                    # Instance is going away - send new conversations elsewhere
+                    raise HTTPException(
+                        status_code=503,
+                        detail="Server is restarting, please retry",
+                        headers={"Retry-After": "1", "Connection": "close"}
+                    )
+                session = new_session()
         
-        return ChatResponse(
-            response=result["response"],
-            new_stage=result["new_stage"],
-            session_id=session_id,
-            user_name=session.get("user_name"),
-            suggested_documents=result.get("suggested_documents"),
-            action_buttons=result.get("action_buttons")
-        )
+            # Update session with any provided data
+            if req.user_name:
+                session.user_name = req.user_name
+        
+            # Use the stage from request or session
+            current_stage = req.context_stage if req.context_stage != "INIT" else session.stage
+            request.state.chat_stage = stage_label(current_stage)
+        
+            # The stored stage turned out to need the LLM: apply the LLM budget now
+            if not needs_llm and current_stage != req.context_stage and \
+                    LegalAI.needs_llm(req.message, current_stage):
+                needs_llm = True
+                enforce_turn_limits(req, request, needs_llm)
         
-    except Exception as e:
-        print(f"[ERROR] Chat processing failed: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"AI processing error: {str(e)}")
+            # Process through the AI Engine
+            try:
+                with track_chat_request(), admission.admit(needs_llm), \
+                        tracer.span("engine.process_flow", stage=stage_label(current_stage)):
+                    # process_flow may block on the Groq call - keep it off the event loop
+                    result = await run_in_threadpool(
+                        LegalAI.process_flow,
+                        message=req.message,
+                        user_name=session.user_name,
+                        stage=current_stage,
+                        session_id=session_id,
+                        history=ConversationHistory(tuple(session.messages), session.summary)
+                    )
+            
+                # Update session
+                session.stage = result["new_stage"]
+                if result.get("user_name"):
+                    session.user_name = result["user_name"]
+                with tracer.span("session.save"):
+                    await run_store(session_store.save, session_id, session, new_messages=[
+                        MessageRecord(ROLE_USER, req.message),
+                        MessageRecord(ROLE_ASSISTANT, result["response"])
+                    ])
+                if turn is not None:
+                    turn.finish(result)
+                if sample_event():
+                    logger.info("Chat turn", extra={
+                        "event": "chat.turn",
+                        "stage": stage_label(current_stage),
+                        "new_stage": stage_label(result["new_stage"]),
+                        "needs_llm": needs_llm,
+                        "sample_rate": log_pipeline.sample_rate,
+                    })
+            
+                return ChatResponse(
+                    response=result["response"],
+                    new_stage=result["new_stage"],
+                    session_id=session_id,
+                    user_name=session.user_name,
+                    suggested_documents=result.get("suggested_documents"),
+                    action_buttons=result.get("action_buttons")
+                )
+            
+            except Exception as e:
+                logger.error("Chat processing failed", exc_info=True, extra={"event": "chat.failed"})
+                raise HTTPException(status_code=500, detail=f"AI processing error: {str(e)}")
 
 # =========================================================
 # Session Management Endpoints
@@ -183,23 +395,22 @@ async def chat_endpoint(req: ChatRequest):
 @app.get("/api/session/{session_id}")
 def get_session(session_id: str):
     """Get session information"""
-    if session_id not in sessions:
+    session = session_store.get(session_id)
+    if session is None:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    session = sessions[session_id]
     return SessionInfo(
         session_id=session_id,
-        user_name=session.get("user_name"),
-        stage=session.get("stage", "INIT"),
-        message_count=len(session.get("messages", [])),
-        created_at=session.get("created_at", "")
+        user_name=session.user_name,
+        stage=session.stage,
+        message_count=session.message_total,
+        created_at=iso_timestamp(session.created_at)
     )
 
 @app.delete("/api/session/{session_id}")
 def clear_session(session_id: str):
     """Clear a session (start fresh)"""
-    if session_id in sessions:
-        del sessions[session_id]
+    session_store.delete(session_id)
     return {"status": "Session cleared", "session_id": session_id}
 
 # =========================================================
@@ -249,9 +460,49 @@ def get_document_info(document_name: str):
     return LegalAI.get_document_details(document_name)
 
 # =========================================================
-# Run Server
+# Admin Endpoints (X-Admin-Token required; disabled while ADMIN_TOKEN is unset)
+# =========================================================
+ADMIN_TOKEN = env_str("ADMIN_TOKEN")
+
+def require_admin(request: Request) -> None:
+    if not ADMIN_TOKEN:
+        # Fail closed: traces carry timings and session attributes
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not hmac.compare_digest(
+        request.headers.get("x-admin-token", "").encode("utf-8"), ADMIN_TOKEN.encode("utf-8")
+    ):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+def trace_buffer():
+    ring = tracer.ring_buffer
+    if ring is None:
+        raise HTTPException(status_code=404, detail="In-memory trace sink is not enabled (TRACE_SINK)")
+    return ring
+
+@app.get("/api/admin/traces", include_in_schema=False)
+def list_traces(request: Request, limit: int = 50, min_ms: float = 0.0):
+    """Recent traces, newest first; `min_ms` keeps only the slow ones"""
+    require_admin(request)
+    traces = trace_buffer().recent(limit, min_ms)
+    return {"tracing": tracer.snapshot(), "traces": [trace.summary() for trace in traces]}
+
+@app.get("/api/admin/traces/{trace_id}", include_in_schema=False)
+def get_trace(trace_id: str, request: Request):
+    """Every span of one buffered trace"""
+    require_admin(request)
+    trace = trace_buffer().get(trace_id.lower())
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found (not sampled or already evicted)")
+    return trace.to_dict()
+
+startup_profile.mark("app_construction")
+
+# =========================================================
+# Run Server (Development - use server.py in production)
 # =========================================================
 if __name__ == "__main__":
+    import uvicorn
+
     print("\n" + "="*60)
     print("🏛️  LEGALGRAM 2.0 BACKEND STARTING...")
     print("="*60)
@@ -263,7 +514,7 @@ if __name__ == "__main__":
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
-        port=8000,
+        port=int(os.getenv("PORT", "8000")),
         reload=True,  # Hot reload for development
         log_level="info"
     )
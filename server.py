@@ -0,0 +1,133 @@
+"""
+=========================================================
+LEGALGRAM 2.0 - PRODUCTION SERVER LAUNCHER
+=========================================================
+Runs the FastAPI app the way production should:
+- No reloader / file watcher
+- Port and worker count from PORT / WEB_CONCURRENCY; more than
+  one worker needs a shared SESSION_STORE (sqlite or redis)
+- uvloop + httptools when installed (uvicorn[standard])
+- Tuned keep-alive and listen backlog
+- Graceful drain on SIGTERM (SHUTDOWN_GRACE_SECONDS)
+
+Development mode stays in main.py (`python main.py`).
+=========================================================
+"""
+
+import importlib.util
+import os
+import sys
+from types import FrameType
+from typing import Any, Dict, Optional
+
+import uvicorn
+from dotenv import load_dotenv
+from uvicorn.supervisors import Multiprocess
+
+from services.config import env_int, env_str
+
+
+def _env_positive(name: str, default: int) -> int:
+    """Read a positive integer; zero and negatives fall back to the default"""
+    value = env_int(name, default)
+    return value if value > 0 else default
+
+
+def _has_module(name: str) -> bool:
+    """Check whether an optional accelerator module is installed"""
+    return importlib.util.find_spec(name) is not None
+
+
+# Session stores every worker sees; the memory store lives inside one worker
+SHARED_SESSION_STORES = ("sqlite", "redis")
+
+
+def shared_session_store() -> bool:
+    """Whether SESSION_STORE keeps sessions where every worker can read them"""
+    return env_str("SESSION_STORE", "memory").strip().lower() in SHARED_SESSION_STORES
+
+
+def default_workers() -> int:
+    """One worker per CPU core with a shared session store, otherwise one.
+
+    The app is async, so more workers than cores add no throughput. With the
+    in-memory store a visitor's next turn could land on a worker that has
+    never seen their session.
+    """
+    if not shared_session_store():
+        return 1
+    return max(os.cpu_count() or 1, 1)
+
+
+def config_error(options: Dict[str, Any]) -> Optional[str]:
+    """Reason the launcher refuses to start with these options, if any"""
+    if options["workers"] > 1 and not shared_session_store():
+        return (
+            f"WEB_CONCURRENCY={options['workers']} needs a shared session store: "
+            "set SESSION_STORE=sqlite or SESSION_STORE=redis, or run one worker"
+        )
+    return None
+
+
+def build_server_config() -> Dict[str, Any]:
+    """Build uvicorn.run() keyword arguments from the environment"""
+    return {
+        "app": "main:app",
+        "host": os.getenv("HOST", "0.0.0.0"),
+        "port": _env_positive("PORT", 8000),
+        "workers": _env_positive("WEB_CONCURRENCY", default_workers()),
+        "loop": "uvloop" if _has_module("uvloop") else "asyncio",
+        "http": "httptools" if _has_module("httptools") else "h11",
+        "reload": False,
+        # Railway's proxy keeps upstream connections open; outlive its idle timeout
+        "timeout_keep_alive": _env_positive("KEEPALIVE_TIMEOUT", 75),
+        "backlog": _env_positive("LISTEN_BACKLOG", 2048),
+        "proxy_headers": True,
+        # Only these peers may set the client IP the rate limiter keys on;
+        # add the proxy's address (FORWARDED_ALLOW_IPS) when running behind one
+        "forwarded_allow_ips": env_str("FORWARDED_ALLOW_IPS", "127.0.0.1"),
+        "log_level": os.getenv("LOG_LEVEL", "info"),
+        "access_log": os.getenv("ACCESS_LOG", "false").lower() == "true",
+        # Let in-flight LLM turns finish before tasks are cancelled
+        "timeout_graceful_shutdown": _env_positive("SHUTDOWN_GRACE_SECONDS", 20),
+    }
+
+
+class DrainingServer(uvicorn.Server):
+    """uvicorn.Server that flips the app into drain mode as soon as a stop signal lands"""
+
+    def handle_exit(self, sig: int, frame: Optional[FrameType]) -> None:
+        # The app's lifespan shutdown only runs after uvicorn has waited for
+        # open connections, so mark draining here to turn away new
+        # conversations (and fail /readyz) during that wait
+        from services.lifecycle import begin_drain
+        begin_drain()
+        super().handle_exit(sig, frame)
+
+
+def main() -> None:
+    """Start the production server"""
+    # Same .env the app loads, read before SESSION_STORE gates the worker count
+    load_dotenv()
+    options = build_server_config()
+    error = config_error(options)
+    if error:
+        print(f"[SERVER] {error}", file=sys.stderr)
+        sys.exit(2)
+    print(
+        f"[SERVER] Starting on {options['host']}:{options['port']} "
+        f"workers={options['workers']} loop={options['loop']} http={options['http']}"
+    )
+    config = uvicorn.Config(**options)
+    server = DrainingServer(config=config)
+    if config.workers > 1:
+        sock = config.bind_socket()
+        Multiprocess(config, target=server.run, sockets=[sock]).run()
+    else:
+        server.run()
+        if not server.started:
+            sys.exit(3)
+
+
+if __name__ == "__main__":
+    main()
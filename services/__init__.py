@@ -2,4 +2,15 @@
 Legalgram 2.0 Backend Services
 """
 
-from .ai_engine import LegalAI, DOCUMENT_DATABASE
+from typing import Any
+
+__all__ = ["LegalAI", "DOCUMENT_DATABASE"]
+
+
+def __getattr__(name: str) -> Any:
+    # Resolved lazily so importing a light submodule (config, startup)
+    # does not pull in the AI engine
+    if name in __all__:
+        from . import ai_engine
+        return getattr(ai_engine, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,92 @@
+"""
+=========================================================
+LEGALGRAM 2.0 - ADMISSION CONTROL (LOAD SHEDDING)
+=========================================================
+Under a traffic spike every SALES_MODE turn queues behind
+slow Groq calls. Past the configured thresholds new LLM work
+is refused with 503 + Retry-After, while the deterministic
+stages (INIT, CAPTURE_NAME, TRIAGE, HUMAN_ROUTE and catalog
+matches) keep being served - they need no LLM.
+
+Signals:
+- in-flight HTTP requests (AdmissionMiddleware)
+- LLM queue depth: admitted turns that need the LLM and have
+  not finished yet (queued for a thread or waiting on Groq)
+=========================================================
+"""
+
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from .config import env_int
+from .inflight import InFlightTracker
+
+# Every HTTP request currently inside the app
+http_requests = InFlightTracker("http_requests")
+
+# Admitted chat turns that need an LLM completion
+llm_turns = InFlightTracker("llm_turns")
+
+
+class AdmissionController:
+    """Decides whether new LLM-backed work may start"""
+
+    def __init__(
+        self,
+        max_in_flight: Optional[int] = None,
+        max_llm_queue: Optional[int] = None,
+        retry_after: Optional[int] = None
+    ) -> None:
+        self.max_in_flight = max_in_flight if max_in_flight is not None else env_int("SHED_MAX_IN_FLIGHT", 256)
+        self.max_llm_queue = max_llm_queue if max_llm_queue is not None else env_int("SHED_MAX_LLM_QUEUE", 32)
+        self.retry_after = retry_after if retry_after is not None else env_int("SHED_RETRY_AFTER_SECONDS", 2)
+        self.shed_total = 0
+
+    def should_shed(self, needs_llm: bool) -> bool:
+        """True when an LLM-backed turn must be refused right now"""
+        if not needs_llm:
+            return False
+        if self.max_llm_queue > 0 and llm_turns.current >= self.max_llm_queue:
+            return True
+        if self.max_in_flight > 0 and http_requests.current > self.max_in_flight:
+            return True
+        return False
+
+    def reject(self) -> None:
+        """Record a shed request"""
+        self.shed_total += 1
+
+    @contextmanager
+    def admit(self, needs_llm: bool) -> Iterator[None]:
+        """Count an admitted turn toward the LLM queue depth"""
+        if not needs_llm:
+            yield
+            return
+        with llm_turns.track():
+            yield
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "in_flight": http_requests.current,
+            "llm_queue_depth": llm_turns.current,
+            "max_in_flight": self.max_in_flight,
+            "max_llm_queue": self.max_llm_queue,
+            "shed_total": self.shed_total,
+        }
+
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware counting in-flight HTTP requests (no body buffering)"""
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with http_requests.track():
+            await self.app(scope, receive, send)
+
+
+admission = AdmissionController()
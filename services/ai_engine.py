@@ -10,9 +10,29 @@ Implements AJA's Strict Requirements:
 =========================================================
 """
 
+import hashlib
 import os
-from typing import Dict, Any, Optional, Tuple
-from groq import Groq
+import threading
+import time
+from enum import Enum
+from typing import TYPE_CHECKING, Dict, Any, Iterable, List, Optional, Tuple
+
+from .config import env_float, env_int, env_str
+from .inflight import llm_calls
+from .prompts import LLM_MAX_OUTPUT_TOKENS, NO_HISTORY, ConversationHistory, build_chat_messages
+from .routing import DEFAULT_MODEL, RoutePolicy, classify_query, is_rate_limited, route_metrics, route_policies
+from .startup import startup_profile
+from .structured_logging import get_logger
+from .tracing import tracer
+from .turn_recorder import note_llm_call
+from .tokens import estimate_tokens, truncate_to_tokens
+
+if TYPE_CHECKING:
+    # groq pulls in httpx/pydantic/anyio; only SALES_MODE needs it,
+    # so the real import is deferred to get_groq_client()
+    from groq import Groq
+
+logger = get_logger("engine")
 
 # =========================================================
 # Document Knowledge Base
@@ -165,25 +185,250 @@ WHEN TO HANDLE AS AI:
 Always be empathetic and helpful regardless of the route.
 """
 
+# =========================================================
+# Conversation Stages
+# =========================================================
+class Stage(str, Enum):
+    """Conversation stages (values are the wire format used by the frontend)"""
+    INIT = "INIT"
+    CAPTURE_NAME = "CAPTURE_NAME"
+    TRIAGE = "TRIAGE"
+    HUMAN_ROUTE = "HUMAN_ROUTE"
+    SALES_MODE = "SALES_MODE"
+    DONE = "DONE"
+
+
+# Plain-str stage names for the hot path (Enum.value is a descriptor lookup)
+_INIT = Stage.INIT.value
+_CAPTURE_NAME = Stage.CAPTURE_NAME.value
+_TRIAGE = Stage.TRIAGE.value
+_HUMAN_ROUTE = Stage.HUMAN_ROUTE.value
+_SALES_MODE = Stage.SALES_MODE.value
+
+_STAGE_VALUES = frozenset(stage.value for stage in Stage)
+OTHER_STAGE = "other"
+
+
+def stage_label(stage: Optional[str]) -> str:
+    """The stage as a known Stage value, else "other".
+
+    context_stage is client text; use this wherever a stage is
+    recorded (metric labels, logs, turn traces) so their cardinality
+    stays bounded.
+    """
+    return stage if stage in _STAGE_VALUES else OTHER_STAGE
+
+
+# =========================================================
+# Catalog Index (built once, shared by all lookups)
+# =========================================================
+# (doc_key, lowercased full name, doc_info) triples
+_CATALOG_INDEX: Optional[Tuple[Tuple[str, str, Dict[str, Any]], ...]] = None
+# Bumped on every rebuild; derived caches (system prompt) key on it
+_CATALOG_VERSION = 0
+
+# =========================================================
+# Sales System Prompt (static per catalog version)
+# =========================================================
+# Nothing per-user goes in here: an identical prefix on every request
+# is what lets the provider (and us) cache it
+PROMPT_FEATURED_DOCUMENTS = env_int("PROMPT_FEATURED_DOCUMENTS", 10)
+
+SALES_INSTRUCTIONS = """
+YOUR RESPONSE SHOULD:
+1. Acknowledge their need
+2. Recommend 1-2 specific documents that fit
+3. Briefly explain why our version is best
+4. End with a call to action
+"""
+
+# Per-user details travel in their own short message after the static prompt
+USER_CONTEXT_TEMPLATE = (
+    "USER CONTEXT:\n"
+    "- User Name: {name}\n"
+    "- They are looking for legal document help"
+)
+
+# (catalog version, prompt text, sha256 of the prompt)
+_SALES_PROMPT: Optional[Tuple[int, str, str]] = None
+
+
+def _featured_name(doc_key: str, full_name: str, doc_info: Dict[str, Any]) -> str:
+    """Catalog name for the prompt; short keys like "nda" are shown too since users ask by them"""
+    if doc_key in full_name:
+        return doc_info["full_name"]
+    return f"{doc_key.upper()} ({doc_info['full_name']})"
+
+# =========================================================
+# Pooled LLM Client
+# =========================================================
+# One Groq client per process: it owns an httpx connection pool, so
+# reusing it skips DNS + TLS setup on every SALES_MODE turn.
+LLM_MODEL = DEFAULT_MODEL
+
+# Cap on how much of a user message is forwarded to the LLM
+LLM_MAX_INPUT_TOKENS = env_int("LLM_MAX_INPUT_TOKENS", 512)
+
+_GROQ_CLASS = None
+_GROQ_CLIENT = None
+# Copy of the pooled client (same connection pool) with SDK retries off
+_GROQ_NO_RETRY_CLIENT = None
+# (api key, base URL) the pooled client was built with
+_GROQ_CLIENT_KEY: Optional[Tuple[str, Optional[str]]] = None
+_GROQ_CLIENT_LOCK = threading.Lock()
+
+
+def _groq_class():
+    """Import groq on first SALES_MODE use and record the cost"""
+    global _GROQ_CLASS
+    if _GROQ_CLASS is None:
+        with startup_profile.phase("lazy_import:groq"):
+            from groq import Groq
+        _GROQ_CLASS = Groq
+    return _GROQ_CLASS
+
+
+def _usage_tokens(completion: Any, messages: List[Dict[str, str]]) -> Tuple[int, int]:
+    """(prompt, completion) tokens from the provider's usage block, else our estimate"""
+    usage = getattr(completion, "usage", None)
+    prompt_tokens = getattr(usage, "prompt_tokens", None)
+    completion_tokens = getattr(usage, "completion_tokens", None)
+    if isinstance(prompt_tokens, int) and isinstance(completion_tokens, int):
+        return prompt_tokens, completion_tokens
+    content = completion.choices[0].message.content
+    return (
+        sum(estimate_tokens(m["content"]) for m in messages),
+        estimate_tokens(content) if isinstance(content, str) else 0
+    )
+
+
 # =========================================================
 # Main AI Engine Class
 # =========================================================
 class LegalAI:
     
     @staticmethod
-    def get_groq_client() -> Groq:
-        """Initialize Groq client with secure API key"""
+    def get_groq_client(retries: bool = True) -> "Groq":
+        """Return the pooled Groq client, creating it with the secure API key.
+
+        retries=False returns a copy sharing its connection pool that
+        never retries, for calls that have a fallback of their own.
+        """
+        global _GROQ_CLIENT, _GROQ_NO_RETRY_CLIENT, _GROQ_CLIENT_KEY
         api_key = os.getenv("GROQ_API_KEY")
         if not api_key:
             raise ValueError("GROQ_API_KEY not found in environment variables")
-        return Groq(api_key=api_key)
+        # GROQ_BASE_URL points the engine at another endpoint (e.g. benchmarks/stub_llm.py)
+        base_url = env_str("GROQ_BASE_URL")
+        with _GROQ_CLIENT_LOCK:
+            if _GROQ_CLIENT is None or _GROQ_CLIENT_KEY != (api_key, base_url):
+                options: Dict[str, Any] = {"api_key": api_key, "base_url": base_url}
+                timeout = env_float("GROQ_TIMEOUT_SECONDS", 0.0)
+                if timeout > 0:
+                    options["timeout"] = timeout
+                max_retries = env_int("GROQ_MAX_RETRIES", -1)
+                if max_retries >= 0:
+                    options["max_retries"] = max_retries
+                _GROQ_CLIENT = _groq_class()(**options)
+                _GROQ_NO_RETRY_CLIENT = None
+                _GROQ_CLIENT_KEY = (api_key, base_url)
+            if retries:
+                return _GROQ_CLIENT
+            if _GROQ_NO_RETRY_CLIENT is None:
+                _GROQ_NO_RETRY_CLIENT = _GROQ_CLIENT.with_options(max_retries=0)
+            return _GROQ_NO_RETRY_CLIENT
+    
+    @staticmethod
+    def close_groq_client() -> None:
+        """Close the pooled client's connections (shutdown)"""
+        global _GROQ_CLIENT, _GROQ_NO_RETRY_CLIENT, _GROQ_CLIENT_KEY
+        with _GROQ_CLIENT_LOCK:
+            client, _GROQ_CLIENT, _GROQ_CLIENT_KEY = _GROQ_CLIENT, None, None
+            _GROQ_NO_RETRY_CLIENT = None
+        if client is not None:
+            client.close()
+    
+    @staticmethod
+    def warm_up_completion() -> None:
+        """Fire a one-token completion to prime DNS, TLS and the provider route"""
+        client = LegalAI.get_groq_client()
+        client.chat.completions.create(
+            messages=[{"role": "user", "content": "ping"}],
+            model=LLM_MODEL,
+            max_tokens=1
+        )
+    
+    @staticmethod
+    def build_catalog_index() -> int:
+        """(Re)build the lowercase lookup index over DOCUMENT_DATABASE"""
+        global _CATALOG_INDEX, _CATALOG_VERSION
+        _CATALOG_INDEX = tuple(
+            (doc_key, doc_info["full_name"].lower(), doc_info)
+            for doc_key, doc_info in DOCUMENT_DATABASE.items()
+        )
+        _CATALOG_VERSION += 1
+        return len(_CATALOG_INDEX)
+    
+    @staticmethod
+    def sales_system_prompt() -> Tuple[str, str]:
+        """Return (prompt, sha256) of the static SALES_MODE system prompt.
+        
+        Rendered once per catalog version; every request reuses the same string.
+        """
+        global _SALES_PROMPT
+        if _CATALOG_INDEX is None:
+            LegalAI.build_catalog_index()
+        cached = _SALES_PROMPT
+        if cached is not None and cached[0] == _CATALOG_VERSION:
+            return cached[1], cached[2]
+        
+        featured = "\n".join(
+            f"- {_featured_name(doc_key, full_name, doc_info)} - {doc_info['category']}"
+            for doc_key, full_name, doc_info in _CATALOG_INDEX[:PROMPT_FEATURED_DOCUMENTS]
+        )
+        prompt = (
+            f"{SALESPERSON_PROMPT}\n"
+            f"AVAILABLE DOCUMENTS (mention these by name):\n{featured}\n"
+            f"- And 165+ more templates\n"
+            f"{SALES_INSTRUCTIONS}"
+        )
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        _SALES_PROMPT = (_CATALOG_VERSION, prompt, digest)
+        return prompt, digest
+    
+    @staticmethod
+    def prompt_info() -> Dict[str, Any]:
+        """Catalog version, hash and size of the cached system prompt (for /api/status)"""
+        prompt, digest = LegalAI.sales_system_prompt()
+        return {
+            "catalog_version": _CATALOG_VERSION,
+            "system_prompt_sha256": digest,
+            "system_prompt_tokens": estimate_tokens(prompt)
+        }
+    
+    @staticmethod
+    def match_document(message: str) -> Optional[Dict[str, Any]]:
+        """Return the first catalog document named in the message, if any"""
+        if _CATALOG_INDEX is None:
+            LegalAI.build_catalog_index()
+        msg_lower = message.lower()
+        for doc_key, full_name, doc_info in _CATALOG_INDEX:
+            if doc_key in msg_lower or full_name in msg_lower:
+                return doc_info
+        return None
+    
+    @staticmethod
+    def needs_llm(message: str, stage: str) -> bool:
+        """True when this turn will call the LLM (SALES_MODE without a catalog match)"""
+        return stage == _SALES_MODE and LegalAI.match_document(message) is None
     
     @staticmethod
     def process_flow(
         message: str, 
         user_name: Optional[str], 
         stage: str,
-        session_id: str
+        session_id: str,
+        history: ConversationHistory = NO_HISTORY
     ) -> Dict[str, Any]:
         """
         Main conversation flow processor implementing AJA's requirements:
@@ -191,6 +436,9 @@ class LegalAI:
         FLOW:
         INIT → CAPTURE_NAME → TRIAGE → SALES_MODE/HUMAN_ROUTE → DONE
         
+        Each stage is a StageHandler in STAGE_HANDLERS; dispatch is one dict lookup.
+        `history` (recent messages + rolling summary) gives SALES_MODE multi-turn context.
+        
         Returns dict with: response, new_stage, user_name, suggested_documents, action_buttons
         """
         
@@ -202,147 +450,22 @@ class LegalAI:
             "action_buttons": None
         }
         
-        # ═══════════════════════════════════════════════════════════
-        # STAGE 1: INITIAL GREETING & DATA CAPTURE
-        # ═══════════════════════════════════════════════════════════
-        if stage == "INIT":
-            result["response"] = (
-                "👋 **Welcome to Legalgram!**\n\n"
-                "I'm your AI Legal Document Assistant. I can help you:\n"
-                "• Find the right legal document for your needs\n"
-                "• Explain what different contracts include\n"
-                "• Guide you through creating your document\n\n"
-                "Before we begin, **may I have your name** so I can address you properly?"
-            )
-            result["new_stage"] = "CAPTURE_NAME"
-            return result
-        
-        # ═══════════════════════════════════════════════════════════
-        # STAGE 2: CAPTURE USER NAME
-        # ═══════════════════════════════════════════════════════════
-        if stage == "CAPTURE_NAME":
-            # Extract name from message (first word or full message if short)
-            extracted_name = message.strip().split()[0].title() if message.strip() else "Friend"
-            
-            # Clean up common prefixes
-            for prefix in ["my name is", "i'm", "i am", "call me", "it's"]:
-                if message.lower().startswith(prefix):
-                    extracted_name = message.lower().replace(prefix, "").strip().split()[0].title()
-                    break
-            
-            result["user_name"] = extracted_name
-            result["response"] = (
-                f"Nice to meet you, **{extracted_name}**! ⚖️\n\n"
-                "How would you like to proceed today?\n\n"
-                "**Option 1:** 👨‍⚖️ **Get Free Human Legal Advice**\n"
-                "Post your question to our panel of real attorneys (Response within 24-48 hours)\n\n"
-                "**Option 2:** 🤖 **Ask Legalgram AI**\n"
-                "Get instant guidance on our 170+ legal document templates\n\n"
-                "_Reply with **1** or **2**, or just tell me what you need!_"
-            )
-            result["new_stage"] = "TRIAGE"
-            result["action_buttons"] = [
-                {"label": "👨‍⚖️ Human Lawyer", "value": "1"},
-                {"label": "🤖 AI Assistant", "value": "2"}
-            ]
-            return result
-        
-        # ═══════════════════════════════════════════════════════════
-        # STAGE 3: TRIAGE - HUMAN VS AI ROUTING
-        # ═══════════════════════════════════════════════════════════
-        if stage == "TRIAGE":
-            msg_lower = message.lower()
-            
-            # Check for Human route - expanded keywords
-            human_keywords = [
-                "1", "one", "human", "lawyer", "attorney", "real person", 
-                "free advice", "actual lawyer", "person", "advice"
-            ]
-            if any(kw in msg_lower for kw in human_keywords):
-                result["response"] = (
-                    f"Excellent choice, {user_name}! 👨‍⚖️\n\n"
-                    "Our **Free Legal Advice** service connects you with real attorneys.\n\n"
-                    "📝 **How it works:**\n"
-                    "1. Visit our [Free Advice Page](/ask-a-lawyer)\n"
-                    "2. Submit your legal question\n"
-                    "3. Receive a response from a qualified attorney within 24-48 hours\n\n"
-                    "**[Click Here to Submit Your Question →](/ask-a-lawyer)**\n\n"
-                    "_Is there anything else I can help you with in the meantime?_"
-                )
-                result["new_stage"] = "HUMAN_ROUTE"
-                result["action_buttons"] = [
-                    {"label": "Go to Free Advice", "value": "/ask-a-lawyer", "type": "link"},
-                    {"label": "Ask AI Instead", "value": "ai"}
-                ]
-                return result
-            
-            # Check for AI route - expanded keywords
-            ai_keywords = [
-                "2", "two", "ai", "instant", "bot", "you", "legalgram", 
-                "chatbot", "assistant"
-            ]
-            if any(kw in msg_lower for kw in ai_keywords):
-                result["response"] = (
-                    f"Great, {user_name}! I'm here to help. 🤖\n\n"
-                    "What kind of legal document are you looking for?\n\n"
-                    "**Popular Categories:**\n"
-                    "📁 **Business:** NDA, LLC Agreement, Employment Contract\n"
-                    "🏠 **Property:** Lease Agreement, Bill of Sale, Eviction Notice\n"
-                    "👨‍👩‍👧 **Family:** Power of Attorney, Living Will, Prenup\n\n"
-                    "_Just tell me what you need, and I'll guide you to the right document!_"
-                )
-                result["new_stage"] = "SALES_MODE"
-                return result
-            
-            # If unclear, try to understand intent
-            result["response"] = (
-                f"I want to make sure I help you the right way, {user_name}.\n\n"
-                "Are you looking to:\n"
-                "1️⃣ Get advice on a specific legal situation (Free Human Lawyers)\n"
-                "2️⃣ Find and create a legal document (AI Assistant)\n\n"
-                "_Just reply with **1** or **2**!_"
-            )
-            return result
-        
-        # ═══════════════════════════════════════════════════════════
-        # STAGE 4: HUMAN ROUTE - FOLLOW UP
-        # ═══════════════════════════════════════════════════════════
-        if stage == "HUMAN_ROUTE":
-            msg_lower = message.lower()
-            
-            # Keywords to switch from human to AI route
-            ai_switch_keywords = [
-                "ai", "2", "document", "template", "contract", "bot", 
-                "chatbot", "assistant", "legalgram"
-            ]
-            if any(kw in msg_lower for kw in ai_switch_keywords):
-                result["response"] = (
-                    f"No problem, {user_name}! Let's find you the right document. 📄\n\n"
-                    "What type of legal document do you need?\n"
-                    "_(e.g., NDA, Lease Agreement, Power of Attorney)_"
-                )
-                result["new_stage"] = "SALES_MODE"
-                return result
-            
-            result["response"] = (
-                f"Is there anything else I can help you with, {user_name}?\n\n"
-                "I'm always here if you need help finding a legal document!"
-            )
-            return result
-        
-        # ═══════════════════════════════════════════════════════════
-        # STAGE 5: SALES MODE - THE SALESPERSON
-        # ═══════════════════════════════════════════════════════════
-        if stage == "SALES_MODE":
-            return LegalAI._handle_sales_mode(message, user_name, result)
+        handler = STAGE_HANDLERS.get(stage)
+        if handler is not None:
+            return handler.handle(message, user_name, result, history)
         
         # Default fallback
         result["response"] = f"How can I help you today, {user_name or 'there'}?"
-        result["new_stage"] = "INIT"
+        result["new_stage"] = _INIT
         return result
     
     @staticmethod
-    def _handle_sales_mode(message: str, user_name: str, result: Dict) -> Dict:
+    def _handle_sales_mode(
+        message: str,
+        user_name: str,
+        result: Dict,
+        history: ConversationHistory = NO_HISTORY
+    ) -> Dict:
         """
         SALES MODE: The AI acts as a knowledgeable salesperson
         - Identifies what document the user needs
@@ -350,14 +473,10 @@ class LegalAI:
         - Guides them to create the document
         """
         
-        msg_lower = message.lower()
-        
         # Check if asking about a specific document
-        matched_doc = None
-        for doc_key, doc_info in DOCUMENT_DATABASE.items():
-            if doc_key in msg_lower or doc_info["full_name"].lower() in msg_lower:
-                matched_doc = doc_info
-                break
+        with tracer.span("catalog.match") as span:
+            matched_doc = LegalAI.match_document(message)
+            span.set("matched", matched_doc is not None)
         
         if matched_doc:
             # Found a specific document - give detailed sales pitch
@@ -373,37 +492,29 @@ class LegalAI:
         try:
             client = LegalAI.get_groq_client()
             
-            system_prompt = f"""
-{SALESPERSON_PROMPT}
-
-USER CONTEXT:
-- User Name: {user_name}
-- They are looking for legal document help
-- Current Query: {message}
-
-AVAILABLE DOCUMENTS (mention these by name):
-- NDA (Non-Disclosure Agreement) - Business confidentiality
-- Lease Agreement - Rental property
-- LLC Operating Agreement - Business formation
-- Power of Attorney - Financial/legal authority
-- Employment Agreement - Hiring employees
-- And 165+ more templates
-
-YOUR RESPONSE SHOULD:
-1. Acknowledge their need
-2. Recommend 1-2 specific documents that fit
-3. Briefly explain why our version is best
-4. End with a call to action
-"""
+            with tracer.span("prompt.build") as span:
+                # Only a bounded slice of the message is worth paying for
+                llm_message = truncate_to_tokens(message, LLM_MAX_INPUT_TOKENS)
+                
+                # Static, cached prompt first; the query itself is only sent as the user message
+                system_prompt, _ = LegalAI.sales_system_prompt()
+                user_context = USER_CONTEXT_TEMPLATE.format(name=user_name)
+                
+                # Model, reply budget and temperature depend on the kind of question
+                route = classify_query(llm_message)
+                policy = route_policies[route]
+                
+                # Earlier turns packed into the token budget, reply headroom reserved;
+                # LLM_MAX_OUTPUT_TOKENS caps every route's reply budget
+                messages, max_tokens = build_chat_messages(
+                    system_prompt, llm_message, history, context=user_context,
+                    max_output_tokens=min(policy.max_tokens, LLM_MAX_OUTPUT_TOKENS)
+                )
+                span.set("route", route)
+                span.set("messages", len(messages))
             
-            completion = client.chat.completions.create(
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": message}
-                ],
-                model="llama3-8b-8192",
-                temperature=0.6,
-                max_tokens=600
+            completion = LegalAI._routed_completion(
+                client, route, policy, messages, max_tokens, LegalAI.get_groq_client(retries=False)
             )
             
             ai_response = completion.choices[0].message.content
@@ -413,7 +524,10 @@ YOUR RESPONSE SHOULD:
             result["new_stage"] = "SALES_MODE"
             
         except Exception as e:
-            print(f"[AI ENGINE ERROR] {str(e)}")
+            logger.error(
+                "SALES_MODE completion failed, sent the fallback reply",
+                extra={"event": "llm.failed", "error_type": type(e).__name__, "error": str(e)}
+            )
             result["response"] = (
                 f"I apologize, {user_name}, I'm experiencing high demand right now.\n\n"
                 "In the meantime, you can:\n"
@@ -423,6 +537,52 @@ YOUR RESPONSE SHOULD:
         
         return result
     
+    @staticmethod
+    def _routed_completion(
+        client: "Groq",
+        route: str,
+        policy: RoutePolicy,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        no_retry_client: Optional["Groq"] = None
+    ) -> Any:
+        """Run the completion on the route's model, moving down the fallback chain on 429.
+
+        Models with a fallback after them are called through
+        `no_retry_client`: the SDK would otherwise retry a 429 on the
+        same model, with backoff sleeps, before the fallback is tried.
+        The last model keeps the client's retries (GROQ_MAX_RETRIES).
+        """
+        models = policy.models
+        for attempt, model in enumerate(models):
+            has_fallback = attempt + 1 < len(models)
+            caller = no_retry_client if has_fallback and no_retry_client is not None else client
+            started = time.perf_counter()
+            try:
+                with llm_calls.track(), \
+                        tracer.span("llm.completion", model=model, route=route, attempt=attempt) as span:
+                    completion = caller.chat.completions.create(
+                        messages=messages,
+                        model=model,
+                        temperature=policy.temperature,
+                        max_tokens=max_tokens
+                    )
+            except Exception as e:
+                if is_rate_limited(e):
+                    route_metrics.record_rate_limited(route)
+                    if has_fallback:
+                        continue
+                route_metrics.record_error(route)
+                raise
+            prompt_tokens, completion_tokens = _usage_tokens(completion, messages)
+            elapsed = time.perf_counter() - started
+            span.set("prompt_tokens", prompt_tokens)
+            span.set("completion_tokens", completion_tokens)
+            route_metrics.record(route, model, elapsed, prompt_tokens, completion_tokens, attempt)
+            note_llm_call(model, route, elapsed, prompt_tokens, completion_tokens, attempt)
+            return completion
+        raise ValueError(f"No model configured for route {route!r}")
+    
     @staticmethod
     def _generate_document_pitch(doc_info: Dict, user_name: str) -> str:
         """Generate a compelling sales pitch for a specific document"""
@@ -477,3 +637,234 @@ _Need help with something else? Just ask!_
             "message": f"Document '{document_name}' not found in database.",
             "suggestion": "Try searching for: NDA, Lease Agreement, LLC Operating Agreement, Power of Attorney"
         }
+
+
+
+# =========================================================
+# Stage Handlers (table-driven dispatch for process_flow)
+# =========================================================
+class KeywordMatcher:
+    """Substring matcher over a fixed keyword tuple.
+    
+    Same semantics as `any(kw in text for kw in keywords)`; a plain loop
+    with early exit skips the generator overhead (measured faster than a
+    compiled regex alternation for chat-sized messages).
+    """
+    
+    def __init__(self, keywords: Iterable[str]) -> None:
+        self.keywords = tuple(keywords)
+    
+    def matches(self, text_lower: str) -> bool:
+        for keyword in self.keywords:
+            if keyword in text_lower:
+                return True
+        return False
+
+
+class ResponseTemplate:
+    """Response text with a `{name}` slot, split once so rendering is a single join"""
+    
+    def __init__(self, text: str) -> None:
+        self.text = text
+        self._parts = text.split("{name}")
+    
+    def render(self, name: Any) -> str:
+        return str(name).join(self._parts)
+
+
+class StageHandler:
+    """Base class: one instance per stage, built once at import.
+    
+    Subclass, set `stage`, implement `handle()` and pass an instance to
+    register_stage_handler() to add a stage.
+    """
+    
+    stage: Stage
+    
+    def handle(
+        self,
+        message: str,
+        user_name: Optional[str],
+        result: Dict[str, Any],
+        history: ConversationHistory
+    ) -> Dict[str, Any]:
+        raise NotImplementedError
+
+
+class InitHandler(StageHandler):
+    """STAGE 1: INITIAL GREETING & DATA CAPTURE"""
+    
+    stage = Stage.INIT
+    
+    RESPONSE = (
+        "👋 **Welcome to Legalgram!**\n\n"
+        "I'm your AI Legal Document Assistant. I can help you:\n"
+        "• Find the right legal document for your needs\n"
+        "• Explain what different contracts include\n"
+        "• Guide you through creating your document\n\n"
+        "Before we begin, **may I have your name** so I can address you properly?"
+    )
+    
+    def handle(self, message, user_name, result, history):
+        result["response"] = self.RESPONSE
+        result["new_stage"] = _CAPTURE_NAME
+        return result
+
+
+class CaptureNameHandler(StageHandler):
+    """STAGE 2: CAPTURE USER NAME"""
+    
+    stage = Stage.CAPTURE_NAME
+    
+    NAME_PREFIXES = ("my name is", "i'm", "i am", "call me", "it's")
+    
+    RESPONSE = ResponseTemplate(
+        "Nice to meet you, **{name}**! ⚖️\n\n"
+        "How would you like to proceed today?\n\n"
+        "**Option 1:** 👨‍⚖️ **Get Free Human Legal Advice**\n"
+        "Post your question to our panel of real attorneys (Response within 24-48 hours)\n\n"
+        "**Option 2:** 🤖 **Ask Legalgram AI**\n"
+        "Get instant guidance on our 170+ legal document templates\n\n"
+        "_Reply with **1** or **2**, or just tell me what you need!_"
+    )
+    
+    def handle(self, message, user_name, result, history):
+        # Extract name from message (first word or full message if short)
+        stripped = message.strip()
+        extracted_name = stripped.split()[0].title() if stripped else "Friend"
+        
+        # Clean up common prefixes
+        msg_lower = message.lower()
+        for prefix in self.NAME_PREFIXES:
+            if msg_lower.startswith(prefix):
+                extracted_name = msg_lower.replace(prefix, "").strip().split()[0].title()
+                break
+        
+        result["user_name"] = extracted_name
+        result["response"] = self.RESPONSE.render(extracted_name)
+        result["new_stage"] = _TRIAGE
+        result["action_buttons"] = [
+            {"label": "👨‍⚖️ Human Lawyer", "value": "1"},
+            {"label": "🤖 AI Assistant", "value": "2"}
+        ]
+        return result
+
+
+class TriageHandler(StageHandler):
+    """STAGE 3: TRIAGE - HUMAN VS AI ROUTING"""
+    
+    stage = Stage.TRIAGE
+    
+    HUMAN_KEYWORDS = KeywordMatcher([
+        "1", "one", "human", "lawyer", "attorney", "real person", 
+        "free advice", "actual lawyer", "person", "advice"
+    ])
+    
+    AI_KEYWORDS = KeywordMatcher([
+        "2", "two", "ai", "instant", "bot", "you", "legalgram", 
+        "chatbot", "assistant"
+    ])
+    
+    HUMAN_RESPONSE = ResponseTemplate(
+        "Excellent choice, {name}! 👨‍⚖️\n\n"
+        "Our **Free Legal Advice** service connects you with real attorneys.\n\n"
+        "📝 **How it works:**\n"
+        "1. Visit our [Free Advice Page](/ask-a-lawyer)\n"
+        "2. Submit your legal question\n"
+        "3. Receive a response from a qualified attorney within 24-48 hours\n\n"
+        "**[Click Here to Submit Your Question →](/ask-a-lawyer)**\n\n"
+        "_Is there anything else I can help you with in the meantime?_"
+    )
+    
+    AI_RESPONSE = ResponseTemplate(
+        "Great, {name}! I'm here to help. 🤖\n\n"
+        "What kind of legal document are you looking for?\n\n"
+        "**Popular Categories:**\n"
+        "📁 **Business:** NDA, LLC Agreement, Employment Contract\n"
+        "🏠 **Property:** Lease Agreement, Bill of Sale, Eviction Notice\n"
+        "👨‍👩‍👧 **Family:** Power of Attorney, Living Will, Prenup\n\n"
+        "_Just tell me what you need, and I'll guide you to the right document!_"
+    )
+    
+    UNCLEAR_RESPONSE = ResponseTemplate(
+        "I want to make sure I help you the right way, {name}.\n\n"
+        "Are you looking to:\n"
+        "1️⃣ Get advice on a specific legal situation (Free Human Lawyers)\n"
+        "2️⃣ Find and create a legal document (AI Assistant)\n\n"
+        "_Just reply with **1** or **2**!_"
+    )
+    
+    def handle(self, message, user_name, result, history):
+        msg_lower = message.lower()
+        
+        if self.HUMAN_KEYWORDS.matches(msg_lower):
+            result["response"] = self.HUMAN_RESPONSE.render(user_name)
+            result["new_stage"] = _HUMAN_ROUTE
+            result["action_buttons"] = [
+                {"label": "Go to Free Advice", "value": "/ask-a-lawyer", "type": "link"},
+                {"label": "Ask AI Instead", "value": "ai"}
+            ]
+            return result
+        
+        if self.AI_KEYWORDS.matches(msg_lower):
+            result["response"] = self.AI_RESPONSE.render(user_name)
+            result["new_stage"] = _SALES_MODE
+            return result
+        
+        # If unclear, try to understand intent
+        result["response"] = self.UNCLEAR_RESPONSE.render(user_name)
+        return result
+
+
+class HumanRouteHandler(StageHandler):
+    """STAGE 4: HUMAN ROUTE - FOLLOW UP"""
+    
+    stage = Stage.HUMAN_ROUTE
+    
+    AI_SWITCH_KEYWORDS = KeywordMatcher([
+        "ai", "2", "document", "template", "contract", "bot", 
+        "chatbot", "assistant", "legalgram"
+    ])
+    
+    SWITCH_RESPONSE = ResponseTemplate(
+        "No problem, {name}! Let's find you the right document. 📄\n\n"
+        "What type of legal document do you need?\n"
+        "_(e.g., NDA, Lease Agreement, Power of Attorney)_"
+    )
+    
+    FOLLOW_UP_RESPONSE = ResponseTemplate(
+        "Is there anything else I can help you with, {name}?\n\n"
+        "I'm always here if you need help finding a legal document!"
+    )
+    
+    def handle(self, message, user_name, result, history):
+        if self.AI_SWITCH_KEYWORDS.matches(message.lower()):
+            result["response"] = self.SWITCH_RESPONSE.render(user_name)
+            result["new_stage"] = _SALES_MODE
+            return result
+        
+        result["response"] = self.FOLLOW_UP_RESPONSE.render(user_name)
+        return result
+
+
+class SalesModeHandler(StageHandler):
+    """STAGE 5: SALES MODE - THE SALESPERSON"""
+    
+    stage = Stage.SALES_MODE
+    
+    def handle(self, message, user_name, result, history):
+        return LegalAI._handle_sales_mode(message, user_name, result, history)
+
+
+# Stage value -> handler, keyed by plain str so lookups take the fast str path
+STAGE_HANDLERS: Dict[str, StageHandler] = {}
+
+
+def register_stage_handler(handler: StageHandler) -> None:
+    """Add or replace the handler for `handler.stage`"""
+    STAGE_HANDLERS[Stage(handler.stage).value] = handler
+
+
+for _handler in (InitHandler(), CaptureNameHandler(), TriageHandler(),
+                 HumanRouteHandler(), SalesModeHandler()):
+    register_stage_handler(_handler)
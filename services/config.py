@@ -0,0 +1,41 @@
+"""
+=========================================================
+LEGALGRAM 2.0 - ENVIRONMENT CONFIGURATION HELPERS
+=========================================================
+Small typed readers for os.environ. Bad values fall back to
+the default instead of crashing the worker at boot.
+=========================================================
+"""
+
+import os
+from typing import Optional
+
+
+def env_str(name: str, default: Optional[str] = None) -> Optional[str]:
+    """Read a string, treating empty values as unset"""
+    value = os.getenv(name)
+    return value if value else default
+
+
+def env_int(name: str, default: int) -> int:
+    """Read an integer"""
+    try:
+        return int(os.getenv(name, ""))
+    except ValueError:
+        return default
+
+
+def env_float(name: str, default: float) -> float:
+    """Read a float"""
+    try:
+        return float(os.getenv(name, ""))
+    except ValueError:
+        return default
+
+
+def env_bool(name: str, default: bool = False) -> bool:
+    """Read a boolean (1/true/yes/on)"""
+    value = os.getenv(name)
+    if not value:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
@@ -0,0 +1,86 @@
+"""
+=========================================================
+LEGALGRAM 2.0 - LATENCY HISTOGRAMS
+=========================================================
+Fixed-bucket histograms for /metrics. An observation is one
+bisect and two additions under a lock, so they can sit on the
+request hot path and in threadpool LLM calls alike.
+=========================================================
+"""
+
+import threading
+from bisect import bisect_left
+from typing import Dict, List, Sequence, Tuple
+
+# HTTP requests and chat turns: deterministic stages answer in
+# well under a millisecond, LLM turns take seconds
+REQUEST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Completions on the provider
+LLM_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 30.0)
+
+
+class Histogram:
+    """Counts per upper bound (`le`) plus sum; the last slot is +Inf"""
+
+    __slots__ = ("buckets", "_counts", "_sum", "_lock")
+
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def snapshot(self) -> Tuple[List[int], float, int]:
+        """(cumulative count per bucket incl. +Inf, sum, count)"""
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        cumulative = []
+        running = 0
+        for count in counts:
+            running += count
+            cumulative.append(running)
+        return cumulative, total, running
+
+
+class HistogramFamily:
+    """Histograms of one metric keyed by label values"""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str],
+        buckets: Sequence[float] = REQUEST_BUCKETS
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._children: Dict[Tuple[str, ...], Histogram] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str) -> Histogram:
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, Histogram(self.buckets))
+        return child
+
+    def observe(self, values: Tuple[str, ...], amount: float) -> None:
+        self.labels(*values).observe(amount)
+
+    def children(self) -> List[Tuple[Tuple[str, ...], Histogram]]:
+        with self._lock:
+            return sorted(self._children.items())
+
+    def reset(self) -> None:
+        with self._lock:
+            self._children.clear()
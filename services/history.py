@@ -0,0 +1,95 @@
+"""
+=========================================================
+LEGALGRAM 2.0 - BOUNDED CONVERSATION HISTORY
+=========================================================
+Keeps per-session memory constant no matter how long a chat
+runs:
+- the newest SESSION_HISTORY_MESSAGES messages are kept
+  verbatim in a ring buffer (deque with maxlen)
+- when the buffer is full, the oldest SESSION_SUMMARY_EVERY
+  messages are folded into a rolling plain-text summary, one
+  condensed line per message (no LLM call, no re-reading of
+  old turns)
+- the summary is held under SESSION_SUMMARY_TOKENS by dropping
+  its oldest lines
+
+Prompt construction reads `session.summary` (older context)
+and `session.messages` (recent turns); `session.message_total`
+still counts every message ever exchanged.
+=========================================================
+"""
+
+import re
+from collections import deque
+from typing import TYPE_CHECKING, Iterable, Optional
+
+from .config import env_int
+from .tokens import estimate_tokens, truncate_to_tokens
+
+if TYPE_CHECKING:
+    from .records import MessageRecord, SessionRecord
+
+_WHITESPACE = re.compile(r"\s+")
+
+# Per-line budgets: what the user asked matters more than how we answered
+_LINE_TOKENS = {"user": 40, "assistant": 24}
+_ROLE_LABELS = {"user": "User", "assistant": "Assistant"}
+
+
+def condense(text: str, max_tokens: int) -> str:
+    """One-line, markdown-free, token-capped version of a message"""
+    flat = _WHITESPACE.sub(" ", text.replace("**", "")).strip()
+    short = truncate_to_tokens(flat, max_tokens)
+    return short if short == flat else short.rstrip() + "…"
+
+
+class HistoryPolicy:
+    """Ring-buffer size, fold batch and summary budget for session history"""
+
+    def __init__(
+        self,
+        max_messages: Optional[int] = None,
+        summary_every: Optional[int] = None,
+        summary_tokens: Optional[int] = None
+    ) -> None:
+        self.max_messages = max(2, max_messages if max_messages is not None else env_int("SESSION_HISTORY_MESSAGES", 20))
+        every = summary_every if summary_every is not None else env_int("SESSION_SUMMARY_EVERY", 4)
+        self.summary_every = min(max(1, every), self.max_messages)
+        self.summary_tokens = summary_tokens if summary_tokens is not None else env_int("SESSION_SUMMARY_TOKENS", 300)
+
+    def append(self, session: "SessionRecord", new_messages: Iterable["MessageRecord"]) -> None:
+        """Add messages to the session, folding the oldest into the summary when full"""
+        if session.messages.maxlen != self.max_messages:
+            # Session built under another cap (config change, snapshot from an older deploy)
+            self.fold(session, len(session.messages) - self.max_messages)
+            session.messages = deque(session.messages, maxlen=self.max_messages)
+        buffer = session.messages
+        for message in new_messages:
+            if len(buffer) >= self.max_messages:
+                self.fold(session, self.summary_every)
+            buffer.append(message)
+            session.message_total += 1
+
+    def fold(self, session: "SessionRecord", count: int) -> None:
+        """Move the `count` oldest buffered messages into the rolling summary"""
+        if count <= 0:
+            return
+        buffer = session.messages
+        lines = []
+        for _ in range(min(count, len(buffer))):
+            message = buffer.popleft()
+            label = _ROLE_LABELS.get(message.role, message.role.title())
+            lines.append(f"{label}: {condense(message.content, _LINE_TOKENS.get(message.role, 24))}")
+        summary = "\n".join(filter(None, [session.summary, *lines]))
+        session.summary = self.trim_summary(summary)
+
+    def trim_summary(self, summary: str) -> str:
+        """Drop the oldest summary lines until it fits the token budget"""
+        if self.summary_tokens <= 0:
+            return ""
+        while summary and estimate_tokens(summary) > self.summary_tokens:
+            _, _, summary = summary.partition("\n")
+        return summary
+
+
+history_policy = HistoryPolicy()
@@ -0,0 +1,140 @@
+"""
+=========================================================
+LEGALGRAM 2.0 - IDEMPOTENCY KEYS
+=========================================================
+The frontend retries /api/chat on network errors, which used
+to run the same turn twice (two Groq calls, duplicated history,
+double stage transitions).
+
+Requests carrying an `Idempotency-Key` header go through a
+bounded, TTL'd result cache:
+- first request runs the turn and stores the response
+- retries within the TTL get the stored response
+- concurrent duplicates wait for the first one to finish; if
+  it is cancelled (client gone, shutdown), one of them runs the
+  turn instead
+- reusing a key with a different body is rejected (422)
+- failures are not cached, so a retry runs the turn again
+- keys are scoped to the client (IP, API key) and session, so two
+  visitors reusing a key never see each other's responses
+=========================================================
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from .config import env_float, env_int
+
+
+class IdempotencyKeyReused(Exception):
+    """The key was already used for a different request body"""
+
+
+class _Entry:
+    __slots__ = ("fingerprint", "future", "result", "done", "expires_at")
+
+    def __init__(self, fingerprint: str, future: "asyncio.Future[Any]", expires_at: float) -> None:
+        self.fingerprint = fingerprint
+        self.future = future
+        self.result: Any = None
+        self.done = False
+        self.expires_at = expires_at
+
+
+def request_fingerprint(payload: Dict[str, Any]) -> str:
+    """Stable hash of a request body"""
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def scoped_key(key: str, *scope: Optional[str]) -> str:
+    """Cache key for an Idempotency-Key within a scope (client IP, API key, session)"""
+    return json.dumps([*(part or "" for part in scope), key], separators=(",", ":"))
+
+
+class IdempotencyCache:
+    """LRU + TTL cache of completed (and in-progress) responses by key"""
+
+    def __init__(self, max_entries: Optional[int] = None, ttl_seconds: Optional[float] = None) -> None:
+        self.max_entries = max_entries if max_entries is not None else env_int("IDEMPOTENCY_MAX_ENTRIES", 10_000)
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else env_float("IDEMPOTENCY_TTL_SECONDS", 600.0)
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self.replays = 0
+        self.misses = 0
+        self.evictions = 0
+
+    async def run(
+        self,
+        key: str,
+        fingerprint: str,
+        compute: Callable[[], Awaitable[Any]]
+    ) -> Tuple[Any, bool]:
+        """Return (result, replayed). `compute` runs at most once per live key"""
+        while True:
+            now = time.monotonic()
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= now:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                break
+
+            if entry.fingerprint != fingerprint:
+                raise IdempotencyKeyReused(key)
+            if entry.done:
+                self.replays += 1
+                return entry.result, True
+            # Same request still running - share its outcome
+            try:
+                result = await asyncio.shield(entry.future)
+            except asyncio.CancelledError:
+                task = asyncio.current_task()
+                if entry.future.cancelled() and not (task is not None and task.cancelling()):
+                    # The first request was cancelled, not this one: its key is
+                    # gone, so the next pass runs the turn (or waits for whoever does)
+                    continue
+                raise
+            self.replays += 1
+            return result, True
+
+        self.misses += 1
+        future: "asyncio.Future[Any]" = asyncio.get_running_loop().create_future()
+        entry = _Entry(fingerprint, future, now + self.ttl_seconds)
+        self._entries[key] = entry
+        self._evict()
+
+        try:
+            result = await compute()
+        except BaseException as e:
+            # Do not cache failures: drop the key so the client's retry re-runs
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+            if not future.done():
+                if isinstance(e, asyncio.CancelledError):
+                    future.cancel()
+                else:
+                    future.set_exception(e)
+                    # Mark retrieved so an unawaited failure is not logged as lost
+                    future.exception()
+            raise
+
+        entry.result = result
+        entry.done = True
+        if not future.done():
+            future.set_result(result)
+        return result, False
+
+    def _evict(self) -> None:
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+idempotency_cache = IdempotencyCache()
@@ -0,0 +1,54 @@
+"""
+=========================================================
+LEGALGRAM 2.0 - IN-FLIGHT WORK COUNTERS
+=========================================================
+Thread-safe gauges for work currently in progress. LLM calls
+run in the threadpool, so plain `+=` on the event loop is not
+enough - every update takes a lock.
+=========================================================
+"""
+
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+
+class InFlightTracker:
+    """Gauge of in-progress operations with peak and lifetime totals"""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.current = 0
+        self.peak = 0
+        self.started = 0
+        self._lock = threading.Lock()
+
+    def enter(self) -> None:
+        with self._lock:
+            self.current += 1
+            self.started += 1
+            if self.current > self.peak:
+                self.peak = self.current
+
+    def exit(self) -> None:
+        with self._lock:
+            self.current -= 1
+
+    @contextmanager
+    def track(self) -> Iterator[None]:
+        """Count the enclosed block as in flight"""
+        self.enter()
+        try:
+            yield
+        finally:
+            self.exit()
+
+    def snapshot(self) -> Dict[str, int]:
+        return {"current": self.current, "peak": self.peak, "started": self.started}
+
+
+# /api/chat requests currently being processed
+chat_requests = InFlightTracker("chat_requests")
+
+# LLM completions currently waiting on the provider
+llm_calls = InFlightTracker("llm_calls")
@@ -0,0 +1,191 @@
+"""
+=========================================================
+LEGALGRAM 2.0 - APPLICATION LIFECYCLE
+=========================================================
+Startup warm-up and readiness gating:
+- Builds catalog indexes before the first request
+- Opens the pooled LLM connection
+- Optionally fires a tiny warm-up completion (LLM_WARMUP=true)
+- Flips readiness only when all of the above are done
+
+Graceful shutdown:
+- Stops accepting new conversations (existing ones may finish)
+- Waits up to SHUTDOWN_GRACE_SECONDS for in-flight chat turns
+- Flushes sessions to the configured store and closes the turn trace
+- Closes pooled LLM connections
+=========================================================
+"""
+
+import asyncio
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from .ai_engine import LegalAI
+from .config import env_bool, env_float
+from .inflight import chat_requests
+from .session_store import SessionStore
+from .startup import startup_profile
+from .structured_logging import get_logger
+from .tracing import tracer
+from .turn_recorder import turn_recorder
+
+logger = get_logger("lifecycle")
+
+
+class ReadinessState:
+    """Process-wide readiness flag plus the outcome of each warm-up step"""
+
+    def __init__(self) -> None:
+        self.ready = False
+        self.checks: Dict[str, str] = {}
+        self.ready_at: float = 0.0
+
+    def reset(self) -> None:
+        self.ready = False
+        self.checks = {}
+        self.ready_at = 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "checks": dict(self.checks),
+        }
+
+
+readiness = ReadinessState()
+
+
+async def warm_up() -> None:
+    """Run every warm-up step, then mark the process ready"""
+    readiness.reset()
+    shutdown.reset()
+
+    with startup_profile.phase("catalog_index"):
+        LegalAI.build_catalog_index()
+    readiness.checks["catalog_index"] = "ok"
+
+    if os.getenv("GROQ_API_KEY"):
+        # Client construction imports groq and builds the connection pool;
+        # keep it off the event loop
+        with startup_profile.phase("llm_client"):
+            await run_in_threadpool(LegalAI.get_groq_client)
+        readiness.checks["llm_client"] = "ok"
+
+        if env_bool("LLM_WARMUP"):
+            try:
+                with startup_profile.phase("llm_warmup"):
+                    await run_in_threadpool(LegalAI.warm_up_completion)
+                readiness.checks["llm_warmup"] = "ok"
+            except Exception as e:
+                # A provider hiccup must not keep the instance out of rotation;
+                # SALES_MODE already degrades gracefully
+                logger.warning("LLM warm-up failed", extra={"event": "lifecycle.warmup_failed", "error": str(e)})
+                readiness.checks["llm_warmup"] = "failed"
+        else:
+            readiness.checks["llm_warmup"] = "skipped"
+    else:
+        readiness.checks["llm_client"] = "skipped"
+
+    readiness.ready = True
+    readiness.ready_at = time.time()
+
+
+# =========================================================
+# Graceful Shutdown
+# =========================================================
+class ShutdownState:
+    """Drain flag plus request counters.
+
+    drained: turns that finished during the drain. aborted: turns
+    cancelled by the server. unfinished: turns still running when
+    the grace period ran out (they end up in one of the others, or
+    die with the process).
+    """
+
+    def __init__(self) -> None:
+        self.draining = False
+        self.drain_started_at: float = 0.0
+        self.drained = 0
+        self.aborted = 0
+        self.unfinished = 0
+
+    def reset(self) -> None:
+        self.draining = False
+        self.drain_started_at = 0.0
+        self.drained = 0
+        self.aborted = 0
+        self.unfinished = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "draining": self.draining,
+            "drained": self.drained,
+            "aborted": self.aborted,
+            "unfinished": self.unfinished,
+        }
+
+
+shutdown = ShutdownState()
+
+
+def begin_drain() -> None:
+    """Stop taking new conversations and leave the load balancer rotation"""
+    if not shutdown.draining:
+        shutdown.draining = True
+        shutdown.drain_started_at = time.monotonic()
+    readiness.ready = False
+
+
+@contextmanager
+def track_chat_request() -> Iterator[None]:
+    """Count a chat turn as in flight; classify it if a drain is under way"""
+    chat_requests.enter()
+    cancelled = False
+    try:
+        yield
+    except asyncio.CancelledError:
+        # The server gave up on this request (graceful timeout exceeded)
+        cancelled = True
+        shutdown.aborted += 1
+        raise
+    finally:
+        chat_requests.exit()
+        if shutdown.draining and not cancelled:
+            shutdown.drained += 1
+
+
+async def shut_down(session_store: SessionStore) -> None:
+    """Drain in-flight turns, persist sessions, close pooled connections"""
+    begin_drain()
+
+    grace = env_float("SHUTDOWN_GRACE_SECONDS", 20.0)
+    deadline = time.monotonic() + grace
+    while chat_requests.current > 0 and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+    # Not counted as aborted here: a turn the server then cancels is counted
+    # by track_chat_request, so this would count it twice
+    shutdown.unfinished = chat_requests.current
+
+    persisted: Optional[int] = None
+    try:
+        session_store.flush()
+        persisted = session_store.count()
+    except Exception as e:
+        logger.error("Session flush failed", extra={"event": "lifecycle.flush_failed", "error": str(e)})
+    session_store.close()
+    turn_recorder.close()
+    tracer.close()
+    LegalAI.close_groq_client()
+
+    logger.info("Shutdown complete", extra={
+        "event": "lifecycle.shutdown",
+        "drained": shutdown.drained,
+        "aborted": shutdown.aborted,
+        "unfinished": shutdown.unfinished,
+        # None: the store does not count its sessions, or the flush failed
+        "sessions": persisted if persisted is not None else "unknown",
+    })
@@ -0,0 +1,264 @@
+"""
+=========================================================
+LEGALGRAM 2.0 - PROMETHEUS METRICS (/metrics)
+=========================================================
+Text exposition format 0.0.4, rendered here: the numbers
+already live in the service singletons, so prometheus-client
+would only add a dependency and a second copy of each counter.
+
+Hot path (per request, MetricsMiddleware):
+- legalgram_http_request_duration_seconds{method,route,status}
+  with the route template, not the raw path
+- legalgram_chat_turn_duration_seconds{stage,status} for
+  /api/chat, by the stage the turn ran in (run_chat_turn puts
+  it in request.state.chat_stage; unknown stages are "other")
+Each is one histogram observation: a bisect and two additions.
+
+Read at scrape time, so free per request:
+- LLM calls: latency histogram, calls, fallbacks, 429s, errors
+  and tokens per route (RouteMetrics)
+- session count and evictions, cache hits/misses (session
+  read-through cache, idempotency cache)
+- in-flight gauges, shed / rate-limited totals, session locks
+
+Every worker keeps its own numbers; with WEB_CONCURRENCY > 1 a
+scrape sees whichever worker answered it.
+=========================================================
+"""
+
+import math
+import time
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from .admission import admission, http_requests, llm_turns
+from .histogram import REQUEST_BUCKETS, HistogramFamily
+from .idempotency import idempotency_cache
+from .inflight import chat_requests, llm_calls
+from .lifecycle import shutdown
+from .rate_limit import rate_limiter
+from .routing import route_metrics
+from .session_locks import session_locks
+from .session_store import SessionStore
+from .tracing import route_template
+from .turn_recorder import turn_recorder
+
+# Starlette appends "; charset=utf-8"
+MEDIA_TYPE = "text/plain; version=0.0.4"
+
+http_request_seconds = HistogramFamily(
+    "legalgram_http_request_duration_seconds",
+    "HTTP request latency by method, route template and status",
+    ("method", "route", "status"),
+    REQUEST_BUCKETS
+)
+
+chat_turn_seconds = HistogramFamily(
+    "legalgram_chat_turn_duration_seconds",
+    "/api/chat latency by the conversation stage the turn ran in",
+    ("stage", "status"),
+    REQUEST_BUCKETS
+)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class MetricFamily(NamedTuple):
+    """One metric with its samples: (name suffix, labels, value)"""
+    name: str
+    kind: str
+    documentation: str
+    samples: List[Tuple[str, Labels, float]]
+
+
+# =========================================================
+# Middleware
+# =========================================================
+class MetricsMiddleware:
+    """Pure ASGI middleware timing every HTTP request"""
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message: Dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            code = str(status)
+            http_request_seconds.observe((scope["method"], route_template(scope), code), elapsed)
+            stage = scope.get("state", {}).get("chat_stage")
+            if stage is not None:
+                chat_turn_seconds.observe((stage, code), elapsed)
+
+
+# =========================================================
+# Collection
+# =========================================================
+def _histogram(family: HistogramFamily) -> MetricFamily:
+    samples: List[Tuple[str, Labels, float]] = []
+    bounds = [_format_value(bound) for bound in family.buckets] + ["+Inf"]
+    for values, histogram in family.children():
+        labels = tuple(zip(family.labelnames, values))
+        cumulative, total, count = histogram.snapshot()
+        for bound, bucket_count in zip(bounds, cumulative):
+            samples.append(("_bucket", labels + (("le", bound),), bucket_count))
+        samples.append(("_sum", labels, total))
+        samples.append(("_count", labels, count))
+    return MetricFamily(family.name, "histogram", family.documentation, samples)
+
+
+def _single(name: str, kind: str, documentation: str, value: float) -> MetricFamily:
+    return MetricFamily(name, kind, documentation, [("", (), value)])
+
+
+def _optional(name: str, kind: str, documentation: str, value: Optional[float]) -> MetricFamily:
+    """A single-sample family with no sample when the value is unknown"""
+    return MetricFamily(name, kind, documentation, [] if value is None else [("", (), value)])
+
+
+def _labelled(name: str, kind: str, documentation: str, label: str, values: Dict[str, float]) -> MetricFamily:
+    return MetricFamily(name, kind, documentation, [("", ((label, key),), value) for key, value in values.items()])
+
+
+def _cache_families(caches: Dict[str, Tuple[int, int, int]]) -> List[MetricFamily]:
+    requests: List[Tuple[str, Labels, float]] = []
+    ratios: List[Tuple[str, Labels, float]] = []
+    evictions: List[Tuple[str, Labels, float]] = []
+    for cache, (hits, misses, evicted) in caches.items():
+        requests.append(("", (("cache", cache), ("result", "hit")), hits))
+        requests.append(("", (("cache", cache), ("result", "miss")), misses))
+        ratios.append(("", (("cache", cache),), hits / (hits + misses) if hits + misses else 0.0))
+        evictions.append(("", (("cache", cache),), evicted))
+    return [
+        MetricFamily("legalgram_cache_requests_total", "counter", "Cache lookups by result", requests),
+        MetricFamily("legalgram_cache_hit_ratio", "gauge", "Lifetime hit ratio per cache", ratios),
+        MetricFamily("legalgram_cache_evictions_total", "counter", "Entries dropped to stay within size", evictions),
+    ]
+
+
+def _llm_families() -> List[MetricFamily]:
+    routes = route_metrics.snapshot()
+    per_route = {
+        field: {route: stats[field] for route, stats in routes.items()}
+        for field in ("calls", "fallbacks", "rate_limited", "errors")
+    }
+    tokens = [
+        ("", (("route", route), ("type", kind)), stats[f"{kind}_tokens"])
+        for route, stats in routes.items() for kind in ("prompt", "completion")
+    ]
+    return [
+        _histogram(route_metrics.latency),
+        _labelled("legalgram_llm_calls_total", "counter", "Completed LLM calls", "route", per_route["calls"]),
+        _labelled(
+            "legalgram_llm_fallbacks_total", "counter",
+            "Calls answered by a fallback model after a 429", "route", per_route["fallbacks"]
+        ),
+        _labelled(
+            "legalgram_llm_rate_limited_total", "counter",
+            "429 responses from the provider", "route", per_route["rate_limited"]
+        ),
+        _labelled("legalgram_llm_errors_total", "counter", "LLM calls that failed", "route", per_route["errors"]),
+        MetricFamily("legalgram_llm_tokens_total", "counter", "Tokens sent and received", tokens),
+    ]
+
+
+def collect(session_store: SessionStore) -> List[MetricFamily]:
+    """Every metric, with gauges and counters read from the services now"""
+    trackers = (http_requests, chat_requests, llm_turns, llm_calls)
+    store_stats = session_store.stats()
+    caches = {
+        "idempotency": (idempotency_cache.replays, idempotency_cache.misses, idempotency_cache.evictions),
+    }
+    if "cache_hits" in store_stats:
+        caches["session"] = (
+            store_stats["cache_hits"], store_stats["cache_misses"], store_stats["cache_evictions"]
+        )
+    evictions = {}
+    if "expired" in store_stats:
+        evictions["expired"] = store_stats["expired"]
+    if "evicted" in store_stats:
+        evictions["capacity"] = store_stats["evicted"]
+    lock_stats = session_locks.snapshot()
+
+    return [
+        _histogram(http_request_seconds),
+        _histogram(chat_turn_seconds),
+        *_llm_families(),
+        _optional("legalgram_sessions", "gauge", "Sessions in the session store", session_store.count()),
+        _labelled(
+            "legalgram_session_evictions_total", "counter",
+            "Sessions dropped by the session store", "reason", evictions
+        ),
+        *_cache_families(caches),
+        _labelled(
+            "legalgram_in_flight", "gauge", "Work currently in progress", "kind",
+            {tracker.name: tracker.current for tracker in trackers}
+        ),
+        _labelled(
+            "legalgram_in_flight_peak", "gauge", "Highest in-flight value since start", "kind",
+            {tracker.name: tracker.peak for tracker in trackers}
+        ),
+        _labelled(
+            "legalgram_started_total", "counter", "Work started since start", "kind",
+            {tracker.name: tracker.started for tracker in trackers}
+        ),
+        _single("legalgram_shed_total", "counter", "LLM turns refused by admission control", admission.shed_total),
+        _single("legalgram_rate_limited_total", "counter", "Requests refused with 429", rate_limiter.limited_total),
+        _single("legalgram_draining", "gauge", "1 while shutting down", int(shutdown.draining)),
+        _single(
+            "legalgram_session_lock_contended_total", "counter",
+            "Turns that waited for another turn on the same session", lock_stats["contended"]
+        ),
+        _single(
+            "legalgram_session_lock_wait_seconds_total", "counter",
+            "Time spent waiting for session locks", lock_stats["wait_ms_total"] / 1000
+        ),
+        _single("legalgram_turns_recorded_total", "counter", "Turns written by the turn recorder", turn_recorder.recorded),
+    ]
+
+
+# =========================================================
+# Exposition
+# =========================================================
+def _format_value(value: float) -> str:
+    if isinstance(value, int):
+        return str(value)
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_metrics(families: Iterable[MetricFamily]) -> str:
+    lines = []
+    for family in families:
+        lines.append(f"# HELP {family.name} {family.documentation}")
+        lines.append(f"# TYPE {family.name} {family.kind}")
+        for suffix, labels, value in family.samples:
+            if labels:
+                rendered = ",".join(f'{key}="{_escape(str(val))}"' for key, val in labels)
+                lines.append(f"{family.name}{suffix}{{{rendered}}} {_format_value(value)}")
+            else:
+                lines.append(f"{family.name}{suffix} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def render_metrics(session_store: SessionStore) -> str:
+    """The /metrics response body"""
+    return format_metrics(collect(session_store))
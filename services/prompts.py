@@ -0,0 +1,139 @@
+"""
+=========================================================
+LEGALGRAM 2.0 - PROMPT ASSEMBLY
+=========================================================
+Builds the chat messages for an LLM turn so SALES_MODE sees
+what the user already said, without overflowing the model
+context.
+
+Token accounting uses the local estimate (services/tokens):
+1. the reply gets its headroom first: the route's max_tokens
+   (services/routing), capped at LLM_MAX_OUTPUT_TOKENS
+2. system prompt, per-user context and current message are
+   always sent
+3. what is left, up to LLM_HISTORY_TOKENS, is packed with
+   recent turns newest-first (long assistant replies are
+   clipped so more turns fit), then the rolling summary of
+   older turns
+4. max_tokens is whatever still fits under the context
+   window, capped at that headroom
+
+Message order is most-stable-first (static system prompt,
+user context, earlier turns, current message) so provider
+prefix caches can reuse as much of each request as possible.
+=========================================================
+"""
+
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Sequence, Tuple
+
+from .config import env_int
+from .tokens import estimate_tokens, truncate_to_tokens
+
+if TYPE_CHECKING:
+    from .records import MessageRecord
+
+# llama3-8b-8192 context window
+LLM_CONTEXT_TOKENS = env_int("LLM_CONTEXT_TOKENS", 8192)
+LLM_MAX_OUTPUT_TOKENS = env_int("LLM_MAX_OUTPUT_TOKENS", 600)
+LLM_HISTORY_TOKENS = env_int("LLM_HISTORY_TOKENS", 1024)
+# Past assistant replies are long pitches; their opening carries the gist
+LLM_HISTORY_REPLY_TOKENS = env_int("LLM_HISTORY_REPLY_TOKENS", 160)
+
+# Chat-format framing per message (role markers, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+# Slack for estimate error against the real tokenizer
+SAFETY_MARGIN_TOKENS = 64
+# Below this, a clipped message or summary is not worth sending
+MIN_PARTIAL_TOKENS = 24
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+
+class ConversationHistory(NamedTuple):
+    """Prior context for a turn: recent messages (oldest first) and the rolling summary"""
+    messages: Sequence["MessageRecord"] = ()
+    summary: str = ""
+
+
+NO_HISTORY = ConversationHistory()
+
+
+def _message_tokens(content: str) -> int:
+    return estimate_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+
+
+# The system prompt is the same string object on every call (see
+# LegalAI.sales_system_prompt), so its size is counted once
+_SYSTEM_TOKENS_CACHE: Tuple[str, int] = ("", MESSAGE_OVERHEAD_TOKENS)
+
+
+def _system_tokens(system_prompt: str) -> int:
+    global _SYSTEM_TOKENS_CACHE
+    cached_prompt, tokens = _SYSTEM_TOKENS_CACHE
+    if system_prompt is not cached_prompt:
+        tokens = _message_tokens(system_prompt)
+        _SYSTEM_TOKENS_CACHE = (system_prompt, tokens)
+    return tokens
+
+
+def _tail_lines(text: str, max_tokens: int) -> str:
+    """Newest lines of `text` that fit in `max_tokens`"""
+    while text and estimate_tokens(text) > max_tokens:
+        _, _, text = text.partition("\n")
+    return text
+
+
+def pack_history(history: ConversationHistory, budget: int) -> List[Dict[str, str]]:
+    """Chat messages for `history` within `budget` tokens, oldest first"""
+    remaining = budget
+    packed: List[Dict[str, str]] = []
+    for message in reversed(history.messages):
+        content = message.content
+        if message.role == "assistant":
+            content = truncate_to_tokens(content, LLM_HISTORY_REPLY_TOKENS)
+        cost = _message_tokens(content)
+        if cost > remaining:
+            room = remaining - MESSAGE_OVERHEAD_TOKENS
+            if room >= MIN_PARTIAL_TOKENS:
+                content = truncate_to_tokens(content, room)
+                packed.append({"role": message.role, "content": content})
+                remaining -= _message_tokens(content)
+            break
+        packed.append({"role": message.role, "content": content})
+        remaining -= cost
+    packed.reverse()
+
+    if history.summary:
+        room = remaining - MESSAGE_OVERHEAD_TOKENS - estimate_tokens(SUMMARY_PREFIX)
+        if room >= MIN_PARTIAL_TOKENS:
+            summary = _tail_lines(history.summary, room)
+            if summary:
+                packed.insert(0, {"role": "system", "content": SUMMARY_PREFIX + summary})
+    return packed
+
+
+def build_chat_messages(
+    system_prompt: str,
+    user_message: str,
+    history: ConversationHistory = NO_HISTORY,
+    context: str = "",
+    history_budget: int = LLM_HISTORY_TOKENS,
+    context_tokens: int = LLM_CONTEXT_TOKENS,
+    max_output_tokens: int = LLM_MAX_OUTPUT_TOKENS
+) -> Tuple[List[Dict[str, str]], int]:
+    """Return (messages, max_tokens) for one completion"""
+    fixed = _system_tokens(system_prompt) + _message_tokens(user_message)
+    lead = [{"role": "system", "content": system_prompt}]
+    if context:
+        lead.append({"role": "system", "content": context})
+        fixed += _message_tokens(context)
+    available = context_tokens - SAFETY_MARGIN_TOKENS - fixed - max_output_tokens
+    prompt_tokens = fixed
+    if history.messages or history.summary:
+        packed = pack_history(history, min(history_budget, available))
+        prompt_tokens += sum(_message_tokens(m["content"]) for m in packed)
+        messages = [*lead, *packed, {"role": "user", "content": user_message}]
+    else:
+        messages = [*lead, {"role": "user", "content": user_message}]
+    max_tokens = max(1, min(max_output_tokens, context_tokens - SAFETY_MARGIN_TOKENS - prompt_tokens))
+    return messages, max_tokens
@@ -0,0 +1,151 @@
+"""
+=========================================================
+LEGALGRAM 2.0 - RATE LIMITING (GCRA)
+=========================================================
+In-memory rate limiting for /api/chat, keyed by client IP,
+session_id and (optionally) X-API-Key.
+
+Uses the Generic Cell Rate Algorithm: each key stores a single
+float (its theoretical arrival time), so a check is O(1) and
+the key table is a bounded LRU - an attacker rotating keys
+cannot grow memory past RATE_LIMIT_MAX_KEYS.
+
+Limits are configured separately for LLM-backed turns (the
+ones that spend Groq quota) and deterministic stages:
+- RATE_LIMIT_PER_MINUTE      deterministic turns (default 30)
+- RATE_LIMIT_LLM_PER_MINUTE  LLM turns (default 10)
+- RATE_LIMIT_PER_HOUR        LLM turns, hourly quota guard (default 200)
+0 disables a limit; all three at 0 turns the limiter off.
+=========================================================
+"""
+
+import math
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+from .config import env_int
+
+
+class RateDecision:
+    """Outcome of a limiter check"""
+
+    __slots__ = ("allowed", "limit", "remaining", "reset_after", "retry_after")
+
+    def __init__(self, allowed: bool, limit: int, remaining: int, reset_after: float, retry_after: float) -> None:
+        self.allowed = allowed
+        self.limit = limit
+        self.remaining = remaining
+        self.reset_after = reset_after
+        self.retry_after = retry_after
+
+    def headers(self) -> Dict[str, str]:
+        """Standard rate limit response headers"""
+        headers = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(self.remaining),
+            "X-RateLimit-Reset": str(math.ceil(self.reset_after)),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(self.retry_after)))
+        return headers
+
+
+class GCRALimiter:
+    """`limit` requests per `period` seconds per key, with bursts up to `burst`"""
+
+    def __init__(self, limit: int, period: float, burst: Optional[int] = None, max_keys: int = 100_000) -> None:
+        self.limit = limit
+        self.period = period
+        self.burst = burst or limit
+        self.max_keys = max_keys
+        self.emission_interval = period / limit
+        self.tolerance = self.emission_interval * self.burst
+        self._tat: "OrderedDict[str, float]" = OrderedDict()
+
+    def peek(self, key: str, now: float) -> RateDecision:
+        """Evaluate a request without consuming capacity"""
+        tat = max(self._tat.get(key, now), now)
+        new_tat = tat + self.emission_interval
+        allow_at = new_tat - self.tolerance
+        if now < allow_at:
+            return RateDecision(False, self.limit, 0, tat - now, allow_at - now)
+        remaining = int((now - allow_at) / self.emission_interval)
+        return RateDecision(True, self.limit, remaining, new_tat - now, 0.0)
+
+    def consume(self, key: str, now: float) -> None:
+        """Record an admitted request"""
+        tat = max(self._tat.get(key, now), now)
+        self._tat[key] = tat + self.emission_interval
+        self._tat.move_to_end(key)
+        if len(self._tat) > self.max_keys:
+            # Oldest-touched key goes first; an evicted key simply starts fresh
+            self._tat.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._tat)
+
+
+class RateLimiter:
+    """Applies every configured limit to every identity of a request"""
+
+    def __init__(
+        self,
+        per_minute: Optional[int] = None,
+        llm_per_minute: Optional[int] = None,
+        llm_per_hour: Optional[int] = None,
+        max_keys: Optional[int] = None
+    ) -> None:
+        per_minute = per_minute if per_minute is not None else env_int("RATE_LIMIT_PER_MINUTE", 30)
+        llm_per_minute = llm_per_minute if llm_per_minute is not None else env_int("RATE_LIMIT_LLM_PER_MINUTE", 10)
+        llm_per_hour = llm_per_hour if llm_per_hour is not None else env_int("RATE_LIMIT_PER_HOUR", 200)
+        max_keys = max_keys if max_keys is not None else env_int("RATE_LIMIT_MAX_KEYS", 100_000)
+
+        self.deterministic: List[GCRALimiter] = []
+        self.llm: List[GCRALimiter] = []
+        if per_minute > 0:
+            self.deterministic.append(GCRALimiter(per_minute, 60.0, max_keys=max_keys))
+        if llm_per_minute > 0:
+            self.llm.append(GCRALimiter(llm_per_minute, 60.0, max_keys=max_keys))
+        if llm_per_hour > 0:
+            self.llm.append(GCRALimiter(llm_per_hour, 3600.0, max_keys=max_keys))
+        self.limited_total = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.deterministic or self.llm)
+
+    def check(self, identities: Iterable[str], needs_llm: bool, now: Optional[float] = None) -> Optional[RateDecision]:
+        """Return the rejecting decision, or None if the request is admitted"""
+        limiters = self.llm if needs_llm else self.deterministic
+        if not limiters:
+            return None
+        now = time.monotonic() if now is None else now
+        keys = [key for key in identities if key]
+
+        # All limits must pass before any capacity is consumed
+        for limiter in limiters:
+            for key in keys:
+                decision = limiter.peek(key, now)
+                if not decision.allowed:
+                    self.limited_total += 1
+                    return decision
+        for limiter in limiters:
+            for key in keys:
+                limiter.consume(key, now)
+        return None
+
+
+def request_identities(client_ip: Optional[str], session_id: Optional[str], api_key: Optional[str]) -> List[str]:
+    """Namespaced rate limit keys for one request"""
+    identities = []
+    if client_ip:
+        identities.append(f"ip:{client_ip}")
+    if session_id:
+        identities.append(f"sid:{session_id}")
+    if api_key:
+        identities.append(f"key:{api_key}")
+    return identities
+
+
+rate_limiter = RateLimiter()
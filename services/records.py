@@ -0,0 +1,141 @@
+"""
+=========================================================
+LEGALGRAM 2.0 - SESSION RECORDS
+=========================================================
+Compact in-memory shape of conversation state.
+
+A session used to be a dict of dicts: every message carried
+its own key table plus an ISO-8601 string built with
+datetime.now().isoformat(). Records use __slots__ (no
+per-instance __dict__), interned role/stage strings (one
+shared object per distinct value) and float epoch timestamps
+(one small float instead of a 26-char string).
+
+Timestamps are formatted as ISO only at the API boundary
+(iso_timestamp). to_dict()/from_dict() give the plain form
+used by the snapshot, SQLite and Redis backends; from_dict()
+also accepts the older ISO-string timestamps.
+
+`messages` is a bounded ring buffer of recent turns; older
+turns live on in `summary` (see services/history.py).
+=========================================================
+"""
+
+import sys
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, Iterable, Optional, Union
+
+from .history import history_policy
+
+ROLE_USER = sys.intern("user")
+ROLE_ASSISTANT = sys.intern("assistant")
+
+
+def iso_timestamp(timestamp: float) -> str:
+    """Epoch seconds -> local ISO-8601 (same format datetime.now().isoformat() gave)"""
+    return datetime.fromtimestamp(timestamp).isoformat()
+
+
+def parse_timestamp(value: Union[float, int, str, None]) -> float:
+    """Epoch seconds from a stored value (number, numeric string or ISO-8601)"""
+    if value is None or value == "":
+        return 0.0
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+class MessageRecord:
+    """One chat message. Treated as immutable once stored"""
+
+    __slots__ = ("role", "content", "timestamp")
+
+    def __init__(self, role: str, content: str, timestamp: Optional[float] = None) -> None:
+        self.role = sys.intern(role)
+        self.content = content
+        self.timestamp = time.time() if timestamp is None else timestamp
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"role": self.role, "content": self.content, "timestamp": self.timestamp}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "MessageRecord":
+        return cls(data["role"], data["content"], parse_timestamp(data.get("timestamp")))
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, MessageRecord):
+            return NotImplemented
+        return (self.role, self.content, self.timestamp) == (other.role, other.content, other.timestamp)
+
+    def __repr__(self) -> str:
+        return f"MessageRecord({self.role!r}, {self.content[:30]!r}, {self.timestamp})"
+
+
+class SessionRecord:
+    """Conversation state for one session id.
+
+    Add messages with history_policy.append() (the stores do this in
+    save()) so the buffer stays bounded and overflow is summarized.
+    """
+
+    __slots__ = ("user_name", "stage", "messages", "created_at", "summary", "message_total")
+
+    def __init__(
+        self,
+        user_name: Optional[str] = None,
+        stage: str = "INIT",
+        messages: Iterable[MessageRecord] = (),
+        created_at: Optional[float] = None,
+        summary: str = "",
+        message_total: Optional[int] = None
+    ) -> None:
+        self.user_name = user_name
+        self.stage = sys.intern(stage)
+        self.messages: Deque[MessageRecord] = deque(messages, maxlen=history_policy.max_messages)
+        self.created_at = time.time() if created_at is None else created_at
+        self.summary = summary
+        self.message_total = len(self.messages) if message_total is None else message_total
+
+    def copy(self) -> "SessionRecord":
+        """Copy with its own message buffer (messages themselves are shared)"""
+        clone = SessionRecord(
+            self.user_name, self.stage, (), self.created_at, self.summary, self.message_total
+        )
+        clone.messages = deque(self.messages, maxlen=self.messages.maxlen)
+        return clone
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "user_name": self.user_name,
+            "stage": self.stage,
+            "messages": [m.to_dict() for m in self.messages],
+            "created_at": self.created_at,
+            "summary": self.summary,
+            "message_total": self.message_total
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SessionRecord":
+        session = cls(
+            data.get("user_name"),
+            data.get("stage") or "INIT",
+            (),
+            parse_timestamp(data.get("created_at")),
+            data.get("summary") or "",
+            0
+        )
+        # Older snapshots may hold more messages than the buffer: summarize the overflow
+        history_policy.append(session, (MessageRecord.from_dict(m) for m in data.get("messages", ())))
+        session.message_total = max(data.get("message_total") or 0, session.message_total)
+        return session
+
+    def __repr__(self) -> str:
+        return (
+            f"SessionRecord(user_name={self.user_name!r}, stage={self.stage!r}, "
+            f"messages={len(self.messages)}/{self.message_total})"
+        )
@@ -0,0 +1,53 @@
+"""
+=========================================================
+LEGALGRAM 2.0 - REQUEST CONTEXT
+=========================================================
+Ids of the request being served, in contextvars so they
+follow the request into run_in_threadpool:
+- trace id   (TracingMiddleware; X-Trace-Id)
+- request id (TracingMiddleware; root span id when traced)
+- session id (run_chat_turn)
+Read by the tracer and stamped on every log record.
+=========================================================
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Iterator, Optional, Tuple
+
+_trace_id: ContextVar[Optional[str]] = ContextVar("legalgram_trace_id", default=None)
+_request_id: ContextVar[Optional[str]] = ContextVar("legalgram_request_id", default=None)
+_session_id: ContextVar[Optional[str]] = ContextVar("legalgram_session_id", default=None)
+
+
+def current_trace_id() -> Optional[str]:
+    """Trace id of the request being served (sampled or not), if any"""
+    return _trace_id.get()
+
+
+def current_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+def current_session_id() -> Optional[str]:
+    return _session_id.get()
+
+
+def bind_request(trace_id: str, request_id: str) -> Tuple[Token, Token]:
+    """Set the request ids; pass the result to reset_request() when done"""
+    return _trace_id.set(trace_id), _request_id.set(request_id)
+
+
+def reset_request(tokens: Tuple[Token, Token]) -> None:
+    _trace_id.reset(tokens[0])
+    _request_id.reset(tokens[1])
+
+
+@contextmanager
+def session_scope(session_id: str) -> Iterator[None]:
+    """Attribute everything in the block to `session_id`"""
+    token = _session_id.set(session_id)
+    try:
+        yield
+    finally:
+        _session_id.reset(token)
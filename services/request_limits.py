@@ -0,0 +1,78 @@
+"""
+=========================================================
+LEGALGRAM 2.0 - REQUEST SIZE LIMITS
+=========================================================
+Rejects oversize request bodies at the ASGI layer, before
+FastAPI reads or JSON-parses them:
+- Content-Length over the cap -> 413 without reading the body
+- Chunked / lying bodies are counted as they stream in and
+  cut off with 413 as soon as they pass the cap
+
+MAX_BODY_BYTES sets the cap (default 32 KiB - a chat turn
+is a few hundred bytes).
+=========================================================
+"""
+
+import json
+from typing import Any, Dict
+
+from starlette.exceptions import HTTPException
+
+from .config import env_int
+
+MAX_BODY_BYTES = env_int("MAX_BODY_BYTES", 32 * 1024)
+
+
+class RequestSizeLimitMiddleware:
+    """Pure ASGI middleware enforcing a maximum request body size"""
+
+    def __init__(self, app: Any, max_body_bytes: int = MAX_BODY_BYTES) -> None:
+        self.app = app
+        self.max_body_bytes = max_body_bytes
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http" or self.max_body_bytes <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        for name, value in scope.get("headers", ()):
+            if name == b"content-length":
+                try:
+                    declared = int(value)
+                except ValueError:
+                    declared = 0
+                if declared > self.max_body_bytes:
+                    await self._reject(send)
+                    return
+                break
+
+        received = 0
+
+        async def limited_receive() -> Dict[str, Any]:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_bytes:
+                    # Raised from inside request.body(); FastAPI re-raises
+                    # HTTPExceptions and the exception middleware renders the 413
+                    raise HTTPException(status_code=413, detail=self._detail())
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+    def _detail(self) -> str:
+        return f"Request body exceeds {self.max_body_bytes} bytes"
+
+    async def _reject(self, send: Any) -> None:
+        body = json.dumps({"detail": self._detail()}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"connection", b"close"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
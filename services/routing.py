@@ -0,0 +1,217 @@
+"""
+=========================================================
+LEGALGRAM 2.0 - LLM ROUTING (QUERY CLASS -> MODEL POLICY)
+=========================================================
+Not every SALES_MODE question needs the same completion. A
+"which form do I need" question is answered in two lines; a
+"lease vs rental agreement" comparison or a "why do I need an
+operating agreement" explanation needs more room.
+
+1. classify_query() buckets the message locally (no LLM call):
+   - comparison    "A vs B", "difference between", "compare"
+   - explanation   why/how/explain questions and long messages
+   - short_answer  everything else (short, direct questions)
+2. The route's RoutePolicy picks model, max_tokens and
+   temperature. Defaults are in DEFAULT_ROUTE_POLICIES and can
+   be overridden per route with LLM_ROUTE_POLICY (JSON), e.g.
+   {"short_answer": {"max_tokens": 150}}. Every route defaults
+   to DEFAULT_MODEL; a larger model is an explicit opt-in, e.g.
+   {"comparison": {"model": "llama3-70b-8192"}}, since it costs
+   more per token. LLM_MAX_OUTPUT_TOKENS caps max_tokens on
+   every route.
+3. If the model answers 429, the next model in the route's
+   fallback chain (LLM_FALLBACK_MODELS) is tried.
+
+RouteMetrics keeps per-route calls, fallbacks, errors, latency
+and token totals for /api/status, and a latency histogram per
+route and model for /metrics.
+=========================================================
+"""
+
+import json
+import re
+import threading
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+from .config import env_str
+from .histogram import LLM_BUCKETS, HistogramFamily
+
+SHORT_ANSWER = "short_answer"
+COMPARISON = "comparison"
+EXPLANATION = "explanation"
+ROUTES = (SHORT_ANSWER, COMPARISON, EXPLANATION)
+
+# Messages longer than this (words) get the explanation budget
+SHORT_ANSWER_MAX_WORDS = 25
+
+_COMPARISON_PATTERN = re.compile(
+    r"\b(?:vs\.?|versus|compare[ds]?|comparing|comparison|differen(?:ce|t)|"
+    r"better|pros and cons|instead of|or should i)\b"
+)
+_EXPLANATION_PATTERN = re.compile(
+    r"\b(?:why|how (?:do|does|can|should|would|long|much)|explain|what happens|"
+    r"what if|walk me through|tell me (?:more )?about|in detail)\b"
+)
+
+
+def classify_query(message: str) -> str:
+    """Route name for a SALES_MODE message"""
+    text = message.lower()
+    if _COMPARISON_PATTERN.search(text):
+        return COMPARISON
+    if _EXPLANATION_PATTERN.search(text):
+        return EXPLANATION
+    if len(text.split()) > SHORT_ANSWER_MAX_WORDS:
+        return EXPLANATION
+    return SHORT_ANSWER
+
+
+class RoutePolicy(NamedTuple):
+    """Completion settings for one route; `fallbacks` are tried in order on 429"""
+    model: str
+    max_tokens: int
+    temperature: float
+    fallbacks: Tuple[str, ...] = ()
+
+    @property
+    def models(self) -> Tuple[str, ...]:
+        """Primary model followed by its fallbacks, without repeats"""
+        return tuple(dict.fromkeys((self.model, *self.fallbacks)))
+
+
+DEFAULT_MODEL = "llama3-8b-8192"
+
+# Rate limits are per model on Groq, so any other model is a valid fallback
+DEFAULT_FALLBACK_MODELS = ("gemma-7b-it", "mixtral-8x7b-32768")
+
+DEFAULT_ROUTE_POLICIES: Dict[str, RoutePolicy] = {
+    SHORT_ANSWER: RoutePolicy(DEFAULT_MODEL, 200, 0.3),
+    COMPARISON: RoutePolicy(DEFAULT_MODEL, 500, 0.4),
+    EXPLANATION: RoutePolicy(DEFAULT_MODEL, 600, 0.6),
+}
+
+
+def load_route_policies(
+    overrides: Optional[str] = None,
+    fallbacks: Optional[str] = None
+) -> Dict[str, RoutePolicy]:
+    """Default policy table with LLM_ROUTE_POLICY / LLM_FALLBACK_MODELS applied.
+
+    Unknown routes or fields and malformed JSON are ignored, like the
+    other env readers: a bad value never stops the worker from booting.
+    """
+    overrides = overrides if overrides is not None else env_str("LLM_ROUTE_POLICY", "")
+    fallbacks = fallbacks if fallbacks is not None else env_str("LLM_FALLBACK_MODELS")
+    chain = DEFAULT_FALLBACK_MODELS
+    if fallbacks is not None:
+        chain = tuple(model.strip() for model in fallbacks.split(",") if model.strip())
+
+    try:
+        table = json.loads(overrides) if overrides else {}
+    except ValueError:
+        table = {}
+    if not isinstance(table, dict):
+        table = {}
+
+    policies: Dict[str, RoutePolicy] = {}
+    for route, default in DEFAULT_ROUTE_POLICIES.items():
+        policy = default._replace(fallbacks=chain)
+        override = table.get(route)
+        if isinstance(override, dict):
+            try:
+                policy = policy._replace(
+                    model=str(override.get("model", policy.model)),
+                    max_tokens=max(1, int(override.get("max_tokens", policy.max_tokens))),
+                    temperature=float(override.get("temperature", policy.temperature)),
+                )
+            except (TypeError, ValueError):
+                pass
+            if "fallbacks" in override and isinstance(override["fallbacks"], list):
+                policy = policy._replace(fallbacks=tuple(str(m) for m in override["fallbacks"]))
+        policies[route] = policy
+    return policies
+
+
+def is_rate_limited(error: BaseException) -> bool:
+    """True for a provider 429 (groq.RateLimitError or any error carrying status 429)"""
+    return getattr(error, "status_code", None) == 429
+
+
+class RouteMetrics:
+    """Per-route completion counters. Completions run in the threadpool, so updates lock"""
+
+    _FIELDS = ("calls", "fallbacks", "rate_limited", "errors", "prompt_tokens", "completion_tokens")
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._routes: Dict[str, Dict[str, float]] = {}
+        self.latency = HistogramFamily(
+            "legalgram_llm_call_duration_seconds",
+            "Completed LLM calls by route and the model that answered",
+            ("route", "model"),
+            LLM_BUCKETS
+        )
+
+    def _route(self, route: str) -> Dict[str, float]:
+        stats = self._routes.get(route)
+        if stats is None:
+            stats = dict.fromkeys(self._FIELDS, 0)
+            stats["latency_total"] = 0.0
+            stats["latency_max"] = 0.0
+            stats["models"] = {}
+            self._routes[route] = stats
+        return stats
+
+    def record(
+        self,
+        route: str,
+        model: str,
+        latency: float,
+        prompt_tokens: int,
+        completion_tokens: int,
+        attempt: int
+    ) -> None:
+        """Count a completed call; `attempt` > 0 means a fallback model answered"""
+        with self._lock:
+            stats = self._route(route)
+            stats["calls"] += 1
+            if attempt:
+                stats["fallbacks"] += 1
+            stats["latency_total"] += latency
+            if latency > stats["latency_max"]:
+                stats["latency_max"] = latency
+            stats["prompt_tokens"] += prompt_tokens
+            stats["completion_tokens"] += completion_tokens
+            models = stats["models"]
+            models[model] = models.get(model, 0) + 1
+        self.latency.observe((route, model), latency)
+
+    def record_rate_limited(self, route: str) -> None:
+        with self._lock:
+            self._route(route)["rate_limited"] += 1
+
+    def record_error(self, route: str) -> None:
+        with self._lock:
+            self._route(route)["errors"] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            snapshot = {}
+            for route, stats in self._routes.items():
+                calls = stats["calls"]
+                snapshot[route] = {
+                    **{field: stats[field] for field in self._FIELDS},
+                    "latency_ms_avg": round(stats["latency_total"] / calls * 1000, 3) if calls else 0.0,
+                    "latency_ms_max": round(stats["latency_max"] * 1000, 3),
+                    "models": dict(stats["models"]),
+                }
+            return snapshot
+
+    def reset(self) -> None:
+        with self._lock:
+            self._routes.clear()
+        self.latency.reset()
+
+
+route_policies = load_route_policies()
+route_metrics = RouteMetrics()
@@ -0,0 +1,95 @@
+"""
+=========================================================
+LEGALGRAM 2.0 - PER-SESSION TURN LOCKS
+=========================================================
+Two concurrent /api/chat requests on the same session both
+read `session["stage"]`, both run the engine and both append
+history, so transitions get lost and messages interleave.
+
+Turns are serialized per session with lock striping: a fixed
+pool of asyncio locks, picked by hashing the session id.
+- same session -> same lock -> turns run one after another
+- different sessions usually hit different stripes and run
+  in parallel (a collision only costs a short wait)
+- memory is fixed, no per-session lock bookkeeping
+
+Lock wait time is tracked so contention shows up in
+/api/status, and as a session.lock_wait span in traces.
+=========================================================
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from .config import env_int
+from .tracing import tracer
+
+
+class SessionLockPool:
+    """Fixed pool of asyncio locks striped by session id"""
+
+    def __init__(self, stripes: Optional[int] = None) -> None:
+        # At least one stripe: zero would divide by zero on the first turn
+        self.stripes = max(1, stripes if stripes is not None else env_int("SESSION_LOCK_STRIPES", 1024))
+        self._locks: List[asyncio.Lock] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.acquired = 0
+        self.contended = 0
+        self.waiting = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def _pool(self) -> List[asyncio.Lock]:
+        # asyncio locks belong to one event loop; rebuild if the loop changes
+        # (each TestClient request, or a restarted server in the same process)
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._locks = [asyncio.Lock() for _ in range(self.stripes)]
+            self._loop = loop
+        return self._locks
+
+    def lock_for(self, session_id: str) -> asyncio.Lock:
+        """Stripe lock guarding `session_id`"""
+        locks = self._pool()
+        return locks[hash(session_id) % len(locks)]
+
+    @asynccontextmanager
+    async def hold(self, session_id: str) -> AsyncIterator[None]:
+        """Run the enclosed block exclusively for `session_id`"""
+        lock = self.lock_for(session_id)
+        if not lock.locked():
+            await lock.acquire()
+            self.acquired += 1
+        else:
+            self.contended += 1
+            self.waiting += 1
+            started = time.perf_counter()
+            try:
+                with tracer.span("session.lock_wait"):
+                    await lock.acquire()
+            finally:
+                self.waiting -= 1
+            waited = time.perf_counter() - started
+            self.acquired += 1
+            self.wait_seconds_total += waited
+            if waited > self.wait_seconds_max:
+                self.wait_seconds_max = waited
+        try:
+            yield
+        finally:
+            lock.release()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "stripes": self.stripes,
+            "acquired": self.acquired,
+            "contended": self.contended,
+            "waiting": self.waiting,
+            "wait_ms_total": round(self.wait_seconds_total * 1000, 3),
+            "wait_ms_max": round(self.wait_seconds_max * 1000, 3),
+        }
+
+
+session_locks = SessionLockPool()
@@ -0,0 +1,604 @@
+"""
+=========================================================
+LEGALGRAM 2.0 - SESSION STORE
+=========================================================
+Conversation state storage behind a small interface so the
+backend can be swapped (SESSION_STORE env var).
+
+- memory: per-process dict capped at SESSION_MAX_SESSIONS and
+          expiring after SESSION_EXPIRE_HOURS of inactivity;
+          optional JSON snapshot on shutdown (SESSION_SNAPSHOT_PATH)
+          that is reloaded on boot, owned by one worker at a time
+- sqlite: WAL-mode database file (SESSION_SQLITE_PATH) shared by
+          every worker on the host, with a read-through cache;
+          rows idle for SESSION_EXPIRE_HOURS are pruned
+- redis:  hash + capped message list per session (REDIS_URL),
+          shared by every worker and host, expiring after
+          SESSION_EXPIRE_HOURS of inactivity
+=========================================================
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Optional, Tuple
+
+from .config import env_float, env_int, env_str
+from .history import HistoryPolicy, history_policy
+from .records import MessageRecord, SessionRecord, parse_timestamp
+from .structured_logging import get_logger
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, single-process development runs
+    fcntl = None
+
+if TYPE_CHECKING:
+    import redis
+
+logger = get_logger("session_store")
+
+# Snapshot path -> open lock file held for the life of this process
+_snapshot_claims: Dict[str, Any] = {}
+_snapshot_claims_lock = threading.Lock()
+
+
+def claim_snapshot(path: str) -> bool:
+    """Take the snapshot at `path` for this process.
+
+    Each worker only holds its own sessions, so several workers writing
+    one snapshot would each overwrite the others' sessions. The first
+    worker to boot takes an flock on `<path>.lock`; the others run
+    without a snapshot. The OS releases the lock when the owner exits.
+    """
+    with _snapshot_claims_lock:
+        if path in _snapshot_claims:
+            return True
+        if fcntl is None:
+            _snapshot_claims[path] = None
+            return True
+        lock_file = open(f"{path}.lock", "a")
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        _snapshot_claims[path] = lock_file
+        return True
+
+
+def new_session() -> SessionRecord:
+    """Fresh conversation state"""
+    return SessionRecord()
+
+
+# =========================================================
+# Store Interface
+# =========================================================
+class SessionStore:
+    """Base class for session backends"""
+
+    # get/save wait on disk or network; async callers run them in a thread
+    blocking = True
+
+    def get(self, session_id: str) -> Optional[SessionRecord]:
+        """Return the session or None"""
+        raise NotImplementedError
+
+    def save(self, session_id: str, session: SessionRecord, new_messages: Iterable[MessageRecord] = ()) -> None:
+        """Persist the session, appending `new_messages` to its bounded history"""
+        raise NotImplementedError
+
+    def delete(self, session_id: str) -> None:
+        """Remove a session (no error if missing)"""
+        raise NotImplementedError
+
+    def count(self) -> Optional[int]:
+        """Number of stored sessions, or None when the backend cannot count them cheaply"""
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, int]:
+        """Backend counters for /metrics (evictions, cache hits); empty when there are none"""
+        return {}
+
+    def flush(self) -> None:
+        """Make all writes durable (called on shutdown)"""
+
+    def close(self) -> None:
+        """Release backend resources"""
+
+    def __contains__(self, session_id: str) -> bool:
+        return self.get(session_id) is not None
+
+    def __len__(self) -> int:
+        count = self.count()
+        if count is None:
+            raise TypeError(f"{type(self).__name__} does not count its sessions")
+        return count
+
+
+# =========================================================
+# In-Memory Backend
+# =========================================================
+class InMemorySessionStore(SessionStore):
+    """Per-process dict. Sessions are lost on restart unless a snapshot path is set.
+
+    Bounded so unique-session traffic cannot grow the worker forever:
+    sessions idle for SESSION_EXPIRE_HOURS are dropped, and past
+    SESSION_MAX_SESSIONS the least recently active one is evicted.
+    Entries are kept in activity order, so both checks only ever
+    look at the front of the dict.
+    """
+
+    # Dict operations under a short lock: cheaper inline than a thread hop
+    blocking = False
+
+    def __init__(
+        self,
+        snapshot_path: Optional[str] = None,
+        history: Optional[HistoryPolicy] = None,
+        max_sessions: Optional[int] = None,
+        ttl_seconds: Optional[float] = None
+    ) -> None:
+        self.history = history or history_policy
+        self.max_sessions = max_sessions if max_sessions is not None else env_int("SESSION_MAX_SESSIONS", 100_000)
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else env_float("SESSION_EXPIRE_HOURS", 24.0) * 3600
+        # session_id -> (last activity on the monotonic clock, session), least recent first
+        self._sessions: "OrderedDict[str, Tuple[float, SessionRecord]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.expired = 0
+        self.evicted = 0
+        self.snapshot_path = snapshot_path
+        if snapshot_path and not claim_snapshot(snapshot_path):
+            logger.warning(
+                "Session snapshot is owned by another worker; this worker's sessions will not be saved",
+                extra={"event": "session_store.snapshot_disabled", "path": snapshot_path}
+            )
+            self.snapshot_path = None
+        if self.snapshot_path:
+            self._load_snapshot()
+
+    def get(self, session_id: str) -> Optional[SessionRecord]:
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            if self.ttl_seconds > 0 and time.monotonic() - entry[0] > self.ttl_seconds:
+                del self._sessions[session_id]
+                self.expired += 1
+                return None
+            return entry[1]
+
+    def save(self, session_id: str, session: SessionRecord, new_messages: Iterable[MessageRecord] = ()) -> None:
+        self.history.append(session, new_messages)
+        now = time.monotonic()
+        with self._lock:
+            self._sessions[session_id] = (now, session)
+            self._sessions.move_to_end(session_id)
+            self._prune(now)
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def count(self) -> int:
+        with self._lock:
+            self._prune(time.monotonic())
+            return len(self._sessions)
+
+    def stats(self) -> Dict[str, int]:
+        return {"expired": self.expired, "evicted": self.evicted}
+
+    def _prune(self, now: float) -> None:
+        sessions = self._sessions
+        if self.ttl_seconds > 0:
+            deadline = now - self.ttl_seconds
+            while sessions:
+                last_active = next(iter(sessions.values()))[0]
+                if last_active > deadline:
+                    break
+                sessions.popitem(last=False)
+                self.expired += 1
+        if self.max_sessions > 0:
+            while len(sessions) > self.max_sessions:
+                sessions.popitem(last=False)
+                self.evicted += 1
+
+    def flush(self) -> None:
+        if self.snapshot_path:
+            self._write_snapshot()
+
+    def _write_snapshot(self) -> None:
+        # Write to a temp file and rename so a crash mid-write never
+        # leaves a truncated snapshot behind
+        tmp_path = f"{self.snapshot_path}.{os.getpid()}.tmp"
+        with self._lock:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(
+                    {sid: session.to_dict() for sid, (_, session) in self._sessions.items()},
+                    f, ensure_ascii=False
+                )
+            os.replace(tmp_path, self.snapshot_path)
+
+    def _load_snapshot(self) -> None:
+        if not os.path.exists(self.snapshot_path):
+            return
+        try:
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                raw = json.load(f)
+            now = time.monotonic()
+            self._sessions = OrderedDict(
+                (sid, (now, SessionRecord.from_dict(data))) for sid, data in raw.items()
+            )
+            self._prune(now)
+        except (OSError, ValueError, KeyError, AttributeError) as e:
+            logger.warning(
+                "Ignoring unreadable session snapshot",
+                extra={"event": "session_store.snapshot_unreadable", "path": self.snapshot_path, "error": str(e)}
+            )
+
+
+# =========================================================
+# SQLite Backend
+# =========================================================
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    user_name  TEXT,
+    stage      TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    version    INTEGER NOT NULL,
+    summary    TEXT NOT NULL DEFAULT '',
+    message_total INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS messages (
+    id         INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    role       TEXT NOT NULL,
+    content    TEXT NOT NULL,
+    timestamp  REAL
+);
+CREATE INDEX IF NOT EXISTS messages_by_session ON messages (session_id, id);
+"""
+
+# Fixed SQL text: sqlite3 keeps each compiled statement in its
+# per-connection cache, so every call after the first skips parsing
+_SQL_GET_SESSION = (
+    "SELECT user_name, stage, created_at, version, summary, message_total, updated_at "
+    "FROM sessions WHERE session_id = ?"
+)
+_SQL_GET_MESSAGES = "SELECT role, content, timestamp FROM messages WHERE session_id = ? ORDER BY id"
+_SQL_UPSERT_SESSION = (
+    "INSERT INTO sessions (session_id, user_name, stage, created_at, version, summary, message_total, updated_at) "
+    "VALUES (?, ?, ?, ?, 1, ?, ?, ?) "
+    "ON CONFLICT (session_id) DO UPDATE SET "
+    "user_name = excluded.user_name, stage = excluded.stage, summary = excluded.summary, "
+    "message_total = excluded.message_total, updated_at = excluded.updated_at, "
+    "version = sessions.version + 1 "
+    "RETURNING version"
+)
+_SQL_INSERT_MESSAGE = "INSERT INTO messages (session_id, role, content, timestamp) VALUES (?, ?, ?, ?)"
+# Drop rows that fell out of the session's ring buffer
+_SQL_TRIM_MESSAGES = (
+    "DELETE FROM messages WHERE session_id = ? AND id NOT IN "
+    "(SELECT id FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT ?)"
+)
+_SQL_DELETE_SESSION = "DELETE FROM sessions WHERE session_id = ?"
+_SQL_DELETE_MESSAGES = "DELETE FROM messages WHERE session_id = ?"
+_SQL_GET_UPDATED_AT = "SELECT updated_at FROM sessions WHERE session_id = ?"
+_SQL_COUNT = "SELECT COUNT(*) FROM sessions WHERE updated_at > ?"
+# Expired sessions, oldest first, a batch at a time so the write lock is held briefly
+_SQL_EXPIRED_BATCH = "SELECT session_id FROM sessions WHERE updated_at <= ? ORDER BY updated_at LIMIT ?"
+
+
+class SqliteSessionStore(SessionStore):
+    """Sessions in a WAL-mode SQLite file, shared by all workers on one host.
+
+    - WAL lets readers in every worker proceed while one writer commits
+    - each save bumps a per-session `version`; cached sessions are served
+      only while the version still matches, so another worker's write is
+      picked up on the next read with a single primary-key lookup
+    - every save and delete commits at once: a write transaction left open
+      between requests would hold the database lock against every other
+      worker
+    - sessions idle for SESSION_EXPIRE_HOURS (by `updated_at`) read as
+      missing; saves delete them in batches of `prune_batch`, at most every
+      `prune_interval` seconds unless the last batch came back full
+    """
+
+    def __init__(
+        self,
+        path: str,
+        cache_size: Optional[int] = None,
+        history: Optional[HistoryPolicy] = None,
+        ttl_seconds: Optional[float] = None,
+        prune_interval: Optional[float] = None,
+        prune_batch: int = 500
+    ) -> None:
+        self.path = path
+        self.history = history or history_policy
+        self.cache_size = cache_size if cache_size is not None else env_int("SESSION_CACHE_SIZE", 10_000)
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else env_float("SESSION_EXPIRE_HOURS", 24.0) * 3600
+        self.prune_interval = prune_interval if prune_interval is not None else min(60.0, self.ttl_seconds / 4)
+        self.prune_batch = prune_batch
+        self._cache: "OrderedDict[str, Tuple[int, SessionRecord]]" = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_evictions = 0
+        self.expired = 0
+        self._next_prune = 0.0
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        with self._lock:
+            self._connection()
+
+    def _connection(self) -> sqlite3.Connection:
+        # Opened lazily so the store can be used again after close()
+        # (the app lifespan may run more than once in one process)
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, cached_statements=64)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            conn.executescript(_SQLITE_SCHEMA)
+            self._migrate(conn)
+            self._conn = conn
+        return self._conn
+
+    def get(self, session_id: str) -> Optional[SessionRecord]:
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(_SQL_GET_SESSION, (session_id,)).fetchone()
+            if row is None:
+                self._cache.pop(session_id, None)
+                return None
+            user_name, stage, created_at, version, summary, message_total, updated_at = row
+            if self._is_expired(updated_at, time.time()):
+                self._cache.pop(session_id, None)
+                return None
+            created_at = parse_timestamp(created_at)
+            cached = self._cache.get(session_id)
+            # created_at guards against another worker deleting and
+            # recreating the id, which restarts its version at 1
+            if cached is not None and cached[0] == version and cached[1].created_at == created_at:
+                self._cache.move_to_end(session_id)
+                self.cache_hits += 1
+                session = cached[1]
+            else:
+                self.cache_misses += 1
+                session = SessionRecord(user_name, stage, [
+                    MessageRecord(role, content, parse_timestamp(timestamp))
+                    for role, content, timestamp in conn.execute(_SQL_GET_MESSAGES, (session_id,))
+                ], created_at, summary, message_total)
+                self._remember(session_id, version, session)
+        # Callers mutate what they get; keep the cached copy pristine
+        return session.copy()
+
+    def save(self, session_id: str, session: SessionRecord, new_messages: Iterable[MessageRecord] = ()) -> None:
+        new_messages = list(new_messages)
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            if self.ttl_seconds > 0 and self._is_expired(self._updated_at(conn, session_id), now):
+                # Saving over an expired row: drop its history first, like a new session
+                conn.execute(_SQL_DELETE_MESSAGES, (session_id,))
+            self.history.append(session, new_messages)
+            (version,) = conn.execute(_SQL_UPSERT_SESSION, (
+                session_id, session.user_name, session.stage, session.created_at,
+                session.summary, session.message_total, now
+            )).fetchone()
+            if new_messages:
+                conn.executemany(_SQL_INSERT_MESSAGE, [
+                    (session_id, m.role, m.content, m.timestamp) for m in new_messages
+                ])
+                if session.message_total > len(session.messages):
+                    conn.execute(_SQL_TRIM_MESSAGES, (session_id, session_id, len(session.messages)))
+            conn.commit()
+            self._remember(session_id, version, session.copy())
+            if now >= self._next_prune:
+                self._prune(conn, now)
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            conn = self._connection()
+            conn.execute(_SQL_DELETE_MESSAGES, (session_id,))
+            conn.execute(_SQL_DELETE_SESSION, (session_id,))
+            conn.commit()
+            self._cache.pop(session_id, None)
+
+    def count(self) -> int:
+        cutoff = time.time() - self.ttl_seconds if self.ttl_seconds > 0 else float("-inf")
+        with self._lock:
+            return self._connection().execute(_SQL_COUNT, (cutoff,)).fetchone()[0]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "cache_evictions": self.cache_evictions,
+            "expired": self.expired,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            self._cache.clear()
+
+    def prune(self) -> int:
+        """Delete one batch of expired sessions now; returns how many"""
+        with self._lock:
+            return self._prune(self._connection(), time.time())
+
+    def _prune(self, conn: sqlite3.Connection, now: float) -> int:
+        if self.ttl_seconds <= 0:
+            self._next_prune = float("inf")
+            return 0
+        expired = [(row[0],) for row in conn.execute(
+            _SQL_EXPIRED_BATCH, (now - self.ttl_seconds, self.prune_batch)
+        )]
+        if expired:
+            conn.executemany(_SQL_DELETE_MESSAGES, expired)
+            conn.executemany(_SQL_DELETE_SESSION, expired)
+            conn.commit()
+            for (session_id,) in expired:
+                self._cache.pop(session_id, None)
+            self.expired += len(expired)
+        # A full batch means more are waiting: prune again on the next save
+        self._next_prune = now if len(expired) >= self.prune_batch else now + self.prune_interval
+        return len(expired)
+
+    def _is_expired(self, updated_at: Optional[float], now: float) -> bool:
+        return updated_at is not None and self.ttl_seconds > 0 and now - updated_at > self.ttl_seconds
+
+    @staticmethod
+    def _updated_at(conn: sqlite3.Connection, session_id: str) -> Optional[float]:
+        row = conn.execute(_SQL_GET_UPDATED_AT, (session_id,)).fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def _migrate(conn: sqlite3.Connection) -> None:
+        # Databases created before history summaries and expiry lack these columns
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(sessions)")}
+        if "summary" not in columns:
+            conn.execute("ALTER TABLE sessions ADD COLUMN summary TEXT NOT NULL DEFAULT ''")
+        if "message_total" not in columns:
+            conn.execute("ALTER TABLE sessions ADD COLUMN message_total INTEGER NOT NULL DEFAULT 0")
+        if "updated_at" not in columns:
+            conn.execute("ALTER TABLE sessions ADD COLUMN updated_at REAL NOT NULL DEFAULT 0")
+            # Existing sessions get a full TTL from the upgrade
+            conn.execute("UPDATE sessions SET updated_at = ?", (time.time(),))
+        conn.execute("CREATE INDEX IF NOT EXISTS sessions_by_updated_at ON sessions (updated_at)")
+        conn.commit()
+
+    def _remember(self, session_id: str, version: int, session: SessionRecord) -> None:
+        if self.cache_size <= 0:
+            return
+        self._cache[session_id] = (version, session)
+        self._cache.move_to_end(session_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+            self.cache_evictions += 1
+
+
+# =========================================================
+# Redis Backend
+# =========================================================
+class RedisSessionStore(SessionStore):
+    """Sessions in Redis, shared by every worker and host.
+
+    Layout per session (all keys expire together):
+    - `<prefix><id>`           hash: user_name, stage, created_at, summary, message_total
+    - `<prefix><id>:messages`  list of JSON messages, LTRIM'd to the session's ring buffer
+
+    One sorted set per prefix, `<prefix minus trailing ':'>-index`, scores
+    each session id by its expiry time so count() needs no keyspace SCAN.
+    It sits outside `<prefix>*`, so no client-chosen session id can land on it.
+
+    Each get/save/delete is one pipelined round trip, and every save
+    pushes the expiry forward so idle conversations age out server-side.
+    """
+
+    def __init__(
+        self,
+        client: "redis.Redis",
+        prefix: str = "legalgram:session:",
+        ttl_seconds: Optional[int] = None,
+        history: Optional[HistoryPolicy] = None
+    ) -> None:
+        self.client = client
+        self.prefix = prefix
+        self.index_key = f"{prefix.rstrip(':')}-index"
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else int(
+            env_float("SESSION_EXPIRE_HOURS", 24.0) * 3600
+        )
+        self.history = history or history_policy
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs: Any) -> "RedisSessionStore":
+        """Connect through a pooled client (`redis` is only imported here)"""
+        import redis
+
+        client = redis.Redis.from_url(
+            url,
+            max_connections=env_int("REDIS_MAX_CONNECTIONS", 32),
+            decode_responses=True
+        )
+        return cls(client, **kwargs)
+
+    def _keys(self, session_id: str) -> Tuple[str, str]:
+        key = f"{self.prefix}{session_id}"
+        return key, f"{key}:messages"
+
+    def get(self, session_id: str) -> Optional[SessionRecord]:
+        key, messages_key = self._keys(session_id)
+        with self.client.pipeline(transaction=False) as pipe:
+            fields, raw_messages = pipe.hgetall(key).lrange(messages_key, 0, -1).execute()
+        if not fields:
+            return None
+        return SessionRecord(
+            fields.get("user_name") or None,
+            fields.get("stage") or "INIT",
+            [MessageRecord.from_dict(json.loads(m)) for m in raw_messages],
+            parse_timestamp(fields.get("created_at")),
+            fields.get("summary", ""),
+            int(fields.get("message_total") or len(raw_messages))
+        )
+
+    def save(self, session_id: str, session: SessionRecord, new_messages: Iterable[MessageRecord] = ()) -> None:
+        new_messages = list(new_messages)
+        self.history.append(session, new_messages)
+        key, messages_key = self._keys(session_id)
+        now = time.time()
+        with self.client.pipeline(transaction=True) as pipe:
+            pipe.hset(key, mapping={
+                "user_name": session.user_name or "",
+                "stage": session.stage,
+                "created_at": repr(session.created_at),
+                "summary": session.summary,
+                "message_total": session.message_total
+            })
+            pipe.expire(key, self.ttl_seconds)
+            if new_messages:
+                pipe.rpush(messages_key, *(json.dumps(m.to_dict(), ensure_ascii=False) for m in new_messages))
+                pipe.ltrim(messages_key, -len(session.messages), -1)
+            pipe.expire(messages_key, self.ttl_seconds)
+            pipe.zadd(self.index_key, {session_id: now + self.ttl_seconds})
+            # Entries whose keys Redis has expired; keeps the index as small as the live set
+            pipe.zremrangebyscore(self.index_key, "-inf", now)
+            pipe.execute()
+
+    def delete(self, session_id: str) -> None:
+        with self.client.pipeline(transaction=True) as pipe:
+            pipe.delete(*self._keys(session_id))
+            pipe.zrem(self.index_key, session_id)
+            pipe.execute()
+
+    def count(self) -> int:
+        with self.client.pipeline(transaction=False) as pipe:
+            _, total = pipe.zremrangebyscore(self.index_key, "-inf", time.time()).zcard(self.index_key).execute()
+        return total
+
+    def close(self) -> None:
+        # Disconnects the pool; it reconnects on next use, so a later lifespan still works
+        self.client.close()
+
+
+# =========================================================
+# Factory
+# =========================================================
+def create_session_store() -> SessionStore:
+    """Build the backend selected by SESSION_STORE"""
+    backend = (env_str("SESSION_STORE", "memory") or "memory").lower()
+    if backend == "memory":
+        return InMemorySessionStore(snapshot_path=env_str("SESSION_SNAPSHOT_PATH"))
+    if backend == "sqlite":
+        return SqliteSessionStore(env_str("SESSION_SQLITE_PATH", "sessions.db"))
+    if backend == "redis":
+        return RedisSessionStore.from_url(env_str("REDIS_URL", "redis://localhost:6379/0"))
+    raise ValueError(f"Unknown SESSION_STORE backend: {backend}")
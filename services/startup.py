@@ -0,0 +1,63 @@
+"""
+=========================================================
+LEGALGRAM 2.0 - STARTUP PROFILER
+=========================================================
+Records how long each boot phase takes (module imports,
+app construction, catalog index build, deferred imports)
+so cold starts on Railway scale-ups can be held to a budget.
+
+Import this module before anything heavy - its import time
+is the zero point of the report.
+=========================================================
+"""
+
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator
+
+from .config import env_float
+
+
+class StartupProfile:
+    """Ordered record of boot phase durations (milliseconds)"""
+
+    def __init__(self) -> None:
+        self._origin = time.perf_counter()
+        self._last_mark = self._origin
+        self.phases: Dict[str, float] = {}
+
+    def mark(self, name: str) -> float:
+        """Record the time elapsed since the previous mark under `name`"""
+        now = time.perf_counter()
+        elapsed_ms = (now - self._last_mark) * 1000
+        self.phases[name] = round(elapsed_ms, 3)
+        self._last_mark = now
+        return elapsed_ms
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time a block that does not run in module order (e.g. startup hooks)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = round((time.perf_counter() - start) * 1000, 3)
+
+    def total_ms(self) -> float:
+        """Sum of all recorded phases"""
+        return round(sum(self.phases.values()), 3)
+
+    def report(self) -> Dict[str, Any]:
+        """Serializable startup report"""
+        budget_ms = env_float("STARTUP_BUDGET_MS", 0.0)
+        total = self.total_ms()
+        return {
+            "phases_ms": dict(self.phases),
+            "total_ms": total,
+            "budget_ms": budget_ms or None,
+            "within_budget": total <= budget_ms if budget_ms else None,
+        }
+
+
+# Process-wide profile
+startup_profile = StartupProfile()
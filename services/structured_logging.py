@@ -0,0 +1,189 @@
+"""
+=========================================================
+LEGALGRAM 2.0 - STRUCTURED LOGGING
+=========================================================
+JSON lines on stdout, written by a background thread.
+
+- Loggers live under `legalgram.*` (get_logger("engine")).
+  Pass fields with `extra=`; they become JSON keys next to
+  ts, level, logger and msg.
+- Every record is stamped with the trace, request and session
+  ids of the request that logged it (services/request_context).
+- Emitting never blocks: the handler renders the message,
+  attaches the ids and put_nowait()s the record on a bounded
+  queue (LOG_QUEUE_SIZE). JSON encoding, tracebacks and the
+  stdout write happen on the listener thread. When the queue
+  is full the record is dropped and counted.
+- High-volume events are guarded by sample_event(): a share of
+  LOG_SAMPLE_RATE requests keep them, decided per request id
+  (server-generated, unlike the trace id a caller may send) so
+  a kept request keeps all its events. Sampled records carry
+  `sample_rate` for reweighting. Warnings and errors are never
+  sampled.
+
+LOG_LEVEL is shared with uvicorn (server.py).
+=========================================================
+"""
+
+import json
+import logging
+import queue
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import IO, Any, Dict, Optional
+
+from .config import env_float, env_int, env_str
+from .request_context import current_request_id, current_session_id, current_trace_id
+
+ROOT_LOGGER = "legalgram"
+
+# Attributes every LogRecord has; anything else came in through `extra=`
+_RECORD_FIELDS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger for one part of the backend, e.g. get_logger("engine")"""
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_FIELDS and value is not None:
+                data[key] = value
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str, ensure_ascii=False, separators=(",", ":"))
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler that never waits: full queue -> record dropped and counted"""
+
+    def __init__(self, log_queue: "queue.Queue[logging.LogRecord]") -> None:
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Runs in the caller: render the message before its args can change and
+        # take the ids from this request's context; the listener does the rest
+        record.msg = record.getMessage()
+        record.args = None
+        if getattr(record, "trace_id", None) is None:
+            record.trace_id = current_trace_id()
+        if getattr(record, "request_id", None) is None:
+            record.request_id = current_request_id()
+        if getattr(record, "session_id", None) is None:
+            record.session_id = current_session_id()
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+
+class _DrainingListener(QueueListener):
+    """Waits for room for the stop sentinel instead of failing on a full queue"""
+
+    def enqueue_sentinel(self) -> None:
+        self.queue.put(self._sentinel)
+
+
+def _level(name: Optional[str]) -> int:
+    level = logging.getLevelName((name or "info").upper())
+    return level if isinstance(level, int) else logging.INFO
+
+
+class LogPipeline:
+    """The `legalgram` logger's queue, handler and listener thread"""
+
+    def __init__(
+        self,
+        stream: Optional[IO[str]] = None,
+        level: Optional[str] = None,
+        queue_size: Optional[int] = None,
+        sample_rate: Optional[float] = None
+    ) -> None:
+        self.level = _level(level or env_str("LOG_LEVEL"))
+        rate = sample_rate if sample_rate is not None else env_float("LOG_SAMPLE_RATE", 0.1)
+        self.sample_rate = min(1.0, max(0.0, rate))
+        size = queue_size if queue_size is not None else env_int("LOG_QUEUE_SIZE", 10000)
+        self.queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=max(1, size))
+        self.handler = NonBlockingQueueHandler(self.queue)
+        self._stream = stream
+        self._listener: Optional[QueueListener] = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._listener is not None
+
+    def start(self) -> None:
+        """Attach the handler and start the writer thread (no-op if running)"""
+        with self._lock:
+            if self._listener is not None:
+                return
+            logger = logging.getLogger(ROOT_LOGGER)
+            logger.addHandler(self.handler)
+            logger.setLevel(self.level)
+            logger.propagate = False
+            output = logging.StreamHandler(self._stream or sys.stdout)
+            output.setFormatter(JsonFormatter())
+            self._listener = _DrainingListener(self.queue, output)
+            self._listener.start()
+
+    def stop(self) -> None:
+        """Write out everything queued, then detach the handler and stop the thread.
+
+        Nothing queues up with no writer running; until the next start()
+        warnings and errors go to logging's stderr fallback.
+        """
+        with self._lock:
+            if self._listener is None:
+                return
+            logging.getLogger(ROOT_LOGGER).removeHandler(self.handler)
+            self._listener.stop()
+            self._listener = None
+
+    def sample_event(self) -> bool:
+        """Whether the current request logs its high-volume events"""
+        if self.sample_rate >= 1.0:
+            return True
+        if self.sample_rate <= 0.0:
+            return False
+        request_id = current_request_id()
+        if request_id:
+            return int(request_id[:8], 16) < self.sample_rate * 0x100000000
+        return random.random() < self.sample_rate
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "level": logging.getLevelName(self.level),
+            "sample_rate": self.sample_rate,
+            "running": self.running,
+            "queued": self.queue.qsize(),
+            "dropped": self.handler.dropped,
+        }
+
+
+# Process-wide pipeline configured from the environment; main.py starts it
+log_pipeline = LogPipeline()
+
+
+def sample_event() -> bool:
+    """Guard for high-volume events: `if sample_event(): logger.info(...)`"""
+    return log_pipeline.sample_event()
@@ -0,0 +1,37 @@
+"""
+=========================================================
+LEGALGRAM 2.0 - TOKEN ESTIMATION
+=========================================================
+Fast local approximation of LLM token counts - no tokenizer
+download, a couple of C-level passes over the string.
+
+Heuristic: ~4 ASCII characters per token, ~1 token per
+non-ASCII character (CJK, emoji, accented text tokenize far
+less efficiently). Errs slightly high, which is the safe side
+for budget checks.
+=========================================================
+"""
+
+import math
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count for `text`"""
+    if not text:
+        return 0
+    ascii_chars = len(text.encode("ascii", "ignore"))
+    other_chars = len(text) - ascii_chars
+    return math.ceil(ascii_chars / 4) + other_chars
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut `text` so its estimated size fits in `max_tokens`"""
+    if max_tokens <= 0:
+        return ""
+    estimate = estimate_tokens(text)
+    if estimate <= max_tokens:
+        return text
+    cut = int(len(text) * max_tokens / estimate)
+    while cut > 0 and estimate_tokens(text[:cut]) > max_tokens:
+        cut = int(cut * 0.9)
+    return text[:cut]
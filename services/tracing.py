@@ -0,0 +1,456 @@
+"""
+=========================================================
+LEGALGRAM 2.0 - REQUEST TRACING
+=========================================================
+Spans around the phases of a request, so a slow chat turn
+shows where its time went: session load, lock wait, triage,
+catalog match, prompt build, each LLM attempt, session save.
+
+- TracingMiddleware opens the root span per request and
+  returns the trace id in X-Trace-Id. An incoming X-Trace-Id
+  or W3C `traceparent` is continued instead of replaced.
+- tracer.span("name", key=value) times the enclosed block as
+  a child of the current span. The current span travels in a
+  contextvar, which run_in_threadpool copies into the worker
+  thread, so engine spans nest under the request.
+- Outside a sampled trace span() returns a shared no-op
+  object: a contextvar read, nothing allocated.
+- Finished traces go to every configured sink (TRACE_SINK):
+    memory  ring buffer of the last TRACE_BUFFER_SIZE traces,
+            served by /api/admin/traces
+    otlp    OTLP/JSON lines appended to TRACE_OTLP_PATH (the
+            OpenTelemetry collector file exporter format)
+  TRACE_SAMPLE is the share of requests traced. The trace id
+  is assigned and returned either way.
+=========================================================
+"""
+
+import json
+import random
+import re
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import IO, Any, Deque, Dict, List, Optional, Sequence, Tuple
+
+from .config import env_float, env_int, env_str
+from .request_context import bind_request, reset_request
+from .structured_logging import get_logger
+
+logger = get_logger("tracing")
+
+TRACE_ID_HEADER = "x-trace-id"
+
+# Probes and scrapes would push chat traces out of the ring buffer
+UNTRACED_PATHS = frozenset({"/", "/healthz", "/readyz", "/metrics", "/api/health"})
+UNTRACED_PREFIXES = ("/api/admin/",)
+
+_TRACE_ID = re.compile(r"^[0-9a-f]{32}$")
+_TRACEPARENT = re.compile(r"^[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+
+def new_trace_id() -> str:
+    return f"{random.getrandbits(128):032x}"
+
+
+def new_span_id() -> str:
+    return f"{random.getrandbits(64):016x}"
+
+
+def incoming_context(trace_header: Optional[str], traceparent: Optional[str]) -> Tuple[str, Optional[str]]:
+    """(trace id, remote parent span id) from request headers, or a fresh trace id"""
+    if traceparent:
+        match = _TRACEPARENT.match(traceparent.strip().lower())
+        if match and match.group(1) != "0" * 32:
+            return match.group(1), match.group(2)
+    if trace_header:
+        trace_id = trace_header.strip().lower()
+        if _TRACE_ID.match(trace_id) and trace_id != "0" * 32:
+            return trace_id, None
+    return new_trace_id(), None
+
+
+# =========================================================
+# Spans
+# =========================================================
+class Span:
+    """One timed phase; also the context manager that times it"""
+
+    __slots__ = (
+        "trace", "name", "span_id", "parent_id", "start_ns", "end_ns",
+        "attributes", "error", "_started", "_token"
+    )
+
+    def __init__(
+        self,
+        trace: "Trace",
+        name: str,
+        parent_id: Optional[str],
+        attributes: Dict[str, Any],
+        span_id: Optional[str] = None
+    ) -> None:
+        self.trace = trace
+        self.name = name
+        self.span_id = span_id or new_span_id()
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.error: Optional[str] = None
+        self.start_ns = 0
+        self.end_ns = 0
+
+    def set(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def __enter__(self) -> "Span":
+        self.trace.spans.append(self)
+        self._token = _current_span.set(self)
+        self.start_ns = time.time_ns()
+        self._started = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        self.end_ns = self.start_ns + time.perf_counter_ns() - self._started
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            self.error = exc_type.__name__
+            status_code = getattr(exc, "status_code", None)
+            if status_code is not None:
+                self.attributes["status_code"] = status_code
+        if self.trace.spans[0] is self:
+            self.trace.tracer.export(self.trace)
+
+    def to_dict(self, origin_ns: int) -> Dict[str, Any]:
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "offset_ms": round((self.start_ns - origin_ns) / 1e6, 3),
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class _NoopSpan:
+    """Stands in for a span when the request is not traced"""
+
+    __slots__ = ()
+
+    def set(self, key: str, value: Any) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    """Spans of one request in start order; the first is the root"""
+
+    __slots__ = ("tracer", "trace_id", "spans")
+
+    def __init__(self, tracer: "Tracer", trace_id: str) -> None:
+        self.tracer = tracer
+        self.trace_id = trace_id
+        self.spans: List[Span] = []
+
+    @property
+    def root(self) -> Span:
+        return self.spans[0]
+
+    def summary(self) -> Dict[str, Any]:
+        root = self.root
+        return {
+            "trace_id": self.trace_id,
+            "name": root.name,
+            "start": round(root.start_ns / 1e9, 3),
+            "duration_ms": round(root.duration_ms, 3),
+            "status_code": root.attributes.get("http.status_code"),
+            "spans": len(self.spans),
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        origin = self.root.start_ns
+        return {**self.summary(), "spans": [span.to_dict(origin) for span in self.spans]}
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("legalgram_span", default=None)
+
+
+# =========================================================
+# Sinks
+# =========================================================
+class SpanSink:
+    """Receives each finished trace; export() runs on the request path"""
+
+    name = "sink"
+
+    def export(self, trace: Trace) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class RingBufferSink(SpanSink):
+    """Last `size` traces in memory, newest last"""
+
+    name = "memory"
+
+    def __init__(self, size: int = 200) -> None:
+        self._traces: Deque[Trace] = deque(maxlen=max(1, size))
+        self._lock = threading.Lock()
+
+    def export(self, trace: Trace) -> None:
+        with self._lock:
+            self._traces.append(trace)
+
+    def recent(self, limit: int = 50, min_ms: float = 0.0) -> List[Trace]:
+        """Newest first, skipping traces faster than `min_ms`"""
+        with self._lock:
+            traces = list(self._traces)
+        slow = [trace for trace in reversed(traces) if trace.root.duration_ms >= min_ms]
+        return slow[:max(0, limit)]
+
+    def get(self, trace_id: str) -> Optional[Trace]:
+        with self._lock:
+            for trace in self._traces:
+                if trace.trace_id == trace_id:
+                    return trace
+        return None
+
+    def __len__(self) -> int:
+        return len(self._traces)
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items()]
+
+
+def otlp_json(trace: Trace, service_name: str = "legalgram-backend") -> Dict[str, Any]:
+    """One trace as an OTLP/JSON ExportTraceServiceRequest"""
+    spans = []
+    for span in trace.spans:
+        otlp_span: Dict[str, Any] = {
+            "traceId": trace.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": 2 if span is trace.root else 1,  # SERVER / INTERNAL
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns),
+            "attributes": _otlp_attributes(span.attributes),
+            "status": {"code": 2, "message": span.error} if span.error else {},
+        }
+        if span.parent_id:
+            otlp_span["parentSpanId"] = span.parent_id
+        spans.append(otlp_span)
+    return {"resourceSpans": [{
+        "resource": {"attributes": _otlp_attributes({"service.name": service_name})},
+        "scopeSpans": [{"scope": {"name": "legalgram.tracing"}, "spans": spans}],
+    }]}
+
+
+class OtlpFileSink(SpanSink):
+    """Appends one OTLP/JSON line per trace; flushed on close()"""
+
+    name = "otlp"
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._file: Optional[IO[str]] = None
+        self._lock = threading.Lock()
+        self.written = 0
+
+    def export(self, trace: Trace) -> None:
+        line = json.dumps(otlp_json(trace), separators=(",", ":"))
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(line + "\n")
+            self.written += 1
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def sinks_from_env() -> List[SpanSink]:
+    """TRACE_SINK: comma-separated `memory`, `otlp`; `none` turns tracing off"""
+    sinks: List[SpanSink] = []
+    for name in (env_str("TRACE_SINK", "memory") or "").split(","):
+        name = name.strip().lower()
+        if name == "memory":
+            sinks.append(RingBufferSink(env_int("TRACE_BUFFER_SIZE", 200)))
+        elif name == "otlp":
+            sinks.append(OtlpFileSink(env_str("TRACE_OTLP_PATH", "traces.otlp.jsonl")))
+        elif name and name != "none":
+            logger.warning("Unknown TRACE_SINK ignored", extra={"event": "tracing.config", "sink": name})
+    return sinks
+
+
+# =========================================================
+# Tracer
+# =========================================================
+class Tracer:
+    """Starts traces, creates child spans and hands finished traces to the sinks"""
+
+    def __init__(self, sinks: Optional[Sequence[SpanSink]] = None, sample_rate: Optional[float] = None) -> None:
+        self.sinks: List[SpanSink] = list(sinks) if sinks is not None else sinks_from_env()
+        rate = sample_rate if sample_rate is not None else env_float("TRACE_SAMPLE", 1.0)
+        self.sample_rate = min(1.0, max(0.0, rate))
+        self.exported = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.sinks) and self.sample_rate > 0
+
+    @property
+    def ring_buffer(self) -> Optional[RingBufferSink]:
+        for sink in self.sinks:
+            if isinstance(sink, RingBufferSink):
+                return sink
+        return None
+
+    def start_trace(
+        self,
+        name: str,
+        trace_id: str,
+        parent_id: Optional[str] = None,
+        span_id: Optional[str] = None,
+        **attributes: Any
+    ):
+        """Root span for a request, or NOOP_SPAN when this request is not sampled"""
+        if not self.enabled or (self.sample_rate < 1.0 and random.random() >= self.sample_rate):
+            return NOOP_SPAN
+        return Span(Trace(self, trace_id), name, parent_id, attributes, span_id)
+
+    def span(self, name: str, **attributes: Any):
+        """Child of the current span; NOOP_SPAN outside a sampled trace"""
+        parent = _current_span.get()
+        if parent is None:
+            return NOOP_SPAN
+        return Span(parent.trace, name, parent.span_id, attributes)
+
+    def export(self, trace: Trace) -> None:
+        self.exported += 1
+        for sink in self.sinks:
+            try:
+                sink.export(trace)
+            except Exception as e:
+                logger.warning(
+                    "Trace sink failed",
+                    extra={"event": "tracing.export_failed", "sink": sink.name, "error": str(e)}
+                )
+
+    def close(self) -> None:
+        for sink in self.sinks:
+            sink.close()
+
+    def snapshot(self) -> Dict[str, Any]:
+        ring = self.ring_buffer
+        return {
+            "sinks": [sink.name for sink in self.sinks],
+            "sample_rate": self.sample_rate,
+            "exported": self.exported,
+            "buffered": len(ring) if ring is not None else 0,
+        }
+
+
+# Process-wide tracer configured from the environment
+tracer = Tracer()
+
+
+# =========================================================
+# Middleware
+# =========================================================
+_route_paths: Dict[Any, str] = {}
+
+
+def route_template(scope: Dict[str, Any]) -> str:
+    """Path template of the route that served `scope` ("unmatched" for 404s)"""
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return "unmatched"
+    path = _route_paths.get(endpoint)
+    if path is None:
+        # Starlette 0.35 does not put the matched route in the scope;
+        # map endpoint -> template once per endpoint
+        for route in getattr(scope.get("app"), "routes", ()):
+            if getattr(route, "endpoint", None) is endpoint:
+                path = route.path
+                break
+        else:
+            path = getattr(endpoint, "__name__", "unknown")
+        _route_paths[endpoint] = path
+    return path
+
+
+class TracingMiddleware:
+    """Pure ASGI middleware: root span per request, trace id in X-Trace-Id"""
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        path = scope.get("path", "")
+        if scope["type"] != "http" or path in UNTRACED_PATHS or path.startswith(UNTRACED_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        trace_id, parent_id = incoming_context(
+            headers.get(b"x-trace-id", b"").decode("latin-1"),
+            headers.get(b"traceparent", b"").decode("latin-1")
+        )
+        header = (TRACE_ID_HEADER.encode("latin-1"), trace_id.encode("latin-1"))
+        status = 500
+
+        async def send_with_trace_id(message: Dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message = {**message, "headers": [*message.get("headers", ()), header]}
+            await send(message)
+
+        method = scope["method"]
+        # The request id doubles as the root span id, so log lines point at their span
+        request_id = new_span_id()
+        tokens = bind_request(trace_id, request_id)
+        root = tracer.start_trace(f"{method} {path}", trace_id, parent_id, request_id, **{"http.method": method})
+        try:
+            with root:
+                try:
+                    await self.app(scope, receive, send_with_trace_id)
+                finally:
+                    if isinstance(root, Span):
+                        route = route_template(scope)
+                        root.name = f"{method} {route}"
+                        root.set("http.route", route)
+                        root.set("http.status_code", status)
+                        stage = scope.get("state", {}).get("chat_stage")
+                        if stage is not None:
+                            root.set("chat.stage", stage)
+        finally:
+            reset_request(tokens)
@@ -0,0 +1,185 @@
+"""
+=========================================================
+LEGALGRAM 2.0 - TURN RECORDER (RECORD-AND-REPLAY TRACES)
+=========================================================
+Opt-in (TURN_RECORD_PATH) turn-level traces of real traffic
+for benchmarks/replay.py. One compact JSON object per turn:
+
+  t      wall-clock start (s)       s      session token
+  st     stage sent by the client   ns     stage after the turn
+         ("other" if not a Stage)
+  len    message length (chars)     code   HTTP status
+  ms     server time incl. waiting on the session lock
+  doc    catalog document suggested (SALES_MODE catalog hits)
+  llm_ms, tin, tout, model, route, try   for LLM turns
+
+Anonymized: no message text and no names are written, and the
+session token is a keyed hash (TURN_RECORD_SALT, random per
+process when unset) so traces cannot be joined back to session
+ids. TURN_RECORD_SAMPLE keeps that share of sessions, decided
+per session so recorded journeys stay whole.
+
+The engine reports LLM calls through note_llm_call(); the
+current turn travels in a contextvar, which run_in_threadpool
+copies into the worker thread.
+=========================================================
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import IO, Any, Dict, Iterator, Optional
+
+from .config import env_float, env_str
+
+
+class TurnTrace:
+    """What is recorded about one /api/chat turn"""
+
+    __slots__ = (
+        "t", "s", "st", "len", "ns", "code", "ms", "doc",
+        "llm_ms", "tin", "tout", "model", "route", "attempt", "_started"
+    )
+
+    def __init__(self, session: str, stage: str, length: int) -> None:
+        self.t = time.time()
+        self._started = time.perf_counter()
+        self.s = session
+        self.st = stage
+        self.len = length
+        self.ns: Optional[str] = None
+        self.code = 200
+        self.ms = 0.0
+        self.doc: Optional[str] = None
+        self.llm_ms: Optional[float] = None
+        self.tin: Optional[int] = None
+        self.tout: Optional[int] = None
+        self.model: Optional[str] = None
+        self.route: Optional[str] = None
+        self.attempt: Optional[int] = None
+
+    def finish(self, result: Dict[str, Any]) -> None:
+        """Take the outcome from a process_flow result"""
+        self.ns = result.get("new_stage")
+        suggested = result.get("suggested_documents")
+        if suggested:
+            self.doc = suggested[0]
+
+    def note_llm(
+        self, model: str, route: str, seconds: float,
+        prompt_tokens: int, completion_tokens: int, attempt: int
+    ) -> None:
+        self.llm_ms = round(seconds * 1000, 1)
+        self.tin = prompt_tokens
+        self.tout = completion_tokens
+        self.model = model
+        self.route = route
+        self.attempt = attempt
+
+    def to_dict(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = {
+            "t": round(self.t, 3), "s": self.s, "st": self.st, "len": self.len,
+            "ns": self.ns, "code": self.code, "ms": self.ms, "doc": self.doc,
+            "llm_ms": self.llm_ms, "tin": self.tin, "tout": self.tout,
+            "model": self.model, "route": self.route, "try": self.attempt,
+        }
+        return {key: value for key, value in data.items() if value is not None}
+
+
+_current_turn: ContextVar[Optional[TurnTrace]] = ContextVar("legalgram_turn", default=None)
+
+
+def note_llm_call(
+    model: str, route: str, seconds: float,
+    prompt_tokens: int, completion_tokens: int, attempt: int
+) -> None:
+    """Attach a finished LLM call to the turn being recorded, if any"""
+    trace = _current_turn.get()
+    if trace is not None:
+        trace.note_llm(model, route, seconds, prompt_tokens, completion_tokens, attempt)
+
+
+class TurnRecorder:
+    """Appends TurnTrace lines to a JSONL file; does nothing without a path"""
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        sample_rate: Optional[float] = None,
+        salt: Optional[str] = None
+    ) -> None:
+        self.path = path if path is not None else env_str("TURN_RECORD_PATH")
+        rate = sample_rate if sample_rate is not None else env_float("TURN_RECORD_SAMPLE", 1.0)
+        self.sample_rate = min(1.0, max(0.0, rate))
+        key = salt if salt is not None else env_str("TURN_RECORD_SALT") or os.urandom(16).hex()
+        self._key = hashlib.sha256(key.encode("utf-8")).digest()
+        self._file: Optional[IO[str]] = None
+        self._lock = threading.Lock()
+        self.recorded = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def session_token(self, session_id: str) -> str:
+        """Keyed hash of a session id: stable within a trace, meaningless outside it"""
+        return hashlib.blake2b(session_id.encode("utf-8"), key=self._key, digest_size=6).hexdigest()
+
+    def _sampled(self, token: str) -> bool:
+        return self.sample_rate >= 1.0 or int(token[:8], 16) < self.sample_rate * 0x100000000
+
+    @contextmanager
+    def turn(self, session_id: str, stage: str, message_length: int) -> Iterator[Optional[TurnTrace]]:
+        """Record the enclosed turn; yields None when not recording it.
+
+        An exception leaving the block is recorded with its status_code
+        (500 for anything that is not an HTTPException) and re-raised.
+        """
+        if not self.path:
+            yield None
+            return
+        token = self.session_token(session_id)
+        if not self._sampled(token):
+            yield None
+            return
+        trace = TurnTrace(token, stage, message_length)
+        reset = _current_turn.set(trace)
+        try:
+            yield trace
+        except Exception as e:
+            trace.code = getattr(e, "status_code", 500)
+            raise
+        finally:
+            _current_turn.reset(reset)
+            trace.ms = round((time.perf_counter() - trace._started) * 1000, 1)
+            self.write(trace)
+
+    def write(self, trace: TurnTrace) -> None:
+        line = json.dumps(trace.to_dict(), separators=(",", ":"))
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(line + "\n")
+            self.recorded += 1
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"enabled": self.enabled, "sample_rate": self.sample_rate, "recorded": self.recorded}
+
+
+# Process-wide recorder configured from the environment
+turn_recorder = TurnRecorder()
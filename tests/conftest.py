@@ -0,0 +1,15 @@
+"""
+=========================================================
+LEGALGRAM 2.0 - TEST CONFIGURATION
+=========================================================
+Every TestClient request comes from the same address, so the
+default per-IP rate limits would refuse most of the suite.
+They are off here; tests/test_rate_limit.py builds its own
+limiters.
+=========================================================
+"""
+
+import os
+
+for name in ("RATE_LIMIT_PER_MINUTE", "RATE_LIMIT_LLM_PER_MINUTE", "RATE_LIMIT_PER_HOUR"):
+    os.environ.setdefault(name, "0")
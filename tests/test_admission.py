@@ -0,0 +1,190 @@
+"""
+=========================================================
+LEGALGRAM 2.0 - LOAD SHEDDING TESTS
+=========================================================
+Tests for admission control: LLM work is shed under
+saturation, deterministic stages are always served.
+=========================================================
+"""
+
+import pytest
+import sys
+import os
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import app
+from services.admission import AdmissionController, http_requests, llm_turns
+from services.ai_engine import LegalAI
+from services.session_store import InMemorySessionStore, new_session
+
+
+@pytest.fixture
+def client():
+    """Create test client"""
+    return TestClient(app)
+
+
+@pytest.fixture
+def saturated():
+    """Admission controller whose LLM queue is already full"""
+    controller = AdmissionController(max_in_flight=100, max_llm_queue=1, retry_after=7)
+    llm_turns.enter()
+    with patch("main.admission", controller):
+        yield controller
+    llm_turns.exit()
+
+
+# =========================================================
+# CONTROLLER TESTS
+# =========================================================
+
+class TestAdmissionController:
+    """Tests for AdmissionController.should_shed()"""
+
+    def test_deterministic_never_shed(self):
+        """Turns without an LLM call are always admitted"""
+        controller = AdmissionController(max_in_flight=0, max_llm_queue=1)
+        llm_turns.enter()
+        try:
+            assert controller.should_shed(needs_llm=False) is False
+        finally:
+            llm_turns.exit()
+
+    def test_llm_admitted_below_thresholds(self):
+        """LLM turns pass when there is headroom"""
+        controller = AdmissionController(max_in_flight=100, max_llm_queue=10)
+        assert controller.should_shed(needs_llm=True) is False
+
+    def test_llm_shed_on_queue_depth(self):
+        """LLM turns are shed once the queue is full"""
+        controller = AdmissionController(max_in_flight=100, max_llm_queue=2)
+        llm_turns.enter()
+        llm_turns.enter()
+        try:
+            assert controller.should_shed(needs_llm=True) is True
+        finally:
+            llm_turns.exit()
+            llm_turns.exit()
+
+    def test_llm_shed_on_in_flight(self):
+        """LLM turns are shed when the server is saturated"""
+        controller = AdmissionController(max_in_flight=1, max_llm_queue=100)
+        http_requests.enter()
+        http_requests.enter()
+        try:
+            assert controller.should_shed(needs_llm=True) is True
+        finally:
+            http_requests.exit()
+            http_requests.exit()
+
+    def test_zero_disables_threshold(self):
+        """A threshold of 0 turns that check off"""
+        controller = AdmissionController(max_in_flight=0, max_llm_queue=0)
+        llm_turns.enter()
+        try:
+            assert controller.should_shed(needs_llm=True) is False
+        finally:
+            llm_turns.exit()
+
+    def test_admit_tracks_queue_depth(self):
+        """Admitted LLM turns count toward the queue until they finish"""
+        controller = AdmissionController()
+        before = llm_turns.current
+        with controller.admit(needs_llm=True):
+            assert llm_turns.current == before + 1
+        assert llm_turns.current == before
+
+    def test_env_configuration(self, monkeypatch):
+        """Thresholds come from the environment"""
+        monkeypatch.setenv("SHED_MAX_IN_FLIGHT", "12")
+        monkeypatch.setenv("SHED_MAX_LLM_QUEUE", "3")
+        monkeypatch.setenv("SHED_RETRY_AFTER_SECONDS", "9")
+        controller = AdmissionController()
+        assert (controller.max_in_flight, controller.max_llm_queue, controller.retry_after) == (12, 3, 9)
+
+
+# =========================================================
+# ENGINE CLASSIFICATION TESTS
+# =========================================================
+
+class TestNeedsLLM:
+    """Tests for LegalAI.needs_llm()"""
+
+    @pytest.mark.parametrize("stage", ["INIT", "CAPTURE_NAME", "TRIAGE", "HUMAN_ROUTE", "DONE"])
+    def test_non_sales_stages(self, stage):
+        assert LegalAI.needs_llm("help me with a contract", stage) is False
+
+    @pytest.mark.parametrize("message", ["I need an NDA", "lease agreement please", "Power of Attorney"])
+    def test_catalog_match_is_deterministic(self, message):
+        assert LegalAI.needs_llm(message, "SALES_MODE") is False
+
+    def test_open_question_needs_llm(self):
+        assert LegalAI.needs_llm("what protects my startup idea?", "SALES_MODE") is True
+
+
+# =========================================================
+# ENDPOINT TESTS
+# =========================================================
+
+class TestLoadShedding:
+    """Tests for /api/chat under saturation"""
+
+    def test_llm_turn_shed_with_retry_after(self, client, saturated):
+        """Open SALES_MODE questions get 503 + Retry-After"""
+        response = client.post("/api/chat", json={
+            "message": "what protects my startup idea?",
+            "context_stage": "SALES_MODE"
+        })
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "7"
+        assert saturated.shed_total == 1
+
+    @pytest.mark.parametrize("stage,message", [
+        ("INIT", ""),
+        ("CAPTURE_NAME", "Ann"),
+        ("TRIAGE", "2"),
+        ("HUMAN_ROUTE", "thanks"),
+        ("SALES_MODE", "I need an NDA"),
+    ])
+    def test_deterministic_turns_still_served(self, client, saturated, stage, message):
+        """Stages that need no LLM are served under saturation"""
+        response = client.post("/api/chat", json={
+            "message": message,
+            "user_name": "Ann",
+            "context_stage": stage
+        })
+        assert response.status_code == 200
+        assert saturated.shed_total == 0
+
+    def test_shed_before_waiting_for_the_session(self, client, saturated):
+        """A shed turn is refused without queueing behind the session's lock"""
+        with patch("main.session_locks.hold", side_effect=AssertionError("session lock taken")):
+            response = client.post("/api/chat", json={
+                "message": "what protects my startup idea?",
+                "session_id": "busy-session",
+                "context_stage": "SALES_MODE"
+            })
+        assert response.status_code == 503
+
+    def test_stored_sales_stage_is_shed(self, client, saturated):
+        """An INIT request on a SALES_MODE session still counts as LLM work"""
+        store = InMemorySessionStore()
+        session = new_session()
+        session.stage = "SALES_MODE"
+        store.save("sales-session", session)
+        with patch("main.session_store", store):
+            response = client.post("/api/chat", json={
+                "message": "what protects my startup idea?",
+                "session_id": "sales-session"
+            })
+        assert response.status_code == 503
+        assert saturated.shed_total == 1
+
+    def test_status_reports_admission(self, client):
+        """/api/status exposes the admission gauges"""
+        data = client.get("/api/status").json()
+        assert "llm_queue_depth" in data["admission"]
+        assert "shed_total" in data["admission"]
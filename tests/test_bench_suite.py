@@ -0,0 +1,132 @@
+"""
+=========================================================
+LEGALGRAM 2.0 - BENCHMARK SUITE TESTS
+=========================================================
+Tests for benchmarks/bench_suite.py: synthetic catalogs,
+baseline files and regression detection.
+=========================================================
+"""
+
+import pytest
+import sys
+import os
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_suite import (
+    CATALOG_SIZES, DEFAULT_BASELINE, MISS_MESSAGE, compare, engine_cases, inconsistent_cases, installed_catalog,
+    load_baseline, main, record_baseline, run_suite, save_baseline, synthetic_catalog
+)
+from services import ai_engine
+from services.ai_engine import LegalAI
+
+
+class TestSyntheticCatalog:
+    """Tests for synthetic_catalog()"""
+
+    @pytest.mark.parametrize("size", CATALOG_SIZES + (3,))
+    def test_size(self, size):
+        catalog = synthetic_catalog(size)
+        assert len(catalog) == size
+        assert len({doc["full_name"] for doc in catalog.values()}) == size
+
+    def test_real_templates_first(self):
+        catalog = synthetic_catalog(170)
+        assert list(catalog)[:5] == list(ai_engine.DOCUMENT_DATABASE)
+
+    def test_entries_have_pitch_fields(self):
+        for doc in synthetic_catalog(50).values():
+            assert LegalAI._generate_document_pitch(doc, "Alice")
+
+    def test_installed_catalog_restores(self):
+        original = ai_engine.DOCUMENT_DATABASE
+        with installed_catalog(synthetic_catalog(170)):
+            assert len(ai_engine.DOCUMENT_DATABASE) == 170
+            assert LegalAI.match_document("I need a Healthcare Waiver 001")
+        assert ai_engine.DOCUMENT_DATABASE is original
+        assert LegalAI.match_document("I need a Healthcare Waiver 001") is None
+
+
+class TestCases:
+    """The cases measure what their names say"""
+
+    @pytest.mark.parametrize("size", CATALOG_SIZES)
+    def test_first_last_and_miss(self, size):
+        with installed_catalog(synthetic_catalog(size)):
+            docs = list(ai_engine.DOCUMENT_DATABASE.values())
+            cases = {case.name: case.call for case in engine_cases(ai_engine.DOCUMENT_DATABASE)}
+            assert cases["match_document:first"]() is docs[0]
+            assert cases["match_document:last"]() is docs[-1]
+            assert cases["match_document:miss"]() is None
+            assert cases["needs_llm:miss"]() is True
+            assert cases["document_details:exact"]()["found"]
+            assert cases["document_details:fuzzy"]()["found"]
+            assert not cases["document_details:miss"]()["found"]
+
+    def test_miss_message_matches_nothing(self):
+        with installed_catalog(synthetic_catalog(5000)):
+            assert LegalAI.match_document(MISS_MESSAGE) is None
+
+    def test_run_suite_keys(self):
+        results = run_suite(sizes=(5,), number=1, repeat=1)
+        assert "catalog=5/process_flow:SALES_MODE:last" in results
+        assert all(ns > 0 for ns in results.values())
+
+
+class TestBaselines:
+    """Baseline files and regression detection"""
+
+    def test_round_trip(self, tmp_path):
+        path = str(tmp_path / "baseline.json")
+        save_baseline(path, {"catalog=5/x": 123.456})
+        stored = load_baseline(path)
+        assert stored["results"] == {"catalog=5/x": 123.5}
+        assert "python" in stored["environment"]
+
+    def test_missing_baseline(self, tmp_path):
+        assert load_baseline(str(tmp_path / "none.json")) is None
+
+    def test_compare_without_baseline_fails(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(sys, "argv", ["bench_suite", "--baseline", str(tmp_path / "none.json")])
+        with pytest.raises(SystemExit) as exit_info:
+            main()
+        assert exit_info.value.code == 2
+
+    def test_reference_baseline_covers_suite(self):
+        stored = load_baseline(DEFAULT_BASELINE)
+        assert stored is not None
+        assert set(stored["results"]) == set(run_suite(number=1, repeat=1))
+        assert inconsistent_cases(stored["results"]) == []
+
+    def test_record_baseline_keeps_median(self):
+        runs = iter([{"a": 100.0}, {"a": 300.0}, {"a": 120.0}])
+        with patch("benchmarks.bench_suite.run_suite", side_effect=lambda *args: next(runs)):
+            assert record_baseline(runs=3) == {"a": 120.0}
+
+    def test_noisy_size_block_is_inconsistent(self):
+        results = {
+            "catalog=5/process_flow:INIT": 340.0, "catalog=170/process_flow:INIT": 617.0,
+            "catalog=5000/process_flow:INIT": 377.0,
+            "catalog=5/match_document:miss": 570.0, "catalog=5000/match_document:miss": 503000.0,
+        }
+        assert inconsistent_cases(results) == ["process_flow:INIT (340-617 ns)"]
+
+    def test_compare_rejects_noisy_baseline(self, tmp_path, monkeypatch):
+        path = str(tmp_path / "baseline.json")
+        save_baseline(path, {"catalog=5/process_flow:INIT": 340.0, "catalog=170/process_flow:INIT": 617.0})
+        monkeypatch.setattr(sys, "argv", ["bench_suite", "--baseline", path])
+        with pytest.raises(SystemExit) as exit_info:
+            main()
+        assert exit_info.value.code == 2
+
+    def test_regression_beyond_tolerance(self):
+        rows = {row.name: row for row in compare({"a": 130.0, "b": 120.0}, {"a": 100.0, "b": 100.0}, 0.25)}
+        assert rows["a"].regressed
+        assert not rows["b"].regressed
+        assert rows["a"].ratio == pytest.approx(1.3)
+
+    def test_new_cases_never_regress(self):
+        (row,) = compare({"new": 999.0}, {}, 0.1)
+        assert not row.regressed
+        assert row.baseline is None
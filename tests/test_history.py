@@ -0,0 +1,133 @@
+"""
+=========================================================
+LEGALGRAM 2.0 - CONVERSATION HISTORY TESTS
+=========================================================
+Tests for the ring buffer and rolling summary.
+=========================================================
+"""
+
+import pytest
+import sys
+import os
+import json
+import uuid
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import app
+from services.history import HistoryPolicy, condense
+from services.records import MessageRecord, SessionRecord
+from services.session_store import InMemorySessionStore
+from services.tokens import estimate_tokens
+
+
+def _messages(count, text="message {i}"):
+    return [
+        MessageRecord("user" if i % 2 == 0 else "assistant", text.format(i=i), float(i))
+        for i in range(count)
+    ]
+
+
+# =========================================================
+# POLICY TESTS
+# =========================================================
+
+class TestHistoryPolicy:
+    """Tests for HistoryPolicy.append()"""
+
+    def test_under_cap_keeps_everything(self):
+        session = SessionRecord()
+        HistoryPolicy(10, 2, 100).append(session, _messages(6))
+        assert len(session.messages) == 6
+        assert session.summary == ""
+        assert session.message_total == 6
+
+    @pytest.mark.parametrize("count", [11, 57, 1000])
+    def test_buffer_never_exceeds_cap(self, count):
+        session = SessionRecord()
+        policy = HistoryPolicy(10, 3, 100)
+        for message in _messages(count):
+            policy.append(session, [message])
+            assert len(session.messages) <= 10
+        assert session.message_total == count
+        assert session.messages[-1].content == f"message {count - 1}"
+
+    def test_overflow_folds_in_batches(self):
+        """The summary changes once per `summary_every` evictions, not per message"""
+        session = SessionRecord()
+        policy = HistoryPolicy(4, 2, 100)
+        policy.append(session, _messages(5))
+        assert len(session.messages) == 3
+        assert session.summary == "User: message 0\nAssistant: message 1"
+
+    def test_summary_respects_budget(self):
+        session = SessionRecord()
+        policy = HistoryPolicy(4, 2, 30)
+        policy.append(session, _messages(200, "a fairly long message about leases number {i}"))
+        assert estimate_tokens(session.summary) <= 30
+        assert "number 195" in session.summary
+
+    def test_zero_budget_disables_summary(self):
+        session = SessionRecord()
+        HistoryPolicy(4, 2, 0).append(session, _messages(20))
+        assert session.summary == ""
+
+    def test_session_from_larger_cap_is_refolded(self):
+        """A cap lowered between deploys folds the excess instead of dropping it"""
+        session = SessionRecord()
+        HistoryPolicy(20, 2, 200).append(session, _messages(12))
+        HistoryPolicy(4, 2, 200).append(session, _messages(1))
+        assert len(session.messages) <= 4
+        assert session.messages.maxlen == 4
+        assert "message 0" in session.summary
+
+    def test_env_configuration(self, monkeypatch):
+        monkeypatch.setenv("SESSION_HISTORY_MESSAGES", "8")
+        monkeypatch.setenv("SESSION_SUMMARY_EVERY", "4")
+        monkeypatch.setenv("SESSION_SUMMARY_TOKENS", "50")
+        policy = HistoryPolicy()
+        assert (policy.max_messages, policy.summary_every, policy.summary_tokens) == (8, 4, 50)
+
+    def test_legacy_snapshot_overflow_is_summarized(self):
+        data = {
+            "stage": "SALES_MODE",
+            "messages": [m.to_dict() for m in _messages(300)],
+            "created_at": 1.0
+        }
+        session = SessionRecord.from_dict(json.loads(json.dumps(data)))
+        assert len(session.messages) <= session.messages.maxlen
+        assert session.message_total == 300
+        assert session.summary
+
+
+class TestCondense:
+    """Tests for condense()"""
+
+    def test_strips_markdown_and_whitespace(self):
+        assert condense("**Great**\n\nchoice", 20) == "Great choice"
+
+    def test_marks_truncation(self):
+        short = condense("word " * 100, 5)
+        assert short.endswith("…")
+        assert estimate_tokens(short) <= 6
+
+
+# =========================================================
+# ENDPOINT TESTS
+# =========================================================
+
+class TestSessionInfoCount:
+    """SessionInfo.message_count keeps counting past the buffer"""
+
+    def test_message_count_is_total(self):
+        store = InMemorySessionStore(history=HistoryPolicy(4, 2, 100))
+        session_id = str(uuid.uuid4())
+        with patch("main.session_store", store):
+            client = TestClient(app)
+            for _ in range(5):
+                client.post("/api/chat", json={"message": "hi", "session_id": session_id})
+            data = client.get(f"/api/session/{session_id}").json()
+        assert data["message_count"] == 10
+        assert len(store.get(session_id).messages) <= 4
@@ -0,0 +1,270 @@
+"""
+=========================================================
+LEGALGRAM 2.0 - IDEMPOTENCY KEY TESTS
+=========================================================
+Tests for Idempotency-Key handling on /api/chat.
+=========================================================
+"""
+
+import pytest
+import asyncio
+import sys
+import os
+import uuid
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import app
+from services.idempotency import IdempotencyCache, IdempotencyKeyReused, request_fingerprint, scoped_key
+from services.session_store import InMemorySessionStore
+
+
+@pytest.fixture
+def client():
+    """Test client with private store and idempotency cache"""
+    with patch("main.session_store", InMemorySessionStore()) as store, \
+            patch("main.idempotency_cache", IdempotencyCache()):
+        yield TestClient(app), store
+
+
+# =========================================================
+# CACHE TESTS
+# =========================================================
+
+class TestIdempotencyCache:
+    """Tests for IdempotencyCache.run()"""
+
+    def test_second_call_replays(self):
+        cache = IdempotencyCache()
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            return "result"
+
+        async def scenario():
+            first = await cache.run("k", "fp", compute)
+            second = await cache.run("k", "fp", compute)
+            return first, second
+
+        first, second = asyncio.run(scenario())
+        assert first == ("result", False)
+        assert second == ("result", True)
+        assert len(calls) == 1
+
+    def test_concurrent_duplicates_wait_for_first(self):
+        cache = IdempotencyCache()
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "result"
+
+        async def scenario():
+            return await asyncio.gather(*(cache.run("k", "fp", compute) for _ in range(5)))
+
+        results = asyncio.run(scenario())
+        assert len(calls) == 1
+        assert [r[0] for r in results] == ["result"] * 5
+        assert sum(r[1] for r in results) == 4
+
+    def test_duplicates_survive_cancelled_first(self):
+        """A cancelled first request hands the turn to one of the waiting duplicates"""
+        cache = IdempotencyCache()
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "result"
+
+        async def scenario():
+            first = asyncio.create_task(cache.run("k", "fp", compute))
+            await asyncio.sleep(0)
+            duplicates = [asyncio.create_task(cache.run("k", "fp", compute)) for _ in range(3)]
+            await asyncio.sleep(0.01)
+            first.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await first
+            return await asyncio.gather(*duplicates)
+
+        results = asyncio.run(scenario())
+        assert len(calls) == 2
+        assert [r[0] for r in results] == ["result"] * 3
+        assert sorted(r[1] for r in results) == [False, True, True]
+
+    def test_cancelled_duplicate_is_not_rerun(self):
+        """A waiting duplicate that is itself cancelled stays cancelled"""
+        cache = IdempotencyCache()
+
+        async def compute():
+            await asyncio.sleep(0.05)
+            return "result"
+
+        async def scenario():
+            first = asyncio.create_task(cache.run("k", "fp", compute))
+            await asyncio.sleep(0)
+            duplicate = asyncio.create_task(cache.run("k", "fp", compute))
+            await asyncio.sleep(0.01)
+            duplicate.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await duplicate
+            return await first
+
+        assert asyncio.run(scenario()) == ("result", False)
+
+    def test_different_body_rejected(self):
+        cache = IdempotencyCache()
+
+        async def compute():
+            return "result"
+
+        async def scenario():
+            await cache.run("k", "fp1", compute)
+            await cache.run("k", "fp2", compute)
+
+        with pytest.raises(IdempotencyKeyReused):
+            asyncio.run(scenario())
+
+    def test_failures_not_cached(self):
+        cache = IdempotencyCache()
+        attempts = []
+
+        async def flaky():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise RuntimeError("boom")
+            return "ok"
+
+        async def scenario():
+            with pytest.raises(RuntimeError):
+                await cache.run("k", "fp", flaky)
+            return await cache.run("k", "fp", flaky)
+
+        assert asyncio.run(scenario()) == ("ok", False)
+        assert len(attempts) == 2
+
+    def test_ttl_expiry(self):
+        cache = IdempotencyCache(ttl_seconds=0.0)
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            return len(calls)
+
+        async def scenario():
+            await cache.run("k", "fp", compute)
+            return await cache.run("k", "fp", compute)
+
+        assert asyncio.run(scenario()) == (2, False)
+
+    def test_bounded(self):
+        cache = IdempotencyCache(max_entries=10)
+
+        async def compute():
+            return 1
+
+        async def scenario():
+            for i in range(100):
+                await cache.run(f"k{i}", "fp", compute)
+
+        asyncio.run(scenario())
+        assert len(cache) == 10
+
+    def test_fingerprint_is_order_independent(self):
+        assert request_fingerprint({"a": 1, "b": 2}) == request_fingerprint({"b": 2, "a": 1})
+        assert request_fingerprint({"a": 1}) != request_fingerprint({"a": 2})
+
+
+# =========================================================
+# ENDPOINT TESTS
+# =========================================================
+
+class TestChatIdempotency:
+    """Tests for Idempotency-Key on /api/chat"""
+
+    def test_retry_does_not_rerun_turn(self, client):
+        """A retried turn returns the stored response and history is not duplicated"""
+        test_client, store = client
+        session_id = str(uuid.uuid4())
+        payload = {"message": "hi", "session_id": session_id}
+        headers = {"Idempotency-Key": "turn-1"}
+
+        first = test_client.post("/api/chat", json=payload, headers=headers)
+        retry = test_client.post("/api/chat", json=payload, headers=headers)
+
+        assert first.status_code == retry.status_code == 200
+        assert retry.json() == first.json()
+        assert retry.headers["idempotent-replayed"] == "true"
+        assert len(store.get(session_id).messages) == 2
+
+    def test_retry_skips_engine(self, client):
+        """process_flow runs once per key"""
+        test_client, _ = client
+        payload = {"message": "hi", "session_id": "idem-engine"}
+        headers = {"Idempotency-Key": "turn-1"}
+        with patch("main.LegalAI") as engine:
+            engine.process_flow.return_value = {
+                "response": "r", "new_stage": "CAPTURE_NAME", "user_name": None
+            }
+            test_client.post("/api/chat", json=payload, headers=headers)
+            test_client.post("/api/chat", json=payload, headers=headers)
+        assert engine.process_flow.call_count == 1
+
+    def test_new_session_retry_keeps_session_id(self, client):
+        """Retrying the very first turn returns the same generated session id"""
+        test_client, store = client
+        headers = {"Idempotency-Key": "first-turn"}
+        first = test_client.post("/api/chat", json={"message": "hi"}, headers=headers)
+        retry = test_client.post("/api/chat", json={"message": "hi"}, headers=headers)
+        assert retry.json()["session_id"] == first.json()["session_id"]
+        assert store.count() == 1
+
+    def test_without_key_runs_every_time(self, client):
+        """Requests without the header are processed normally"""
+        test_client, store = client
+        payload = {"message": "hi", "session_id": "no-key"}
+        test_client.post("/api/chat", json=payload)
+        test_client.post("/api/chat", json=payload)
+        assert len(store.get("no-key").messages) == 4
+
+    def test_key_reuse_with_different_body(self, client):
+        test_client, _ = client
+        headers = {"Idempotency-Key": "turn-1"}
+        test_client.post("/api/chat", json={"message": "hi", "session_id": "s"}, headers=headers)
+        response = test_client.post("/api/chat", json={"message": "bye", "session_id": "s"}, headers=headers)
+        assert response.status_code == 422
+
+    def test_same_key_different_sessions(self, client):
+        """Keys are scoped to the session"""
+        test_client, _ = client
+        headers = {"Idempotency-Key": "turn-1"}
+        a = test_client.post("/api/chat", json={"message": "hi", "session_id": "a"}, headers=headers)
+        b = test_client.post("/api/chat", json={"message": "hi", "session_id": "b"}, headers=headers)
+        assert "idempotent-replayed" not in b.headers
+        assert a.json()["session_id"] != b.json()["session_id"]
+
+    def test_same_key_different_clients_without_session(self, client):
+        """Two new visitors reusing a key each get their own session"""
+        test_client, store = client
+        first = test_client.post("/api/chat", json={"message": "hi"},
+                                 headers={"Idempotency-Key": "1", "X-API-Key": "client-a"})
+        second = test_client.post("/api/chat", json={"message": "hi"},
+                                  headers={"Idempotency-Key": "1", "X-API-Key": "client-b"})
+        assert "idempotent-replayed" not in second.headers
+        assert first.json()["session_id"] != second.json()["session_id"]
+        assert store.count() == 2
+
+    def test_scope_separates_client_ips(self):
+        assert scoped_key("1", "10.0.0.1", None, None) != scoped_key("1", "10.0.0.2", None, None)
+        assert scoped_key("1", "10.0.0.1", None, None) == scoped_key("1", "10.0.0.1", "", "")
+        assert scoped_key("b", "a:") != scoped_key(":b", "a")
+
+    def test_overlong_key_rejected(self, client):
+        test_client, _ = client
+        response = test_client.post("/api/chat", json={"message": "hi"},
+                                    headers={"Idempotency-Key": "k" * 256})
+        assert response.status_code == 400
@@ -0,0 +1,332 @@
+"""
+=========================================================
+LEGALGRAM 2.0 - LIFECYCLE TESTS
+=========================================================
+Tests for startup warm-up, readiness gating, the pooled
+LLM client and graceful shutdown.
+=========================================================
+"""
+
+import pytest
+import asyncio
+import sys
+import os
+from fastapi.testclient import TestClient
+from unittest.mock import patch, MagicMock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import app
+from services import ai_engine
+from services.ai_engine import LegalAI
+from services.inflight import chat_requests
+from services.lifecycle import (
+    readiness, shutdown, begin_drain, shut_down, track_chat_request
+)
+from services.session_store import InMemorySessionStore, RedisSessionStore, SqliteSessionStore
+from benchmarks.fake_redis import FakeRedis
+
+
+@pytest.fixture
+def fake_groq_class():
+    """Replace the lazily imported Groq class with a mock factory"""
+    factory = MagicMock(side_effect=lambda **kwargs: MagicMock())
+    with patch.object(ai_engine, "_groq_class", return_value=factory):
+        LegalAI.close_groq_client()
+        yield factory
+        LegalAI.close_groq_client()
+
+
+@pytest.fixture
+def client_with_store():
+    """Test client backed by a private in-memory store"""
+    store = InMemorySessionStore()
+    with patch("main.session_store", store):
+        yield TestClient(app), store
+
+
+# =========================================================
+# PROBE TESTS
+# =========================================================
+
+class TestProbes:
+    """Tests for /healthz and /readyz"""
+
+    def test_healthz_always_alive(self):
+        """Liveness does not depend on warm-up"""
+        readiness.reset()
+        response = TestClient(app).get("/healthz")
+        assert response.status_code == 200
+        assert response.json()["status"] == "alive"
+
+    def test_readyz_503_before_warm_up(self):
+        """Readiness is gated until the lifespan has run"""
+        readiness.reset()
+        response = TestClient(app).get("/readyz")
+        assert response.status_code == 503
+        assert response.json()["ready"] is False
+
+    def test_readyz_200_after_warm_up(self, monkeypatch):
+        """Readiness flips once warm-up finishes"""
+        monkeypatch.delenv("GROQ_API_KEY", raising=False)
+        with TestClient(app) as client:
+            response = client.get("/readyz")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["ready"] is True
+        assert data["checks"]["catalog_index"] == "ok"
+        assert data["checks"]["llm_client"] == "skipped"
+
+    def test_not_ready_after_shutdown(self, monkeypatch):
+        """Readiness drops when the lifespan exits"""
+        monkeypatch.delenv("GROQ_API_KEY", raising=False)
+        with TestClient(app):
+            pass
+        assert readiness.ready is False
+
+    def test_legacy_health_check_unchanged(self):
+        """The original root health check is still served"""
+        assert TestClient(app).get("/").status_code == 200
+
+
+# =========================================================
+# WARM-UP TESTS
+# =========================================================
+
+class TestWarmUp:
+    """Tests for the warm-up steps"""
+
+    def test_opens_pooled_client(self, monkeypatch, fake_groq_class):
+        """The LLM client is built during startup when a key is configured"""
+        monkeypatch.setenv("GROQ_API_KEY", "gsk_test")
+        monkeypatch.delenv("LLM_WARMUP", raising=False)
+        with TestClient(app) as client:
+            checks = client.get("/readyz").json()["checks"]
+        assert checks["llm_client"] == "ok"
+        assert checks["llm_warmup"] == "skipped"
+        assert fake_groq_class.call_count == 1
+
+    def test_warm_up_completion(self, monkeypatch, fake_groq_class):
+        """LLM_WARMUP fires a one-token completion"""
+        monkeypatch.setenv("GROQ_API_KEY", "gsk_test")
+        monkeypatch.setenv("LLM_WARMUP", "true")
+        with TestClient(app) as client:
+            checks = client.get("/readyz").json()["checks"]
+            pooled = LegalAI.get_groq_client()
+        assert checks["llm_warmup"] == "ok"
+        kwargs = pooled.chat.completions.create.call_args.kwargs
+        assert kwargs["max_tokens"] == 1
+
+    def test_failed_warm_up_still_ready(self, monkeypatch):
+        """A provider error during warm-up does not block readiness"""
+        monkeypatch.setenv("GROQ_API_KEY", "gsk_test")
+        monkeypatch.setenv("LLM_WARMUP", "true")
+        with patch.object(LegalAI, "get_groq_client"), \
+                patch.object(LegalAI, "warm_up_completion", side_effect=RuntimeError("down")):
+            with TestClient(app) as client:
+                response = client.get("/readyz")
+        assert response.status_code == 200
+        assert response.json()["checks"]["llm_warmup"] == "failed"
+
+
+# =========================================================
+# POOLED CLIENT TESTS
+# =========================================================
+
+class TestPooledClient:
+    """Tests for the shared Groq client"""
+
+    def test_client_is_reused(self, monkeypatch, fake_groq_class):
+        """Repeated calls return the same client"""
+        monkeypatch.setenv("GROQ_API_KEY", "gsk_test")
+        assert LegalAI.get_groq_client() is LegalAI.get_groq_client()
+        assert fake_groq_class.call_count == 1
+
+    def test_no_retry_copy(self, monkeypatch, fake_groq_class):
+        """retries=False is a cached copy of the pooled client with max_retries=0"""
+        monkeypatch.setenv("GROQ_API_KEY", "gsk_test")
+        pooled = LegalAI.get_groq_client()
+        no_retry = LegalAI.get_groq_client(retries=False)
+        assert no_retry is pooled.with_options.return_value
+        assert LegalAI.get_groq_client(retries=False) is no_retry
+        pooled.with_options.assert_called_once_with(max_retries=0)
+
+    def test_key_rotation_rebuilds_client(self, monkeypatch, fake_groq_class):
+        """A new API key produces a new client"""
+        monkeypatch.setenv("GROQ_API_KEY", "gsk_one")
+        first = LegalAI.get_groq_client()
+        monkeypatch.setenv("GROQ_API_KEY", "gsk_two")
+        assert LegalAI.get_groq_client() is not first
+
+    def test_base_url_setting(self, monkeypatch, fake_groq_class):
+        """GROQ_BASE_URL, timeout and retry settings reach the client"""
+        monkeypatch.setenv("GROQ_API_KEY", "gsk_test")
+        monkeypatch.setenv("GROQ_BASE_URL", "http://127.0.0.1:8100")
+        monkeypatch.setenv("GROQ_TIMEOUT_SECONDS", "5")
+        monkeypatch.setenv("GROQ_MAX_RETRIES", "0")
+        LegalAI.get_groq_client()
+        kwargs = fake_groq_class.call_args.kwargs
+        assert kwargs["base_url"] == "http://127.0.0.1:8100"
+        assert kwargs["timeout"] == 5.0
+        assert kwargs["max_retries"] == 0
+
+    def test_base_url_change_rebuilds_client(self, monkeypatch, fake_groq_class):
+        monkeypatch.setenv("GROQ_API_KEY", "gsk_test")
+        monkeypatch.delenv("GROQ_BASE_URL", raising=False)
+        first = LegalAI.get_groq_client()
+        assert fake_groq_class.call_args.kwargs["base_url"] is None
+        assert "timeout" not in fake_groq_class.call_args.kwargs
+        monkeypatch.setenv("GROQ_BASE_URL", "http://127.0.0.1:8100")
+        assert LegalAI.get_groq_client() is not first
+
+    def test_close_releases_connections(self, monkeypatch, fake_groq_class):
+        """close_groq_client() closes and forgets the pooled client"""
+        monkeypatch.setenv("GROQ_API_KEY", "gsk_test")
+        client = LegalAI.get_groq_client()
+        LegalAI.close_groq_client()
+        client.close.assert_called_once()
+        assert LegalAI.get_groq_client() is not client
+
+    def test_missing_key_still_raises(self, monkeypatch):
+        """Without a key the client cannot be built"""
+        monkeypatch.delenv("GROQ_API_KEY", raising=False)
+        with pytest.raises(ValueError):
+            LegalAI.get_groq_client()
+
+
+# =========================================================
+# GRACEFUL SHUTDOWN TESTS
+# =========================================================
+
+class TestGracefulShutdown:
+    """Tests for draining, session flush and connection close"""
+
+    @pytest.fixture(autouse=True)
+    def reset_shutdown(self):
+        shutdown.reset()
+        yield
+        shutdown.reset()
+
+    def test_draining_rejects_new_conversations(self, client_with_store):
+        """New sessions get 503 with Retry-After while draining"""
+        client, _ = client_with_store
+        begin_drain()
+        response = client.post("/api/chat", json={"message": "hi", "session_id": "brand-new"})
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "1"
+
+    def test_draining_serves_existing_conversations(self, client_with_store):
+        """Existing sessions can finish their turn"""
+        client, _ = client_with_store
+        client.post("/api/chat", json={"message": "hi", "session_id": "existing"})
+        begin_drain()
+        response = client.post("/api/chat", json={"message": "Ann", "session_id": "existing"})
+        assert response.status_code == 200
+        assert shutdown.drained == 1
+
+    def test_draining_fails_readiness(self, client_with_store):
+        """The instance leaves rotation as soon as draining starts"""
+        client, _ = client_with_store
+        readiness.ready = True
+        begin_drain()
+        assert client.get("/readyz").status_code == 503
+
+    def test_shutdown_flushes_and_closes(self, monkeypatch):
+        """Lifespan exit flushes the store and closes the pooled client"""
+        monkeypatch.delenv("GROQ_API_KEY", raising=False)
+        store = MagicMock()
+        store.count.return_value = 0
+        with patch("main.session_store", store), \
+                patch.object(LegalAI, "close_groq_client") as close_client:
+            with TestClient(app):
+                pass
+        store.flush.assert_called_once()
+        store.close.assert_called_once()
+        close_client.assert_called_once()
+
+    @pytest.mark.parametrize("backend", ["sqlite", "redis"])
+    def test_durable_store_across_restarts(self, monkeypatch, tmp_path, backend):
+        """A conversation continues after the app shuts down and starts again"""
+        monkeypatch.delenv("GROQ_API_KEY", raising=False)
+        if backend == "sqlite":
+            store = SqliteSessionStore(str(tmp_path / "sessions.db"))
+        else:
+            store = RedisSessionStore(FakeRedis())
+        with patch("main.session_store", store):
+            with TestClient(app) as client:
+                client.post("/api/chat", json={"message": "hi", "session_id": "durable"})
+            with TestClient(app) as client:
+                response = client.post("/api/chat", json={"message": "Ann", "session_id": "durable"})
+                session = client.get("/api/session/durable").json()
+        assert response.json()["new_stage"] == "TRIAGE"
+        assert session["message_count"] == 4
+
+    def test_grace_period_counts_unfinished(self, monkeypatch):
+        """Turns still running when the grace period ends are counted as unfinished"""
+        monkeypatch.setenv("SHUTDOWN_GRACE_SECONDS", "0.1")
+        chat_requests.enter()
+        try:
+            asyncio.run(shut_down(InMemorySessionStore()))
+        finally:
+            chat_requests.exit()
+        assert (shutdown.unfinished, shutdown.aborted) == (1, 0)
+
+    def test_unfinished_then_cancelled_counts_once(self, monkeypatch):
+        """A turn outliving the grace period and then cancelled is aborted once"""
+        monkeypatch.setenv("SHUTDOWN_GRACE_SECONDS", "0.1")
+
+        async def scenario():
+            async def stuck_turn():
+                with track_chat_request():
+                    await asyncio.sleep(10)
+            task = asyncio.create_task(stuck_turn())
+            await asyncio.sleep(0)
+            await shut_down(InMemorySessionStore())
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(scenario())
+        assert (shutdown.unfinished, shutdown.aborted, shutdown.drained) == (1, 1, 0)
+
+    def test_uncounted_store_logs_unknown_sessions(self):
+        """A store that cannot count reports "unknown" sessions, not null"""
+        store = MagicMock(spec=InMemorySessionStore)
+        store.count.return_value = None
+        with patch("services.lifecycle.logger") as log:
+            asyncio.run(shut_down(store))
+        assert log.info.call_args.kwargs["extra"]["sessions"] == "unknown"
+
+    def test_waits_for_in_flight_turns(self, monkeypatch):
+        """Shutdown waits for outstanding turns inside the grace period"""
+        monkeypatch.setenv("SHUTDOWN_GRACE_SECONDS", "5")
+
+        async def scenario():
+            async def slow_turn():
+                with track_chat_request():
+                    await asyncio.sleep(0.2)
+            task = asyncio.create_task(slow_turn())
+            await asyncio.sleep(0)
+            await shut_down(InMemorySessionStore())
+            await task
+
+        asyncio.run(scenario())
+        assert shutdown.drained == 1
+        assert shutdown.aborted == 0
+
+    def test_cancelled_turn_counts_aborted(self):
+        """A turn cancelled by the server is aborted, not drained"""
+        async def scenario():
+            async def stuck_turn():
+                with track_chat_request():
+                    await asyncio.sleep(10)
+            begin_drain()
+            task = asyncio.create_task(stuck_turn())
+            await asyncio.sleep(0)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(scenario())
+        assert shutdown.aborted == 1
+        assert shutdown.drained == 0
@@ -0,0 +1,144 @@
+"""
+=========================================================
+LEGALGRAM 2.0 - LOAD TEST HARNESS TESTS
+=========================================================
+Tests for benchmarks/loadtest.py against the in-process app
+with a mocked LLM.
+=========================================================
+"""
+
+import pytest
+import asyncio
+import random
+import sys
+import os
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.loadtest import Journey, LoadReport, in_process_client, percentile, run_journey, run_load
+from services.ai_engine import LegalAI
+from services.session_store import InMemorySessionStore
+
+
+@pytest.fixture
+def app_env(monkeypatch):
+    """Fresh session store and an instant fake LLM"""
+    monkeypatch.setenv("GROQ_API_KEY", "test-key")
+    client = MagicMock()
+    client.chat.completions.create.return_value.choices = [MagicMock(message=MagicMock(content="Try our NDA"))]
+    with patch("main.session_store", InMemorySessionStore()), \
+            patch.object(LegalAI, "get_groq_client", return_value=client):
+        yield client
+
+
+async def _load(**options):
+    async with in_process_client() as client:
+        return await run_load(client, **options)
+
+
+# =========================================================
+# HELPERS
+# =========================================================
+
+class TestPercentile:
+    """Tests for percentile()"""
+
+    def test_nearest_rank(self):
+        values = [float(v) for v in range(1, 101)]
+        assert percentile(values, 50) == 50
+        assert percentile(values, 95) == 95
+        assert percentile(values, 99) == 99
+        assert percentile(values, 100) == 100
+
+    def test_small_samples(self):
+        assert percentile([], 50) == 0.0
+        assert percentile([0.3], 99) == 0.3
+        assert percentile([0.1, 0.2], 50) == 0.1
+
+
+class TestJourney:
+    """Tests for scripted journeys"""
+
+    def test_ai_journey(self):
+        journey = Journey(random.Random(1), sales_turns=3, human_ratio=0, llm_ratio=1)
+        labels = [label for label, _ in journey.turns]
+        assert labels == ["INIT", "CAPTURE_NAME", "TRIAGE"] + ["SALES_MODE:llm"] * 3
+
+    def test_human_journey(self):
+        journey = Journey(random.Random(1), sales_turns=3, human_ratio=1, llm_ratio=1)
+        assert [label for label, _ in journey.turns][-1] == "HUMAN_ROUTE"
+
+    def test_catalog_turns_do_not_need_llm(self):
+        journey = Journey(random.Random(1), sales_turns=5, human_ratio=0, llm_ratio=0)
+        for label, message in journey.turns[3:]:
+            assert label == "SALES_MODE:catalog"
+            assert not LegalAI.needs_llm(message, "SALES_MODE")
+
+    def test_llm_turns_need_llm(self):
+        journey = Journey(random.Random(1), sales_turns=5, human_ratio=0, llm_ratio=1)
+        for _, message in journey.turns[3:]:
+            assert LegalAI.needs_llm(message, "SALES_MODE")
+
+
+class TestLoadReport:
+    """Tests for LoadReport"""
+
+    def test_summary(self):
+        report = LoadReport()
+        for ms in range(1, 101):
+            report.record("INIT", ms / 1000, None)
+        report.record("TRIAGE", 0.5, "503")
+        report.elapsed = 2.0
+        data = report.to_dict()
+        assert data["turns"] == 101
+        assert data["errors"] == 1
+        assert data["stages"]["INIT"]["p95_ms"] == 95.0
+        assert data["stages"]["TRIAGE"]["errors"] == {"503": 1}
+        assert "TRIAGE" in report.format()
+
+
+# =========================================================
+# IN-PROCESS RUNS
+# =========================================================
+
+class TestRunLoad:
+    """Journeys against the in-process app"""
+
+    def test_journey_walks_every_stage(self, app_env):
+        async def scenario():
+            report = LoadReport()
+            journey = Journey(random.Random(2), sales_turns=2, human_ratio=0, llm_ratio=1)
+            async with in_process_client() as client:
+                ok = await run_journey(client, journey, report)
+            return ok, report
+        ok, report = asyncio.run(scenario())
+        assert ok
+        assert report.error_count == 0
+        assert app_env.chat.completions.create.call_count == 2
+
+    def test_run_counts_journeys_and_llm_calls(self, app_env):
+        report = asyncio.run(_load(rate=200, journeys=20, sales_turns=2, human_ratio=0, llm_ratio=1, seed=5))
+        assert report.journeys_started == 20
+        assert report.journeys_completed == 20
+        assert report.turns == 20 * 5
+        assert report.llm_calls == 40
+        data = report.to_dict()
+        assert set(data["stages"]) == {"INIT", "CAPTURE_NAME", "TRIAGE", "SALES_MODE:llm"}
+        assert data["error_rate"] == 0
+
+    def test_duration_bound(self, app_env):
+        report = asyncio.run(_load(rate=50, duration=0.2, seed=1))
+        assert report.journeys_started >= 1
+        assert report.elapsed >= 0.1
+
+    def test_errors_are_recorded_per_stage(self, app_env):
+        """Shed LLM turns show up as 503s on the SALES_MODE stage"""
+        with patch("main.admission.should_shed", side_effect=lambda needs_llm: needs_llm):
+            report = asyncio.run(_load(rate=200, journeys=5, human_ratio=0, llm_ratio=1, seed=1))
+        assert report.errors["SALES_MODE:llm"] == {"503": 5}
+        assert report.journeys_completed == 0
+
+    def test_needs_a_bound(self):
+        with pytest.raises(ValueError):
+            asyncio.run(_load(rate=1))
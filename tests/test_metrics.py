@@ -0,0 +1,277 @@
+"""
+=========================================================
+LEGALGRAM 2.0 - METRICS TESTS
+=========================================================
+Tests for the histograms, the Prometheus text rendering and
+the /metrics endpoint.
+=========================================================
+"""
+
+import pytest
+import re
+import sys
+import os
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+
+from main import app
+from services.ai_engine import LegalAI
+from services.histogram import Histogram, HistogramFamily
+from services.lifecycle import shutdown
+from services.metrics import MetricFamily, chat_turn_seconds, format_metrics, http_request_seconds
+from services.routing import RouteMetrics
+from services.session_store import InMemorySessionStore, RedisSessionStore, SqliteSessionStore
+from benchmarks.fake_redis import FakeRedis
+
+_SAMPLE = re.compile(r'^(\w+)(?:\{(.*)\})? (\S+)$')
+
+
+def parse_metrics(text):
+    """{(name, ((label, value), ...)): float} for every sample line"""
+    samples = {}
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        name, labels, value = _SAMPLE.match(line).groups()
+        pairs = tuple(sorted(re.findall(r'(\w+)="((?:[^"\\]|\\.)*)"', labels or "")))
+        samples[(name, pairs)] = float(value)
+    return samples
+
+
+def sample(samples, name, **labels):
+    return samples[(name, tuple(sorted(labels.items())))]
+
+
+# =========================================================
+# HISTOGRAMS
+# =========================================================
+
+class TestHistogram:
+    """Tests for Histogram"""
+
+    def test_bucket_upper_bounds_are_inclusive(self):
+        histogram = Histogram((0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 1.0, 3.0):
+            histogram.observe(value)
+        cumulative, total, count = histogram.snapshot()
+        assert cumulative == [2, 4, 5]
+        assert count == 5
+        assert total == pytest.approx(4.65)
+
+    def test_empty(self):
+        assert Histogram((1.0,)).snapshot() == ([0, 0], 0.0, 0)
+
+    def test_family_reuses_children(self):
+        family = HistogramFamily("x_seconds", "x", ("route",), (1.0,))
+        assert family.labels("a") is family.labels("a")
+        family.observe(("a",), 0.5)
+        family.observe(("b",), 2.0)
+        assert [values for values, _ in family.children()] == [("a",), ("b",)]
+        family.reset()
+        assert family.children() == []
+
+
+class TestFormatMetrics:
+    """Tests for the text exposition"""
+
+    def test_help_type_and_samples(self):
+        text = format_metrics([
+            MetricFamily("legalgram_x_total", "counter", "Things", [("", (("kind", "a"),), 3)]),
+            MetricFamily("legalgram_up", "gauge", "Up", [("", (), 1.5)]),
+        ])
+        assert text.splitlines() == [
+            "# HELP legalgram_x_total Things",
+            "# TYPE legalgram_x_total counter",
+            'legalgram_x_total{kind="a"} 3',
+            "# HELP legalgram_up Up",
+            "# TYPE legalgram_up gauge",
+            "legalgram_up 1.5",
+        ]
+
+    def test_label_values_are_escaped(self):
+        text = format_metrics([MetricFamily("m", "gauge", "m", [("", (("v", 'a"b\\c\nd'),), 1)])])
+        assert 'm{v="a\\"b\\\\c\\nd"} 1' in text
+
+    def test_histogram_rendering(self):
+        from services.metrics import _histogram
+
+        family = HistogramFamily("legalgram_t_seconds", "t", ("stage",), (0.1, 1.0))
+        family.observe(("INIT",), 0.05)
+        family.observe(("INIT",), 5.0)
+        samples = parse_metrics(format_metrics([_histogram(family)]))
+        assert sample(samples, "legalgram_t_seconds_bucket", stage="INIT", le="0.1") == 1
+        assert sample(samples, "legalgram_t_seconds_bucket", stage="INIT", le="1.0") == 1
+        assert sample(samples, "legalgram_t_seconds_bucket", stage="INIT", le="+Inf") == 2
+        assert sample(samples, "legalgram_t_seconds_count", stage="INIT") == 2
+        assert sample(samples, "legalgram_t_seconds_sum", stage="INIT") == pytest.approx(5.05)
+
+
+# =========================================================
+# /metrics ENDPOINT
+# =========================================================
+
+@pytest.fixture
+def metrics_env(monkeypatch):
+    """Private store, fresh request histograms and LLM counters, mocked Groq"""
+    monkeypatch.setenv("GROQ_API_KEY", "test-key")
+    shutdown.reset()
+    http_request_seconds.reset()
+    chat_turn_seconds.reset()
+    groq = MagicMock()
+    completion = MagicMock()
+    completion.choices = [MagicMock(message=MagicMock(content="Try our contractor agreement"))]
+    completion.usage = MagicMock(prompt_tokens=400, completion_tokens=30)
+    groq.chat.completions.create.return_value = completion
+    routes = RouteMetrics()
+    store = InMemorySessionStore(max_sessions=2)
+    with patch("main.session_store", store), \
+            patch("services.ai_engine.route_metrics", routes), \
+            patch("services.metrics.route_metrics", routes), \
+            patch.object(LegalAI, "get_groq_client", return_value=groq):
+        yield TestClient(app), store
+
+
+def _chat(client, message, stage, session_id="m1"):
+    return client.post("/api/chat", json={"message": message, "session_id": session_id, "context_stage": stage})
+
+
+def _scrape(client):
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    return parse_metrics(response.text)
+
+
+class TestMetricsEndpoint:
+    """What /metrics reports after real traffic"""
+
+    def test_content_type(self, metrics_env):
+        client, _ = metrics_env
+        response = client.get("/metrics")
+        assert response.headers["content-type"] == "text/plain; version=0.0.4; charset=utf-8"
+
+    def test_turns_by_stage(self, metrics_env):
+        client, _ = metrics_env
+        _chat(client, "hi", "INIT")
+        _chat(client, "my name is Al", "CAPTURE_NAME")
+        _chat(client, "2", "TRIAGE")
+        _chat(client, "I need an NDA", "SALES_MODE")
+        _chat(client, "I need a lease agreement", "INIT")  # continues from the stored stage
+        samples = _scrape(client)
+        assert sample(samples, "legalgram_chat_turn_duration_seconds_count", stage="SALES_MODE", status="200") == 2
+        assert sample(samples, "legalgram_chat_turn_duration_seconds_count", stage="TRIAGE", status="200") == 1
+        assert sample(
+            samples, "legalgram_http_request_duration_seconds_count", method="POST", route="/api/chat", status="200"
+        ) == 5
+
+    def test_route_templates_not_raw_paths(self, metrics_env):
+        client, _ = metrics_env
+        _chat(client, "hi", "INIT", session_id="abc")
+        client.get("/api/session/abc")
+        client.get("/api/session/missing")
+        client.get("/no-such-page")
+        samples = _scrape(client)
+        route = "/api/session/{session_id}"
+        assert sample(samples, "legalgram_http_request_duration_seconds_count", method="GET", route=route, status="200") == 1
+        assert sample(samples, "legalgram_http_request_duration_seconds_count", method="GET", route=route, status="404") == 1
+        assert sample(
+            samples, "legalgram_http_request_duration_seconds_count", method="GET", route="unmatched", status="404"
+        ) == 1
+        assert not any("abc" in str(key) for key in samples)
+
+    def test_refused_turns_keep_their_stage(self, metrics_env):
+        client, _ = metrics_env
+        with patch("main.admission.should_shed", return_value=True):
+            assert _chat(client, "which form do I need to hire a freelancer?", "SALES_MODE").status_code == 503
+        samples = _scrape(client)
+        assert sample(samples, "legalgram_chat_turn_duration_seconds_count", stage="SALES_MODE", status="503") == 1
+
+    def test_unknown_stages_share_one_label(self, metrics_env):
+        client, _ = metrics_env
+        for n in range(50):
+            assert _chat(client, "hi", f"stage-{n}", session_id=f"u{n}").status_code == 200
+        assert [labels for labels, _ in chat_turn_seconds.children()] == [("other", "200")]
+        samples = _scrape(client)
+        assert sample(samples, "legalgram_chat_turn_duration_seconds_count", stage="other", status="200") == 50
+
+    def test_llm_calls(self, metrics_env):
+        client, _ = metrics_env
+        _chat(client, "which form do I need to hire a freelancer?", "SALES_MODE")
+        samples = _scrape(client)
+        assert sample(samples, "legalgram_llm_calls_total", route="short_answer") == 1
+        assert sample(samples, "legalgram_llm_tokens_total", route="short_answer", type="prompt") == 400
+        assert sample(samples, "legalgram_llm_tokens_total", route="short_answer", type="completion") == 30
+        assert sample(
+            samples, "legalgram_llm_call_duration_seconds_count", route="short_answer", model="llama3-8b-8192"
+        ) == 1
+        assert sample(samples, "legalgram_llm_errors_total", route="short_answer") == 0
+
+    def test_sessions_and_evictions(self, metrics_env):
+        client, _ = metrics_env
+        for i in range(3):
+            _chat(client, "hi", "INIT", session_id=f"s{i}")
+        samples = _scrape(client)
+        assert sample(samples, "legalgram_sessions") == 2
+        assert sample(samples, "legalgram_session_evictions_total", reason="capacity") == 1
+
+    def test_in_flight_gauges(self, metrics_env):
+        client, _ = metrics_env
+        samples = _scrape(client)
+        assert sample(samples, "legalgram_in_flight", kind="http_requests") == 1  # the scrape itself
+        assert sample(samples, "legalgram_in_flight", kind="llm_calls") == 0
+        assert sample(samples, "legalgram_draining") == 0
+
+    def test_idempotency_cache(self, metrics_env):
+        client, _ = metrics_env
+        body = {"message": "hi", "session_id": "idem", "context_stage": "INIT"}
+        before = _scrape(client)
+        for _ in range(3):
+            client.post("/api/chat", json=body, headers={"Idempotency-Key": "k-metrics"})
+        after = _scrape(client)
+        hits = sample(after, "legalgram_cache_requests_total", cache="idempotency", result="hit")
+        misses = sample(after, "legalgram_cache_requests_total", cache="idempotency", result="miss")
+        assert hits - sample(before, "legalgram_cache_requests_total", cache="idempotency", result="hit") == 2
+        assert misses - sample(before, "legalgram_cache_requests_total", cache="idempotency", result="miss") == 1
+        assert sample(after, "legalgram_cache_hit_ratio", cache="idempotency") == pytest.approx(hits / (hits + misses))
+
+    def test_sqlite_session_cache(self, metrics_env, tmp_path):
+        client, _ = metrics_env
+        store = SqliteSessionStore(str(tmp_path / "sessions.db"), cache_size=1)
+        with patch("main.session_store", store):
+            _chat(client, "hi", "INIT", session_id="a")
+            _chat(client, "my name is Al", "CAPTURE_NAME", session_id="a")
+            _chat(client, "hi", "INIT", session_id="b")
+            _chat(client, "my name is Bo", "CAPTURE_NAME", session_id="a")
+            samples = _scrape(client)
+        store.close()
+        assert sample(samples, "legalgram_cache_requests_total", cache="session", result="hit") == 1
+        assert sample(samples, "legalgram_cache_requests_total", cache="session", result="miss") == 1
+        assert sample(samples, "legalgram_cache_evictions_total", cache="session") == 2
+        assert sample(samples, "legalgram_cache_hit_ratio", cache="session") == 0.5
+        assert sample(samples, "legalgram_sessions") == 2
+
+    def test_redis_store_reports_sessions(self, metrics_env):
+        """Redis counts sessions from its index, without a keyspace SCAN"""
+        client, _ = metrics_env
+        store = RedisSessionStore(FakeRedis())
+        with patch("main.session_store", store):
+            _chat(client, "hi", "INIT", session_id="a")
+            _chat(client, "hi", "INIT", session_id="b")
+            samples = _scrape(client)
+            assert client.get("/api/status").json()["active_sessions"] == 2
+        assert sample(samples, "legalgram_sessions") == 2
+
+    def test_uncounted_store_skips_session_gauge(self, metrics_env):
+        """A store that cannot count leaves the gauge and the status field out"""
+        client, _ = metrics_env
+        with patch("main.session_store.count", return_value=None):
+            body = client.get("/metrics").text
+            assert "active_sessions" not in client.get("/api/status").json()
+        assert "# TYPE legalgram_sessions gauge" in body
+        assert not any(line.startswith("legalgram_sessions ") for line in body.splitlines())
+
+    def test_not_in_openapi_schema(self, metrics_env):
+        client, _ = metrics_env
+        assert "/metrics" not in client.get("/openapi.json").json()["paths"]
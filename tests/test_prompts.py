@@ -0,0 +1,214 @@
+"""
+=========================================================
+LEGALGRAM 2.0 - PROMPT ASSEMBLY TESTS
+=========================================================
+Tests for token-budgeted multi-turn prompts in SALES_MODE.
+=========================================================
+"""
+
+import pytest
+import sys
+import os
+import uuid
+from fastapi.testclient import TestClient
+from unittest.mock import patch, MagicMock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import app
+from services import ai_engine
+from services.ai_engine import LegalAI
+from services.prompts import (
+    ConversationHistory, SAFETY_MARGIN_TOKENS, build_chat_messages, pack_history
+)
+from services.records import MessageRecord
+from services.session_store import InMemorySessionStore
+from services.tokens import estimate_tokens
+
+
+def _history(turns, reply="Here is a long answer about documents. " * 10, summary=""):
+    messages = []
+    for i in range(turns):
+        messages.append(MessageRecord("user", f"question {i}", float(i)))
+        messages.append(MessageRecord("assistant", f"answer {i}: {reply}", float(i)))
+    return ConversationHistory(tuple(messages), summary)
+
+
+def _prompt_tokens(messages):
+    return sum(estimate_tokens(m["content"]) + 4 for m in messages)
+
+
+# =========================================================
+# BUILDER TESTS
+# =========================================================
+
+class TestBuildChatMessages:
+    """Tests for build_chat_messages()"""
+
+    def test_without_history(self):
+        messages, max_tokens = build_chat_messages("system", "hello")
+        assert messages == [
+            {"role": "system", "content": "system"},
+            {"role": "user", "content": "hello"}
+        ]
+        assert max_tokens == 600
+
+    def test_history_in_order_before_current_message(self):
+        messages, _ = build_chat_messages("system", "now", _history(2))
+        assert [m["role"] for m in messages] == ["system", "user", "assistant", "user", "assistant", "user"]
+        assert messages[1]["content"] == "question 0"
+        assert messages[-1]["content"] == "now"
+
+    def test_newest_turns_win_when_budget_is_tight(self):
+        messages, _ = build_chat_messages("system", "now", _history(30), history_budget=200)
+        contents = " ".join(m["content"] for m in messages)
+        assert "question 29" in contents
+        assert "question 0" not in contents
+        assert _prompt_tokens(messages[1:-1]) <= 200
+
+    def test_long_replies_are_clipped(self):
+        messages, _ = build_chat_messages("system", "now", _history(1, reply="x" * 20000))
+        assert estimate_tokens(messages[2]["content"]) <= 160
+
+    def test_summary_included_when_room(self):
+        history = ConversationHistory((), "User: wanted a lease\nAssistant: pitched lease")
+        messages, _ = build_chat_messages("system", "now", history)
+        assert messages[1]["role"] == "system"
+        assert "wanted a lease" in messages[1]["content"]
+
+    def test_summary_keeps_newest_lines(self):
+        summary = "\n".join(f"User: topic {i}" for i in range(200))
+        history = ConversationHistory((), summary)
+        messages, _ = build_chat_messages("system", "now", history, history_budget=60)
+        assert "topic 199" in messages[1]["content"]
+        assert "topic 0\n" not in messages[1]["content"]
+
+    @pytest.mark.parametrize("max_output", [600, 4000, 8000])
+    def test_never_exceeds_context(self, max_output):
+        """History shrinks to keep reply headroom; the total stays inside 8192"""
+        system = "s " * 2000
+        messages, max_tokens = build_chat_messages(
+            system, "now", _history(50), history_budget=8192, max_output_tokens=max_output
+        )
+        assert _prompt_tokens(messages) + max_tokens <= 8192 - SAFETY_MARGIN_TOKENS
+        assert max_tokens >= 1
+
+    def test_reply_headroom_is_reserved(self):
+        """With room to spare, the reply gets its full max_tokens"""
+        _, max_tokens = build_chat_messages("system", "now", _history(50), history_budget=4000)
+        assert max_tokens == 600
+
+    def test_pack_history_respects_budget(self):
+        packed = pack_history(_history(20, summary="User: old stuff"), 300)
+        assert _prompt_tokens(packed) <= 300
+
+
+# =========================================================
+# ENGINE + ENDPOINT TESTS
+# =========================================================
+
+@pytest.fixture
+def groq():
+    with patch.object(LegalAI, "get_groq_client") as get_client:
+        client = MagicMock()
+        client.chat.completions.create.return_value.choices = [
+            MagicMock(message=MagicMock(content="You want an NDA"))
+        ]
+        get_client.return_value = client
+        yield client
+
+
+class TestSalesModeContext:
+    """SALES_MODE sends earlier turns to the LLM"""
+
+    def test_process_flow_sends_history(self, groq):
+        LegalAI.process_flow("what about for contractors?", "Ann", "SALES_MODE", "s", history=_history(1))
+        kwargs = groq.chat.completions.create.call_args.kwargs
+        contents = [m["content"] for m in kwargs["messages"]]
+        assert "question 0" in contents
+        # Short follow-up: the short_answer route's reply budget
+        assert kwargs["max_tokens"] == 200
+
+    def test_chat_endpoint_threads_session_history(self, groq, monkeypatch):
+        """A follow-up turn sees the previous SALES_MODE exchange"""
+        monkeypatch.setenv("GROQ_API_KEY", "test-key")
+        session_id = str(uuid.uuid4())
+        with patch("main.session_store", InMemorySessionStore()):
+            client = TestClient(app)
+            for text in ["hi", "Ann", "2", "I am hiring a freelancer", "what should it cover?"]:
+                client.post("/api/chat", json={"message": text, "session_id": session_id})
+        messages = groq.chat.completions.create.call_args.kwargs["messages"]
+        contents = [m["content"] for m in messages]
+        assert "I am hiring a freelancer" in contents
+        assert "You want an NDA" in contents
+        assert messages[-1]["content"] == "what should it cover?"
+
+
+# =========================================================
+# STATIC SYSTEM PROMPT TESTS
+# =========================================================
+
+class TestStaticSystemPrompt:
+    """The SALES_MODE system prompt is identical for every request"""
+
+    def test_same_prompt_for_every_user(self, groq):
+        LegalAI.process_flow("hiring a designer", "Ann", "SALES_MODE", "s1")
+        first = groq.chat.completions.create.call_args.kwargs["messages"]
+        LegalAI.process_flow("moving into a flat", "Bob", "SALES_MODE", "s2")
+        second = groq.chat.completions.create.call_args.kwargs["messages"]
+        assert first[0] == second[0]
+        assert "Ann" not in first[0]["content"]
+        assert "hiring a designer" not in first[0]["content"]
+
+    def test_user_context_in_separate_message(self, groq):
+        LegalAI.process_flow("hiring a designer", "Ann", "SALES_MODE", "s1")
+        messages = groq.chat.completions.create.call_args.kwargs["messages"]
+        assert messages[1]["role"] == "system"
+        assert "Ann" in messages[1]["content"]
+        # The query is sent once, as the user message
+        assert sum("hiring a designer" in m["content"] for m in messages) == 1
+
+    def test_built_once_per_catalog_version(self):
+        first, digest = LegalAI.sales_system_prompt()
+        again, same_digest = LegalAI.sales_system_prompt()
+        assert again is first
+        assert same_digest == digest
+
+    def test_rebuilt_when_catalog_changes(self, monkeypatch):
+        prompt, digest = LegalAI.sales_system_prompt()
+        catalog = dict(ai_engine.DOCUMENT_DATABASE)
+        catalog["bill of sale"] = {"full_name": "Bill of Sale", "category": "Property Matters"}
+        monkeypatch.setattr(ai_engine, "DOCUMENT_DATABASE", catalog)
+        LegalAI.build_catalog_index()
+        try:
+            new_prompt, new_digest = LegalAI.sales_system_prompt()
+        finally:
+            monkeypatch.undo()
+            LegalAI.build_catalog_index()
+        assert "Bill of Sale" in new_prompt
+        assert new_digest != digest
+        assert LegalAI.sales_system_prompt()[1] == digest
+
+    def test_catalog_shortnames_listed(self):
+        prompt, _ = LegalAI.sales_system_prompt()
+        assert "NDA (Non-Disclosure Agreement)" in prompt
+        assert "AVAILABLE DOCUMENTS" in prompt
+
+    def test_featured_list_is_capped(self, monkeypatch):
+        """Large catalogs do not blow up the prompt"""
+        catalog = {
+            f"doc{i}": {"full_name": f"Document {i}", "category": "Misc"} for i in range(5000)
+        }
+        monkeypatch.setattr(ai_engine, "DOCUMENT_DATABASE", catalog)
+        LegalAI.build_catalog_index()
+        try:
+            prompt, _ = LegalAI.sales_system_prompt()
+        finally:
+            monkeypatch.undo()
+            LegalAI.build_catalog_index()
+        featured = [line for line in prompt.splitlines() if line.endswith(" - Misc")]
+        assert len(featured) == ai_engine.PROMPT_FEATURED_DOCUMENTS
+
+    def test_status_reports_prompt_hash(self):
+        data = TestClient(app).get("/api/status").json()
+        assert data["prompt"]["system_prompt_sha256"] == LegalAI.sales_system_prompt()[1]
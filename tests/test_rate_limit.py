@@ -0,0 +1,183 @@
+"""
+=========================================================
+LEGALGRAM 2.0 - RATE LIMITING TESTS
+=========================================================
+Tests for the GCRA limiter and the 429 responses from
+/api/chat.
+=========================================================
+"""
+
+import pytest
+import sys
+import os
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import app
+from services.rate_limit import GCRALimiter, RateLimiter, request_identities
+
+
+@pytest.fixture
+def client():
+    """Create test client"""
+    return TestClient(app)
+
+
+# =========================================================
+# GCRA TESTS
+# =========================================================
+
+class TestGCRALimiter:
+    """Tests for the GCRA algorithm"""
+
+    def test_allows_burst_then_rejects(self):
+        """Up to `limit` requests pass at once, the next is rejected"""
+        limiter = GCRALimiter(limit=5, period=60.0)
+        for _ in range(5):
+            assert limiter.peek("k", 0.0).allowed
+            limiter.consume("k", 0.0)
+        assert not limiter.peek("k", 0.0).allowed
+
+    def test_remaining_counts_down(self):
+        """Remaining reflects consumed capacity"""
+        limiter = GCRALimiter(limit=3, period=60.0)
+        assert limiter.peek("k", 0.0).remaining == 2
+        limiter.consume("k", 0.0)
+        assert limiter.peek("k", 0.0).remaining == 1
+
+    def test_capacity_refills_over_time(self):
+        """One emission interval later a request is allowed again"""
+        limiter = GCRALimiter(limit=2, period=60.0)
+        limiter.consume("k", 0.0)
+        limiter.consume("k", 0.0)
+        assert not limiter.peek("k", 0.0).allowed
+        assert limiter.peek("k", 30.0).allowed
+
+    def test_retry_after(self):
+        """Retry-After is the time until the next slot frees up"""
+        limiter = GCRALimiter(limit=2, period=60.0)
+        limiter.consume("k", 0.0)
+        limiter.consume("k", 0.0)
+        decision = limiter.peek("k", 10.0)
+        assert decision.retry_after == pytest.approx(20.0)
+
+    def test_keys_are_independent(self):
+        """One key's usage does not affect another"""
+        limiter = GCRALimiter(limit=1, period=60.0)
+        limiter.consume("a", 0.0)
+        assert not limiter.peek("a", 0.0).allowed
+        assert limiter.peek("b", 0.0).allowed
+
+    def test_key_table_is_bounded(self):
+        """The LRU table never exceeds max_keys"""
+        limiter = GCRALimiter(limit=1, period=60.0, max_keys=100)
+        for i in range(1000):
+            limiter.consume(f"k{i}", 0.0)
+        assert len(limiter) == 100
+
+    def test_headers(self):
+        """429 headers include Retry-After and reset"""
+        limiter = GCRALimiter(limit=1, period=60.0)
+        limiter.consume("k", 0.0)
+        headers = limiter.peek("k", 0.0).headers()
+        assert headers["X-RateLimit-Limit"] == "1"
+        assert headers["X-RateLimit-Remaining"] == "0"
+        assert int(headers["Retry-After"]) >= 1
+        assert int(headers["X-RateLimit-Reset"]) >= 1
+
+
+# =========================================================
+# POLICY TESTS
+# =========================================================
+
+class TestRateLimiter:
+    """Tests for the combined policy"""
+
+    def test_enabled_by_default(self, monkeypatch):
+        """Unset limits fall back to conservative defaults"""
+        for name in ("RATE_LIMIT_PER_MINUTE", "RATE_LIMIT_LLM_PER_MINUTE", "RATE_LIMIT_PER_HOUR"):
+            monkeypatch.delenv(name, raising=False)
+        limiter = RateLimiter()
+        assert [gcra.limit for gcra in limiter.deterministic] == [30]
+        assert [(gcra.limit, gcra.period) for gcra in limiter.llm] == [(10, 60.0), (200, 3600.0)]
+
+    def test_zero_disables(self, monkeypatch):
+        """All limits at 0 means everything passes"""
+        for name in ("RATE_LIMIT_PER_MINUTE", "RATE_LIMIT_LLM_PER_MINUTE", "RATE_LIMIT_PER_HOUR"):
+            monkeypatch.setenv(name, "0")
+        limiter = RateLimiter()
+        assert not limiter.enabled
+        assert limiter.check(["ip:1"], needs_llm=True) is None
+
+    def test_llm_and_deterministic_budgets_are_separate(self):
+        """Exhausting the LLM budget leaves deterministic turns alone"""
+        limiter = RateLimiter(per_minute=100, llm_per_minute=1, llm_per_hour=0)
+        assert limiter.check(["ip:1"], needs_llm=True, now=0.0) is None
+        assert limiter.check(["ip:1"], needs_llm=True, now=0.0) is not None
+        assert limiter.check(["ip:1"], needs_llm=False, now=0.0) is None
+
+    def test_any_identity_can_trip_the_limit(self):
+        """A new IP reusing a hot session id is still limited"""
+        limiter = RateLimiter(per_minute=0, llm_per_minute=1, llm_per_hour=0)
+        limiter.check(["ip:1", "sid:s"], needs_llm=True, now=0.0)
+        assert limiter.check(["ip:2", "sid:s"], needs_llm=True, now=0.0) is not None
+
+    def test_rejection_consumes_nothing(self):
+        """A rejected request does not use up other identities' budgets"""
+        limiter = RateLimiter(per_minute=0, llm_per_minute=1, llm_per_hour=0)
+        limiter.check(["sid:s"], needs_llm=True, now=0.0)
+        limiter.check(["ip:fresh", "sid:s"], needs_llm=True, now=0.0)
+        assert limiter.check(["ip:fresh"], needs_llm=True, now=0.0) is None
+
+    def test_hourly_quota(self):
+        """The hourly limit applies on top of the per-minute one"""
+        limiter = RateLimiter(per_minute=0, llm_per_minute=100, llm_per_hour=2)
+        assert limiter.check(["ip:1"], needs_llm=True, now=0.0) is None
+        assert limiter.check(["ip:1"], needs_llm=True, now=120.0) is None
+        assert limiter.check(["ip:1"], needs_llm=True, now=240.0) is not None
+
+    def test_request_identities(self):
+        """Missing identities are skipped"""
+        assert request_identities("1.2.3.4", None, None) == ["ip:1.2.3.4"]
+        assert request_identities("1.2.3.4", "s", "k") == ["ip:1.2.3.4", "sid:s", "key:k"]
+
+
+# =========================================================
+# ENDPOINT TESTS
+# =========================================================
+
+class TestChatRateLimiting:
+    """Tests for 429 responses from /api/chat"""
+
+    def test_llm_turns_limited(self, client):
+        """SALES_MODE LLM turns over budget get 429 with reset headers"""
+        limiter = RateLimiter(per_minute=0, llm_per_minute=2, llm_per_hour=0)
+        payload = {"message": "what protects my startup idea?", "session_id": "rl-1",
+                   "context_stage": "SALES_MODE"}
+        with patch("main.rate_limiter", limiter):
+            statuses = [client.post("/api/chat", json=payload).status_code for _ in range(3)]
+            response = client.post("/api/chat", json=payload)
+        assert statuses == [200, 200, 429]
+        assert response.status_code == 429
+        assert "retry-after" in response.headers
+        assert response.headers["x-ratelimit-remaining"] == "0"
+
+    def test_deterministic_turns_use_their_own_budget(self, client):
+        """Hitting the LLM limit does not block triage"""
+        limiter = RateLimiter(per_minute=100, llm_per_minute=1, llm_per_hour=0)
+        with patch("main.rate_limiter", limiter):
+            client.post("/api/chat", json={"message": "startup idea?", "context_stage": "SALES_MODE"})
+            client.post("/api/chat", json={"message": "startup idea?", "context_stage": "SALES_MODE"})
+            response = client.post("/api/chat", json={"message": "2", "user_name": "Ann",
+                                                      "context_stage": "TRIAGE"})
+        assert response.status_code == 200
+
+    def test_api_key_identity(self, client):
+        """X-API-Key is used as an extra identity"""
+        limiter = RateLimiter(per_minute=1, llm_per_minute=0, llm_per_hour=0)
+        with patch("main.rate_limiter", limiter), \
+                patch("main.request_identities", wraps=request_identities) as identities:
+            client.post("/api/chat", json={"message": "hi"}, headers={"X-API-Key": "partner"})
+        assert identities.call_args.args[2] == "partner"
@@ -0,0 +1,96 @@
+"""
+=========================================================
+LEGALGRAM 2.0 - SESSION RECORD TESTS
+=========================================================
+Tests for the slotted session/message records.
+=========================================================
+"""
+
+import pytest
+import sys
+import os
+import json
+import uuid
+from datetime import datetime
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import app
+from services.records import (
+    MessageRecord, SessionRecord, iso_timestamp, parse_timestamp
+)
+from services.session_store import InMemorySessionStore
+
+
+# =========================================================
+# RECORD TESTS
+# =========================================================
+
+class TestRecords:
+    """Tests for MessageRecord and SessionRecord"""
+
+    @pytest.mark.parametrize("record", [MessageRecord("user", "hi"), SessionRecord()])
+    def test_no_instance_dict(self, record):
+        assert not hasattr(record, "__dict__")
+
+    def test_roles_and_stages_interned(self):
+        role = "".join(["assis", "tant"])
+        stage = "".join(["SALES", "_MODE"])
+        assert MessageRecord(role, "x").role is MessageRecord("assistant", "y").role
+        assert SessionRecord(stage=stage).stage is SessionRecord(stage="SALES_MODE").stage
+
+    def test_numeric_timestamps(self):
+        message = MessageRecord("user", "hi")
+        assert isinstance(message.timestamp, float)
+        assert isinstance(SessionRecord().created_at, float)
+
+    def test_round_trip(self):
+        session = SessionRecord("Ann", "TRIAGE", [MessageRecord("user", "hi", 1.5)], 1.0)
+        restored = SessionRecord.from_dict(json.loads(json.dumps(session.to_dict())))
+        assert restored.user_name == "Ann"
+        assert restored.stage == "TRIAGE"
+        assert restored.messages == session.messages
+        assert restored.created_at == 1.0
+
+    def test_from_dict_accepts_iso_timestamps(self):
+        """Snapshots written before records used ISO strings"""
+        data = {
+            "user_name": None,
+            "stage": "INIT",
+            "messages": [{"role": "user", "content": "hi", "timestamp": "2024-01-01T10:00:00"}],
+            "created_at": "2024-01-01T09:59:59.500000"
+        }
+        session = SessionRecord.from_dict(data)
+        assert iso_timestamp(session.messages[0].timestamp) == "2024-01-01T10:00:00"
+        assert iso_timestamp(session.created_at) == "2024-01-01T09:59:59.500000"
+
+    @pytest.mark.parametrize("value,expected", [(None, 0.0), ("", 0.0), (5, 5.0), ("7.25", 7.25)])
+    def test_parse_timestamp(self, value, expected):
+        assert parse_timestamp(value) == expected
+
+    def test_copy_has_own_message_list(self):
+        session = SessionRecord(messages=[MessageRecord("user", "hi")])
+        clone = session.copy()
+        clone.messages.append(MessageRecord("assistant", "yo"))
+        assert len(session.messages) == 1
+
+
+# =========================================================
+# API BOUNDARY TESTS
+# =========================================================
+
+class TestSessionEndpointFormat:
+    """Timestamps are ISO-8601 only where the API returns them"""
+
+    def test_created_at_is_iso(self):
+        store = InMemorySessionStore()
+        with patch("main.session_store", store):
+            client = TestClient(app)
+            session_id = str(uuid.uuid4())
+            client.post("/api/chat", json={"message": "hi", "session_id": session_id})
+            data = client.get(f"/api/session/{session_id}").json()
+        datetime.fromisoformat(data["created_at"])
+        assert isinstance(store.get(session_id).created_at, float)
+        assert data["message_count"] == 2
@@ -0,0 +1,159 @@
+"""
+=========================================================
+LEGALGRAM 2.0 - TRACE REPLAY TESTS
+=========================================================
+Tests for benchmarks/replay.py against the in-process app
+with a mocked LLM.
+=========================================================
+"""
+
+import pytest
+import asyncio
+import json
+import sys
+import os
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.loadtest import in_process_client
+from benchmarks.replay import (
+    effective_stages, group_sessions, load_trace, recorded_report, run_replay, synthesize_message
+)
+from services.ai_engine import LegalAI
+from services.lifecycle import shutdown
+from services.routing import ROUTES, classify_query
+from services.session_store import InMemorySessionStore
+
+
+def _session(token, start, doc_turn=True, llm_turns=1, human=False, gap=0.01):
+    turns = [
+        {"st": "INIT", "ns": "CAPTURE_NAME"},
+        {"st": "CAPTURE_NAME", "ns": "TRIAGE"},
+        {"st": "TRIAGE", "ns": "HUMAN_ROUTE" if human else "SALES_MODE"},
+    ]
+    if human:
+        turns.append({"st": "HUMAN_ROUTE", "ns": "HUMAN_ROUTE"})
+    else:
+        if doc_turn:
+            turns.append({"st": "SALES_MODE", "ns": "SALES_MODE", "doc": "Non-Disclosure Agreement"})
+        turns += [{"st": "SALES_MODE", "ns": "SALES_MODE", "route": "comparison", "len": 120, "llm_ms": 300.0}] * llm_turns
+    return [
+        {"t": start + i * gap, "s": token, "len": 5, "code": 200, "ms": 2.0, **turn}
+        for i, turn in enumerate(turns)
+    ]
+
+
+@pytest.fixture
+def trace(tmp_path):
+    records = _session("aaa", 100.0) + _session("bbb", 100.005, human=True) + _session("ccc", 100.02, llm_turns=2)
+    path = tmp_path / "turns.jsonl"
+    with open(path, "w") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+        f.write("not json\n")
+    return str(path)
+
+
+@pytest.fixture
+def app_env(monkeypatch):
+    monkeypatch.setenv("GROQ_API_KEY", "test-key")
+    client = MagicMock()
+    client.chat.completions.create.return_value.choices = [MagicMock(message=MagicMock(content="Try our NDA"))]
+    shutdown.reset()
+    with patch("main.session_store", InMemorySessionStore()), \
+            patch.object(LegalAI, "get_groq_client", return_value=client):
+        yield client
+
+
+async def _replay(records, speed):
+    async with in_process_client() as client:
+        return await run_replay(client, records, speed)
+
+
+# =========================================================
+# TRACES
+# =========================================================
+
+class TestTraceFiles:
+    """Loading and grouping recorded turns"""
+
+    def test_load_skips_bad_lines_and_sorts(self, trace):
+        records = load_trace(trace)
+        assert len(records) == 5 + 4 + 6
+        assert [r["t"] for r in records] == sorted(r["t"] for r in records)
+
+    def test_group_by_first_turn(self, trace):
+        assert list(group_sessions(load_trace(trace))) == ["aaa", "bbb", "ccc"]
+
+    def test_effective_stage_follows_session(self):
+        """Clients that always send INIT continue from the stored stage"""
+        turns = [{"st": "INIT", "ns": "CAPTURE_NAME"}, {"st": "INIT", "ns": "TRIAGE"}, {"st": "INIT"}]
+        assert effective_stages(turns) == ["INIT", "CAPTURE_NAME", "TRIAGE"]
+
+    def test_recorded_report(self, trace):
+        report = recorded_report(load_trace(trace))
+        assert report.turns == 15
+        assert report.llm_calls == 3
+        assert set(report.latencies) == {
+            "INIT", "CAPTURE_NAME", "TRIAGE", "HUMAN_ROUTE", "SALES_MODE:catalog", "SALES_MODE:llm"
+        }
+
+
+class TestSynthesizeMessage:
+    """Synthetic messages take the recorded path"""
+
+    @pytest.mark.parametrize("next_stage", ["HUMAN_ROUTE", "SALES_MODE", "TRIAGE"])
+    def test_triage_choice(self, next_stage):
+        message = synthesize_message({"ns": next_stage}, "TRIAGE")
+        assert LegalAI.process_flow(message, "A", "TRIAGE", "x")["new_stage"] == next_stage
+
+    @pytest.mark.parametrize("next_stage", ["HUMAN_ROUTE", "SALES_MODE"])
+    def test_human_route_choice(self, next_stage):
+        message = synthesize_message({"ns": next_stage}, "HUMAN_ROUTE")
+        assert LegalAI.process_flow(message, "A", "HUMAN_ROUTE", "x")["new_stage"] == next_stage
+
+    def test_catalog_turn(self):
+        message = synthesize_message({"doc": "LLC Operating Agreement"}, "SALES_MODE")
+        assert LegalAI.match_document(message)["full_name"] == "LLC Operating Agreement"
+
+    def test_unknown_document_becomes_llm_turn(self):
+        assert LegalAI.needs_llm(synthesize_message({"doc": "Time Machine Lease"}, "SALES_MODE"), "SALES_MODE")
+
+    @pytest.mark.parametrize("route", ROUTES)
+    @pytest.mark.parametrize("length", [0, 150, 1000])
+    def test_llm_turn_keeps_route(self, route, length):
+        message = synthesize_message({"route": route, "len": length}, "SALES_MODE")
+        assert LegalAI.needs_llm(message, "SALES_MODE")
+        assert classify_query(message) == route
+        assert len(message) <= max(length, 70)
+
+
+# =========================================================
+# REPLAY
+# =========================================================
+
+class TestRunReplay:
+    """Replaying through the in-process app"""
+
+    def test_replays_every_turn(self, trace, app_env):
+        report = asyncio.run(_replay(load_trace(trace), speed=0))
+        assert report.turns == 15
+        assert report.error_count == 0
+        assert report.journeys_completed == 3
+        assert report.llm_calls == 3
+        assert app_env.chat.completions.create.call_count == 3
+        assert report.latencies.keys() == recorded_report(load_trace(trace)).latencies.keys()
+
+    def test_original_timing(self, app_env):
+        records = _session("aaa", 50.0, gap=0.1)
+        report = asyncio.run(_replay(records, speed=1))
+        assert report.elapsed >= 0.35
+
+    def test_compressed_timing(self, app_env):
+        records = _session("aaa", 50.0, gap=1.0)
+        report = asyncio.run(_replay(records, speed=20))
+        assert 0.15 <= report.elapsed < 2.0
+
+    def test_empty_trace(self):
+        assert asyncio.run(run_replay(MagicMock(), [], 1)).turns == 0
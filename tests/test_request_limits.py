@@ -0,0 +1,139 @@
+"""
+=========================================================
+LEGALGRAM 2.0 - REQUEST SIZE LIMIT TESTS
+=========================================================
+Tests for early body-size rejection, message length caps
+and LLM input truncation.
+=========================================================
+"""
+
+import pytest
+import sys
+import os
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from unittest.mock import patch, MagicMock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import app, MAX_MESSAGE_CHARS
+from services.ai_engine import LegalAI, LLM_MAX_INPUT_TOKENS
+from services.request_limits import RequestSizeLimitMiddleware
+from services.tokens import estimate_tokens, truncate_to_tokens
+
+
+@pytest.fixture
+def client():
+    """Create test client"""
+    return TestClient(app)
+
+
+@pytest.fixture
+def echo_client():
+    """Tiny app behind a 100-byte limit that reports how much body it read"""
+    echo = FastAPI()
+
+    @echo.post("/echo")
+    async def read_body(request: Request):
+        return {"size": len(await request.body())}
+
+    echo.add_middleware(RequestSizeLimitMiddleware, max_body_bytes=100)
+    return TestClient(echo)
+
+
+# =========================================================
+# MIDDLEWARE TESTS
+# =========================================================
+
+class TestRequestSizeLimitMiddleware:
+    """Tests for the ASGI body-size limit"""
+
+    def test_small_body_passes(self, echo_client):
+        response = echo_client.post("/echo", content=b"x" * 50)
+        assert response.status_code == 200
+        assert response.json()["size"] == 50
+
+    def test_declared_oversize_rejected(self, echo_client):
+        """Content-Length over the cap is refused without reading the body"""
+        response = echo_client.post("/echo", content=b"x" * 101)
+        assert response.status_code == 413
+
+    def test_streamed_oversize_rejected(self, echo_client):
+        """Chunked bodies are cut off once they pass the cap"""
+        def chunks():
+            for _ in range(10):
+                yield b"x" * 30
+        response = echo_client.post("/echo", content=chunks())
+        assert response.status_code == 413
+
+    def test_get_requests_unaffected(self, client):
+        assert client.get("/").status_code == 200
+
+
+# =========================================================
+# CHAT ENDPOINT TESTS
+# =========================================================
+
+class TestChatSizeLimits:
+    """Tests for /api/chat payload limits"""
+
+    def test_huge_payload_rejected_before_parsing(self, client):
+        """A multi-megabyte body never reaches Pydantic or the engine"""
+        with patch("main.LegalAI") as engine:
+            response = client.post("/api/chat", json={"message": "a" * 2_000_000})
+        assert response.status_code == 413
+        engine.process_flow.assert_not_called()
+
+    def test_message_over_char_limit(self, client):
+        """Messages over MAX_MESSAGE_CHARS fail validation"""
+        response = client.post("/api/chat", json={"message": "a" * (MAX_MESSAGE_CHARS + 1)})
+        assert response.status_code == 422
+
+    def test_message_at_char_limit(self, client):
+        """Messages at the limit are accepted"""
+        response = client.post("/api/chat", json={"message": "a" * MAX_MESSAGE_CHARS})
+        assert response.status_code == 200
+
+    @pytest.mark.parametrize("field,limit", [("session_id", 128), ("user_name", 100)])
+    def test_identifier_limits(self, client, field, limit):
+        payload = {"message": "hi", field: "x" * (limit + 1)}
+        assert client.post("/api/chat", json=payload).status_code == 422
+
+
+# =========================================================
+# TOKEN BUDGET TESTS
+# =========================================================
+
+class TestTokenBudget:
+    """Tests for the local token estimate and LLM truncation"""
+
+    @pytest.mark.parametrize("text,expected", [
+        ("", 0),
+        ("abcd", 1),
+        ("abcde", 2),
+        ("日本語", 3),
+    ])
+    def test_estimate(self, text, expected):
+        assert estimate_tokens(text) == expected
+
+    def test_truncate_noop_when_small(self):
+        assert truncate_to_tokens("short", 100) == "short"
+
+    @pytest.mark.parametrize("text", ["a" * 10000, "日本" * 3000, "word " * 5000])
+    def test_truncate_fits_budget(self, text):
+        truncated = truncate_to_tokens(text, 50)
+        assert estimate_tokens(truncated) <= 50
+        assert text.startswith(truncated)
+
+    def test_llm_receives_truncated_message(self):
+        """Only LLM_MAX_INPUT_TOKENS of the message is sent to Groq"""
+        with patch.object(LegalAI, "get_groq_client") as get_client:
+            groq = MagicMock()
+            groq.chat.completions.create.return_value.choices = [
+                MagicMock(message=MagicMock(content="ok"))
+            ]
+            get_client.return_value = groq
+            LegalAI.process_flow("z" * 100000, "Ann", "SALES_MODE", "s")
+        messages = groq.chat.completions.create.call_args.kwargs["messages"]
+        assert all(estimate_tokens(m["content"]) < LLM_MAX_INPUT_TOKENS + 1000 for m in messages)
+        assert estimate_tokens(messages[-1]["content"]) <= LLM_MAX_INPUT_TOKENS
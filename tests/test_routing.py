@@ -0,0 +1,245 @@
+"""
+=========================================================
+LEGALGRAM 2.0 - LLM ROUTING TESTS
+=========================================================
+Tests for query classification, the route policy table,
+429 fallback and per-route metrics.
+=========================================================
+"""
+
+import pytest
+import sys
+import os
+from fastapi.testclient import TestClient
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import app
+from services import routing
+from services.ai_engine import LegalAI
+from services.routing import (
+    COMPARISON, DEFAULT_MODEL, DEFAULT_ROUTE_POLICIES, EXPLANATION, SHORT_ANSWER,
+    RouteMetrics, RoutePolicy, classify_query, is_rate_limited, load_route_policies
+)
+
+
+class FakeRateLimitError(Exception):
+    """Stand-in shaped like groq.RateLimitError"""
+    status_code = 429
+
+
+class FakeServerError(Exception):
+    status_code = 500
+
+
+# =========================================================
+# CLASSIFIER TESTS
+# =========================================================
+
+class TestClassifyQuery:
+    """Tests for classify_query()"""
+
+    @pytest.mark.parametrize("message", [
+        "which form do I need for a contractor?",
+        "do I need a will",
+        "what document for renting my flat",
+        "hello",
+    ])
+    def test_short_answer(self, message):
+        assert classify_query(message) == SHORT_ANSWER
+
+    @pytest.mark.parametrize("message", [
+        "lease vs rental agreement",
+        "What is the difference between an LLC and a sole proprietorship?",
+        "Should I compare a will and a trust?",
+        "Is a mutual NDA better than a one-way NDA?",
+        "pros and cons of a living trust",
+    ])
+    def test_comparison(self, message):
+        assert classify_query(message) == COMPARISON
+
+    @pytest.mark.parametrize("message", [
+        "Why do I need an operating agreement?",
+        "How does a power of attorney work?",
+        "Can you explain what a non-compete covers",
+        "What happens if my tenant stops paying",
+    ])
+    def test_explanation(self, message):
+        assert classify_query(message) == EXPLANATION
+
+    def test_long_message_is_explanation(self):
+        message = " ".join(["word"] * (routing.SHORT_ANSWER_MAX_WORDS + 1))
+        assert classify_query(message) == EXPLANATION
+
+    def test_comparison_wins_over_explanation(self):
+        assert classify_query("why is a trust better than a will?") == COMPARISON
+
+    def test_whole_words_only(self):
+        """'vs' inside another word does not make a comparison"""
+        assert classify_query("canvs order") == SHORT_ANSWER
+
+
+# =========================================================
+# POLICY TABLE TESTS
+# =========================================================
+
+class TestRoutePolicies:
+    """Tests for load_route_policies()"""
+
+    def test_defaults(self):
+        policies = load_route_policies("", "")
+        assert set(policies) == {SHORT_ANSWER, COMPARISON, EXPLANATION}
+        assert policies[SHORT_ANSWER].max_tokens < policies[EXPLANATION].max_tokens
+        assert policies[EXPLANATION].model == DEFAULT_ROUTE_POLICIES[EXPLANATION].model
+        assert {policy.model for policy in policies.values()} == {DEFAULT_MODEL}
+
+    def test_override_fields(self):
+        policies = load_route_policies('{"short_answer": {"max_tokens": 120, "temperature": 0.1}}', None)
+        assert policies[SHORT_ANSWER].max_tokens == 120
+        assert policies[SHORT_ANSWER].temperature == 0.1
+        assert policies[SHORT_ANSWER].model == DEFAULT_ROUTE_POLICIES[SHORT_ANSWER].model
+
+    def test_fallback_chain(self):
+        policies = load_route_policies("", "m1, m2")
+        assert policies[COMPARISON].fallbacks == ("m1", "m2")
+
+    def test_per_route_fallbacks(self):
+        policies = load_route_policies('{"comparison": {"fallbacks": ["x"]}}', "m1")
+        assert policies[COMPARISON].fallbacks == ("x",)
+        assert policies[SHORT_ANSWER].fallbacks == ("m1",)
+
+    @pytest.mark.parametrize("raw", ["not json", "[1, 2]", '{"short_answer": {"max_tokens": "lots"}}'])
+    def test_bad_config_keeps_defaults(self, raw):
+        policies = load_route_policies(raw, None)
+        assert policies[SHORT_ANSWER].max_tokens == DEFAULT_ROUTE_POLICIES[SHORT_ANSWER].max_tokens
+
+    def test_models_are_deduplicated(self):
+        policy = RoutePolicy("a", 10, 0.5, ("b", "a", "c"))
+        assert policy.models == ("a", "b", "c")
+
+    def test_is_rate_limited(self):
+        assert is_rate_limited(FakeRateLimitError())
+        assert not is_rate_limited(FakeServerError())
+        assert not is_rate_limited(ValueError())
+
+
+# =========================================================
+# ENGINE TESTS
+# =========================================================
+
+@pytest.fixture
+def groq():
+    with patch.object(LegalAI, "get_groq_client") as get_client:
+        client = MagicMock()
+        completion = MagicMock()
+        completion.choices = [MagicMock(message=MagicMock(content="Try our NDA"))]
+        completion.usage = MagicMock(prompt_tokens=400, completion_tokens=30)
+        client.chat.completions.create.return_value = completion
+        get_client.return_value = client
+        yield client
+
+
+@pytest.fixture
+def metrics():
+    fresh = RouteMetrics()
+    with patch("services.ai_engine.route_metrics", fresh):
+        yield fresh
+
+
+@pytest.fixture
+def policies():
+    table = {
+        SHORT_ANSWER: RoutePolicy("small", 150, 0.2, ("backup-1", "backup-2")),
+        COMPARISON: RoutePolicy("large", 500, 0.4, ("backup-1",)),
+        EXPLANATION: RoutePolicy("small", 600, 0.6, ()),
+    }
+    with patch.dict("services.ai_engine.route_policies", table):
+        yield table
+
+
+class TestRoutedCompletion:
+    """SALES_MODE uses the route's policy and falls back on 429"""
+
+    def test_policy_applied(self, groq, metrics, policies):
+        LegalAI.process_flow("lease vs rental agreement", "Ann", "SALES_MODE", "s")
+        kwargs = groq.chat.completions.create.call_args.kwargs
+        assert kwargs["model"] == "large"
+        assert kwargs["temperature"] == 0.4
+        assert kwargs["max_tokens"] == 500
+
+    def test_short_answer_budget(self, groq, metrics, policies):
+        LegalAI.process_flow("which form do I need?", "Ann", "SALES_MODE", "s")
+        kwargs = groq.chat.completions.create.call_args.kwargs
+        assert kwargs["model"] == "small"
+        assert kwargs["max_tokens"] == 150
+
+    def test_output_cap_applies_to_every_route(self, groq, metrics, policies):
+        """LLM_MAX_OUTPUT_TOKENS caps the route's reply budget"""
+        with patch("services.ai_engine.LLM_MAX_OUTPUT_TOKENS", 300):
+            LegalAI.process_flow("lease vs rental agreement", "Ann", "SALES_MODE", "s")
+            LegalAI.process_flow("which form do I need?", "Ann", "SALES_MODE", "s")
+        budgets = [call.kwargs["max_tokens"] for call in groq.chat.completions.create.call_args_list]
+        assert budgets == [300, 150]
+
+    def test_falls_back_on_rate_limit(self, groq, metrics, policies):
+        answer = groq.chat.completions.create.return_value
+        groq.chat.completions.create.side_effect = [FakeRateLimitError(), answer]
+        result = LegalAI.process_flow("which form do I need?", "Ann", "SALES_MODE", "s")
+        assert result["response"] == "Try our NDA"
+        models = [c.kwargs["model"] for c in groq.chat.completions.create.call_args_list]
+        assert models == ["small", "backup-1"]
+        stats = metrics.snapshot()[SHORT_ANSWER]
+        assert stats["rate_limited"] == 1
+        assert stats["fallbacks"] == 1
+        assert stats["models"] == {"backup-1": 1}
+
+    def test_sdk_retries_only_on_last_model(self, groq, metrics, policies):
+        """429s leave the model at once; only the end of the chain keeps SDK retries"""
+        no_retry = MagicMock()
+        no_retry.chat.completions.create.side_effect = FakeRateLimitError()
+        with patch.object(LegalAI, "get_groq_client", side_effect=lambda retries=True: groq if retries else no_retry):
+            result = LegalAI.process_flow("which form do I need?", "Ann", "SALES_MODE", "s")
+        assert result["response"] == "Try our NDA"
+        fast = [c.kwargs["model"] for c in no_retry.chat.completions.create.call_args_list]
+        assert fast == ["small", "backup-1"]
+        assert groq.chat.completions.create.call_args.kwargs["model"] == "backup-2"
+
+    def test_chain_exhausted(self, groq, metrics, policies):
+        groq.chat.completions.create.side_effect = FakeRateLimitError()
+        result = LegalAI.process_flow("which form do I need?", "Ann", "SALES_MODE", "s")
+        assert "high demand" in result["response"]
+        assert groq.chat.completions.create.call_count == 3
+        stats = metrics.snapshot()[SHORT_ANSWER]
+        assert stats["rate_limited"] == 3
+        assert stats["errors"] == 1
+
+    def test_other_errors_do_not_fall_back(self, groq, metrics, policies):
+        groq.chat.completions.create.side_effect = FakeServerError()
+        result = LegalAI.process_flow("which form do I need?", "Ann", "SALES_MODE", "s")
+        assert "high demand" in result["response"]
+        assert groq.chat.completions.create.call_count == 1
+        assert metrics.snapshot()[SHORT_ANSWER]["errors"] == 1
+
+    def test_metrics_use_provider_usage(self, groq, metrics, policies):
+        LegalAI.process_flow("which form do I need?", "Ann", "SALES_MODE", "s")
+        stats = metrics.snapshot()[SHORT_ANSWER]
+        assert stats["calls"] == 1
+        assert stats["prompt_tokens"] == 400
+        assert stats["completion_tokens"] == 30
+        assert stats["latency_ms_max"] >= stats["latency_ms_avg"] >= 0
+
+    def test_metrics_estimate_without_usage(self, groq, metrics, policies):
+        groq.chat.completions.create.return_value.usage = None
+        LegalAI.process_flow("which form do I need?", "Ann", "SALES_MODE", "s")
+        stats = metrics.snapshot()[SHORT_ANSWER]
+        assert stats["prompt_tokens"] > 0
+        assert stats["completion_tokens"] > 0
+
+
+class TestRouteMetricsEndpoint:
+    """/api/status exposes per-route metrics"""
+
+    def test_status_includes_routes(self):
+        data = TestClient(app).get("/api/status").json()
+        assert isinstance(data["llm_routes"], dict)
@@ -0,0 +1,131 @@
+"""
+=========================================================
+LEGALGRAM 2.0 - PRODUCTION LAUNCHER TESTS
+=========================================================
+Tests for the server.py uvicorn configuration.
+=========================================================
+"""
+
+import pytest
+import sys
+import os
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import server
+
+
+# =========================================================
+# CONFIGURATION TESTS
+# =========================================================
+
+class TestServerConfig:
+    """Tests for build_server_config()"""
+
+    def test_reload_always_disabled(self):
+        """Production launcher never runs the file watcher"""
+        assert server.build_server_config()["reload"] is False
+
+    def test_targets_main_app(self):
+        """Launcher serves the main FastAPI app"""
+        assert server.build_server_config()["app"] == "main:app"
+
+    def test_port_from_env(self, monkeypatch):
+        """PORT is honoured"""
+        monkeypatch.setenv("PORT", "9123")
+        assert server.build_server_config()["port"] == 9123
+
+    def test_workers_from_env(self, monkeypatch):
+        """WEB_CONCURRENCY sets the worker count"""
+        monkeypatch.setenv("WEB_CONCURRENCY", "6")
+        assert server.build_server_config()["workers"] == 6
+
+    def test_workers_default_to_cpu_count_with_shared_store(self, monkeypatch):
+        """Without WEB_CONCURRENCY one worker per CPU is used when sessions are shared"""
+        monkeypatch.delenv("WEB_CONCURRENCY", raising=False)
+        monkeypatch.setenv("SESSION_STORE", "sqlite")
+        with patch.object(server.os, "cpu_count", return_value=4):
+            assert server.build_server_config()["workers"] == 4
+
+    def test_single_worker_with_memory_store(self, monkeypatch):
+        """Per-worker sessions default to one worker"""
+        monkeypatch.delenv("WEB_CONCURRENCY", raising=False)
+        monkeypatch.delenv("SESSION_STORE", raising=False)
+        with patch.object(server.os, "cpu_count", return_value=4):
+            config = server.build_server_config()
+        assert config["workers"] == 1
+        assert server.config_error(config) is None
+
+    @pytest.mark.parametrize("store,refused", [("memory", True), ("sqlite", False), ("redis", False)])
+    def test_multiple_workers_need_shared_store(self, monkeypatch, store, refused):
+        """WEB_CONCURRENCY > 1 with the in-memory store is refused"""
+        monkeypatch.setenv("WEB_CONCURRENCY", "4")
+        monkeypatch.setenv("SESSION_STORE", store)
+        assert (server.config_error(server.build_server_config()) is not None) is refused
+
+    def test_forwarded_headers_trusted_from_localhost_only(self, monkeypatch):
+        """X-Forwarded-For from arbitrary peers must not pick the rate-limited IP"""
+        monkeypatch.delenv("FORWARDED_ALLOW_IPS", raising=False)
+        assert server.build_server_config()["forwarded_allow_ips"] == "127.0.0.1"
+        monkeypatch.setenv("FORWARDED_ALLOW_IPS", "10.0.0.5")
+        assert server.build_server_config()["forwarded_allow_ips"] == "10.0.0.5"
+
+    @pytest.mark.parametrize("raw", ["", "abc", "0", "-3"])
+    def test_invalid_env_falls_back(self, monkeypatch, raw):
+        """Bad values fall back to defaults instead of crashing the boot"""
+        monkeypatch.setenv("PORT", raw)
+        assert server.build_server_config()["port"] == 8000
+
+    def test_keepalive_and_backlog(self, monkeypatch):
+        """Keep-alive and backlog are tunable"""
+        monkeypatch.setenv("KEEPALIVE_TIMEOUT", "30")
+        monkeypatch.setenv("LISTEN_BACKLOG", "4096")
+        config = server.build_server_config()
+        assert config["timeout_keep_alive"] == 30
+        assert config["backlog"] == 4096
+
+    def test_prefers_uvloop_and_httptools(self):
+        """Accelerators are selected when installed"""
+        with patch.object(server, "_has_module", return_value=True):
+            config = server.build_server_config()
+        assert config["loop"] == "uvloop"
+        assert config["http"] == "httptools"
+
+    def test_falls_back_without_accelerators(self):
+        """Pure-Python loop and parser are used when accelerators are missing"""
+        with patch.object(server, "_has_module", return_value=False):
+            config = server.build_server_config()
+        assert config["loop"] == "asyncio"
+        assert config["http"] == "h11"
+
+
+# =========================================================
+# LAUNCH TESTS
+# =========================================================
+
+class TestMain:
+    """Tests for main()"""
+
+    def test_dotenv_session_store_reaches_worker_guard(self, monkeypatch):
+        """SESSION_STORE set only in .env still allows several workers"""
+        monkeypatch.setenv("WEB_CONCURRENCY", "4")
+        monkeypatch.delenv("SESSION_STORE", raising=False)
+
+        def load_dotenv():
+            monkeypatch.setenv("SESSION_STORE", "sqlite")
+
+        with patch.object(server, "load_dotenv", side_effect=load_dotenv), \
+                patch.object(server, "DrainingServer"), \
+                patch.object(server, "Multiprocess") as multiprocess, \
+                patch.object(server.uvicorn.Config, "bind_socket"):
+            server.main()
+        multiprocess.return_value.run.assert_called_once()
+
+    def test_memory_store_refuses_workers(self, monkeypatch):
+        """Several workers without a shared store exit before binding"""
+        monkeypatch.setenv("WEB_CONCURRENCY", "4")
+        monkeypatch.setenv("SESSION_STORE", "memory")
+        with patch.object(server, "load_dotenv"), pytest.raises(SystemExit) as exit_info:
+            server.main()
+        assert exit_info.value.code == 2
@@ -0,0 +1,162 @@
+"""
+=========================================================
+LEGALGRAM 2.0 - SESSION LOCK TESTS
+=========================================================
+Tests for per-session turn serialization.
+=========================================================
+"""
+
+import pytest
+import asyncio
+import sys
+import os
+import time
+import httpx
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import app
+from services.ai_engine import LegalAI
+from services.session_locks import SessionLockPool
+from services.session_store import InMemorySessionStore
+
+
+# =========================================================
+# POOL TESTS
+# =========================================================
+
+class TestSessionLockPool:
+    """Tests for SessionLockPool"""
+
+    def test_same_session_is_serialized(self):
+        pool = SessionLockPool(stripes=8)
+        events = []
+
+        async def turn(tag):
+            async with pool.hold("s1"):
+                events.append(f"{tag}:start")
+                await asyncio.sleep(0.01)
+                events.append(f"{tag}:end")
+
+        async def scenario():
+            await asyncio.gather(turn("a"), turn("b"))
+
+        asyncio.run(scenario())
+        assert events == ["a:start", "a:end", "b:start", "b:end"]
+        assert pool.contended == 1
+        assert pool.wait_seconds_max > 0
+
+    def test_different_stripes_run_in_parallel(self):
+        pool = SessionLockPool(stripes=1024)
+        first = "a"
+        second = next(f"b{i}" for i in range(1000)
+                      if hash(f"b{i}") % 1024 != hash(first) % 1024)
+
+        async def turn(session_id):
+            async with pool.hold(session_id):
+                await asyncio.sleep(0.05)
+
+        async def scenario():
+            started = time.perf_counter()
+            await asyncio.gather(turn(first), turn(second))
+            return time.perf_counter() - started
+
+        assert asyncio.run(scenario()) < 0.09
+        assert pool.contended == 0
+
+    def test_same_stripe_maps_to_same_lock(self):
+        pool = SessionLockPool(stripes=4)
+
+        async def scenario():
+            return pool.lock_for("x") is pool.lock_for("x")
+
+        assert asyncio.run(scenario())
+
+    @pytest.mark.parametrize("raw", ["0", "-4"])
+    def test_non_positive_stripes_clamped(self, monkeypatch, raw):
+        """SESSION_LOCK_STRIPES below one still gives a working pool"""
+        monkeypatch.setenv("SESSION_LOCK_STRIPES", raw)
+        pool = SessionLockPool()
+        assert pool.stripes == 1
+
+        async def turn():
+            async with pool.hold("s1"):
+                return True
+
+        assert asyncio.run(turn())
+
+    def test_pool_rebuilt_for_new_loop(self):
+        """Each asyncio.run() (or TestClient request) gets fresh locks"""
+        pool = SessionLockPool(stripes=4)
+
+        async def grab():
+            return pool.lock_for("x")
+
+        assert asyncio.run(grab()) is not asyncio.run(grab())
+
+    def test_lock_released_on_error(self):
+        pool = SessionLockPool(stripes=4)
+
+        async def scenario():
+            with pytest.raises(RuntimeError):
+                async with pool.hold("x"):
+                    raise RuntimeError("boom")
+            return pool.lock_for("x").locked()
+
+        assert asyncio.run(scenario()) is False
+
+    def test_snapshot(self):
+        pool = SessionLockPool(stripes=4)
+
+        async def scenario():
+            async with pool.hold("x"):
+                pass
+
+        asyncio.run(scenario())
+        snapshot = pool.snapshot()
+        assert snapshot["stripes"] == 4
+        assert snapshot["acquired"] == 1
+        assert snapshot["waiting"] == 0
+
+
+# =========================================================
+# ENDPOINT TESTS
+# =========================================================
+
+class TestConcurrentTurns:
+    """Concurrent /api/chat requests on one session"""
+
+    def test_concurrent_turns_keep_history_and_stages(self):
+        """No lost messages or stage transitions when turns overlap"""
+        store = InMemorySessionStore()
+        real_process_flow = LegalAI.process_flow
+
+        def slow_process_flow(**kwargs):
+            time.sleep(0.05)
+            return real_process_flow(**kwargs)
+
+        async def scenario():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await asyncio.gather(*(
+                    client.post("/api/chat", json={"message": "hi", "session_id": "race"})
+                    for _ in range(3)
+                ))
+
+        with patch("main.session_store", store), \
+                patch("main.LegalAI.process_flow", side_effect=slow_process_flow):
+            responses = asyncio.run(scenario())
+
+        assert all(r.status_code == 200 for r in responses)
+        session = store.get("race")
+        assert len(session.messages) == 6
+        assert [m.role for m in session.messages] == ["user", "assistant"] * 3
+        assert sorted(r.json()["new_stage"] for r in responses) == sorted(
+            ["CAPTURE_NAME", "TRIAGE", "TRIAGE"]
+        )
+
+    def test_status_reports_lock_metrics(self):
+        data = TestClient(app).get("/api/status").json()
+        assert "wait_ms_max" in data["session_locks"]
@@ -0,0 +1,582 @@
+"""
+=========================================================
+LEGALGRAM 2.0 - SESSION STORE TESTS
+=========================================================
+Tests for the session storage backends.
+=========================================================
+"""
+
+import pytest
+import sys
+import os
+import json
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.history import HistoryPolicy
+from services.records import MessageRecord
+from unittest.mock import patch
+
+from services import session_store
+from benchmarks.fake_redis import FakeRedis
+from services.session_store import (
+    InMemorySessionStore, RedisSessionStore, SqliteSessionStore,
+    create_session_store, new_session
+)
+
+
+def _turn(text):
+    return [
+        MessageRecord("user", text, 1704067200.0),
+        MessageRecord("assistant", f"re: {text}", 1704067201.0),
+    ]
+
+
+# =========================================================
+# IN-MEMORY BACKEND TESTS
+# =========================================================
+
+class TestInMemorySessionStore:
+    """Tests for InMemorySessionStore"""
+
+    def test_missing_session(self):
+        """Unknown ids return None"""
+        assert InMemorySessionStore().get("nope") is None
+
+    def test_save_and_get(self):
+        """Saved sessions round-trip with appended messages"""
+        store = InMemorySessionStore()
+        session = new_session()
+        store.save("s1", session, new_messages=_turn("hello"))
+        loaded = store.get("s1")
+        assert loaded.stage == "INIT"
+        assert [m.role for m in loaded.messages] == ["user", "assistant"]
+
+    def test_delete(self):
+        """Deleted sessions are gone; deleting twice is harmless"""
+        store = InMemorySessionStore()
+        store.save("s1", new_session())
+        store.delete("s1")
+        store.delete("s1")
+        assert "s1" not in store
+        assert store.count() == 0
+
+    def test_count(self):
+        """count() and len() agree"""
+        store = InMemorySessionStore()
+        for i in range(5):
+            store.save(f"s{i}", new_session())
+        assert store.count() == len(store) == 5
+
+    def test_flush_without_snapshot_is_noop(self, tmp_path):
+        """No snapshot path means nothing is written"""
+        store = InMemorySessionStore()
+        store.save("s1", new_session())
+        store.flush()
+        assert list(tmp_path.iterdir()) == []
+
+    def test_snapshot_round_trip(self, tmp_path):
+        """Sessions flushed at shutdown are restored on the next boot"""
+        path = str(tmp_path / "sessions.json")
+        store = InMemorySessionStore(snapshot_path=path)
+        session = new_session()
+        session.user_name = "Ann"
+        session.stage = "SALES_MODE"
+        store.save("s1", session, new_messages=_turn("nda"))
+        store.flush()
+
+        restored = InMemorySessionStore(snapshot_path=path).get("s1")
+        assert restored.user_name == "Ann"
+        assert restored.stage == "SALES_MODE"
+        assert len(restored.messages) == 2
+
+    def test_corrupt_snapshot_ignored(self, tmp_path):
+        """A damaged snapshot does not stop the worker from booting"""
+        path = tmp_path / "sessions.json"
+        path.write_text("{not json")
+        assert InMemorySessionStore(snapshot_path=str(path)).count() == 0
+
+    def test_snapshot_is_valid_json(self, tmp_path):
+        """Snapshot file is plain JSON"""
+        path = tmp_path / "sessions.json"
+        store = InMemorySessionStore(snapshot_path=str(path))
+        store.save("s1", new_session())
+        store.flush()
+        assert "s1" in json.loads(path.read_text())
+
+    def test_snapshot_owned_by_one_worker(self, tmp_path):
+        """A worker that cannot take the snapshot lock neither loads nor writes it"""
+        path = str(tmp_path / "sessions.json")
+        store = InMemorySessionStore(snapshot_path=path)
+        store.save("s1", new_session())
+        store.flush()
+        with patch.object(session_store, "_snapshot_claims", {}), \
+                patch.object(session_store.fcntl, "flock", side_effect=BlockingIOError):
+            other = InMemorySessionStore(snapshot_path=path)
+        assert other.snapshot_path is None
+        assert other.count() == 0
+        other.save("s2", new_session())
+        other.flush()
+        assert list(json.loads((tmp_path / "sessions.json").read_text())) == ["s1"]
+
+    def test_capped_at_max_sessions(self):
+        """Past the cap the least recently active session is evicted"""
+        store = InMemorySessionStore(max_sessions=3)
+        for i in range(3):
+            store.save(f"s{i}", new_session())
+        store.save("s0", store.get("s0"))
+        store.save("s3", new_session())
+        assert store.count() == 3
+        assert "s1" not in store
+        assert "s0" in store
+        assert store.evicted == 1
+
+    def test_idle_sessions_expire(self, monkeypatch):
+        """Sessions idle for longer than the TTL are dropped"""
+        clock = [1000.0]
+        monkeypatch.setattr("services.session_store.time.monotonic", lambda: clock[0])
+        store = InMemorySessionStore(ttl_seconds=60)
+        store.save("old", new_session())
+        clock[0] += 30
+        store.save("new", new_session())
+        clock[0] += 45
+        assert store.get("old") is None
+        assert store.get("new") is not None
+        assert store.count() == 1
+        assert store.expired == 1
+
+    def test_limits_from_env(self, monkeypatch):
+        monkeypatch.setenv("SESSION_MAX_SESSIONS", "50")
+        monkeypatch.setenv("SESSION_EXPIRE_HOURS", "2")
+        store = InMemorySessionStore()
+        assert store.max_sessions == 50
+        assert store.ttl_seconds == 7200
+
+    def test_zero_disables_limits(self):
+        store = InMemorySessionStore(max_sessions=0, ttl_seconds=0)
+        for i in range(20):
+            store.save(f"s{i}", new_session())
+        assert store.count() == 20
+        assert store.evicted == store.expired == 0
+
+    def test_snapshot_reload_respects_cap(self, tmp_path):
+        path = str(tmp_path / "sessions.json")
+        store = InMemorySessionStore(snapshot_path=path)
+        for i in range(5):
+            store.save(f"s{i}", new_session())
+        store.flush()
+        assert InMemorySessionStore(snapshot_path=path, max_sessions=2).count() == 2
+
+
+# =========================================================
+# SQLITE BACKEND TESTS
+# =========================================================
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "sessions.db")
+
+
+class TestSqliteSessionStore:
+    """Tests for SqliteSessionStore"""
+
+    def test_missing_session(self, db_path):
+        assert SqliteSessionStore(db_path).get("nope") is None
+
+    def test_save_and_get(self, db_path):
+        store = SqliteSessionStore(db_path)
+        session = new_session()
+        session.user_name = "Ann"
+        store.save("s1", session, new_messages=_turn("hello"))
+        store.save("s1", session, new_messages=_turn("again"))
+        loaded = store.get("s1")
+        assert loaded.user_name == "Ann"
+        assert [m.content for m in loaded.messages] == ["hello", "re: hello", "again", "re: again"]
+
+    def test_wal_mode(self, db_path):
+        store = SqliteSessionStore(db_path)
+        mode = store._connection().execute("PRAGMA journal_mode").fetchone()[0]
+        assert mode == "wal"
+
+    def test_shared_between_workers(self, db_path):
+        """A second store on the same file (another worker) sees the session"""
+        worker_a = SqliteSessionStore(db_path)
+        worker_b = SqliteSessionStore(db_path)
+        session = new_session()
+        session.stage = "TRIAGE"
+        worker_a.save("s1", session, new_messages=_turn("hi"))
+        assert worker_b.get("s1").stage == "TRIAGE"
+
+    def test_cache_invalidated_by_other_worker(self, db_path):
+        """Cached sessions are re-read once another worker bumps the version"""
+        worker_a = SqliteSessionStore(db_path)
+        worker_b = SqliteSessionStore(db_path)
+        worker_a.save("s1", new_session())
+        assert worker_a.get("s1").stage == "INIT"
+
+        session = worker_b.get("s1")
+        session.stage = "SALES_MODE"
+        worker_b.save("s1", session, new_messages=_turn("nda"))
+
+        reloaded = worker_a.get("s1")
+        assert reloaded.stage == "SALES_MODE"
+        assert len(reloaded.messages) == 2
+
+    def test_get_returns_copy(self, db_path):
+        """Mutating a fetched session without saving does not leak into the cache"""
+        store = SqliteSessionStore(db_path)
+        store.save("s1", new_session())
+        store.get("s1").messages.append(MessageRecord("user", "x"))
+        store.get("s1").stage = "DONE"
+        assert list(store.get("s1").messages) == []
+        assert store.get("s1").stage == "INIT"
+
+    def test_no_write_lock_held_between_saves(self, db_path):
+        """Another worker can write right after a save; no transaction stays open"""
+        import sqlite3
+        worker_a = SqliteSessionStore(db_path)
+        worker_b = SqliteSessionStore(db_path)
+        worker_b._connection().execute("PRAGMA busy_timeout=0")
+        worker_a.save("s1", new_session())
+        worker_b.save("s2", new_session())
+        assert not worker_a._connection().in_transaction
+        assert worker_a.count() == worker_b.count() == 2
+        try:
+            worker_b.delete("s1")
+        except sqlite3.OperationalError:
+            pytest.fail("database locked by the other worker")
+
+    def test_delete(self, db_path):
+        store = SqliteSessionStore(db_path)
+        store.save("s1", new_session(), new_messages=_turn("hi"))
+        store.delete("s1")
+        store.delete("s1")
+        assert "s1" not in store
+        assert store.count() == 0
+
+    def test_survives_restart(self, db_path):
+        store = SqliteSessionStore(db_path)
+        store.save("s1", new_session(), new_messages=_turn("hi"))
+        store.close()
+        assert len(SqliteSessionStore(db_path).get("s1").messages) == 2
+
+    def test_reusable_after_close(self, db_path):
+        """The lifespan may close the store and start again in the same process"""
+        store = SqliteSessionStore(db_path)
+        store.save("s1", new_session())
+        store.close()
+        store.close()
+        store.save("s2", new_session())
+        assert store.count() == 2
+
+    def test_migrates_older_schema(self, db_path):
+        """Databases created before history summaries gain the new columns"""
+        import sqlite3
+        conn = sqlite3.connect(db_path)
+        conn.execute(
+            "CREATE TABLE sessions (session_id TEXT PRIMARY KEY, user_name TEXT, "
+            "stage TEXT NOT NULL, created_at REAL NOT NULL, version INTEGER NOT NULL)"
+        )
+        conn.execute("INSERT INTO sessions VALUES ('old', 'Ann', 'TRIAGE', 1.0, 3)")
+        conn.commit()
+        conn.close()
+
+        store = SqliteSessionStore(db_path)
+        assert store.get("old").stage == "TRIAGE"
+        store.save("old", store.get("old"), new_messages=_turn("hi"))
+        assert store.get("old").message_total == 2
+        assert store.count() == 1
+
+    def test_idle_sessions_expire(self, db_path, monkeypatch):
+        """Sessions idle past the TTL read as missing and are pruned by later saves"""
+        clock = [1_700_000_000.0]
+        monkeypatch.setattr("services.session_store.time.time", lambda: clock[0])
+        store = SqliteSessionStore(db_path, ttl_seconds=60, prune_interval=10, prune_batch=2)
+        for i in range(3):
+            store.save(f"old{i}", new_session(), new_messages=_turn("hi"))
+        clock[0] += 30
+        store.save("new", new_session())
+        clock[0] += 45
+        assert store.get("old0") is None
+        assert store.get("new") is not None
+        assert store.count() == 1
+
+        store.save("newer", new_session())
+        store.save("newest", new_session())
+        conn = store._connection()
+        assert conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0] == 3
+        assert conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0] == 0
+        assert store.stats()["expired"] == 3
+
+    def test_save_over_expired_session_starts_fresh(self, db_path, monkeypatch):
+        clock = [1_700_000_000.0]
+        monkeypatch.setattr("services.session_store.time.time", lambda: clock[0])
+        store = SqliteSessionStore(db_path, ttl_seconds=60, prune_interval=3600)
+        store.save("s1", new_session(), new_messages=_turn("old"))
+        clock[0] += 120
+        store.save("s1", new_session(), new_messages=_turn("new"))
+        assert [m.content for m in store.get("s1").messages] == ["new", "re: new"]
+
+    def test_ttl_from_env(self, db_path, monkeypatch):
+        monkeypatch.setenv("SESSION_EXPIRE_HOURS", "2")
+        store = SqliteSessionStore(db_path)
+        assert store.ttl_seconds == 7200
+        assert store.prune_interval == 60
+
+    def test_zero_ttl_never_expires(self, db_path, monkeypatch):
+        clock = [1_700_000_000.0]
+        monkeypatch.setattr("services.session_store.time.time", lambda: clock[0])
+        store = SqliteSessionStore(db_path, ttl_seconds=0)
+        store.save("s1", new_session())
+        clock[0] += 10 ** 9
+        store.save("s2", new_session())
+        assert store.count() == 2
+        assert store.prune() == 0
+
+    def test_cache_is_bounded(self, db_path):
+        store = SqliteSessionStore(db_path, cache_size=5)
+        for i in range(20):
+            store.save(f"s{i}", new_session())
+        assert len(store._cache) == 5
+        assert store.get("s0") is not None
+
+
+# =========================================================
+# REDIS BACKEND TESTS (in-process fake, no server needed)
+# =========================================================
+
+@pytest.fixture
+def redis_store():
+    return RedisSessionStore(FakeRedis(), ttl_seconds=3600, history=HistoryPolicy(6, 2, 300))
+
+
+class TestRedisSessionStore:
+    """Tests for RedisSessionStore"""
+
+    def test_missing_session(self, redis_store):
+        assert redis_store.get("nope") is None
+
+    def test_save_and_get(self, redis_store):
+        session = new_session()
+        session.user_name = "Ann"
+        session.stage = "TRIAGE"
+        redis_store.save("s1", session, new_messages=_turn("héllo"))
+        loaded = redis_store.get("s1")
+        assert loaded.user_name == "Ann"
+        assert loaded.stage == "TRIAGE"
+        assert loaded.created_at == session.created_at
+        assert [m.content for m in loaded.messages] == ["héllo", "re: héllo"]
+
+    def test_none_user_name_round_trips(self, redis_store):
+        redis_store.save("s1", new_session())
+        assert redis_store.get("s1").user_name is None
+
+    def test_hash_and_list_layout(self, redis_store):
+        redis_store.save("s1", new_session(), new_messages=_turn("hi"))
+        client = redis_store.client
+        assert client.hgetall("legalgram:session:s1")["stage"] == "INIT"
+        assert len(client.lrange("legalgram:session:s1:messages", 0, -1)) == 2
+
+    def test_one_round_trip_per_operation(self, redis_store):
+        """get and save are pipelined"""
+        client = redis_store.client
+        redis_store.save("s1", new_session(), new_messages=_turn("hi"))
+        redis_store.get("s1")
+        assert client.round_trips == 2
+
+    def test_messages_capped(self, redis_store):
+        """Only the session's ring buffer is kept, in Redis and locally"""
+        session = new_session()
+        for i in range(5):
+            redis_store.save("s1", session, new_messages=_turn(str(i)))
+        stored = redis_store.get("s1").messages
+        assert len(stored) == len(session.messages) == 6
+        assert stored[-1].content == "re: 4"
+        assert stored == session.messages
+        assert redis_store.get("s1").message_total == 10
+        assert "User: 0" in redis_store.get("s1").summary
+
+    def test_ttl_refreshed_on_save(self, redis_store):
+        client = redis_store.client
+        redis_store.save("s1", new_session(), new_messages=_turn("hi"))
+        client.expire("legalgram:session:s1", 10)
+        redis_store.save("s1", redis_store.get("s1"), new_messages=_turn("again"))
+        assert client.ttl("legalgram:session:s1") == 3600
+        assert client.ttl("legalgram:session:s1:messages") == 3600
+
+    def test_expired_session_is_gone(self):
+        store = RedisSessionStore(FakeRedis(), ttl_seconds=0)
+        store.save("s1", new_session(), new_messages=_turn("hi"))
+        assert store.get("s1") is None
+
+    def test_ttl_from_expire_hours(self, monkeypatch):
+        monkeypatch.setenv("SESSION_EXPIRE_HOURS", "2")
+        assert RedisSessionStore(FakeRedis()).ttl_seconds == 7200
+
+    def test_delete(self, redis_store):
+        for i in range(3):
+            redis_store.save(f"s{i}", new_session(), new_messages=_turn("hi"))
+        redis_store.delete("s0")
+        redis_store.delete("s0")
+        assert "s0" not in redis_store
+        assert "s1" in redis_store
+        assert redis_store.client.dbsize() == 5  # two sessions' keys and the index
+        assert redis_store.count() == 2
+        assert redis_store.client.lrange("legalgram:session:s0:messages", 0, -1) == []
+
+    def test_count(self, redis_store):
+        """count() reads the session index and agrees with len()"""
+        for i in range(3):
+            redis_store.save(f"s{i}", new_session())
+        redis_store.save("s0", new_session())
+        assert redis_store.count() == len(redis_store) == 3
+
+    def test_count_drops_expired_sessions(self):
+        """Sessions Redis has expired leave the index too"""
+        server = FakeRedis()
+        store = RedisSessionStore(server, ttl_seconds=0)
+        for i in range(3):
+            store.save(f"s{i}", new_session())
+        assert store.count() == 0
+        assert server.zcard(store.index_key) == 0
+
+    def test_index_is_outside_the_session_keys(self, redis_store):
+        """A client-chosen session id cannot collide with the index"""
+        redis_store.save("index", new_session())
+        redis_store.save("-index", new_session())
+        assert not redis_store.index_key.startswith(redis_store.prefix)
+        assert redis_store.count() == 2
+
+    def test_shared_between_workers(self):
+        """Two stores on one server see the same sessions"""
+        server = FakeRedis()
+        RedisSessionStore(server).save("s1", new_session())
+        assert RedisSessionStore(server).get("s1") is not None
+
+    def test_prefix_isolates_apps(self):
+        server = FakeRedis()
+        RedisSessionStore(server, prefix="a:").save("s1", new_session())
+        assert RedisSessionStore(server, prefix="b:").get("s1") is None
+
+    def test_abandoned_sessions_are_swept(self):
+        """Expired keys nobody reads again are still deleted (active expiry)"""
+        server = FakeRedis()
+        server.ACTIVE_EXPIRE_EVERY = 10
+        store = RedisSessionStore(server, ttl_seconds=0)
+        for i in range(20):
+            store.save(f"s{i}", new_session(), new_messages=_turn("hi"))
+        assert server.dbsize() < 10
+        assert store.get("s19") is None
+
+
+# =========================================================
+# BOUNDED HISTORY (ALL BACKENDS)
+# =========================================================
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def bounded_store(request, tmp_path):
+    policy = HistoryPolicy(max_messages=4, summary_every=2, summary_tokens=200)
+    if request.param == "memory":
+        return InMemorySessionStore(history=policy)
+    if request.param == "sqlite":
+        return SqliteSessionStore(str(tmp_path / "sessions.db"), history=policy)
+    return RedisSessionStore(FakeRedis(), history=policy)
+
+
+class TestBoundedHistory:
+    """Every backend keeps a bounded buffer plus summary"""
+
+    def test_long_chat_stays_bounded(self, bounded_store):
+        session = new_session()
+        for i in range(50):
+            bounded_store.save("s1", session, new_messages=_turn(f"question {i}"))
+            session = bounded_store.get("s1")
+        assert len(session.messages) <= 4
+        assert session.message_total == 100
+        assert session.messages[-1].content == "re: question 49"
+        assert "question 48" not in session.summary
+        assert "question 47" in session.summary
+
+    def test_summary_survives_reload(self, bounded_store):
+        session = new_session()
+        for i in range(3):
+            bounded_store.save("s1", session, new_messages=_turn(f"q{i}"))
+        reloaded = bounded_store.get("s1")
+        assert reloaded.summary == session.summary != ""
+        assert reloaded.message_total == 6
+
+
+# =========================================================
+# FACTORY TESTS
+# =========================================================
+
+class TestCreateSessionStore:
+    """Tests for create_session_store()"""
+
+    def test_default_is_memory(self, monkeypatch):
+        monkeypatch.delenv("SESSION_STORE", raising=False)
+        assert isinstance(create_session_store(), InMemorySessionStore)
+
+    def test_sqlite_backend(self, monkeypatch, tmp_path):
+        monkeypatch.setenv("SESSION_STORE", "sqlite")
+        monkeypatch.setenv("SESSION_SQLITE_PATH", str(tmp_path / "s.db"))
+        store = create_session_store()
+        assert isinstance(store, SqliteSessionStore)
+        store.close()
+
+    def test_redis_backend_needs_package(self, monkeypatch):
+        """redis is optional; it is only imported when selected"""
+        monkeypatch.setenv("SESSION_STORE", "redis")
+        try:
+            import redis  # noqa: F401
+        except ImportError:
+            with pytest.raises(ImportError):
+                create_session_store()
+        else:
+            assert isinstance(create_session_store(), RedisSessionStore)
+
+    def test_unknown_backend(self, monkeypatch):
+        monkeypatch.setenv("SESSION_STORE", "carrier-pigeon")
+        with pytest.raises(ValueError):
+            create_session_store()
+
+
+# =========================================================
+# CHAT ENDPOINT
+# =========================================================
+
+class TestStoreOffEventLoop:
+    """/api/chat keeps blocking store I/O off the event loop"""
+
+    def _threads(self, store):
+        from fastapi.testclient import TestClient
+        from main import app
+
+        threads = []
+        real_get, real_save = store.get, store.save
+
+        def get(*args, **kwargs):
+            threads.append(threading.current_thread())
+            return real_get(*args, **kwargs)
+
+        def save(*args, **kwargs):
+            threads.append(threading.current_thread())
+            return real_save(*args, **kwargs)
+
+        with patch("main.session_store", store), \
+                patch.object(store, "get", side_effect=get), \
+                patch.object(store, "save", side_effect=save):
+            response = TestClient(app).post("/api/chat", json={"message": "hi", "session_id": "loop"})
+        assert response.status_code == 200
+        return threads
+
+    def test_sqlite_runs_in_threadpool(self, db_path):
+        threads = self._threads(SqliteSessionStore(db_path))
+        assert len(threads) == 2
+        assert all(thread.name.startswith("AnyIO worker") for thread in threads)
+
+    def test_memory_store_runs_inline(self):
+        threads = self._threads(InMemorySessionStore())
+        assert len(threads) == 2
+        assert not any(thread.name.startswith("AnyIO worker") for thread in threads)
@@ -0,0 +1,95 @@
+"""
+=========================================================
+LEGALGRAM 2.0 - SESSION SOAK TESTS
+=========================================================
+Short runs of benchmarks/soak_sessions.py: every backend
+has to level off under unique-session traffic.
+=========================================================
+"""
+
+import pytest
+import sys
+import os
+from types import SimpleNamespace
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+from benchmarks.soak_sessions import BACKENDS, FakeLLMClient, main_cli, make_store, soak
+
+
+# Stored rows/keys per session: sqlite has a sessions row plus one per message
+# (5 turns x 2), redis a hash plus a message list
+ROWS_PER_SESSION = {"sqlite": 11, "redis": 2}
+
+
+@pytest.fixture
+def turn_clock():
+    """Session stores see time advance 10 ms per chat turn instead of with the wall clock.
+
+    Expiry then depends on the number of turns, not on how fast this
+    machine plays them, so stored row counts are the same every run.
+    """
+    clock = SimpleNamespace(now=1_000_000.0, step=0.01)
+    fake_time = SimpleNamespace(time=lambda: clock.now, monotonic=lambda: clock.now)
+    chat_endpoint = main.chat_endpoint
+
+    async def ticking(*args, **kwargs):
+        clock.now += clock.step
+        return await chat_endpoint(*args, **kwargs)
+
+    with patch("services.session_store.time", fake_time), \
+            patch("benchmarks.fake_redis.time", fake_time), \
+            patch.object(main, "chat_endpoint", ticking):
+        yield clock
+
+
+class TestFakeLLMClient:
+    """Tests for the non-recording LLM stand-in"""
+
+    def test_response_shape(self):
+        client = FakeLLMClient()
+        response = client.chat.completions.create(model="m", messages=[])
+        assert "Contractor" in response.choices[0].message.content
+        assert response.usage.completion_tokens == 20
+        assert client.calls == 1
+
+
+class TestMakeStore:
+    """Tests for make_store()"""
+
+    def test_unknown_backend(self, tmp_path):
+        with pytest.raises(ValueError):
+            make_store("mongo", 10, 1, str(tmp_path))
+
+    def test_memory_cap(self, tmp_path):
+        assert make_store("memory", 10, 1, str(tmp_path)).max_sessions == 10
+
+
+class TestSoak:
+    """Unique-session traffic stays bounded"""
+
+    @pytest.mark.parametrize("backend", BACKENDS)
+    def test_backend_levels_off(self, backend, turn_clock):
+        result = soak(backend, turns=3000, max_sessions=100, session_ttl=1, sample_every=500, max_growth=0.25)
+        assert 1150 <= result.llm_calls <= 1200
+        assert result.bounded, (result.row_growth, result.top_growth)
+        assert len(result.samples) == 6
+        # The 1 s TTL spans 100 turns (20 visitors); 50 sessions leaves room for
+        # journeys in progress and the prune interval. Unpruned would be 600
+        cap = 100 if backend == "memory" else ROWS_PER_SESSION[backend] * 50
+        assert max(point.rows for point in result.samples) <= cap
+
+    def test_sqlite_rows_are_pruned(self, turn_clock):
+        result = soak("sqlite", turns=3000, max_sessions=100, session_ttl=0.2, sample_every=500, max_growth=0.25)
+        # 0.2 s is 20 turns of TTL; without pruning the file would keep all 600 sessions
+        assert result.samples[-1].rows < ROWS_PER_SESSION["sqlite"] * 50
+
+    def test_memory_store_stays_at_cap(self):
+        result = soak("memory", turns=2000, max_sessions=50, sample_every=500)
+        assert max(point.sessions for point in result.samples) == 50
+
+    def test_cli_exit_code(self, capsys):
+        assert main_cli(["--backends", "memory", "--turns", "1000", "--max-sessions", "50", "--max-growth", "0.5"]) == 0
+        assert "bounded" in capsys.readouterr().out
@@ -0,0 +1,112 @@
+"""
+=========================================================
+LEGALGRAM 2.0 - STARTUP PROFILING TESTS
+=========================================================
+Tests for the boot report and deferred heavy imports.
+=========================================================
+"""
+
+import pytest
+import sys
+import os
+import subprocess
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import app
+from services.startup import StartupProfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# =========================================================
+# PROFILE TESTS
+# =========================================================
+
+class TestStartupProfile:
+    """Tests for StartupProfile"""
+
+    def test_marks_are_ordered(self):
+        """Phases are reported in the order they were marked"""
+        profile = StartupProfile()
+        profile.mark("first")
+        profile.mark("second")
+        assert list(profile.phases) == ["first", "second"]
+
+    def test_phase_context_manager(self):
+        """phase() records a non-negative duration"""
+        profile = StartupProfile()
+        with profile.phase("block"):
+            sum(range(1000))
+        assert profile.phases["block"] >= 0
+
+    def test_total_is_sum_of_phases(self):
+        """Total equals the sum of the phases"""
+        profile = StartupProfile()
+        profile.phases = {"a": 1.5, "b": 2.5}
+        assert profile.total_ms() == 4.0
+
+    def test_no_budget_by_default(self, monkeypatch):
+        """Budget check is skipped when STARTUP_BUDGET_MS is unset"""
+        monkeypatch.delenv("STARTUP_BUDGET_MS", raising=False)
+        report = StartupProfile().report()
+        assert report["budget_ms"] is None
+        assert report["within_budget"] is None
+
+    @pytest.mark.parametrize("budget,expected", [("10", True), ("1", False)])
+    def test_budget_check(self, monkeypatch, budget, expected):
+        """Report flags totals over the budget"""
+        monkeypatch.setenv("STARTUP_BUDGET_MS", budget)
+        profile = StartupProfile()
+        profile.phases = {"boot": 5.0}
+        assert profile.report()["within_budget"] is expected
+
+
+# =========================================================
+# LAZY IMPORT TESTS
+# =========================================================
+
+class TestLazyImports:
+    """The LLM SDK must not load until SALES_MODE needs it"""
+
+    def test_groq_not_imported_at_boot(self):
+        """Importing the app does not import groq"""
+        code = "import sys, main; print('groq' in sys.modules)"
+        out = subprocess.run(
+            [sys.executable, "-c", code], cwd=BACKEND_DIR,
+            capture_output=True, text=True, check=True
+        )
+        assert out.stdout.strip() == "False"
+
+    def test_services_package_is_lazy(self):
+        """Importing a light submodule does not load the engine"""
+        code = "import sys, services.config; print('services.ai_engine' in sys.modules)"
+        out = subprocess.run(
+            [sys.executable, "-c", code], cwd=BACKEND_DIR,
+            capture_output=True, text=True, check=True
+        )
+        assert out.stdout.strip() == "False"
+
+    def test_package_reexports_still_work(self):
+        """services.LegalAI is still importable"""
+        import services
+        assert services.LegalAI.__name__ == "LegalAI"
+        assert "nda" in services.DOCUMENT_DATABASE
+
+
+# =========================================================
+# ENDPOINT TESTS
+# =========================================================
+
+class TestStartupEndpoint:
+    """Tests for /api/startup"""
+
+    def test_report_exposed(self):
+        """Boot report lists import and app construction phases"""
+        with TestClient(app) as client:
+            data = client.get("/api/startup").json()
+        assert {"import:pydantic", "import:fastapi", "import:services.ai_engine", "import:services"} <= set(data["phases_ms"])
+        assert "app_construction" in data["phases_ms"]
+        assert "catalog_index" in data["phases_ms"]
+        assert data["total_ms"] >= 0
@@ -0,0 +1,271 @@
+"""
+=========================================================
+LEGALGRAM 2.0 - STRUCTURED LOGGING TESTS
+=========================================================
+Tests for services/structured_logging.py and
+services/request_context.py: JSON records, request ids,
+the non-blocking queue and event sampling.
+=========================================================
+"""
+
+import pytest
+import io
+import json
+import logging
+import queue
+import sys
+import os
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+
+from main import app
+from services.ai_engine import LegalAI
+from services.lifecycle import shutdown
+from services.request_context import (
+    bind_request, current_request_id, current_session_id, current_trace_id, reset_request, session_scope
+)
+from services.session_store import InMemorySessionStore
+from services.structured_logging import (
+    JsonFormatter, LogPipeline, NonBlockingQueueHandler, get_logger, log_pipeline
+)
+from services.tracing import new_span_id
+
+TRACE_ID = "0af7651916cd43dd8448eb211c80319c"
+
+
+def _record(msg="hello %s", args=("world",), level=logging.INFO, **extra):
+    record = logging.LogRecord("legalgram.test", level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+@pytest.fixture
+def pipeline():
+    """Started pipeline writing to a buffer; lines() stops it and parses the output"""
+    stream = io.StringIO()
+    pipe = LogPipeline(stream=stream, level="info", sample_rate=1.0)
+    pipe.start()
+
+    def lines():
+        pipe.stop()
+        return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+    pipe.lines = lines
+    yield pipe
+    pipe.stop()
+
+
+# =========================================================
+# REQUEST CONTEXT
+# =========================================================
+
+class TestRequestContext:
+    """Tests for services/request_context.py"""
+
+    def test_bind_and_reset(self):
+        tokens = bind_request(TRACE_ID, "b7ad6b7169203331")
+        assert (current_trace_id(), current_request_id()) == (TRACE_ID, "b7ad6b7169203331")
+        reset_request(tokens)
+        assert current_trace_id() is None and current_request_id() is None
+
+    def test_session_scope(self):
+        with session_scope("s1"):
+            with session_scope("s2"):
+                assert current_session_id() == "s2"
+            assert current_session_id() == "s1"
+        assert current_session_id() is None
+
+
+# =========================================================
+# FORMATTER AND HANDLER
+# =========================================================
+
+class TestJsonFormatter:
+    """Tests for JsonFormatter"""
+
+    def test_standard_fields_and_extra(self):
+        data = json.loads(JsonFormatter().format(_record(event="chat.turn", stage="INIT", empty=None)))
+        assert data["msg"] == "hello world"
+        assert data["level"] == "INFO"
+        assert data["logger"] == "legalgram.test"
+        assert data["ts"].endswith("+00:00")
+        assert (data["event"], data["stage"]) == ("chat.turn", "INIT")
+        assert "empty" not in data
+        assert "args" not in data and "lineno" not in data
+
+    def test_exception_and_odd_values(self):
+        record = _record(blob=object(), text="café")
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            record.exc_info = sys.exc_info()
+        data = json.loads(JsonFormatter().format(record))
+        assert "ValueError: boom" in data["exc"]
+        assert data["blob"].startswith("<object")
+        assert data["text"] == "café"
+
+
+class TestNonBlockingQueueHandler:
+    """Tests for NonBlockingQueueHandler"""
+
+    def test_prepare_renders_and_stamps_ids(self):
+        handler = NonBlockingQueueHandler(queue.Queue())
+        tokens = bind_request(TRACE_ID, "b7ad6b7169203331")
+        try:
+            with session_scope("s1"):
+                record = handler.prepare(_record())
+        finally:
+            reset_request(tokens)
+        assert (record.msg, record.args) == ("hello world", None)
+        assert (record.trace_id, record.request_id, record.session_id) == (TRACE_ID, "b7ad6b7169203331", "s1")
+
+    def test_explicit_ids_win(self):
+        handler = NonBlockingQueueHandler(queue.Queue())
+        with session_scope("s1"):
+            assert handler.prepare(_record(session_id="other")).session_id == "other"
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        handler = NonBlockingQueueHandler(queue.Queue(maxsize=2))
+        for _ in range(5):
+            handler.handle(_record())
+        assert handler.queue.qsize() == 2
+        assert handler.dropped == 3
+
+
+# =========================================================
+# PIPELINE
+# =========================================================
+
+class TestLogPipeline:
+    """Tests for LogPipeline"""
+
+    def test_writes_json_lines(self, pipeline):
+        get_logger("test").info("one %d", 1, extra={"event": "test.one"})
+        get_logger("test").error("two", extra={"event": "test.two"})
+        (first, second) = pipeline.lines()
+        assert (first["msg"], first["event"], first["logger"]) == ("one 1", "test.one", "legalgram.test")
+        assert second["level"] == "ERROR"
+
+    def test_level_filter(self):
+        stream = io.StringIO()
+        pipe = LogPipeline(stream=stream, level="warning")
+        pipe.start()
+        try:
+            get_logger("test").info("hidden")
+            get_logger("test").warning("shown")
+        finally:
+            pipe.stop()
+            logging.getLogger("legalgram").setLevel(logging.INFO)
+        assert [json.loads(line)["msg"] for line in stream.getvalue().splitlines()] == ["shown"]
+
+    def test_stop_detaches_and_start_resumes(self):
+        stream = io.StringIO()
+        pipe = LogPipeline(stream=stream)
+        pipe.start()
+        pipe.start()  # no-op while running
+        assert logging.getLogger("legalgram").handlers.count(pipe.handler) == 1
+        pipe.stop()
+        assert pipe.handler not in logging.getLogger("legalgram").handlers
+        get_logger("test").warning("while stopped")
+        assert pipe.queue.qsize() == 0
+        pipe.start()
+        get_logger("test").warning("after restart")
+        pipe.stop()
+        assert [json.loads(line)["msg"] for line in stream.getvalue().splitlines()] == ["after restart"]
+
+    def test_snapshot(self):
+        pipe = LogPipeline(stream=io.StringIO(), level="debug", sample_rate=0.25)
+        assert pipe.snapshot() == {
+            "level": "DEBUG", "sample_rate": 0.25, "running": False, "queued": 0, "dropped": 0,
+        }
+
+    def test_from_env(self, monkeypatch):
+        monkeypatch.setenv("LOG_LEVEL", "nonsense")
+        monkeypatch.setenv("LOG_SAMPLE_RATE", "3")
+        monkeypatch.setenv("LOG_QUEUE_SIZE", "5")
+        pipe = LogPipeline()
+        assert pipe.level == logging.INFO
+        assert pipe.sample_rate == 1.0
+        assert pipe.queue.maxsize == 5
+
+
+class TestSampleEvent:
+    """High-volume events are sampled per request"""
+
+    @pytest.mark.parametrize("rate,expected", [(0.0, False), (1.0, True)])
+    def test_extremes(self, rate, expected):
+        assert LogPipeline(sample_rate=rate).sample_event() is expected
+
+    def test_same_request_same_decision(self):
+        pipe = LogPipeline(sample_rate=0.5)
+        kept = 0
+        for _ in range(400):
+            tokens = bind_request(TRACE_ID, new_span_id())
+            try:
+                decisions = {pipe.sample_event() for _ in range(5)}
+            finally:
+                reset_request(tokens)
+            assert len(decisions) == 1
+            kept += decisions.pop()
+        assert 100 < kept < 300
+
+
+# =========================================================
+# APP
+# =========================================================
+
+class TestAppLogging:
+    """Log lines from requests through the app"""
+
+    @pytest.fixture
+    def app_env(self, monkeypatch):
+        monkeypatch.setenv("GROQ_API_KEY", "test-key")
+        shutdown.reset()
+        groq = MagicMock()
+        groq.chat.completions.create.side_effect = RuntimeError("provider down")
+        with patch("main.session_store", InMemorySessionStore()), \
+                patch.object(log_pipeline, "sample_rate", 1.0), \
+                patch.object(LegalAI, "get_groq_client", return_value=groq):
+            yield TestClient(app)
+
+    def _chat(self, client, message, stage, session_id="log-session"):
+        body = {"message": message, "session_id": session_id, "context_stage": stage}
+        return client.post("/api/chat", json=body)
+
+    def test_engine_error_carries_request_ids(self, app_env, pipeline):
+        response = self._chat(app_env, "which form do I need to hire a freelancer?", "SALES_MODE")
+        assert response.status_code == 200
+        lines = pipeline.lines()
+        (failure,) = [line for line in lines if line.get("event") == "llm.failed"]
+        assert failure["level"] == "ERROR"
+        assert failure["error"] == "provider down"
+        assert failure["trace_id"] == response.headers["x-trace-id"]
+        assert failure["session_id"] == "log-session"
+        assert len(failure["request_id"]) == 16
+        (turn,) = [line for line in lines if line.get("event") == "chat.turn"]
+        assert turn["request_id"] == failure["request_id"]
+        assert (turn["stage"], turn["needs_llm"], turn["sample_rate"]) == ("SALES_MODE", True, 1.0)
+
+    def test_turn_event_bounds_stage(self, app_env, pipeline):
+        assert self._chat(app_env, "hi", "any client text").status_code == 200
+        (turn,) = [line for line in pipeline.lines() if line.get("event") == "chat.turn"]
+        assert turn["stage"] == "other"
+
+    def test_chat_failure_logs_traceback(self, app_env, pipeline):
+        with patch("main.session_store.save", side_effect=ValueError("disk full")):
+            assert self._chat(app_env, "hi", "INIT").status_code == 500
+        (failure,) = [line for line in pipeline.lines() if line.get("event") == "chat.failed"]
+        assert "ValueError: disk full" in failure["exc"]
+
+    def test_turn_events_are_sampled(self, app_env, pipeline):
+        with patch.object(log_pipeline, "sample_rate", 0.0):
+            self._chat(app_env, "hi", "INIT")
+        assert [line for line in pipeline.lines() if line.get("event") == "chat.turn"] == []
+
+    def test_status_reports_pipeline(self, app_env):
+        assert set(app_env.get("/api/status").json()["logging"]) == {
+            "level", "sample_rate", "running", "queued", "dropped"
+        }
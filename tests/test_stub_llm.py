@@ -0,0 +1,206 @@
+"""
+=========================================================
+LEGALGRAM 2.0 - STUB LLM SERVER TESTS
+=========================================================
+Tests for benchmarks/stub_llm.py: wire format (checked with
+the real groq client), streaming, fault injection and the
+engine talking to the stub through GROQ_BASE_URL.
+=========================================================
+"""
+
+import pytest
+import json
+import random
+import sys
+import os
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import groq
+from benchmarks.stub_llm import LatencyDistribution, StubConfig, create_stub_app
+from services import ai_engine
+from services.ai_engine import LegalAI
+
+MESSAGES = [{"role": "system", "content": "You sell documents"}, {"role": "user", "content": "I need an NDA"}]
+
+
+def instant(**overrides) -> StubConfig:
+    """Stub config with no waiting"""
+    options = {"ttft": "fixed:0", "tokens_per_second": 0, "seed": 7}
+    options.update(overrides)
+    return StubConfig(**options)
+
+
+@pytest.fixture
+def stub():
+    app = create_stub_app(instant())
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def groq_client(stub):
+    """Real groq SDK client whose HTTP requests go to the stub app"""
+    return groq.Groq(api_key="stub", base_url="http://testserver", http_client=stub, max_retries=0)
+
+
+# =========================================================
+# DISTRIBUTION TESTS
+# =========================================================
+
+class TestLatencyDistribution:
+    """Tests for LatencyDistribution"""
+
+    @pytest.mark.parametrize("spec", [
+        "fixed:0.2", "uniform:0.1,0.5", "normal:0.3,0.1", "lognormal:0.3,0.5", "exponential:0.3"
+    ])
+    def test_samples_are_non_negative(self, spec):
+        distribution = LatencyDistribution.parse(spec)
+        rng = random.Random(1)
+        assert all(distribution.sample(rng) >= 0 for _ in range(500))
+        assert str(distribution) == spec
+
+    def test_bare_number_is_fixed(self):
+        assert LatencyDistribution.parse("0.25").sample(random.Random()) == 0.25
+
+    def test_uniform_bounds(self):
+        distribution = LatencyDistribution.parse("uniform:0.1,0.2")
+        rng = random.Random(1)
+        assert all(0.1 <= distribution.sample(rng) <= 0.2 for _ in range(200))
+
+    def test_lognormal_median(self):
+        distribution = LatencyDistribution.parse("lognormal:0.4,0.5")
+        rng = random.Random(1)
+        samples = sorted(distribution.sample(rng) for _ in range(4001))
+        assert samples[2000] == pytest.approx(0.4, rel=0.1)
+
+    @pytest.mark.parametrize("spec", ["poisson:1", "uniform:0.1", "fixed:a"])
+    def test_invalid_spec(self, spec):
+        with pytest.raises(ValueError):
+            LatencyDistribution.parse(spec)
+
+
+# =========================================================
+# WIRE FORMAT TESTS
+# =========================================================
+
+class TestWireFormat:
+    """Responses parse with the real groq client"""
+
+    def test_completion(self, groq_client, stub):
+        completion = groq_client.chat.completions.create(messages=MESSAGES, model="llama3-8b-8192", max_tokens=50)
+        assert completion.model == "llama3-8b-8192"
+        assert completion.choices[0].message.role == "assistant"
+        assert completion.choices[0].message.content
+        assert completion.usage.completion_tokens == 50
+        assert completion.usage.prompt_tokens > 0
+        assert completion.choices[0].finish_reason == "length"
+        assert stub.get("/stub/stats").json()["stats"]["completed"] == 1
+
+    def test_short_reply_finishes_with_stop(self, stub, groq_client):
+        stub.post("/stub/config", json={"reply_tokens": 10})
+        completion = groq_client.chat.completions.create(messages=MESSAGES, model="m", max_tokens=50)
+        assert completion.choices[0].finish_reason == "stop"
+        assert completion.usage.completion_tokens == 10
+
+    def test_streaming(self, groq_client, stub):
+        stub.post("/stub/config", json={"reply_tokens": 12})
+        chunks = list(groq_client.chat.completions.create(messages=MESSAGES, model="m", stream=True))
+        assert chunks[0].choices[0].delta.role == "assistant"
+        text = "".join(c.choices[0].delta.content or "" for c in chunks)
+        assert len(text.split()) == 12
+        assert chunks[-1].choices[0].finish_reason == "stop"
+        assert chunks[-1].x_groq.usage.completion_tokens == 12
+        assert stub.get("/stub/stats").json()["stats"]["streamed"] == 1
+
+    def test_stream_ends_with_done(self, stub):
+        body = {"messages": MESSAGES, "model": "m", "stream": True, "max_tokens": 3}
+        with stub.stream("POST", "/openai/v1/chat/completions", json=body) as response:
+            assert response.headers["content-type"].startswith("text/event-stream")
+            events = [line for line in response.iter_lines() if line]
+        assert events[-1] == "data: [DONE]"
+        payloads = [json.loads(line[6:]) for line in events[:-1]]
+        assert all(p["object"] == "chat.completion.chunk" for p in payloads)
+        assert len(payloads) == 1 + 3 + 1
+
+    def test_bad_request(self, stub):
+        assert stub.post("/openai/v1/chat/completions", json={"model": "m"}).status_code == 400
+
+
+# =========================================================
+# FAULT INJECTION TESTS
+# =========================================================
+
+class TestFaultInjection:
+    """429 / 500 / timeout injection"""
+
+    def test_rate_limit(self, stub, groq_client):
+        stub.post("/stub/config", json={"rate_429": 1, "retry_after": 2})
+        response = stub.post("/openai/v1/chat/completions", json={"messages": MESSAGES, "model": "m"})
+        assert response.status_code == 429
+        assert response.headers["retry-after"] == "2"
+        assert response.json()["error"]["code"] == "rate_limit_exceeded"
+        with pytest.raises(groq.RateLimitError):
+            groq_client.chat.completions.create(messages=MESSAGES, model="m")
+
+    def test_server_error(self, stub, groq_client):
+        stub.post("/stub/config", json={"rate_500": 1})
+        with pytest.raises(groq.InternalServerError):
+            groq_client.chat.completions.create(messages=MESSAGES, model="m")
+        assert stub.get("/stub/stats").json()["stats"]["server_errors"] == 1
+
+    def test_timeout_hangs_then_504(self, stub):
+        stub.post("/stub/config", json={"rate_timeout": 1, "hang_seconds": 0.01})
+        response = stub.post("/openai/v1/chat/completions", json={"messages": MESSAGES, "model": "m"})
+        assert response.status_code == 504
+        assert stub.get("/stub/stats").json()["stats"]["timeouts"] == 1
+
+    def test_rates_are_respected(self):
+        config = instant(rate_429=0.2, rate_500=0.1, seed=3)
+        faults = [config.fault() for _ in range(5000)]
+        assert faults.count("429") / 5000 == pytest.approx(0.2, abs=0.02)
+        assert faults.count("500") / 5000 == pytest.approx(0.1, abs=0.02)
+
+    def test_config_validation(self, stub):
+        assert stub.post("/stub/config", json={"bogus": 1}).status_code == 400
+        assert stub.post("/stub/config", json={"ttft": "poisson:1"}).status_code == 400
+
+    def test_reset(self, stub):
+        stub.post("/openai/v1/chat/completions", json={"messages": MESSAGES, "model": "m"})
+        stub.post("/stub/reset")
+        assert stub.get("/stub/stats").json()["stats"]["requests"] == 0
+
+
+# =========================================================
+# ENGINE AGAINST THE STUB
+# =========================================================
+
+class TestEngineAgainstStub:
+    """SALES_MODE talks to the stub through the real client"""
+
+    @pytest.fixture
+    def engine(self, stub, monkeypatch):
+        monkeypatch.setenv("GROQ_API_KEY", "stub")
+        monkeypatch.setenv("GROQ_BASE_URL", "http://testserver")
+        monkeypatch.setenv("GROQ_MAX_RETRIES", "0")
+        real_groq = ai_engine._groq_class()
+        factory = lambda **options: real_groq(http_client=stub, **options)
+        with patch.object(ai_engine, "_groq_class", return_value=factory):
+            LegalAI.close_groq_client()
+            yield stub
+            LegalAI.close_groq_client()
+
+    def test_sales_mode_completion(self, engine):
+        result = LegalAI.process_flow("what do I need for a new hire?", "Ann", "SALES_MODE", "s")
+        assert result["response"].startswith("Based on what you described")
+        assert engine.get("/stub/stats").json()["stats"]["completed"] == 1
+
+    def test_rate_limit_falls_back(self, engine):
+        engine.post("/stub/config", json={"rate_429": 1})
+        result = LegalAI.process_flow("what do I need for a new hire?", "Ann", "SALES_MODE", "s")
+        assert "high demand" in result["response"]
+        stats = engine.get("/stub/stats").json()["stats"]
+        # Primary model plus each fallback
+        assert stats["rate_limited"] == len(ai_engine.route_policies["short_answer"].models)
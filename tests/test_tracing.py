@@ -0,0 +1,340 @@
+"""
+=========================================================
+LEGALGRAM 2.0 - TRACING TESTS
+=========================================================
+Tests for services/tracing.py: spans, sinks, trace id
+propagation and the /api/admin/traces endpoints.
+=========================================================
+"""
+
+import pytest
+import asyncio
+import json
+import sys
+import os
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from starlette.concurrency import run_in_threadpool
+
+from main import app
+from services.ai_engine import LegalAI
+from services.lifecycle import shutdown
+from services.session_store import InMemorySessionStore
+from services.tracing import (
+    NOOP_SPAN, OtlpFileSink, RingBufferSink, Tracer, incoming_context, sinks_from_env
+)
+
+TRACE_ID = "0af7651916cd43dd8448eb211c80319c"
+
+
+def _names(trace):
+    return [span.name for span in trace.spans]
+
+
+# =========================================================
+# TRACE CONTEXT
+# =========================================================
+
+class TestIncomingContext:
+    """Continuing a caller's trace"""
+
+    def test_traceparent(self):
+        assert incoming_context(None, f"00-{TRACE_ID}-b7ad6b7169203331-01") == (TRACE_ID, "b7ad6b7169203331")
+
+    def test_trace_id_header(self):
+        assert incoming_context(TRACE_ID.upper(), None) == (TRACE_ID, None)
+
+    @pytest.mark.parametrize("header", ["", "xyz", "0" * 32, TRACE_ID + "0", "00-bad-traceparent"])
+    def test_invalid_ids_get_a_fresh_one(self, header):
+        trace_id, parent = incoming_context(header, header)
+        assert len(trace_id) == 32 and trace_id not in (TRACE_ID, "0" * 32)
+        assert parent is None
+
+
+# =========================================================
+# TRACER
+# =========================================================
+
+class TestTracer:
+    """Tests for Tracer and Span"""
+
+    def test_span_outside_a_trace_is_a_noop(self):
+        tracer = Tracer([RingBufferSink()])
+        with tracer.span("orphan") as span:
+            span.set("ignored", 1)
+        assert span is NOOP_SPAN
+        assert tracer.exported == 0
+
+    def test_nesting_and_export(self):
+        ring = RingBufferSink()
+        tracer = Tracer([ring], sample_rate=1.0)
+        with tracer.start_trace("root", TRACE_ID) as root:
+            with tracer.span("child", phase=1) as child:
+                with tracer.span("grandchild") as grandchild:
+                    pass
+            with tracer.span("sibling") as sibling:
+                pass
+        (trace,) = ring.recent()
+        assert _names(trace) == ["root", "child", "grandchild", "sibling"]
+        assert child.parent_id == sibling.parent_id == root.span_id
+        assert grandchild.parent_id == child.span_id
+        assert child.attributes == {"phase": 1}
+        assert root.duration_ms >= child.duration_ms >= grandchild.duration_ms >= 0
+        assert tracer.span("after") is NOOP_SPAN
+
+    def test_errors_are_recorded(self):
+        ring = RingBufferSink()
+        tracer = Tracer([ring], sample_rate=1.0)
+        with pytest.raises(HTTPException):
+            with tracer.start_trace("root", TRACE_ID):
+                with pytest.raises(ValueError):
+                    with tracer.span("fails"):
+                        raise ValueError("boom")
+                with tracer.span("refused"):
+                    raise HTTPException(status_code=429)
+        root, fails, refused = ring.recent()[0].spans
+        assert (fails.error, refused.error) == ("ValueError", "HTTPException")
+        assert refused.attributes["status_code"] == 429
+        assert root.error == "HTTPException"
+
+    @pytest.mark.parametrize("rate,expected", [(0.0, 0), (1.0, 100)])
+    def test_sample_rate(self, rate, expected):
+        tracer = Tracer([RingBufferSink(500)], sample_rate=rate)
+        for _ in range(100):
+            with tracer.start_trace("root", TRACE_ID):
+                pass
+        assert tracer.exported == expected
+
+    def test_no_sinks_means_disabled(self):
+        tracer = Tracer([], sample_rate=1.0)
+        assert not tracer.enabled
+        assert tracer.start_trace("root", TRACE_ID) is NOOP_SPAN
+
+    def test_failing_sink_does_not_break_requests(self):
+        broken = MagicMock()
+        broken.export.side_effect = OSError("disk full")
+        ring = RingBufferSink()
+        tracer = Tracer([broken, ring], sample_rate=1.0)
+        with tracer.start_trace("root", TRACE_ID):
+            pass
+        assert len(ring) == 1
+
+    def test_spans_follow_into_the_threadpool(self):
+        ring = RingBufferSink()
+        tracer = Tracer([ring], sample_rate=1.0)
+
+        def blocking_work():
+            with tracer.span("in_thread"):
+                pass
+
+        async def handler():
+            with tracer.start_trace("root", TRACE_ID) as root:
+                with tracer.span("dispatch") as dispatch:
+                    await run_in_threadpool(blocking_work)
+            return root, dispatch
+
+        root, dispatch = asyncio.run(handler())
+        (trace,) = ring.recent()
+        assert _names(trace) == ["root", "dispatch", "in_thread"]
+        assert trace.spans[2].parent_id == dispatch.span_id
+
+    def test_from_env(self, monkeypatch, tmp_path):
+        monkeypatch.setenv("TRACE_SINK", "memory, otlp, bogus")
+        monkeypatch.setenv("TRACE_BUFFER_SIZE", "7")
+        monkeypatch.setenv("TRACE_OTLP_PATH", str(tmp_path / "t.jsonl"))
+        monkeypatch.setenv("TRACE_SAMPLE", "0.5")
+        tracer = Tracer()
+        assert [sink.name for sink in tracer.sinks] == ["memory", "otlp"]
+        assert tracer.sample_rate == 0.5
+        assert tracer.ring_buffer._traces.maxlen == 7
+
+    def test_sink_none(self, monkeypatch):
+        monkeypatch.setenv("TRACE_SINK", "none")
+        assert sinks_from_env() == []
+
+
+class TestSinks:
+    """Tests for the ring buffer and OTLP file sinks"""
+
+    def _trace(self, tracer, trace_id=TRACE_ID):
+        with tracer.start_trace("root", trace_id, "b7ad6b7169203331", **{"http.status_code": 200}):
+            with tracer.span("child", tokens=12, ratio=0.5, cached=True, model="m"):
+                pass
+
+    def test_ring_buffer_keeps_the_newest(self):
+        ring = RingBufferSink(size=3)
+        tracer = Tracer([ring], sample_rate=1.0)
+        ids = [f"{i:032x}" for i in range(1, 6)]
+        for trace_id in ids:
+            self._trace(tracer, trace_id)
+        assert [trace.trace_id for trace in ring.recent()] == ids[:1:-1]
+        assert ring.get(ids[0]) is None
+        assert ring.get(ids[-1]).summary()["status_code"] == 200
+        assert ring.recent(limit=1)[0].trace_id == ids[-1]
+        assert ring.recent(min_ms=60_000) == []
+
+    def test_otlp_file(self, tmp_path):
+        path = str(tmp_path / "traces.jsonl")
+        sink = OtlpFileSink(path)
+        tracer = Tracer([sink], sample_rate=1.0)
+        self._trace(tracer)
+        self._trace(tracer)
+        sink.close()
+        with open(path) as f:
+            lines = [json.loads(line) for line in f]
+        assert len(lines) == 2
+        (resource,) = lines[0]["resourceSpans"]
+        assert resource["resource"]["attributes"][0]["value"] == {"stringValue": "legalgram-backend"}
+        root, child = resource["scopeSpans"][0]["spans"]
+        assert root["traceId"] == child["traceId"] == TRACE_ID
+        assert root["parentSpanId"] == "b7ad6b7169203331"
+        assert child["parentSpanId"] == root["spanId"]
+        assert (root["kind"], child["kind"]) == (2, 1)
+        assert int(root["endTimeUnixNano"]) >= int(child["endTimeUnixNano"]) >= int(child["startTimeUnixNano"])
+        values = {attribute["key"]: attribute["value"] for attribute in child["attributes"]}
+        assert values == {
+            "tokens": {"intValue": "12"}, "ratio": {"doubleValue": 0.5},
+            "cached": {"boolValue": True}, "model": {"stringValue": "m"},
+        }
+
+
+# =========================================================
+# APP
+# =========================================================
+
+@pytest.fixture
+def traced(monkeypatch):
+    """Fresh tracer with a ring buffer, private session store, mocked Groq"""
+    monkeypatch.setenv("GROQ_API_KEY", "test-key")
+    shutdown.reset()
+    groq = MagicMock()
+    completion = MagicMock()
+    completion.choices = [MagicMock(message=MagicMock(content="Try our contractor agreement"))]
+    completion.usage = MagicMock(prompt_tokens=400, completion_tokens=30)
+    groq.chat.completions.create.return_value = completion
+    tracer = Tracer([RingBufferSink(50)], sample_rate=1.0)
+    with patch("services.tracing.tracer", tracer), \
+            patch("main.tracer", tracer), \
+            patch("main.session_store", InMemorySessionStore()), \
+            patch.object(LegalAI, "get_groq_client", return_value=groq):
+        yield TestClient(app), tracer.ring_buffer
+
+
+def _chat(client, message, stage, headers=None):
+    body = {"message": message, "session_id": "t1", "context_stage": stage}
+    return client.post("/api/chat", json=body, headers=headers or {})
+
+
+class TestRequestTracing:
+    """Traces of requests through the app"""
+
+    def test_trace_id_header(self, traced):
+        client, ring = traced
+        response = _chat(client, "hi", "INIT")
+        trace_id = response.headers["x-trace-id"]
+        assert len(trace_id) == 32
+        trace = ring.get(trace_id)
+        assert trace.root.name == "POST /api/chat"
+        assert trace.root.attributes["http.status_code"] == 200
+        assert trace.root.attributes["chat.stage"] == "INIT"
+
+    def test_incoming_trace_is_continued(self, traced):
+        client, ring = traced
+        response = _chat(client, "hi", "INIT", headers={"traceparent": f"00-{TRACE_ID}-b7ad6b7169203331-01"})
+        assert response.headers["x-trace-id"] == TRACE_ID
+        assert ring.get(TRACE_ID).root.parent_id == "b7ad6b7169203331"
+
+    def test_llm_turn_phases(self, traced):
+        client, ring = traced
+        response = _chat(client, "which form do I need to hire a freelancer?", "SALES_MODE")
+        trace = ring.get(response.headers["x-trace-id"])
+        assert _names(trace) == [
+            "POST /api/chat", "engine.needs_llm", "rate_limit.check", "session.load",
+            "engine.process_flow", "catalog.match", "prompt.build", "llm.completion", "session.save",
+        ]
+        spans = {span.name: span for span in trace.spans}
+        assert spans["catalog.match"].parent_id == spans["engine.process_flow"].span_id
+        assert spans["llm.completion"].attributes == {
+            "model": "llama3-8b-8192", "route": "short_answer", "attempt": 0,
+            "prompt_tokens": 400, "completion_tokens": 30,
+        }
+
+    def test_refused_turn(self, traced):
+        client, ring = traced
+        with patch("main.admission.should_shed", return_value=True):
+            response = _chat(client, "which form do I need to hire a freelancer?", "SALES_MODE")
+        trace = ring.get(response.headers["x-trace-id"])
+        assert response.status_code == 503
+        assert trace.root.attributes["http.status_code"] == 503
+        assert "engine.process_flow" not in _names(trace)
+
+    def test_route_template_in_name(self, traced):
+        client, ring = traced
+        response = client.get("/api/session/unknown-session")
+        assert ring.get(response.headers["x-trace-id"]).root.name == "GET /api/session/{session_id}"
+
+    @pytest.mark.parametrize("path", ["/healthz", "/metrics", "/api/admin/traces"])
+    def test_probes_are_not_traced(self, traced, path):
+        client, ring = traced
+        assert "x-trace-id" not in client.get(path).headers
+        assert len(ring) == 0
+
+
+class TestTraceAdmin:
+    """/api/admin/traces endpoints"""
+
+    @pytest.fixture(autouse=True)
+    def admin_token(self, traced):
+        client, _ = traced
+        with patch("main.ADMIN_TOKEN", "s3cret"):
+            client.headers["X-Admin-Token"] = "s3cret"
+            yield
+
+    def test_list_and_detail(self, traced):
+        client, _ = traced
+        trace_id = _chat(client, "hi", "INIT").headers["x-trace-id"]
+        listing = client.get("/api/admin/traces").json()
+        assert listing["traces"][0]["trace_id"] == trace_id
+        assert listing["tracing"]["sinks"] == ["memory"]
+        detail = client.get(f"/api/admin/traces/{trace_id}").json()
+        assert detail["spans"][0]["offset_ms"] == 0
+        assert [span["name"] for span in detail["spans"]][:2] == ["POST /api/chat", "engine.needs_llm"]
+
+    def test_min_ms_filter(self, traced):
+        client, _ = traced
+        _chat(client, "hi", "INIT")
+        assert client.get("/api/admin/traces", params={"min_ms": 60_000}).json()["traces"] == []
+
+    def test_unknown_trace(self, traced):
+        client, _ = traced
+        assert client.get(f"/api/admin/traces/{TRACE_ID}").status_code == 404
+
+    def test_admin_token(self, traced):
+        client, _ = traced
+        assert client.get("/api/admin/traces").status_code == 200
+        assert client.get("/api/admin/traces", headers={"X-Admin-Token": "wrong"}).status_code == 403
+        del client.headers["X-Admin-Token"]
+        assert client.get("/api/admin/traces").status_code == 403
+
+    def test_disabled_without_admin_token(self, traced):
+        client, _ = traced
+        _chat(client, "hi", "INIT")
+        with patch("main.ADMIN_TOKEN", None):
+            assert client.get("/api/admin/traces").status_code == 404
+            assert client.get(f"/api/admin/traces/{TRACE_ID}").status_code == 404
+
+    def test_client_stage_is_not_stored(self, traced):
+        client, ring = traced
+        trace = ring.get(_chat(client, "hi", "<b>anything</b>").headers["x-trace-id"])
+        stages = [span.attributes.get("stage") for span in trace.spans if "stage" in span.attributes]
+        assert stages and set(stages) == {"other"}
+        assert trace.root.attributes["chat.stage"] == "other"
+
+    def test_no_ring_buffer(self, traced):
+        client, _ = traced
+        with patch("main.tracer", Tracer([], sample_rate=1.0)):
+            assert client.get("/api/admin/traces").status_code == 404
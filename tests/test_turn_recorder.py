@@ -0,0 +1,182 @@
+"""
+=========================================================
+LEGALGRAM 2.0 - TURN RECORDER TESTS
+=========================================================
+Tests for services/turn_recorder.py and the recording hook
+in /api/chat.
+=========================================================
+"""
+
+import pytest
+import asyncio
+import json
+import sys
+import os
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import HTTPException
+
+from benchmarks.loadtest import in_process_client
+from services.ai_engine import LegalAI
+from services.lifecycle import shutdown
+from services.session_store import InMemorySessionStore
+from services.turn_recorder import TurnRecorder, TurnTrace, note_llm_call
+
+
+def _lines(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+# =========================================================
+# RECORDER
+# =========================================================
+
+class TestTurnRecorder:
+    """Tests for TurnRecorder"""
+
+    def test_disabled_without_path(self, monkeypatch):
+        monkeypatch.delenv("TURN_RECORD_PATH", raising=False)
+        recorder = TurnRecorder()
+        assert not recorder.enabled
+        with recorder.turn("s1", "INIT", 2) as trace:
+            assert trace is None
+        assert recorder.recorded == 0
+
+    def test_records_one_compact_line(self, tmp_path):
+        path = str(tmp_path / "turns.jsonl")
+        recorder = TurnRecorder(path, salt="k")
+        with recorder.turn("s1", "SALES_MODE", 17) as trace:
+            trace.finish({"new_stage": "SALES_MODE", "suggested_documents": ["Non-Disclosure Agreement"]})
+        recorder.close()
+        (line,) = _lines(path)
+        assert line["st"] == line["ns"] == "SALES_MODE"
+        assert line["len"] == 17
+        assert line["doc"] == "Non-Disclosure Agreement"
+        assert line["code"] == 200
+        assert "llm_ms" not in line
+        with open(path) as f:
+            assert " " not in f.read().replace("Non-Disclosure Agreement", "")
+
+    def test_session_ids_are_hashed(self, tmp_path):
+        a = TurnRecorder(str(tmp_path / "a"), salt="one")
+        b = TurnRecorder(str(tmp_path / "b"), salt="two")
+        assert a.session_token("user-42") == a.session_token("user-42")
+        assert a.session_token("user-42") != b.session_token("user-42")
+        assert "user-42" not in a.session_token("user-42")
+
+    def test_http_errors_keep_their_status(self, tmp_path):
+        path = str(tmp_path / "turns.jsonl")
+        recorder = TurnRecorder(path, salt="k")
+        with pytest.raises(HTTPException):
+            with recorder.turn("s1", "SALES_MODE", 3):
+                raise HTTPException(status_code=429)
+        with pytest.raises(RuntimeError):
+            with recorder.turn("s1", "SALES_MODE", 3):
+                raise RuntimeError("boom")
+        recorder.flush()
+        assert [line["code"] for line in _lines(path)] == [429, 500]
+
+    def test_llm_call_attaches_to_current_turn(self, tmp_path):
+        recorder = TurnRecorder(str(tmp_path / "turns.jsonl"), salt="k")
+        note_llm_call("m", "comparison", 0.5, 400, 30, 0)  # no turn: ignored
+        with recorder.turn("s1", "SALES_MODE", 3) as trace:
+            note_llm_call("m", "comparison", 0.25, 400, 30, 1)
+        data = trace.to_dict()
+        assert data["llm_ms"] == 250.0
+        assert (data["tin"], data["tout"], data["route"], data["try"]) == (400, 30, "comparison", 1)
+
+    @pytest.mark.parametrize("rate,expected", [(0.0, 0), (1.0, 200)])
+    def test_sample_rate_extremes(self, tmp_path, rate, expected):
+        recorder = TurnRecorder(str(tmp_path / "turns.jsonl"), sample_rate=rate, salt="k")
+        for i in range(200):
+            with recorder.turn(f"s{i}", "INIT", 2):
+                pass
+        assert recorder.recorded == expected
+
+    def test_sampling_keeps_whole_sessions(self, tmp_path):
+        recorder = TurnRecorder(str(tmp_path / "turns.jsonl"), sample_rate=0.5, salt="k")
+        for turn in range(3):
+            for i in range(200):
+                with recorder.turn(f"s{i}", "INIT", 2):
+                    pass
+        assert 0 < recorder.recorded < 600
+        assert recorder.recorded % 3 == 0
+
+    def test_from_env(self, monkeypatch, tmp_path):
+        monkeypatch.setenv("TURN_RECORD_PATH", str(tmp_path / "t.jsonl"))
+        monkeypatch.setenv("TURN_RECORD_SAMPLE", "0.25")
+        recorder = TurnRecorder()
+        assert recorder.snapshot() == {"enabled": True, "sample_rate": 0.25, "recorded": 0}
+
+    def test_trace_omits_unset_fields(self):
+        assert set(TurnTrace("abc", "INIT", 2).to_dict()) == {"t", "s", "st", "len", "code", "ms"}
+
+
+# =========================================================
+# /api/chat HOOK
+# =========================================================
+
+class TestChatRecording:
+    """Turns through the app land in the trace"""
+
+    @pytest.fixture(autouse=True)
+    def reset_shutdown(self):
+        shutdown.reset()
+        yield
+        shutdown.reset()
+
+    def test_journey_is_recorded(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("GROQ_API_KEY", "test-key")
+        path = str(tmp_path / "turns.jsonl")
+        recorder = TurnRecorder(path, salt="k")
+        client = MagicMock()
+        completion = MagicMock()
+        completion.choices = [MagicMock(message=MagicMock(content="Try our contractor agreement"))]
+        completion.usage = MagicMock(prompt_tokens=400, completion_tokens=30)
+        client.chat.completions.create.return_value = completion
+
+        async def journey():
+            turns = [
+                ("INIT", "hi"), ("CAPTURE_NAME", "my name is Secret Person"), ("TRIAGE", "2"),
+                ("SALES_MODE", "I need an NDA"), ("SALES_MODE", "which form do I need to hire a freelancer?"),
+            ]
+            async with in_process_client() as http:
+                for stage, message in turns:
+                    body = {"message": message, "session_id": "private-session", "context_stage": stage}
+                    response = await http.post("/api/chat", json=body)
+                    assert response.status_code == 200, response.text
+
+        with patch("main.session_store", InMemorySessionStore()), \
+                patch("main.turn_recorder", recorder), \
+                patch.object(LegalAI, "get_groq_client", return_value=client):
+            asyncio.run(journey())
+        recorder.close()
+
+        lines = _lines(path)
+        assert [line["st"] for line in lines] == ["INIT", "CAPTURE_NAME", "TRIAGE", "SALES_MODE", "SALES_MODE"]
+        assert [line["ns"] for line in lines] == ["CAPTURE_NAME", "TRIAGE", "SALES_MODE", "SALES_MODE", "SALES_MODE"]
+        assert len({line["s"] for line in lines}) == 1
+        assert lines[3]["doc"] == "Non-Disclosure Agreement"
+        assert lines[4]["tin"] == 400 and lines[4]["route"] == "short_answer"
+        with open(path) as f:
+            raw = f.read()
+        assert "Secret" not in raw and "private-session" not in raw and "freelancer" not in raw
+
+    def test_unknown_stage_is_recorded_as_other(self, tmp_path):
+        path = str(tmp_path / "turns.jsonl")
+        recorder = TurnRecorder(path, salt="k")
+
+        async def turns():
+            async with in_process_client() as http:
+                for stage in ("TRIAGE", "name: Secret Person", "ADVISING"):
+                    body = {"message": "hi", "session_id": "s1", "context_stage": stage}
+                    assert (await http.post("/api/chat", json=body)).status_code == 200
+
+        with patch("main.session_store", InMemorySessionStore()), patch("main.turn_recorder", recorder):
+            asyncio.run(turns())
+        recorder.close()
+
+        assert [line["st"] for line in _lines(path)] == ["TRIAGE", "other", "other"]